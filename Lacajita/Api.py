@@ -13,7 +13,7 @@ from datetime import datetime
 import os
 import re
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 from dotenv import load_dotenv
 # HTTP / JWT
 import requests
@@ -550,28 +550,50 @@ class PlaylistModel(BaseModel):
 
 @app.post('/uiplaylist', tags=["core"])
 def uiPlaylist(pl: PlaylistModel, user: dict = Depends(require_auth)):
+    """Crea o actualiza un playlist y su conjunto de categorías en una transacción.
+    - Un INSERT ... ON DUPLICATE KEY UPDATE en lugar de SELECT + INSERT/UPDATE.
+    - Categorías por diferencia: solo se borran las quitadas y se insertan las nuevas.
+    - La respuesta se arma con los datos enviados; no se relee la fila.
+    """
     if not (pl.title and pl.id and pl.segid > 0):
         return {"msg": "Titulo, Id y Segmento son obligatorios!"}
+    wanted = list(dict.fromkeys(pl.categories))
     conn = getConnection(); cur = conn.cursor()
-    cur.execute("select 1 from lacajita_playlists where id=%s", (pl.id,))
-    exists = cur.fetchall()
-    if not exists:
-        cur.execute("""insert into lacajita_playlists (id, segment_id, img, title, description)
-                       values (%s,%s,%s,%s,%s)""", (pl.id, pl.segid, pl.img, pl.title, pl.desc))
-        conn.commit()
-        for c in pl.categories:
-            cur.execute("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", (pl.id, c))
-            conn.commit()
-    else:
-        cur.execute("""update lacajita_playlists set id=%s, segment_id=%s, img=%s, title=%s, description=%s
-                       where id=%s""", (pl.id, pl.segid, pl.img, pl.title, pl.desc, pl.id))
-        cur.execute("delete from lacajita_playlist_categories where id_playlist=%s", (pl.id,))
+    try:
+        # updated_at no va en el UPDATE: rowcount 0 sigue significando "sin cambios" (se toca abajo)
+        cur.execute("""insert into lacajita_playlists (id, segment_id, img, title, description, updated_at)
+                       values (%s,%s,%s,%s,%s,now())
+                       on duplicate key update segment_id=values(segment_id), img=values(img),
+                       title=values(title), description=values(description)""",
+                    (pl.id, pl.segid, pl.img, pl.title, pl.desc))
+        affected = cur.rowcount
+        created = affected == 1  # 1 = insertado, 2 = actualizado, 0 = sin cambios
+        have = []
+        if not created:
+            cur.execute("select id_category from lacajita_playlist_categories where id_playlist=%s", (pl.id,))
+            have = [r[0] for r in cur.fetchall()]
+        have_set, wanted_set = set(have), set(wanted)
+        removed = [c for c in dict.fromkeys(have) if c not in wanted_set]
+        added = [(pl.id, c) for c in wanted if c not in have_set]
+        if removed:
+            cur.execute("delete from lacajita_playlist_categories where id_playlist=%s and id_category in ("
+                        + ",".join(["%s"] * len(removed)) + ")", [pl.id] + removed)
+        if added:
+            cur.executemany("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", added)
+        if not created and (affected or added or removed):
+            # el catálogo en memoria de fastapi-playlists relee por updated_at, también si solo cambiaron categorías
+            cur.execute("update lacajita_playlists set updated_at=now() where id=%s", (pl.id,))
         conn.commit()
-        for c in pl.categories:
-            cur.execute("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", (pl.id, c))
-            conn.commit()
-    cur.close(); conn.close()
-    return {"msg":"Los datos han sido guardados correctamente!"}
+    except Error as err:
+        conn.rollback()
+        print(f"Error guardando playlist {pl.id}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error guardando playlist: {err}")
+    finally:
+        cur.close(); conn.close()
+    return {"msg": "Los datos han sido guardados correctamente!", "created": created,
+            "playlist": {"id": pl.id, "segment_id": pl.segid, "img": pl.img, "title": pl.title,
+                         "description": pl.desc, "categories": wanted},
+            "categories_added": len(added), "categories_removed": len(removed)}
 
 class dPlaylist(BaseModel):
     id: str
@@ -589,20 +611,49 @@ def dPlaylistDel(pl: dPlaylist, user: dict = Depends(require_auth)):
     conn.commit()
     cur.close(); conn.close()
 
+VIDEOS_CHUNK_ROWS = 500  # ids por sentencia IN
+
 class SeasVideosModel(BaseModel):
     season_id: int
     videoarr: list
 
 @app.post('/iuseasonvideos', tags=["core"])
 def iuseasonvideos(sv: SeasVideosModel, user: dict = Depends(require_auth)):
+    """Fija los videos de una temporada aplicando solo la diferencia con lo guardado.
+    Los videos que se mantienen conservan su `date`; el orden no se guarda (la tabla no tiene
+    posición), así que reordenar no genera escrituras. Un video que vuelve a enviarse estando
+    inactivo (p. ej. desactivado por /bulk/seasons) se reactiva, igual que en /bulk/seasons.
+    Los que se quitan aquí se borran: es una edición manual, y /iuseason solo elimina una
+    temporada sin videos. Un envío sin cambios cuesta un SELECT y ningún commit.
+    """
+    desired = list(dict.fromkeys(v for v in sv.videoarr if v))
     conn = getConnection(); cur = conn.cursor()
-    cur.execute('DELETE FROM lacajita_videos where season_id=%s', (sv.season_id,))
-    conn.commit()
-    for v in sv.videoarr:
-        cur.execute('insert into lacajita_videos(season_id, video_id) values(%s,%s)', (sv.season_id, v))
-        conn.commit()
-    cur.close(); conn.close()
-    return {"msg":"Cambios realizados correctamente!"}
+    try:
+        cur.execute('select video_id, active from lacajita_videos where season_id=%s', (sv.season_id,))
+        have = {r[0]: r[1] for r in cur.fetchall()}
+        desired_set = set(desired)
+        to_insert = [(sv.season_id, v) for v in desired if v not in have]
+        to_activate = [v for v in desired if v in have and not have[v]]
+        to_delete = [v for v in have if v not in desired_set]
+        if to_insert or to_activate or to_delete:
+            # IN en trozos acotados (como Core_M_cajita): una temporada grande no genera una sentencia gigante
+            for statement, ids in (('delete from lacajita_videos', to_delete),
+                                   ('update lacajita_videos set active=1', to_activate)):
+                for i in range(0, len(ids), VIDEOS_CHUNK_ROWS):
+                    chunk = ids[i:i + VIDEOS_CHUNK_ROWS]
+                    cur.execute(statement + " where season_id=%s and video_id in ("
+                                + ",".join(["%s"] * len(chunk)) + ")", [sv.season_id] + chunk)
+            if to_insert:
+                cur.executemany('insert into lacajita_videos(season_id, video_id) values(%s,%s)', to_insert)
+            conn.commit()
+    except Error as err:
+        conn.rollback()
+        print(f"Error guardando videos de la temporada {sv.season_id}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error guardando videos: {err}")
+    finally:
+        cur.close(); conn.close()
+    return {"msg": "Cambios realizados correctamente!", "inserted": len(to_insert), "deleted": len(to_delete),
+            "reactivated": len(to_activate), "unchanged": len(desired) - len(to_insert) - len(to_activate)}
 
 class SeasonsModel(BaseModel):
     id: int = 0
@@ -639,11 +690,28 @@ class SegmentsOrder(BaseModel):
 
 @app.post('/usegments', tags=["core"])
 def updateSegments(se: SegmentsOrder, user: dict = Depends(require_auth)):
+    rows = [(l['order_'], l['id']) for l in se.arrorder]
+    if not rows:
+        return
     conn = getConnection(); cur = conn.cursor()
-    for l in se.arrorder:
-        cur.execute('update lacajita_segments set order_=%s where id=%s', (l['order_'], l['id']))
-        conn.commit()
-    cur.close(); conn.close()
+    try:
+        cur.executemany('update lacajita_segments set order_=%s where id=%s', rows)
+        try:
+            # Si existe rank_key, manda sobre order_ al leer (ver fastapi-playlists/ordering.py):
+            # se borra en toda la tabla, no solo en estas filas, para que el orden lo dé order_
+            # (borrarla solo aquí dejaría las filas tocadas detrás de todas las que tienen clave).
+            # Core_M_cajita vuelve a generar las claves desde ese orden al próximo movimiento.
+            cur.execute('update lacajita_segments set rank_key=null')
+        except Error as err:
+            if err.errno != errorcode.ER_BAD_FIELD_ERROR:  # base sin la columna rank_key
+                raise
+        conn.commit()  # un solo commit para todo el nuevo orden
+    except Error as err:
+        conn.rollback()
+        print(f"Error actualizando el orden de segmentos: {err}")
+        raise HTTPException(status_code=500, detail=f"Error actualizando segmentos: {err}")
+    finally:
+        cur.close(); conn.close()
 
 @app.get('/homecarousel', tags=["core"])
 def getHomecarousel(user: dict = Depends(require_auth)):
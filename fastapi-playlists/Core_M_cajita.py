@@ -1,15 +1,16 @@
 # Core_M_cajita.py
 # API La Cajita TV (MySQL) + Auth0 (idéntico a app.py) + endpoints
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Depends, Header, status
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Depends, Header, status, BackgroundTasks, Response
 from starlette.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.openapi.utils import get_openapi
 from starlette.datastructures import CommaSeparatedStrings
 from pydantic import BaseModel, validator
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 from datetime import datetime
+import asyncio
 import os
 import re
 import mysql.connector
@@ -20,6 +21,12 @@ import requests
 from functools import lru_cache
 from jose import jwt as jose_jwt
 from jose.exceptions import JWTError as JoseJWTError, ExpiredSignatureError as JoseExpiredSignatureError
+import image_index
+import ordering
+import keyset
+import wire
+import changelog
+import event_hub
 load_dotenv(dotenv_path='.env')
 
 # Entorno / desarrollo
@@ -44,6 +51,8 @@ app = FastAPI(
     redoc_url=None,
     openapi_url="/api/openapi.json",
 )
+# Cuerpos MessagePack/CBOR y formato de respuesta negociado con Accept (ver wire.py)
+app.router.route_class = wire.NegotiatedRoute
 
 # ----------------- Files -----------------
 UPLOAD_DIR = 'img'
@@ -112,6 +121,24 @@ def getConnection():
         print(f"Error connecting database: {err}")
         raise HTTPException(status_code=500, detail="DB connection error")
 
+@app.on_event("startup")
+def ensure_rank_columns_on_startup():
+    """Columna `rank_key` de segmentos/carrusel (ver ordering.py); sin BD el arranque sigue."""
+    try:
+        conn = getConnection()
+        try:
+            ordering.ensure_rank_columns(conn)
+            changelog.ensure_table(conn)
+        finally:
+            conn.close()
+    except Exception as e:
+        print(f"Startup: no se pudo preparar rank_key / {changelog.TABLE}: {e}")
+
+@app.on_event("startup")
+async def schedule_changelog_prune():
+    """Poda de lacajita_changes también durante la vida del proceso (ver changelog.prune_forever)."""
+    app.state.changelog_prune = asyncio.create_task(changelog.prune_forever(getConnection))
+
 # ----------------- Auth0 (idéntico a app.py) -----------------
 AUTH0_DOMAIN = os.getenv("AUTH0_DOMAIN")
 AUTH0_API_AUDIENCE = os.getenv("AUTH0_API_AUDIENCE")  # usar SIEMPRE este, igual que app.py
@@ -266,6 +293,85 @@ def _parse_iso8601(ts: Optional[str]) -> Optional[datetime]:
     except Exception:
         return None
 
+AUTH0_USER_FIELDS = [
+    "user_id","email","email_verified","blocked","created_at","last_login","last_ip","logins_count","identities","app_metadata","user_metadata"
+]
+AUTH0_MAX_PER_PAGE = 100  # máximo de per_page en /api/v2/users
+AUTH0_MAX_RESULTS = 1000  # Auth0 no devuelve más resultados por consulta
+
+def _auth0_users_request(url: str, headers: Dict[str, str], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    try:
+        r = requests.get(url, headers=headers, params=params, timeout=15)
+    except requests.exceptions.RequestException as e:
+        raise HTTPException(status_code=502, detail=f"Error conectando con Auth0: {e}")
+    if r.status_code != 200:
+        raise HTTPException(status_code=502, detail={
+            "message": "Auth0 /users falló",
+            "status": r.status_code,
+            "response": r.text[:500],
+        })
+    data = r.json()
+    # Formato puede ser lista o dict con users; manejamos ambos
+    return (data.get("users") if isinstance(data, dict) else data) or []
+
+def _user_key(u: Dict[str, Any]) -> tuple:
+    return u.get("created_at") or "", u.get("user_id") or ""
+
+def _fetch_auth0_ties(url: str, headers: Dict[str, str], params: Dict[str, Any], created_at: str):
+    """Todos los usuarios con ese `created_at` exacto, ordenados por user_id. Auth0 solo ordena
+    por un campo y no admite rangos sobre user_id, así que el grupo de empates se pide entero
+    con page/per_page (normalmente una petición) y se ordena aquí."""
+    ties: List[Dict[str, Any]] = []
+    query = {**params, "q": f'created_at:"{created_at}"', "search_engine": "v3",
+             "per_page": AUTH0_MAX_PER_PAGE}
+    for page in range(AUTH0_MAX_RESULTS // AUTH0_MAX_PER_PAGE):
+        batch = _auth0_users_request(url, headers, {**query, "page": page})
+        ties += batch
+        if len(batch) < AUTH0_MAX_PER_PAGE:
+            break
+    return sorted(ties, key=_user_key)
+
+def _fetch_auth0_users_after(after: Optional[List[str]], limit: int):
+    """Una página de usuarios en orden (created_at, user_id) posterior a `after`.
+
+    Keyset sobre Auth0: en vez de page/per_page (que además se corta a los 1000 resultados)
+    se piden el resto de los empates de `after` (`created_at:"último"`) y después el rango
+    estricto `created_at:{último TO *]`. Del rango solo se entregan grupos de `created_at`
+    completos: si la respuesta llega llena, el último grupo puede venir cortado y se deja para
+    la página siguiente; si la respuesta entera es un solo grupo, se pide completo. Así más de
+    `per_page` empates no cortan el listado. Cada página cuesta una o dos peticiones a Auth0.
+    Devuelve (usuarios, clave del último o None si no hay más).
+    """
+    token = get_management_token()
+    url = f"https://{AUTH0_DOMAIN}/api/v2/users"
+    headers = {"Authorization": f"Bearer {token}"}
+    params: Dict[str, Any] = {
+        "fields": ",".join(AUTH0_USER_FIELDS),
+        "include_fields": "true",
+        "sort": "created_at:1",
+    }
+    rows: List[Dict[str, Any]] = []
+    full = False
+    if after:
+        rows = [u for u in _fetch_auth0_ties(url, headers, params, after[0]) if _user_key(u) > tuple(after)]
+    if len(rows) <= limit:
+        query = {**params, "per_page": min(limit + 1, AUTH0_MAX_PER_PAGE), "page": 0}
+        if after:
+            query["q"] = f'created_at:{{"{after[0]}" TO *]'
+            query["search_engine"] = "v3"
+        batch = sorted(_auth0_users_request(url, headers, query), key=_user_key)
+        full = len(batch) == query["per_page"]
+        if full:
+            last = _user_key(batch[-1])[0]
+            head = [u for u in batch if _user_key(u)[0] < last]
+            batch = head or _fetch_auth0_ties(url, headers, params, last)
+        rows += batch
+    more = len(rows) > limit or full
+    rows = rows[:limit]
+    if not (more and rows):
+        return rows, None
+    return rows, list(_user_key(rows[-1]))
+
 def _fetch_auth0_users() -> List[Dict[str, Any]]:
     """Obtiene todos los usuarios de Auth0 con paginación y caché simple."""
     global _users_cache
@@ -286,11 +392,8 @@ def _fetch_auth0_users() -> List[Dict[str, Any]]:
     max_pages = 2000 // per_page
 
     # Pedimos campos mínimos para estadísticas
-    fields = [
-        "user_id","email","email_verified","blocked","created_at","last_login","last_ip","logins_count","identities","app_metadata","user_metadata"
-    ]
     params_base = {
-        "fields": ",".join(fields),
+        "fields": ",".join(AUTH0_USER_FIELDS),
         "include_fields": "true",
         "include_totals": "true",
         "sort": "created_at:1",
@@ -298,19 +401,7 @@ def _fetch_auth0_users() -> List[Dict[str, Any]]:
 
     while page < max_pages:
         params = {**params_base, "page": page, "per_page": per_page}
-        try:
-            r = requests.get(url, headers=headers, params=params, timeout=15)
-        except requests.exceptions.RequestException as e:
-            raise HTTPException(status_code=502, detail=f"Error conectando con Auth0: {e}")
-        if r.status_code != 200:
-            raise HTTPException(status_code=502, detail={
-                "message": "Auth0 /users falló",
-                "status": r.status_code,
-                "response": r.text[:500],
-            })
-        data = r.json()
-        # Formato puede ser lista o dict con users; manejamos ambos
-        page_users = data.get("users") if isinstance(data, dict) else data
+        page_users = _auth0_users_request(url, headers, params)
         if not page_users:
             break
         users.extend(page_users)
@@ -326,7 +417,20 @@ def _fetch_auth0_users() -> List[Dict[str, Any]]:
 # Se protegen con JWT de la API (o bypass en desarrollo) y usan el token M2M del backend.
 
 @app.get("/auth0/users", tags=["auth0"])
-def auth0_list_users(page: int = 0, per_page: int = 50, _user: dict = Depends(require_auth)):
+def auth0_list_users(page: int = 0, per_page: int = 50,
+                     limit: Optional[int] = Query(None, ge=1, description=f"Paginación por cursor (máx. {AUTH0_MAX_PER_PAGE})"),
+                     cursor: Optional[str] = Query(None, description="`next_cursor` de la página anterior"),
+                     _user: dict = Depends(require_auth)):
+    """Con `limit`/`cursor` pide a Auth0 solo la página (ver _fetch_auth0_users_after);
+    con page/per_page se mantiene el listado anterior sobre la caché completa."""
+    if limit is not None or cursor is not None:
+        try:
+            after = keyset.decode_cursor(cursor, 2) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        n = keyset.clamp_limit(limit, maximum=AUTH0_MAX_PER_PAGE)
+        users, last = _fetch_auth0_users_after(after, n)
+        return {"users": users, "limit": n, "next_cursor": keyset.encode_cursor(last) if last else None}
     users = _fetch_auth0_users()
     start = max(0, page * per_page)
     end = start + per_page
@@ -786,6 +890,32 @@ def customers_demographic(_user: dict = Depends(require_auth)):
         by_country=by_country or None,
     )
 
+# ---------- Push al panel (SSE): cambios del catálogo y métricas del dashboard ----------
+def _dashboard_aggregates() -> Dict[str, Any]:
+    """Métricas de las tarjetas del dashboard, calculadas una vez para todas las sesiones.
+    Una métrica que falla (p. ej. Auth0 no responde) se omite y se reintenta en el siguiente ciclo."""
+    out: Dict[str, Any] = {}
+    for name, build in (("system_summary", lambda: system_summary(None)),
+                        ("customers_summary", lambda: customers_summary(None)),
+                        ("login_stats", lambda: dashboard_login_stats(None)),
+                        ("video_consumption", lambda: video_consumption(30, None))):
+        try:
+            out[name] = build().dict()
+        except Exception as e:
+            print(f"Push: métrica {name} no disponible: {e}")
+    return out
+
+EVENTS = event_hub.Hub(getConnection, _dashboard_aggregates)
+
+@app.get("/events", tags=["dashboard"])
+async def admin_events(request: Request, last_event_id: Optional[str] = Header(None),
+                       _user: dict = Depends(require_auth)):
+    """Server-Sent Events para el panel: versión y elementos cambiados del catálogo y métricas
+    del dashboard, con latidos y reanudación por `Last-Event-ID` (o `?lastEventId=`). Ver event_hub.py."""
+    resume = last_event_id or request.query_params.get("lastEventId")
+    return StreamingResponse(EVENTS.stream(resume), media_type=event_hub.MEDIA_TYPE,
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 def custom_openapi():
     if app.openapi_schema:
         return app.openapi_schema
@@ -823,7 +953,7 @@ async def strip_api_prefix(request: Request, call_next):
 # ----------------- CORS -------------------
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "") or os.getenv("CORS_ALLOWED_ORIGINS", "")
 CORS_METHODS = os.getenv("CORS_METHODS", "GET,POST,PUT,DELETE,OPTIONS")
-CORS_HEADERS = os.getenv("CORS_HEADERS", "Authorization,Content-Type,Accept")
+CORS_HEADERS = os.getenv("CORS_HEADERS", "Authorization,Content-Type,Accept,Last-Event-ID")
 CORS_CREDENTIALS = os.getenv("CORS_CREDENTIALS", "true").lower() == "true"
 
 allowed_origins = [o.strip() for o in CommaSeparatedStrings(CORS_ORIGINS) if o.strip()] or ["http://localhost:5174"]
@@ -836,6 +966,7 @@ app.add_middleware(
     allow_methods=allowed_methods,
     allow_headers=allowed_headers,
     allow_credentials=CORS_CREDENTIALS,
+    expose_headers=[keyset.NEXT_CURSOR_HEADER],  # cursor de la página siguiente (ver keyset.py)
 )
 
 # ================== ENDPOINTS Auth0 ==================
@@ -945,17 +1076,44 @@ def get_client_credentials_token(request: ClientCredentialsRequest):
 
 # ================== RUTAS ORIGINALES (PROTEGIDAS CON JWT) ==================
 
+# Paginación por cursor de los listados (ver keyset.py): sin `limit` ni `cursor` se
+# devuelve la lista completa como antes; con ellos, una página y la cabecera X-Next-Cursor.
+LIMIT_QUERY = Query(None, ge=1, description=f"Paginación por cursor (máx. {keyset.MAX_LIMIT})")
+CURSOR_QUERY = Query(None, description=f"Valor de la cabecera {keyset.NEXT_CURSOR_HEADER} de la página anterior")
+
+def _keyset_rows(cur, ks: keyset.Keyset, sql: str, limit: Optional[int], cursor: Optional[str],
+                 response: Response) -> list:
+    """Ejecuta `sql` (sin WHERE) ordenado por `ks`, completo o paginado."""
+    params: list = []
+    if cursor:
+        try:
+            after, params = ks.after(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        sql += f" where {after}"
+    sql += f" order by {ks.order_by()}"
+    if limit is None and cursor is None:
+        cur.execute(sql)
+        return cur.fetchall()
+    rows, next_cursor = keyset.fetch_page(cur, ks, sql, params, keyset.clamp_limit(limit))
+    if next_cursor:
+        response.headers[keyset.NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
+CATEGORIES_KEYSET = keyset.Keyset(("c.id",))
+
 @app.get('/categories', tags=["core"])
-def getCategories(user: dict = Depends(require_auth)):
+def getCategories(response: Response, limit: Optional[int] = LIMIT_QUERY, cursor: Optional[str] = CURSOR_QUERY,
+                  user: dict = Depends(require_auth)):
     conn = getConnection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute(
-        "select c.*, case when exists(select id from lacajita_playlist_categories where id_category=c.id) "
-        "then 1 else 0 end as hascat from lacajita_categories c"
-    )
-    cat = cursor.fetchall()
-    cursor.close(); conn.close()
-    return cat
+    cur = conn.cursor(dictionary=True)
+    try:
+        cat = _keyset_rows(cur, CATEGORIES_KEYSET,
+            "select c.*, case when exists(select id from lacajita_playlist_categories where id_category=c.id) "
+            "then 1 else 0 end as hascat from lacajita_categories c", limit, cursor, response)
+    finally:
+        cur.close(); conn.close()
+    return wire.respond(cat, response)
 
 class CategoriesModel(BaseModel):
     id: int = 0
@@ -969,8 +1127,10 @@ def insertCategory(cat: CategoriesModel, user: dict = Depends(require_auth)):
     cur = conn.cursor(dictionary=True)
     if cat.id == 0:
         cur.execute("insert into lacajita_categories(name) values(%s)", (cat.name,))
+        changelog.record(cur, "category", changelog.INSERT, [cur.lastrowid])
     else:
         cur.execute("update lacajita_categories set name=%s where id=%s", (cat.name, cat.id))
+        changelog.record(cur, "category", changelog.UPDATE, [cat.id])
     conn.commit()
     cur.close(); conn.close()
     return {"msg": "Data has been saved"}
@@ -982,6 +1142,8 @@ def deleteCategory(cat: CategoriesModel, user: dict = Depends(require_auth)):
     conn = getConnection()
     cur = conn.cursor(dictionary=True)
     cur.execute("delete from lacajita_categories where id=%s", (cat.id,))
+    if cur.rowcount:
+        changelog.record(cur, "category", changelog.DELETE, [cat.id])
     conn.commit()
     cur.close(); conn.close()
     return {"msg": "La categoria ha sido eliminada correctamente"}
@@ -995,34 +1157,71 @@ def getSegments_list(user: dict = Depends(require_auth)):
     cur.close(); conn.close()
     return seg
 
+def _for_page(sql: str, column: str, ids: list, paged: bool):
+    """Relaciones de los elementos de la página: `column in (...)` si se pagina, todo si no."""
+    if not paged:
+        return sql, []
+    return f"{sql} where {column} in ({_in_list(len(ids))})", ids
+
+MANPLAYLISTS_KEYSET = keyset.Keyset(("pl.id",))
+
 @app.get("/manplaylists", tags=["core"])
-def getManPlaylist(user: dict = Depends(require_auth)):
+def getManPlaylist(response: Response, limit: Optional[int] = LIMIT_QUERY, cursor: Optional[str] = CURSOR_QUERY,
+                   user: dict = Depends(require_auth)):
     conn = getConnection()
     cur = conn.cursor(dictionary=True)
-    cur.execute('select pl.*, se.name as segment from lacajita_playlists pl join lacajita_segments se on pl.segment_id = se.id')
-    pl = cur.fetchall()
-    cur.execute('select cat.*, pc.id_playlist from lacajita_categories cat join lacajita_playlist_categories pc on pc.id_category = cat.id')
-    cate = cur.fetchall()
-    cur.execute('select * from lacajita_season')
-    seas = cur.fetchall()
+    try:
+        pl = _keyset_rows(cur, MANPLAYLISTS_KEYSET,
+                          'select pl.*, se.name as segment from lacajita_playlists pl'
+                          ' join lacajita_segments se on pl.segment_id = se.id', limit, cursor, response)
+        paged = limit is not None or cursor is not None
+        ids = [p['id'] for p in pl]
+        cate, seas = [], []
+        if ids:
+            cur.execute(*_for_page('select cat.*, pc.id_playlist from lacajita_categories cat'
+                                   ' join lacajita_playlist_categories pc on pc.id_category = cat.id',
+                                   'pc.id_playlist', ids, paged))
+            cate = cur.fetchall()
+            cur.execute(*_for_page('select * from lacajita_season', 'playlist_id', ids, paged))
+            seas = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    by_playlist: Dict[Any, Dict[str, list]] = {p['id']: {'categories': [], 'seasons': []} for p in pl}
+    for c in cate:
+        if c['id_playlist'] in by_playlist:
+            by_playlist[c['id_playlist']]['categories'].append({'name': c['name'], 'id': c['id']})
+    for s in seas:
+        if s['playlist_id'] in by_playlist:
+            by_playlist[s['playlist_id']]['seasons'].append(s)
+    covers = image_index.load_index(UPLOAD_DIR)
     for p in pl:
-        p['categories'] = [{'name': c['name'], 'id': c['id']} for c in cate if p['id']==c['id_playlist']]
-        p['seasons'] = [s for s in seas if p['id']==s['playlist_id']]
-    cur.close(); conn.close()
-    return pl
+        p.update(by_playlist[p['id']])
+        p['placeholder'] = image_index.placeholder_for(covers, p['id'], p.get('img'))
+    return wire.respond(pl, response)
+
+SEASONS_KEYSET = keyset.Keyset(("id",))
 
 @app.get('/seasons', tags=["core"])
-def getSeason(user: dict = Depends(require_auth)):
+def getSeason(response: Response, limit: Optional[int] = LIMIT_QUERY, cursor: Optional[str] = CURSOR_QUERY,
+              user: dict = Depends(require_auth)):
     conn = getConnection()
     cur = conn.cursor(dictionary=True)
-    cur.execute("select * from lacajita_season")
-    seasons = cur.fetchall()
-    cur.execute("select * from lacajita_videos")
-    videos = cur.fetchall()
+    try:
+        seasons = _keyset_rows(cur, SEASONS_KEYSET, "select * from lacajita_season", limit, cursor, response)
+        videos = []
+        if seasons:
+            cur.execute(*_for_page("select season_id, video_id from lacajita_videos", "season_id",
+                                   [s['id'] for s in seasons], limit is not None or cursor is not None))
+            videos = cur.fetchall()
+    finally:
+        cur.close(); conn.close()
+    by_season: Dict[Any, list] = {s['id']: [] for s in seasons}
+    for v in videos:
+        if v['season_id'] in by_season:
+            by_season[v['season_id']].append(v['video_id'])
     for s in seasons:
-        s['videos'] = [v['video_id'] for v in videos if s['id'] == v['season_id']]
-    cur.close(); conn.close()
-    return seasons
+        s['videos'] = by_season[s['id']]
+    return wire.respond(seasons, response)
 
 class PlaylistModel(BaseModel):
     id: str
@@ -1034,28 +1233,275 @@ class PlaylistModel(BaseModel):
 
 @app.post('/uiplaylist', tags=["core"])
 def uiPlaylist(pl: PlaylistModel, user: dict = Depends(require_auth)):
+    """Crea o actualiza un playlist y su conjunto de categorías en una transacción.
+    - Un INSERT ... ON DUPLICATE KEY UPDATE en lugar de SELECT + INSERT/UPDATE.
+    - Categorías por diferencia: solo se borran las quitadas y se insertan las nuevas.
+    - La respuesta se arma con los datos enviados; no se relee la fila.
+    """
     if not (pl.title and pl.id and pl.segid > 0):
         return {"msg": "Titulo, Id y Segmento son obligatorios!"}
+    wanted = list(dict.fromkeys(pl.categories))
     conn = getConnection(); cur = conn.cursor()
-    cur.execute("select 1 from lacajita_playlists where id=%s", (pl.id,))
-    exists = cur.fetchall()
-    if not exists:
-        cur.execute("""insert into lacajita_playlists (id, segment_id, img, title, description)
-                       values (%s,%s,%s,%s,%s)""", (pl.id, pl.segid, pl.img, pl.title, pl.desc))
+    try:
+        # updated_at no va en el UPDATE: rowcount 0 sigue significando "sin cambios" (se toca abajo)
+        cur.execute("""insert into lacajita_playlists (id, segment_id, img, title, description, updated_at)
+                       values (%s,%s,%s,%s,%s,now())
+                       on duplicate key update segment_id=values(segment_id), img=values(img),
+                       title=values(title), description=values(description)""",
+                    (pl.id, pl.segid, pl.img, pl.title, pl.desc))
+        affected = cur.rowcount
+        created = affected == 1  # 1 = insertado, 2 = actualizado, 0 = sin cambios
+        have = []
+        if not created:
+            cur.execute("select id_category from lacajita_playlist_categories where id_playlist=%s", (pl.id,))
+            have = [r[0] for r in cur.fetchall()]
+        have_set, wanted_set = set(have), set(wanted)
+        removed = [c for c in dict.fromkeys(have) if c not in wanted_set]
+        added = [(pl.id, c) for c in wanted if c not in have_set]
+        for chunk in _chunks(removed, BULK_CHUNK_ROWS):
+            cur.execute("delete from lacajita_playlist_categories where id_playlist=%s"
+                        f" and id_category in ({_in_list(len(chunk))})", [pl.id] + chunk)
+        if added:
+            cur.executemany("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", added)
+        if not created and (affected or added or removed):
+            # el catálogo en memoria (catalog.py) relee por updated_at: también si solo cambiaron categorías
+            cur.execute("update lacajita_playlists set updated_at=now() where id=%s", (pl.id,))
+        if affected or added or removed:
+            changelog.record(cur, "playlist", changelog.INSERT if created else changelog.UPDATE, [pl.id])
         conn.commit()
-        for c in pl.categories:
-            cur.execute("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", (pl.id, c))
-            conn.commit()
-    else:
-        cur.execute("""update lacajita_playlists set id=%s, segment_id=%s, img=%s, title=%s, description=%s
-                       where id=%s""", (pl.id, pl.segid, pl.img, pl.title, pl.desc, pl.id))
-        cur.execute("delete from lacajita_playlist_categories where id_playlist=%s", (pl.id,))
+    except Error as err:
+        conn.rollback()
+        print(f"Error guardando playlist {pl.id}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error guardando playlist: {err}")
+    finally:
+        cur.close(); conn.close()
+    return {"msg": "Los datos han sido guardados correctamente!", "created": created,
+            "playlist": {"id": pl.id, "segment_id": pl.segid, "img": pl.img, "title": pl.title,
+                         "description": pl.desc, "categories": wanted},
+            "categories_added": len(added), "categories_removed": len(removed)}
+
+# ---------- Upsert masivo de playlists (clientes de ingestión) ----------
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", "1000"))
+BULK_CHUNK_ROWS = 500  # filas por sentencia multi-row
+
+class BulkPlaylistItem(BaseModel):
+    id: str
+    segid: int
+    img: Optional[str] = None
+    title: str
+    desc: str = ""
+    # None = no tocar las categorías existentes; [] = dejar el playlist sin categorías
+    categories: Optional[List[int]] = None
+
+class BulkPlaylists(BaseModel):
+    playlists: List[BulkPlaylistItem]
+
+def _chunks(seq: list, size: int):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+@app.post('/bulk/playlists', tags=["core"])
+def bulkPlaylists(body: BulkPlaylists, user: dict = Depends(require_auth)):
+    """Upsert de cientos de playlists (con categorías) en una sola transacción.
+    - INSERT ... ON DUPLICATE KEY UPDATE multi-row para los playlists.
+    - Categorías: un DELETE y un INSERT multi-row para los items que envían `categories`.
+    - Respuesta con estado por item: inserted | updated | invalid.
+    """
+    if len(body.playlists) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ITEMS} playlists por petición")
+
+    results: List[Dict[str, Any]] = []
+    valid: Dict[str, BulkPlaylistItem] = {}
+    for pl in body.playlists:
+        if not (pl.title and pl.id and pl.segid > 0):
+            results.append({"id": pl.id, "status": "invalid", "msg": "Titulo, Id y Segmento son obligatorios!"})
+            continue
+        valid[pl.id] = pl  # ids repetidos: gana el último
+    if not valid:
+        return wire.respond({"results": results, "inserted": 0, "updated": 0, "invalid": len(results)})
+
+    ids = list(valid.keys())
+    conn = getConnection(); cur = conn.cursor()
+    try:
+        existing = set()
+        for chunk in _chunks(ids, BULK_CHUNK_ROWS):
+            cur.execute(f"select id from lacajita_playlists where id in ({','.join(['%s'] * len(chunk))})", chunk)
+            existing.update(r[0] for r in cur.fetchall())
+
+        rows = [(p.id, p.segid, p.img, p.title, p.desc) for p in valid.values()]
+        for chunk in _chunks(rows, BULK_CHUNK_ROWS):
+            cur.execute(
+                "insert into lacajita_playlists (id, segment_id, img, title, description, updated_at) values "
+                + ",".join(["(%s,%s,%s,%s,%s,now())"] * len(chunk))
+                + " on duplicate key update segment_id=values(segment_id), img=values(img),"
+                  " title=values(title), description=values(description), updated_at=now()",
+                [v for row in chunk for v in row],
+            )
+
+        with_cats = [p for p in valid.values() if p.categories is not None]
+        for chunk in _chunks([p.id for p in with_cats], BULK_CHUNK_ROWS):
+            cur.execute(
+                f"delete from lacajita_playlist_categories where id_playlist in ({','.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+        links = list({(p.id, c) for p in with_cats for c in p.categories})
+        for chunk in _chunks(links, BULK_CHUNK_ROWS):
+            cur.execute(
+                "insert into lacajita_playlist_categories(id_playlist, id_category) values "
+                + ",".join(["(%s,%s)"] * len(chunk)),
+                [v for link in chunk for v in link],
+            )
+        changelog.record(cur, "playlist", changelog.INSERT, [pid for pid in ids if pid not in existing])
+        changelog.record(cur, "playlist", changelog.UPDATE, [pid for pid in ids if pid in existing])
         conn.commit()
-        for c in pl.categories:
-            cur.execute("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", (pl.id, c))
-            conn.commit()
-    cur.close(); conn.close()
-    return {"msg":"Los datos han sido guardados correctamente!"}
+    except Error as err:
+        conn.rollback()
+        print(f"Error en bulk playlists: {err}")
+        raise HTTPException(status_code=500, detail=f"Error aplicando lote: {err}")
+    finally:
+        cur.close(); conn.close()
+
+    inserted = updated = 0
+    for pid in ids:
+        if pid in existing:
+            updated += 1
+            results.append({"id": pid, "status": "updated"})
+        else:
+            inserted += 1
+            results.append({"id": pid, "status": "inserted"})
+    invalid = len(results) - inserted - updated
+    return wire.respond({"results": results, "inserted": inserted, "updated": updated, "invalid": invalid})
+
+# ---------- Sincronización masiva de temporadas/videos (clientes de ingestión) ----------
+class BulkSeasonItem(BaseModel):
+    playlist_id: str
+    title: str
+    description: Optional[str] = None
+    videos: List[str]  # ids de media JW: la lista completa deseada para la temporada
+
+class BulkSeasons(BaseModel):
+    seasons: List[BulkSeasonItem]
+
+def _in_list(n: int) -> str:
+    return ",".join(["%s"] * n)
+
+@app.post('/bulk/seasons', tags=["core"])
+def bulkSeasons(body: BulkSeasons, user: dict = Depends(require_auth)):
+    """Sincroniza temporadas y sus videos por diferencia, en una sola transacción.
+    - La temporada se identifica por (playlist_id, title); se crea si no existe.
+    - Videos nuevos: INSERT multi-row. Videos que ya no vienen: active=0. Videos que
+      vuelven: active=1. Las filas sin cambios no se tocan.
+    - Una lista vacía desactiva todos los videos de la temporada; si la temporada no existe
+      no se crea (no habría nada que poner en ella).
+    - Unas pocas sentencias por lote, independientemente del número de videos.
+    """
+    if len(body.seasons) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BULK_MAX_ITEMS} temporadas por petición")
+
+    results: List[Dict[str, Any]] = []
+    wanted: Dict[tuple, BulkSeasonItem] = {}
+    for se in body.seasons:
+        if not (se.playlist_id and se.title):
+            results.append({"playlist_id": se.playlist_id, "title": se.title, "status": "invalid",
+                            "msg": "playlist_id y title son obligatorios!"})
+            continue
+        wanted[(se.playlist_id, se.title)] = se  # repetidos: gana el último
+    if not wanted:
+        return wire.respond({"results": results, "added": 0, "reactivated": 0, "deactivated": 0})
+
+    playlist_ids = list({k[0] for k in wanted})
+    conn = getConnection(); cur = conn.cursor()
+    try:
+        known_playlists = set()
+        for chunk in _chunks(playlist_ids, BULK_CHUNK_ROWS):
+            cur.execute(f"select id from lacajita_playlists where id in ({_in_list(len(chunk))})", chunk)
+            known_playlists.update(r[0] for r in cur.fetchall())
+        for key in [k for k in wanted if k[0] not in known_playlists]:
+            wanted.pop(key)
+            results.append({"playlist_id": key[0], "title": key[1], "status": "invalid",
+                            "msg": "El playlist no existe"})
+        playlist_ids = [pid for pid in playlist_ids if pid in known_playlists]
+
+        def load_seasons() -> Dict[tuple, tuple]:
+            found: Dict[tuple, tuple] = {}
+            for chunk in _chunks(playlist_ids, BULK_CHUNK_ROWS):
+                cur.execute(f"select id, playlist_id, title, active from lacajita_season"
+                            f" where playlist_id in ({_in_list(len(chunk))})", chunk)
+                for sid, pid, title, active in cur.fetchall():
+                    found.setdefault((pid, title), (sid, active))
+            return found
+
+        seasons = load_seasons()
+        for key in [k for k in wanted if k not in seasons and not any(wanted[k].videos)]:
+            wanted.pop(key)
+            results.append({"playlist_id": key[0], "title": key[1], "status": "unchanged",
+                            "added": 0, "reactivated": 0, "deactivated": 0})
+        created = [k for k in wanted if k not in seasons]
+        now = datetime.utcnow()
+        for chunk in _chunks(created, BULK_CHUNK_ROWS):
+            cur.execute(
+                "insert into lacajita_season(playlist_id, title, description, date, active) values "
+                + ",".join(["(%s,%s,%s,%s,1)"] * len(chunk)),
+                [v for k in chunk for v in (k[0], k[1], wanted[k].description, now)],
+            )
+        if created:
+            seasons = load_seasons()  # ids autoincrementales de las nuevas
+        reopened = [seasons[k][0] for k in wanted if k in seasons and k not in created and not seasons[k][1]]
+        for chunk in _chunks(reopened, BULK_CHUNK_ROWS):
+            cur.execute(f"update lacajita_season set active=1 where id in ({_in_list(len(chunk))})", chunk)
+
+        season_ids = [seasons[k][0] for k in wanted if k in seasons]
+        current: Dict[int, Dict[str, int]] = {sid: {} for sid in season_ids}
+        for chunk in _chunks(season_ids, BULK_CHUNK_ROWS):
+            cur.execute(f"select season_id, video_id, active from lacajita_videos"
+                        f" where season_id in ({_in_list(len(chunk))})", chunk)
+            for sid, vid, active in cur.fetchall():
+                current[sid][vid] = active
+
+        to_insert, to_activate, to_deactivate = [], [], []
+        for key, se in wanted.items():
+            sid = seasons[key][0]
+            have = current[sid]
+            desired = list(dict.fromkeys(v for v in se.videos if v))
+            added = [v for v in desired if v not in have]
+            activated = [v for v in desired if v in have and not have[v]]
+            desired_set = set(desired)
+            removed = [v for v, active in have.items() if active and v not in desired_set]
+            to_insert += [(sid, v) for v in added]
+            to_activate += [(sid, v) for v in activated]
+            to_deactivate += [(sid, v) for v in removed]
+            status_ = "created" if key in created else ("updated" if added or activated or removed else "unchanged")
+            results.append({"playlist_id": key[0], "title": key[1], "season_id": sid, "status": status_,
+                            "added": len(added), "reactivated": len(activated), "deactivated": len(removed)})
+
+        for chunk in _chunks(to_insert, BULK_CHUNK_ROWS):
+            cur.execute(
+                "insert into lacajita_videos(season_id, video_id, date, active) values "
+                + ",".join(["(%s,%s,%s,1)"] * len(chunk)),
+                [v for sid, vid in chunk for v in (sid, vid, now)],
+            )
+        for active, pairs in ((1, to_activate), (0, to_deactivate)):
+            for chunk in _chunks(pairs, BULK_CHUNK_ROWS):
+                cur.execute(
+                    f"update lacajita_videos set active={active} where (season_id, video_id) in ("
+                    + ",".join(["(%s,%s)"] * len(chunk)) + ")",
+                    [v for pair in chunk for v in pair],
+                )
+        changelog.record(cur, "season", changelog.INSERT, [seasons[k][0] for k in created])
+        changelog.record(cur, "season", changelog.UPDATE, reopened)
+        changelog.record(cur, "video", changelog.INSERT, [changelog.video_key(*pair) for pair in to_insert])
+        changelog.record(cur, "video", changelog.UPDATE,
+                         [changelog.video_key(*pair) for pair in to_activate + to_deactivate])
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        print(f"Error en bulk seasons: {err}")
+        raise HTTPException(status_code=500, detail=f"Error aplicando lote: {err}")
+    finally:
+        cur.close(); conn.close()
+
+    return wire.respond({"results": results, "added": len(to_insert), "reactivated": len(to_activate),
+                         "deactivated": len(to_deactivate)})
 
 class dPlaylist(BaseModel):
     id: str
@@ -1070,6 +1516,8 @@ def dPlaylistDel(pl: dPlaylist, user: dict = Depends(require_auth)):
                    and not exists(SELECT * FROM lacajita_playlist_categories WHERE id_playlist = %s)
                    and not exists(SELECT * FROM lacajita_seasons WHERE playlist_id = %s)""",
                 (pl.id, pl.id, pl.id))
+    if cur.rowcount:
+        changelog.record(cur, "playlist", changelog.DELETE, [pl.id])
     conn.commit()
     cur.close(); conn.close()
 
@@ -1079,14 +1527,43 @@ class SeasVideosModel(BaseModel):
 
 @app.post('/iuseasonvideos', tags=["core"])
 def iuseasonvideos(sv: SeasVideosModel, user: dict = Depends(require_auth)):
+    """Fija los videos de una temporada aplicando solo la diferencia con lo guardado.
+    Los videos que se mantienen conservan su `date`; el orden no se guarda (la tabla no tiene
+    posición), así que reordenar no genera escrituras. Un video que vuelve a enviarse estando
+    inactivo (p. ej. desactivado por /bulk/seasons) se reactiva, igual que en /bulk/seasons.
+    Los que se quitan aquí se borran: es una edición manual, y /iuseason solo elimina una
+    temporada sin videos. Un envío sin cambios cuesta un SELECT y ningún commit.
+    """
+    desired = list(dict.fromkeys(v for v in sv.videoarr if v))
     conn = getConnection(); cur = conn.cursor()
-    cur.execute('DELETE FROM lacajita_videos where season_id=%s', (sv.season_id,))
-    conn.commit()
-    for v in sv.videoarr:
-        cur.execute('insert into lacajita_videos(season_id, video_id) values(%s,%s)', (sv.season_id, v))
-        conn.commit()
-    cur.close(); conn.close()
-    return {"msg":"Cambios realizados correctamente!"}
+    try:
+        cur.execute('select video_id, active from lacajita_videos where season_id=%s', (sv.season_id,))
+        have = {r[0]: r[1] for r in cur.fetchall()}
+        desired_set = set(desired)
+        to_insert = [(sv.season_id, v) for v in desired if v not in have]
+        to_activate = [v for v in desired if v in have and not have[v]]
+        to_delete = [v for v in have if v not in desired_set]
+        if to_insert or to_activate or to_delete:
+            for chunk in _chunks(to_delete, BULK_CHUNK_ROWS):
+                cur.execute(f"delete from lacajita_videos where season_id=%s and video_id in ({_in_list(len(chunk))})",
+                            [sv.season_id] + chunk)
+            for chunk in _chunks(to_activate, BULK_CHUNK_ROWS):
+                cur.execute(f"update lacajita_videos set active=1 where season_id=%s and video_id in ({_in_list(len(chunk))})",
+                            [sv.season_id] + chunk)
+            if to_insert:
+                cur.executemany('insert into lacajita_videos(season_id, video_id) values(%s,%s)', to_insert)
+            changelog.record(cur, "video", changelog.DELETE, [changelog.video_key(sv.season_id, v) for v in to_delete])
+            changelog.record(cur, "video", changelog.UPDATE, [changelog.video_key(sv.season_id, v) for v in to_activate])
+            changelog.record(cur, "video", changelog.INSERT, [changelog.video_key(*pair) for pair in to_insert])
+            conn.commit()
+    except Error as err:
+        conn.rollback()
+        print(f"Error guardando videos de la temporada {sv.season_id}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error guardando videos: {err}")
+    finally:
+        cur.close(); conn.close()
+    return {"msg": "Cambios realizados correctamente!", "inserted": len(to_insert), "deleted": len(to_delete),
+            "reactivated": len(to_activate), "unchanged": len(desired) - len(to_insert) - len(to_activate)}
 
 class SeasonsModel(BaseModel):
     id: int = 0
@@ -1101,19 +1578,23 @@ def iuseason(se: SeasonsModel, user: dict = Depends(require_auth)):
     conn = getConnection(); cur = conn.cursor()
     if se.id == 0:
         cur.execute("insert into lacajita_season(playlist_id, title) values(%s,%s)", (se.playlist_id, se.name))
+        changelog.record(cur, "season", changelog.INSERT, [cur.lastrowid])
     else:
         if not se.delete:
             cur.execute("update lacajita_season set title=%s where id=%s", (se.name, se.id))
+            changelog.record(cur, "season", changelog.UPDATE, [se.id])
         else:
             cur.execute("""delete from lacajita_season
                            where id=%s and not exists(select * from lacajita_videos where season_id=%s)""",
                         (se.id, se.id))
+            if cur.rowcount:
+                changelog.record(cur, "season", changelog.DELETE, [se.id])
     conn.commit(); cur.close(); conn.close()
 
 @app.get('/allsegments', tags=["core"])
 def getSegments_all(user: dict = Depends(require_auth)):
     conn = getConnection(); cur = conn.cursor(dictionary=True)
-    cur.execute('select * from lacajita_segments order by order_')
+    cur.execute(f'select * from lacajita_segments order by {ordering.ORDER_BY}')
     seg = cur.fetchall()
     cur.close(); conn.close()
     return seg
@@ -1123,16 +1604,95 @@ class SegmentsOrder(BaseModel):
 
 @app.post('/usegments', tags=["core"])
 def updateSegments(se: SegmentsOrder, user: dict = Depends(require_auth)):
+    """Orden completo enviado por el panel: un único UPDATE con CASE (ver ordering.py)."""
+    entries = sorted(se.arrorder, key=lambda l: l['order_'])  # estable: empates según el envío
+    if not entries:
+        return
     conn = getConnection(); cur = conn.cursor()
-    for l in se.arrorder:
-        cur.execute('update lacajita_segments set order_=%s where id=%s', (l['order_'], l['id']))
+    try:
+        ordering.apply_permutation(cur, "lacajita_segments", [l['id'] for l in entries],
+                                   [l['order_'] for l in entries])
+        changelog.record(cur, "segment", changelog.UPDATE, [l['id'] for l in entries])
         conn.commit()
-    cur.close(); conn.close()
+    except Error as err:
+        conn.rollback()
+        print(f"Error actualizando el orden de segmentos: {err}")
+        raise HTTPException(status_code=500, detail=f"Error actualizando segmentos: {err}")
+    finally:
+        cur.close(); conn.close()
+
+class OrderMove(BaseModel):
+    id: int
+    after_id: Optional[int] = None   # colocar justo después de este elemento
+    before_id: Optional[int] = None  # o justo antes de este; sin ninguno, al final
+
+class OrderList(BaseModel):
+    ids: List[int]
+
+def _ordered_table(entity: str) -> str:
+    table = ordering.TABLES.get(entity)
+    if not table:
+        raise HTTPException(status_code=404, detail=f"Entidad no ordenable: {entity}")
+    return table
+
+def _rebalance_in_background(table: str):
+    conn = getConnection(); cur = conn.cursor()
+    try:
+        rows = ordering.rebalance(cur, table)
+        conn.commit()
+        print(f"rank_key de {table} rebalanceadas ({rows} filas)")
+    except Error as err:
+        conn.rollback()
+        print(f"Error rebalanceando {table}: {err}")
+    finally:
+        cur.close(); conn.close()
+
+@app.post('/order/{entity}/move', tags=["core"])
+def moveOrdered(entity: str, mv: OrderMove, background_tasks: BackgroundTasks, user: dict = Depends(require_auth)):
+    """Mueve un segmento o elemento del carrusel: solo se reescribe su propia clave."""
+    table = _ordered_table(entity)
+    if mv.after_id is not None and mv.before_id is not None:
+        raise HTTPException(status_code=400, detail="Indique after_id o before_id, no ambos")
+    conn = getConnection(); cur = conn.cursor()
+    try:
+        key = ordering.move(cur, table, mv.id, mv.after_id, mv.before_id)
+        changelog.record(cur, changelog.ORDERED_ENTITIES[entity], changelog.UPDATE, [mv.id])
+        conn.commit()
+    except (LookupError, ValueError) as err:
+        conn.rollback()
+        raise HTTPException(status_code=404 if isinstance(err, LookupError) else 400, detail=str(err))
+    except Error as err:
+        conn.rollback()
+        print(f"Error moviendo {entity} {mv.id}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error moviendo elemento: {err}")
+    finally:
+        cur.close(); conn.close()
+    rebalance = ordering.needs_rebalance(key)
+    if rebalance:
+        background_tasks.add_task(_rebalance_in_background, table)
+    return {"id": mv.id, "rank_key": key, "rebalance": rebalance}
+
+@app.post('/order/{entity}/reorder', tags=["core"])
+def reorderOrdered(entity: str, body: OrderList, user: dict = Depends(require_auth)):
+    """Aplica una permutación completa (lista de ids en el orden deseado) en un solo UPDATE."""
+    table = _ordered_table(entity)
+    conn = getConnection(); cur = conn.cursor()
+    try:
+        keys = ordering.apply_permutation(cur, table, body.ids)
+        changelog.record(cur, changelog.ORDERED_ENTITIES[entity], changelog.UPDATE, body.ids)
+        conn.commit()
+    except Error as err:
+        conn.rollback()
+        print(f"Error reordenando {entity}: {err}")
+        raise HTTPException(status_code=500, detail=f"Error reordenando: {err}")
+    finally:
+        cur.close(); conn.close()
+    return {"updated": len(keys)}
 
 @app.get('/homecarousel', tags=["core"])
 def getHomecarousel(user: dict = Depends(require_auth)):
     conn = getConnection(); cur = conn.cursor(dictionary=True)
-    cur.execute('SELECT * FROM lacajita_home_carousel order by id')
+    cur.execute(f'SELECT * FROM lacajita_home_carousel order by {ordering.ORDER_BY}')
     seg = cur.fetchall()
     cur.close(); conn.close()
     return seg
@@ -1165,6 +1725,8 @@ def idHomecarousel(hc: Homecarousel, user: dict = Depends(require_auth)):
     if hc.id > 0:
         conn = getConnection(); cur = conn.cursor()
         cur.execute('delete from lacajita_home_carousel where id=%s', (hc.id,))
+        if cur.rowcount:
+            changelog.record(cur, "homecarousel", changelog.DELETE, [hc.id])
         conn.commit(); cur.close(); conn.close()
         return {"msg": "Eliminado"}
 
@@ -1177,9 +1739,10 @@ def idHomecarousel(hc: Homecarousel, user: dict = Depends(require_auth)):
 
     conn = getConnection(); cur = conn.cursor()
     cur.execute(
-        'insert into lacajita_home_carousel (link, imgsrc, video, muted) values(%s,%s,%s,%s)',
-        (hc.link, hc.imgsrc, hc.video, muted_val)
+        'insert into lacajita_home_carousel (link, imgsrc, video, muted, rank_key) values(%s,%s,%s,%s,%s)',
+        (hc.link, hc.imgsrc, hc.video, muted_val, ordering.append_key(cur, "lacajita_home_carousel"))
     )
+    changelog.record(cur, "homecarousel", changelog.INSERT, [cur.lastrowid])
     conn.commit(); cur.close(); conn.close()
     return {"msg": "Insertado"}
 # --- MIGRACIÓN SQL ---
@@ -1191,9 +1754,11 @@ def idHomecarousel(hc: Homecarousel, user: dict = Depends(require_auth)):
 @app.get("/images", tags=["images"])
 def list_images(user: dict = Depends(require_auth)):
     """
-    Lista archivos de la carpeta ./img filtrados por extensiones permitidas.
+    Lista archivos de la carpeta ./img filtrados por extensiones permitidas,
+    con su placeholder (BlurHash + color) si está en el índice.
     """
     base = Path(UPLOAD_DIR)
+    covers = image_index.load_index(UPLOAD_DIR)
     items: List[Dict[str, Any]] = []
     for f in base.iterdir():
         if f.is_file() and f.suffix.lower() in ALLOWED_IMAGE_EXTS:
@@ -1202,6 +1767,7 @@ def list_images(user: dict = Depends(require_auth)):
                 "filename": f.name,
                 "size_bytes": stat.st_size,
                 "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+                "placeholder": covers.get(f.name),
             })
     items.sort(key=lambda x: x["filename"])
     return {"images": items}
@@ -1224,7 +1790,7 @@ def get_image_file(filename: str, user: dict = Depends(require_auth)):
 async def upload_image(plid: str = Form(...), file: UploadFile = File(...), user: dict = Depends(require_auth)):
     """
     Subida de imagen (compatibilidad con UI actual): guarda como <plid>.jpeg.
-    Valida nombre, tamaño y tipo básico.
+    Valida nombre, tamaño y tipo básico, y registra su placeholder en img/index.json.
     """
     # Validar nombre
     plid_safe = _sanitize_filename(plid)
@@ -1247,7 +1813,11 @@ async def upload_image(plid: str = Form(...), file: UploadFile = File(...), user
     with open(file_path, "wb") as buffer:
         buffer.write(content)
 
-    return {"msg": "File uploaded successfully", "filename": filename}
+    # Placeholder de baja calidad para que catálogo/admin pinten la portada al instante.
+    # Decodificar y calcular el BlurHash es CPU (y el índice se escribe con lock): fuera del event loop
+    placeholder = await asyncio.to_thread(image_index.update_entry, UPLOAD_DIR, filename, content)
+
+    return {"msg": "File uploaded successfully", "filename": filename, "placeholder": placeholder}
 
 # Compatibilidad: endpoint existente que busca <filename>.jpeg
 @app.get("/getcover", tags=["images"])
@@ -1,8 +1,8 @@
 from fastapi import FastAPI, HTTPException, status, Request, Response, Header, Depends, Query, Body
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse
+from fastapi.responses import JSONResponse, HTMLResponse, RedirectResponse, StreamingResponse
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import mysql.connector
 from mysql.connector import Error
 from datetime import datetime, timedelta
@@ -11,11 +11,25 @@ from jose import jwt as jose_jwt
 from jose.exceptions import JWTError as JoseJWTError, ExpiredSignatureError as JoseExpiredSignatureError
 from functools import lru_cache
 from dotenv import load_dotenv
+import asyncio
 import os
 import sentry_sdk
 import logging
 import json
 from fastapi.middleware.cors import CORSMiddleware
+import image_index
+import ordering
+import batch_crud
+import keyset
+import catalog
+import search_index
+import suggest_index
+import facet_index
+import projection
+import catalog_stream
+import segment_rows
+import wire
+import changelog
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -54,6 +68,9 @@ ALGORITHMS = ["RS256"]
 # URL para LiveTV API
 LIVETV_API_URL = os.getenv("LIVETV_API_URL", "https://cajita.concepcion.tech/live-tvs?_sort=number:asc")
 
+# Carpeta de portadas (la misma que escribe Core_M_cajita.py) e índice de placeholders
+IMG_DIR = os.getenv("IMG_DIR", "/opt/fastapi-playlists/img")
+
 # API Externa Config
 API_BASE_URL = os.getenv("API_BASE_URL", "https://b5f8a23e7d06c2de5ef515ae93e16016.sajet.us")
 
@@ -149,6 +166,8 @@ app = FastAPI(
         },
     ],
 )
+# Cuerpos MessagePack/CBOR y formato de respuesta negociado con Accept (ver wire.py)
+app.router.route_class = wire.NegotiatedRoute
 
 # Registrar middleware CORS después de que la app exista
 app.add_middleware(
@@ -157,6 +176,7 @@ app.add_middleware(
     allow_methods=["*"],  # GET, POST, PUT, DELETE, OPTIONS, etc.
     allow_headers=["*"],  # Authorization, Content-Type, etc.
     allow_credentials=False,  # 🚫 cookies/sesiones (no las usas)
+    expose_headers=[keyset.NEXT_CURSOR_HEADER],  # cursor de la página siguiente (ver keyset.py)
 )
 
 @app.on_event("startup")
@@ -191,11 +211,29 @@ def check_database_tables_on_startup():
             if t not in existing:
                 logger.warning(f"Startup DB check: tabla esperada no encontrada: {t}")
 
+        # Claves de orden de segmentos/carrusel (migración idempotente, ver ordering.py)
+        if {'lacajita_home_carousel', 'lacajita_segments'} <= existing:
+            ordering.ensure_rank_columns(conn)
+
+        # Índices de la paginación por cursor de /videos y /seasons (ver keyset.py)
+        if 'lacajita_videos' in existing:
+            keyset.ensure_index(conn, 'lacajita_videos', 'idx_lacajita_videos_keyset', VIDEOS_KEYSET.columns)
+        if 'lacajita_season' in existing:
+            keyset.ensure_index(conn, 'lacajita_season', 'idx_lacajita_season_keyset', SEASONS_KEYSET.columns)
+
+        # Registro de cambios para /catalog/changes (ver changelog.py)
+        changelog.ensure_table(conn)
+
         cursor.close()
         conn.close()
     except Exception as e:
         logger.exception(f"Error durante la verificación de tablas en startup: {e}")
 
+@app.on_event("startup")
+async def schedule_changelog_prune():
+    """Poda de lacajita_changes también durante la vida del proceso (ver changelog.prune_forever)."""
+    app.state.changelog_prune = asyncio.create_task(changelog.prune_forever(get_connection))
+
 # ——— Configuración de MySQL ———————————————————
 DB_CONFIG = {
     "host": DB_HOST,
@@ -228,6 +266,30 @@ def format_date(field_name: str, obj: dict) -> str:
 def iso(dt: Optional[datetime]) -> Optional[str]:
     return dt.isoformat() if dt else None
 
+def _keyset_where(ks: keyset.Keyset, cursor: Optional[str], filters: Dict[str, Any]):
+    """WHERE de un listado: filtros de igualdad (los None se omiten) más la continuación del cursor."""
+    where = [f"{col} = %s" for col, v in filters.items() if v is not None]
+    params = [v for v in filters.values() if v is not None]
+    if cursor:
+        try:
+            sql, cursor_params = ks.after(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        where, params = where + [sql], params + cursor_params
+    return (" WHERE " + " AND ".join(where) if where else ""), params
+
+def _keyset_fetch(cursor_db, ks: keyset.Keyset, sql: str, params: list, limit: Optional[int],
+                  cursor: Optional[str], response: Response) -> List[Dict[str, Any]]:
+    """Ejecuta `sql` (ya ordenado por `ks`). Sin limit ni cursor devuelve la lista completa
+    (clientes antiguos); con ellos, una página y el cursor siguiente en la cabecera."""
+    if limit is None and cursor is None:
+        cursor_db.execute(sql, params)
+        return cursor_db.fetchall()
+    rows, next_cursor = keyset.fetch_page(cursor_db, ks, sql, params, keyset.clamp_limit(limit))
+    if next_cursor:
+        response.headers[keyset.NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
 # ——— Modelos Pydantic —————————————————————————
 class Auth0UserCreate(BaseModel):
     email: str
@@ -326,6 +388,7 @@ class PlaylistComplete(BaseModel):
     active: Optional[int]
     created_at: Optional[str] = None  # ISO string format
     updated_at: Optional[str] = None  # ISO string format
+    placeholder: Optional[Dict[str, Any]] = None  # BlurHash + color de la portada
     seasons: List[SeasonComplete] = []
 
 class LiveTVChannel(BaseModel):
@@ -807,18 +870,18 @@ def get_home_carousel(
     cursor = conn.cursor(dictionary=True)
     try:
         if active is not None:
-            sql = """
+            sql = f"""
             SELECT id, link, imgsrc, video, date_time, active, order_ as order
             FROM lacajita_home_carousel
             WHERE active = %s
-            ORDER BY order_
+            ORDER BY {ordering.ORDER_BY}
             """
             cursor.execute(sql, (active,))
         else:
-            sql = """
+            sql = f"""
             SELECT id, link, imgsrc, video, date_time, active, order_ as order
             FROM lacajita_home_carousel
-            ORDER BY order_
+            ORDER BY {ordering.ORDER_BY}
             """
             cursor.execute(sql)
 
@@ -841,12 +904,15 @@ def create_home_carousel(
 ):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
+    # Nuevo elemento al final del orden (ver ordering.py)
+    rank_key = ordering.append_key(cursor, "lacajita_home_carousel")
     cursor.execute("""
-    INSERT INTO lacajita_home_carousel (link, imgsrc, video, date_time, active, order_)
-    VALUES (%s, %s, %s, NOW(), %s, %s)
-    """, (item.link, item.imgsrc, item.video, item.active or 1, item.order_ or 0))
-    conn.commit()
+    INSERT INTO lacajita_home_carousel (link, imgsrc, video, date_time, active, order_, rank_key)
+    VALUES (%s, %s, %s, NOW(), %s, %s, %s)
+    """, (item.link, item.imgsrc, item.video, item.active or 1, item.order_ or 0, rank_key))
     new_id = cursor.lastrowid
+    changelog.record(cursor, "homecarousel", changelog.INSERT, [new_id])
+    conn.commit()
     cursor.execute("""
     SELECT id, link, imgsrc, video, date_time, active, order_ as order
     FROM lacajita_home_carousel
@@ -876,6 +942,14 @@ def get_home_carousel_item(
         raise HTTPException(status_code=404, detail="Home carousel item not found")
     return result
 
+def _move_to_order(cursor, table: str, item_id: int, order: Optional[int], current: Optional[int]) -> bool:
+    """Un `order` distinto del guardado recoloca la fila según ese valor: el orden de lectura
+    es `rank_key` (ver ordering.place_by_order), así que escribir solo `order_` no tendría efecto."""
+    if order is None or order == current:
+        return False
+    ordering.place_by_order(cursor, table, {item_id: order})
+    return True
+
 @app.put("/home-carousel/{item_id}", response_model=HomeCarousel, tags=["homecarousel"])
 def update_home_carousel(
     item_id: int,
@@ -883,13 +957,26 @@ def update_home_carousel(
     user_claims: dict = Depends(require_auth)
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT order_ FROM lacajita_home_carousel WHERE id = %s", (item_id,))
+    current = cursor.fetchone()
+    if not current:
+        cursor.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Home carousel item not found")
     cursor.execute("""
     UPDATE lacajita_home_carousel
     SET link = %s, imgsrc = %s, video = %s, active = %s, order_ = %s
     WHERE id = %s
     """, (item.link, item.imgsrc, item.video, item.active, item.order_, item_id))
+    changed = cursor.rowcount > 0
+    if _move_to_order(cursor, "lacajita_home_carousel", item_id, item.order_, current[0]):
+        changed = True
+    if changed:
+        changelog.record(cursor, "homecarousel", changelog.UPDATE, [item_id])
     conn.commit()
+    cursor.close()
+    cursor = conn.cursor(dictionary=True)
     cursor.execute("""
     SELECT id, link, imgsrc, video, date_time, active, order_ as order
     FROM lacajita_home_carousel
@@ -914,6 +1001,7 @@ def delete_home_carousel(
         cursor.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Home carousel item not found")
+    changelog.record(cursor, "homecarousel", changelog.DELETE, [item_id])
     conn.commit()
     cursor.close()
     conn.close()
@@ -929,18 +1017,18 @@ def get_segments(
     cursor = conn.cursor(dictionary=True)
     try:
         if active is not None:
-            sql = """
+            sql = f"""
             SELECT id, name, livetv, order_ as order, active
             FROM lacajita_segments
             WHERE active = %s
-            ORDER BY order_
+            ORDER BY {ordering.ORDER_BY}
             """
             cursor.execute(sql, (active,))
         else:
-            sql = """
+            sql = f"""
             SELECT id, name, livetv, order_ as order, active
             FROM lacajita_segments
-            ORDER BY order_
+            ORDER BY {ordering.ORDER_BY}
             """
             cursor.execute(sql)
 
@@ -962,12 +1050,14 @@ def create_segment(
 ):
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
+    rank_key = ordering.append_key(cursor, "lacajita_segments")
     cursor.execute("""
-    INSERT INTO lacajita_segments (name, livetv, order_, active)
-    VALUES (%s, %s, %s, %s)
-    """, (item.name, item.livetv or 0, item.order_ or 0, item.active or 1))
-    conn.commit()
+    INSERT INTO lacajita_segments (name, livetv, order_, active, rank_key)
+    VALUES (%s, %s, %s, %s, %s)
+    """, (item.name, item.livetv or 0, item.order_ or 0, item.active or 1, rank_key))
     new_id = cursor.lastrowid
+    changelog.record(cursor, "segment", changelog.INSERT, [new_id])
+    conn.commit()
     cursor.execute("""
     SELECT id, name, livetv, order_ as order, active
     FROM lacajita_segments
@@ -1004,13 +1094,26 @@ def update_segment(
     user_claims: dict = Depends(require_auth)
 ):
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    cursor = conn.cursor()
+    cursor.execute("SELECT order_ FROM lacajita_segments WHERE id = %s", (item_id,))
+    current = cursor.fetchone()
+    if not current:
+        cursor.close()
+        conn.close()
+        raise HTTPException(status_code=404, detail="Segment not found")
     cursor.execute("""
     UPDATE lacajita_segments
     SET name = %s, livetv = %s, order_ = %s, active = %s
     WHERE id = %s
     """, (item.name, item.livetv, item.order_, item.active, item_id))
+    changed = cursor.rowcount > 0
+    if _move_to_order(cursor, "lacajita_segments", item_id, item.order_, current[0]):
+        changed = True
+    if changed:
+        changelog.record(cursor, "segment", changelog.UPDATE, [item_id])
     conn.commit()
+    cursor.close()
+    cursor = conn.cursor(dictionary=True)
     cursor.execute("""
     SELECT id, name, livetv, order_ as order, active
     FROM lacajita_segments
@@ -1035,6 +1138,7 @@ def delete_segment(
         cursor.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Segment not found")
+    changelog.record(cursor, "segment", changelog.DELETE, [item_id])
     conn.commit()
     cursor.close()
     conn.close()
@@ -1056,27 +1160,115 @@ def get_playlists(
     cursor.close()
     conn.close()
     return results"""
+def _livetv_channels() -> list:
+    try:
+        respose = requests.get(LIVETV_API_URL, timeout=5)
+        if respose.status_code==200:
+            return respose.json()
+        print(f"comunication error {respose.status_code}")
+    except requests.exceptions.RequestException as err:
+        print(f"catch error: {err}")
+    return []
+
+def _projection_or_400(request: Request, default_include=()) -> Optional[projection.Projection]:
+    try:
+        return projection.Projection.from_query(request.query_params, default_include=default_include)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _catalog_snapshot() -> catalog.Snapshot:
+    try:
+        return CATALOG.snapshot()
+    except Exception as e:
+        logger.error(f"Error cargando la instantánea del catálogo: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+def _placeholder_fn(proj: projection.Projection):
+    """Calcula `placeholder` solo si la proyección lo pide (lee el índice de portadas una vez)."""
+    if not proj.wants("playlist", "placeholder"):
+        return None
+    covers = image_index.load_index(IMG_DIR)
+    return lambda p: image_index.placeholder_for(covers, p['id'], p.get('img'))
+
+def _catalog_key(request: Request, version: int, *extra) -> tuple:
+    """Clave de wire.respond_cached: ruta, query, versión del catálogo e índice de portadas."""
+    return (request.url.path, str(request.query_params), version, image_index.index_mtime(IMG_DIR), *extra)
+
+def _by_updated_at(playlist: Dict[str, Any]):
+    # mismo orden que ORDER BY updated_at (NULL primero)
+    return playlist.get('updated_at') is not None, playlist.get('updated_at') or datetime.min
+
+def _home_carousel_rows() -> List[Dict[str, Any]]:
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"SELECT * FROM lacajita_home_carousel order by {ordering.ORDER_BY}")
+        homecarousel = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+    for home in homecarousel:
+        home['video'] = home['video'] or ""
+        home['imgsrc'] = home['imgsrc'] or ""
+    return homecarousel
+
+def _projected_catalog(proj: projection.Projection, snapshot: catalog.Snapshot,
+                       homecarousel: List[Dict[str, Any]], livetv: list) -> dict:
+    """Árbol de /playlists desde la instantánea del catálogo, con la proyección pedida."""
+    by_segment: Dict[Any, List[Dict[str, Any]]] = {}
+    for p in snapshot.playlists.values():
+        if p.get('active') == 1:
+            by_segment.setdefault(p.get('segment_id'), []).append(p)
+    placeholder = _placeholder_fn(proj)
+    segments = []
+    for sgm in snapshot.segments.values():
+        if sgm.get('active') != 1:
+            continue
+        out = proj.project("segment", sgm)
+        if sgm.get('livetv') == 1:
+            out['livetvlist'] = livetv
+        else:
+            out['playlist'] = [proj.playlist(p, snapshot, placeholder)
+                               for p in sorted(by_segment.get(sgm['id'], []), key=_by_updated_at)]
+        segments.append(out)
+    return {
+        "homecarousel": [proj.project("homecarousel", h) for h in homecarousel],
+        "segments": segments,
+        "categories": [{"id": cid, "name": name} for cid, name in snapshot.categories.items()],
+    }
+
+def _has_livetv(snapshot: catalog.Snapshot) -> bool:
+    return any(s.get('active') == 1 and s.get('livetv') == 1 for s in snapshot.segments.values())
+
+# Árbol completo (como la respuesta clásica de /playlists) para los clientes de formato binario
+CATALOG_TREE_PROJECTION = projection.Projection.from_query({"include": "seasons,seasons.videos"})
+
 @app.get("/playlists", tags=["playlists"])
 def get_playlists(
+    request: Request,
     active: Optional[int] = None,
     user_claims: dict = Depends(require_auth)
 ):
+    """Árbol completo del catálogo. Con `?fields=`/`?include=` (ver projection.py) o con
+    `Accept: application/msgpack|cbor` (ver wire.py) se sirve desde la instantánea en memoria,
+    y el cuerpo codificado se reutiliza mientras no cambien el catálogo, el carrusel ni LiveTV."""
+    proj = _projection_or_400(request)
+    if proj is None and wire.accepted() is not None:
+        proj = CATALOG_TREE_PROJECTION
+    if proj is not None:
+        snapshot = _catalog_snapshot()
+        homecarousel = _home_carousel_rows()
+        livetv = _livetv_channels() if _has_livetv(snapshot) else []
+        key = _catalog_key(request, snapshot.version, hash(wire.encode([homecarousel, livetv], None)))
+        return wire.respond_cached(key, lambda: _projected_catalog(proj, snapshot, homecarousel, livetv))
+
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
-    livetv = []
-    try:
-        respose = requests.get(LIVETV_API_URL)
-        if respose.status_code==200:
-            livetv = respose.json()
-            # print(json.dumps(livetv, indent=2))
-        else:
-            print("comunication error {respose.status_code}")
-    except requests.exceptions.RequestException as err:
-        print("catch error: {err}")
+    livetv = _livetv_channels()
 
-    cursor.execute("SELECT * FROM lacajita_home_carousel order by order_")
+    cursor.execute(f"SELECT * FROM lacajita_home_carousel order by {ordering.ORDER_BY}")
     homecarousel = cursor.fetchall()
-    cursor.execute("SELECT * FROM lacajita_segments where active = 1 order by order_")
+    cursor.execute(f"SELECT * FROM lacajita_segments where active = 1 order by {ordering.ORDER_BY}")
     segments = cursor.fetchall()
     cursor.execute("SELECT * FROM lacajita_playlists where active = 1 and segment_id in(select id from lacajita_segments where active = 1) order by updated_at")
     playlist = cursor.fetchall()
@@ -1090,11 +1282,11 @@ def get_playlists(
     videos = cursor.fetchall()
 
     jsonarr = {"homecarousel":[],"segments":[],"categories":[]}
+    covers = image_index.load_index(IMG_DIR)
 
     for home in homecarousel:
         home['video'] = "" if home['video']== None else home["video"]
         home['imgsrc'] = "" if home['imgsrc']== None else home["imgsrc"]
-        home['date_time'] = format_date('date_time',home)
 
     jsonarr['homecarousel'] = homecarousel
     jsonarr['categories'] = categories
@@ -1103,16 +1295,12 @@ def get_playlists(
         plst = []
         for pl in playlist:
             if pl['segment_id']==sgm['id']:
-                pl['created_at'] = format_date('created_at',pl)
-                pl['updated_at'] = format_date('updated_at',pl)
                 seas = []
                 for se in seasons:
                     if se['playlist_id']==pl['id']:
-                        se['date'] = format_date('date',se)
                         vid = [];
                         for vi in videos:
                             if vi['season_id']==se['id']:
-                                vi['date'] = format_date('date',vi)
                                 vid.append(vi['video_id'])
                         se['videos'] = vid; seas.append(se)
 
@@ -1122,6 +1310,7 @@ def get_playlists(
                         pc.append(plca['id_category'])
                 pl['categories'] = pc
                 pl['seasons'] = seas
+                pl['placeholder'] = image_index.placeholder_for(covers, pl['id'], pl.get('img'))
                 plst.append(pl)
 
         pltv = 'livetvlist' if sgm['livetv']==1 else'playlist'
@@ -1134,7 +1323,8 @@ def get_playlists(
 
     cursor.close()
     conn.close()
-    return jsonarr
+    # fechas en ISO las pone el codificador (wire.py)
+    return wire.respond(jsonarr)
 
 # ——— CRUD Playlists ——————————————————————————————
 @app.get("/playlists", response_model=CompletePlaylistResponse, tags=["playlists"])
@@ -1153,19 +1343,19 @@ def get_complete_playlist_data(
     cursor = conn.cursor(dictionary=True)
     try:
         # Home carousel activo
-        cursor.execute("""
+        cursor.execute(f"""
         SELECT id, link, imgsrc, video, date_time, active, order_ as order
         FROM lacajita_home_carousel
-        ORDER BY order_
+        ORDER BY {ordering.ORDER_BY}
         """)
         homecarousel = cursor.fetchall()
 
         # Segments activos
-        cursor.execute("""
+        cursor.execute(f"""
         SELECT id, name, livetv, order_ as order, active
         FROM lacajita_segments
         WHERE active = 1
-        ORDER BY order_
+        ORDER BY {ordering.ORDER_BY}
         """)
         segments = cursor.fetchall()
 
@@ -1302,31 +1492,167 @@ def get_legacy_playlist(user_claims: dict = Depends(require_auth)):
     # Reutiliza la función que arma toda la estructura
     return get_complete_playlist_data(user_claims=user_claims)
 
+# Instantánea del catálogo e índices en memoria; el CRUD de playlists los mantiene al día
+CATALOG = catalog.Catalog(lambda: get_connection())
+CATALOG.register("search", search_index.SearchIndex.from_snapshot)
+CATALOG.register("suggest", suggest_index.SuggestIndex.from_snapshot)
+CATALOG.register("facets", facet_index.FacetIndex.from_snapshot)
+CATALOG.register("rows", segment_rows.SegmentRows.from_snapshot)
+
 @app.post("/playlists", response_model=Playlist, status_code=status.HTTP_201_CREATED, tags=["playlists"])
 def create_playlist(
     item: Playlist,
     user_claims: dict = Depends(require_auth)
 ):
-    """Crear una nueva playlist"""
+    """Crear una nueva playlist (la respuesta sale de los datos enviados, sin releer la fila)"""
+    # Marca de tiempo propia (sin microsegundos, como DATETIME) para devolver exactamente lo guardado
+    now = datetime.now().replace(microsecond=0)
+    row = {
+        "id": item.id, "segment_id": item.segment_id, "title": item.title, "description": item.description,
+        "category": item.category, "subscription": item.subscription or 0,
+        "subscription_cost": item.subscription_cost, "active": item.active or 1,
+        "created_at": now, "updated_at": now,
+    }
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("""
-    INSERT INTO lacajita_playlists (id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at)
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-    """, (item.id, item.segment_id, item.title, item.description, item.category, item.subscription or 0, item.subscription_cost, item.active or 1))
-    conn.commit()
-    cursor.execute("SELECT id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at FROM lacajita_playlists WHERE id = %s", (item.id,))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return result
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        INSERT INTO lacajita_playlists (id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (row["id"], row["segment_id"], row["title"], row["description"], row["category"], row["subscription"],
+              row["subscription_cost"], row["active"], now, now))
+        changelog.record(cursor, "playlist", changelog.INSERT, [item.id])
+        conn.commit()
+    except mysql.connector.IntegrityError as e:
+        conn.rollback()
+        if e.errno == 1062:  # ER_DUP_ENTRY
+            raise HTTPException(status_code=409, detail="Playlist already exists")
+        raise HTTPException(status_code=400, detail=f"Invalid playlist: {e.msg}")
+    finally:
+        cursor.close()
+        conn.close()
+    CATALOG.playlist_saved(row)
+    return row
+
+# ——— Búsqueda de playlists ————————————————————————
+# Índice invertido en memoria sobre la instantánea del catálogo (ver catalog.py y search_index.py).
+# Declarada antes de /playlists/{item_id} para que "search" no se tome como id.
+
+@app.get("/playlists/search", response_model=List[PlaylistComplete], tags=["playlists"])
+def search_playlists(
+    q: str = Query(..., min_length=1, description="Término de búsqueda"),
+    category: Optional[str] = None,
+    subscription: Optional[int] = None,
+    limit: int = Query(10, le=100),
+    offset: int = Query(0, ge=0),
+    user_claims: dict = Depends(require_auth)
+):
+    """Buscar playlists activas por título, descripción, categoría o segmento, por relevancia (BM25).
+    Sin distinguir acentos ni mayúsculas y por raíz ("documentales" encuentra "documental")."""
+    try:
+        index = CATALOG.index("search")
+    except Exception as e:
+        logger.error(f"Error en búsqueda de playlists: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+    def accept(p: Dict[str, Any]) -> bool:
+        return (p.get("active") == 1
+                and (not category or p.get("category") == category)
+                and (subscription is None or p.get("subscription") == subscription))
+
+    results = []
+    for _, playlist in index.search(q, accept, limit=limit, offset=offset):
+        row = dict(playlist)
+        row['created_at'] = format_date('created_at', row)
+        row['updated_at'] = format_date('updated_at', row)
+        results.append(row)
+    return results
+
+@app.get("/playlists/suggest", tags=["playlists"])
+def suggest_playlists(
+    prefix: str = Query(..., min_length=1, description="Texto escrito hasta ahora"),
+    limit: int = Query(10, ge=1, le=suggest_index.MAX_K),
+    type: Optional[str] = Query(None, description="playlist, season o category"),
+    user_claims: dict = Depends(require_auth)
+):
+    """Autocompletado: títulos de playlists y temporadas activas y nombres de categorías con
+    alguna palabra que empieza por `prefix`, ordenados por peso (recencia/popularidad)."""
+    if type is not None and type not in suggest_index.KINDS:
+        raise HTTPException(status_code=422, detail=f"type debe ser uno de: {', '.join(suggest_index.KINDS)}")
+    try:
+        index = CATALOG.index("suggest")
+    except Exception as e:
+        logger.error(f"Error en sugerencias de playlists: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+    return {"prefix": prefix, "version": index.version, "suggestions": index.suggest(prefix, limit, type)}
+
+@app.get("/playlists/suggest/stats", tags=["playlists"])
+def suggest_stats(user_claims: dict = Depends(require_auth)):
+    """Tamaño del índice de autocompletado (entradas, claves y bytes aproximados)."""
+    return CATALOG.index("suggest").stats()
+
+def _facets_or_500() -> Tuple[catalog.Snapshot, facet_index.FacetIndex]:
+    try:
+        return CATALOG.indexed("facets")
+    except Exception as e:
+        logger.error(f"Error en el índice de facetas: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+
+@app.get("/playlists/facets", tags=["playlists"])
+def get_playlist_facets(
+    segment: Optional[str] = Query(None, description="Ids de segmento separados por coma"),
+    category: Optional[str] = Query(None, description="Ids de categoría (lacajita_playlist_categories) separados por coma"),
+    legacy_category: Optional[str] = Query(None, description="Valores de la columna category separados por coma"),
+    subscription: Optional[str] = None,
+    active: Optional[str] = None,
+    user_claims: dict = Depends(require_auth)
+):
+    """Conteos de todas las facetas en una llamada. Cada filtro es un OR de sus valores y los
+    filtros se combinan con AND; los conteos de una faceta ignoran su propio filtro."""
+    _, index = _facets_or_500()
+    params = {"segment": segment, "category": category, "legacy_category": legacy_category,
+              "subscription": subscription, "active": active}
+    selected = {f: [v.strip() for v in raw.split(",") if v.strip()] for f, raw in params.items() if raw}
+    return {"version": index.version, "total": index.select(selected).bit_count(),
+            "facets": index.counts(selected)}
+
+class FacetFilter(BaseModel):
+    where: Dict[str, Any] = Field(..., description='p. ej. {"and": [{"category": [1, 2]}, {"not": {"subscription": 1}}]}')
+    limit: int = Field(50, ge=1, le=500)
+    offset: int = Field(0, ge=0)
+    counts: bool = False
+
+@app.post("/playlists/filter", tags=["playlists"])
+def filter_playlists(body: FacetFilter, user_claims: dict = Depends(require_auth)):
+    """Playlists que cumplen una combinación arbitraria de AND/OR/NOT sobre las facetas."""
+    snapshot, index = _facets_or_500()
+    try:
+        mask = index.evaluate(body.where)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # filas de la misma instantánea que el índice; una baja concurrente puede quitar alguna
+    rows = (snapshot.playlists.get(pid) for pid in index.members(mask)[body.offset:body.offset + body.limit])
+    items = [row for row in rows if row is not None]
+    out = {"version": index.version, "total": mask.bit_count(), "items": items}
+    if body.counts:
+        out["facets"] = index.counts({}, base=mask)
+    return wire.respond(out)
 
 @app.get("/playlists/{item_id}", response_model=Playlist, tags=["playlists"])
 def get_playlist(
     item_id: str,
+    request: Request,
     user_claims: dict = Depends(require_auth)
 ):
-    """Obtener una playlist específica por ID"""
+    """Obtener una playlist específica por ID. Con `?fields=`/`?include=seasons,seasons.videos`
+    (ver projection.py) se sirve proyectada desde la instantánea del catálogo."""
+    proj = _projection_or_400(request)
+    if proj is not None:
+        snapshot = _catalog_snapshot()
+        playlist = snapshot.playlists.get(item_id)
+        if not playlist:
+            raise HTTPException(status_code=404, detail="Playlist not found")
+        return wire.respond(proj.playlist(playlist, snapshot, _placeholder_fn(proj)))
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     cursor.execute("SELECT id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at FROM lacajita_playlists WHERE id = %s", (item_id,))
@@ -1343,27 +1669,47 @@ def update_playlist(
     item: Playlist,
     user_claims: dict = Depends(require_auth)
 ):
-    """Actualizar una playlist existente"""
+    """Actualizar una playlist existente.
+
+    Un solo UPDATE: la existencia solo se comprueba si no afectó filas (p. ej. datos
+    idénticos en el mismo segundo). La respuesta sale de los datos enviados; `created_at`
+    no se modifica y se devuelve el guardado, nunca el enviado: del catálogo en memoria, o
+    con un SELECT de una fila si aún no lo tiene (proceso recién arrancado, fila de otro proceso).
+    """
+    now = datetime.now().replace(microsecond=0)
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    # Verificar que la playlist existe antes de actualizar
-    cursor.execute("SELECT id FROM lacajita_playlists WHERE id = %s", (item_id,))
-    if not cursor.fetchone():
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+        UPDATE lacajita_playlists
+        SET segment_id = %s, title = %s, description = %s, category = %s, subscription = %s, subscription_cost = %s, active = %s, updated_at = %s
+        WHERE id = %s
+        """, (item.segment_id, item.title, item.description, item.category, item.subscription, item.subscription_cost, item.active, now, item_id))
+        if cursor.rowcount == 0:
+            cursor.execute("SELECT 1 FROM lacajita_playlists WHERE id = %s", (item_id,))
+            if not cursor.fetchone():
+                conn.rollback()
+                raise HTTPException(status_code=404, detail="Playlist not found")
+        else:
+            changelog.record(cursor, "playlist", changelog.UPDATE, [item_id])
+        conn.commit()
+        row = {
+            "id": item_id, "segment_id": item.segment_id, "title": item.title, "description": item.description,
+            "category": item.category, "subscription": item.subscription, "subscription_cost": item.subscription_cost,
+            "active": item.active, "updated_at": now,
+        }
+        saved = CATALOG.playlist_saved(row)
+        created_at = saved.get("created_at") if saved else None
+        if created_at is None:
+            cursor.execute("SELECT created_at FROM lacajita_playlists WHERE id = %s", (item_id,))
+            found = cursor.fetchone()
+            created_at = found[0] if found else None
+            if saved is not None:
+                saved["created_at"] = created_at  # la fila de la instantánea tampoco lo tenía
+    finally:
         cursor.close()
         conn.close()
-        raise HTTPException(status_code=404, detail="Playlist not found")
-
-    cursor.execute("""
-    UPDATE lacajita_playlists
-    SET segment_id = %s, title = %s, description = %s, category = %s, subscription = %s, subscription_cost = %s, active = %s, updated_at = NOW()
-    WHERE id = %s
-    """, (item.segment_id, item.title, item.description, item.category, item.subscription, item.subscription_cost, item.active, item_id))
-    conn.commit()
-    cursor.execute("SELECT id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at FROM lacajita_playlists WHERE id = %s", (item_id,))
-    result = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    return result
+    return {**row, "created_at": created_at}
 
 @app.delete("/playlists/{item_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["playlists"])
 def delete_playlist(
@@ -1378,37 +1724,39 @@ def delete_playlist(
         cursor.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Playlist not found")
+    changelog.record(cursor, "playlist", changelog.DELETE, [item_id])
     conn.commit()
     cursor.close()
     conn.close()
+    CATALOG.playlist_removed(item_id)
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # ——— CRUD Seasons ——————————————————————————————
+SEASONS_KEYSET = keyset.Keyset(("date", "id"), desc=True, nullable_first=True)
+
 @app.get("/seasons", response_model=List[Season], tags=["seasons"])
 def get_seasons(
+    response: Response,
     active: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, description=f"Paginación por cursor (máx. {keyset.MAX_LIMIT})"),
+    cursor: Optional[str] = Query(None, description=f"Valor de la cabecera {keyset.NEXT_CURSOR_HEADER} de la página anterior"),
     user_claims: dict = Depends(require_auth)
 ):
+    where, params = _keyset_where(SEASONS_KEYSET, cursor, {"active": active})
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    db = conn.cursor(dictionary=True)
     try:
-        if active is not None:
-            sql = "SELECT id, playlist_id, title, description, date, active FROM lacajita_season WHERE active = %s ORDER BY date DESC"
-            cursor.execute(sql, (active,))
-        else:
-            sql = "SELECT id, playlist_id, title, description, date, active FROM lacajita_season ORDER BY date DESC"
-            cursor.execute(sql)
-
-        results = cursor.fetchall()
+        sql = f"SELECT id, playlist_id, title, description, date, active FROM lacajita_season{where} ORDER BY {SEASONS_KEYSET.order_by()}"
+        results = _keyset_fetch(db, SEASONS_KEYSET, sql, params, limit, cursor, response)
     except Exception as e:
         err = f"DB error in get_seasons: {str(e)}"
         print(err)
-        cursor.close(); conn.close()
+        db.close(); conn.close()
         raise HTTPException(status_code=500, detail=err)
 
-    cursor.close()
+    db.close()
     conn.close()
-    return results
+    return wire.respond(results, response)
 
 @app.post("/seasons", response_model=Season, status_code=status.HTTP_201_CREATED, tags=["seasons"])
 def create_season(
@@ -1421,8 +1769,9 @@ def create_season(
     INSERT INTO lacajita_season (playlist_id, title, description, date, active)
     VALUES (%s, %s, %s, %s, %s)
     """, (item.playlist_id, item.title, item.description, item.date or datetime.utcnow(), item.active or 1))
-    conn.commit()
     new_id = cursor.lastrowid
+    changelog.record(cursor, "season", changelog.INSERT, [new_id])
+    conn.commit()
     cursor.execute("SELECT id, playlist_id, title, description, date, active FROM lacajita_season WHERE id = %s", (new_id,))
     result = cursor.fetchone()
     cursor.close()
@@ -1457,6 +1806,8 @@ def update_season(
     SET playlist_id = %s, title = %s, description = %s, date = %s, active = %s
     WHERE id = %s
     """, (item.playlist_id, item.title, item.description, item.date, item.active, item_id))
+    if cursor.rowcount:
+        changelog.record(cursor, "season", changelog.UPDATE, [item_id])
     conn.commit()
     cursor.execute("SELECT id, playlist_id, title, description, date, active FROM lacajita_season WHERE id = %s", (item_id,))
     result = cursor.fetchone()
@@ -1478,27 +1829,31 @@ def delete_season(
         cursor.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Season not found")
+    changelog.record(cursor, "season", changelog.DELETE, [item_id])
     conn.commit()
     cursor.close()
     conn.close()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 # ——— CRUD Videos ——————————————————————————————
+VIDEOS_KEYSET = keyset.Keyset(("date", "season_id", "video_id"), desc=True, nullable_first=True)
+
 @app.get("/videos", response_model=List[Video], tags=["videos"])
 def get_videos(
+    response: Response,
     active: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, description=f"Paginación por cursor (máx. {keyset.MAX_LIMIT})"),
+    cursor: Optional[str] = Query(None, description=f"Valor de la cabecera {keyset.NEXT_CURSOR_HEADER} de la página anterior"),
     user_claims: dict = Depends(require_auth)
 ):
+    where, params = _keyset_where(VIDEOS_KEYSET, cursor, {"active": active})
+    sql = f"SELECT season_id, video_id, date, active FROM lacajita_videos{where} ORDER BY {VIDEOS_KEYSET.order_by()}"
     conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    if active is not None:
-        cursor.execute("SELECT season_id, video_id, date, active FROM lacajita_videos WHERE active = %s ORDER BY date DESC", (active,))
-    else:
-        cursor.execute("SELECT season_id, video_id, date, active FROM lacajita_videos ORDER BY date DESC")
-    results = cursor.fetchall()
-    cursor.close()
+    db = conn.cursor(dictionary=True)
+    results = _keyset_fetch(db, VIDEOS_KEYSET, sql, params, limit, cursor, response)
+    db.close()
     conn.close()
-    return results
+    return wire.respond(results, response)
 
 @app.post("/videos", response_model=Video, status_code=status.HTTP_201_CREATED, tags=["videos"])
 def create_video(
@@ -1511,6 +1866,7 @@ def create_video(
     INSERT INTO lacajita_videos (season_id, video_id, date, active)
     VALUES (%s, %s, %s, %s)
     """, (item.season_id, item.video_id, item.date or datetime.utcnow(), item.active or 1))
+    changelog.record(cursor, "video", changelog.INSERT, [changelog.video_key(item.season_id, item.video_id)])
     conn.commit()
     cursor.execute("SELECT season_id, video_id, date, active FROM lacajita_videos WHERE season_id = %s AND video_id = %s", (item.season_id, item.video_id))
     result = cursor.fetchone()
@@ -1548,6 +1904,8 @@ def update_video(
     SET date = %s, active = %s
     WHERE season_id = %s AND video_id = %s
     """, (item.date, item.active, season_id, video_id))
+    if cursor.rowcount:
+        changelog.record(cursor, "video", changelog.UPDATE, [changelog.video_key(season_id, video_id)])
     conn.commit()
     cursor.execute("SELECT season_id, video_id, date, active FROM lacajita_videos WHERE season_id = %s AND video_id = %s", (season_id, video_id))
     result = cursor.fetchone()
@@ -1570,11 +1928,200 @@ def delete_video(
         cursor.close()
         conn.close()
         raise HTTPException(status_code=404, detail="Video not found")
+    changelog.record(cursor, "video", changelog.DELETE, [changelog.video_key(season_id, video_id)])
     conn.commit()
     cursor.close()
     conn.close()
     return Response(status_code=status.HTTP_204_NO_CONTENT)
 
+# ——— CRUD por lotes ——————————————————————————————
+# Altas/cambios/bajas de muchos elementos en una petición: todo se valida antes de escribir,
+# se ejecuta en una transacción con sentencias multi-row y se responde con el estado de cada
+# elemento (ver batch_crud.py). Carga comparada con llamadas individuales: scripts/load_batch_crud.py
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+
+def _utcnow() -> datetime:
+    """Reloj único de las escrituras por lotes (UTC, sin microsegundos como DATETIME)."""
+    return datetime.utcnow().replace(microsecond=0)
+
+def _carousel_has_media(row: dict) -> Optional[str]:
+    return None if (row.get("imgsrc") or row.get("video")) else "Debe indicar imgsrc o video"
+
+BATCH_SPECS = {
+    "videos": batch_crud.BatchSpec(
+        "lacajita_videos", key=("season_id", "video_id"), columns=("date", "active"),
+        defaults={"date": _utcnow, "active": lambda: 1}),
+    "seasons": batch_crud.BatchSpec(
+        "lacajita_season", key=("id",), columns=("playlist_id", "title", "description", "date", "active"),
+        defaults={"date": _utcnow, "active": lambda: 1}, auto_id=True, required=("playlist_id",)),
+    "home-carousel": batch_crud.BatchSpec(
+        "lacajita_home_carousel", key=("id",), columns=("link", "imgsrc", "video", "date_time", "active", "order_"),
+        defaults={"date_time": _utcnow, "active": lambda: 1, "order_": lambda: 0},
+        auto_id=True, ranked=True, check=_carousel_has_media),
+    "segments": batch_crud.BatchSpec(
+        "lacajita_segments", key=("id",), columns=("name", "livetv", "order_", "active"),
+        defaults={"livetv": lambda: 0, "order_": lambda: 0, "active": lambda: 1},
+        auto_id=True, ranked=True, required=("name",)),
+}
+
+class VideoBatch(BaseModel):
+    items: List[Video]
+
+class VideoPatch(BaseModel):
+    season_id: int
+    video_id: str
+    date: Optional[datetime] = None
+    active: Optional[int] = None
+
+class VideoPatchBatch(BaseModel):
+    items: List[VideoPatch]
+
+class VideoKey(BaseModel):
+    season_id: int
+    video_id: str
+
+class VideoKeyBatch(BaseModel):
+    items: List[VideoKey]
+
+class SeasonBatch(BaseModel):
+    items: List[Season]
+
+class SeasonPatch(BaseModel):
+    id: int
+    playlist_id: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    date: Optional[datetime] = None
+    active: Optional[int] = None
+
+class SeasonPatchBatch(BaseModel):
+    items: List[SeasonPatch]
+
+class HomeCarouselBatch(BaseModel):
+    items: List[HomeCarousel]
+
+class HomeCarouselPatch(BaseModel):
+    id: int
+    link: Optional[str] = None
+    imgsrc: Optional[str] = None
+    video: Optional[str] = None
+    active: Optional[int] = None
+    order_: Optional[int] = Field(default=None, alias="order")
+
+class HomeCarouselPatchBatch(BaseModel):
+    items: List[HomeCarouselPatch]
+
+class SegmentBatch(BaseModel):
+    items: List[Segment]
+
+class SegmentPatch(BaseModel):
+    id: int
+    name: Optional[str] = None
+    livetv: Optional[int] = None
+    order_: Optional[int] = Field(default=None, alias="order")
+    active: Optional[int] = None
+
+class SegmentPatchBatch(BaseModel):
+    items: List[SegmentPatch]
+
+class IdBatch(BaseModel):
+    ids: List[int]
+
+# Entidad del registro de cambios (changelog.py) de cada lote y operación según el estado del elemento
+BATCH_CHANGELOG = {"videos": "video", "seasons": "season", "home-carousel": "homecarousel", "segments": "segment"}
+_BATCH_CHANGE_OPS = {"created": changelog.INSERT, "updated": changelog.UPDATE, "deleted": changelog.DELETE}
+
+def _record_batch(cursor, entity: str, results: List[dict]):
+    spec = BATCH_SPECS[entity]
+    by_op: Dict[str, list] = {}
+    for r in results:
+        op = _BATCH_CHANGE_OPS.get(r["status"])
+        if op:
+            key = spec.key_of(r.get("item", r))
+            by_op.setdefault(op, []).append(changelog.video_key(*key) if len(key) > 1 else key[0])
+    for op, ids in by_op.items():
+        changelog.record(cursor, BATCH_CHANGELOG[entity], op, ids)
+
+def _run_batch(entity: str, op: str, items: List[dict]):
+    """Valida el lote completo y lo aplica en una sola transacción."""
+    spec = BATCH_SPECS[entity]
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Máximo {BATCH_MAX_ITEMS} elementos por lote")
+    errors = batch_crud.validate_new(spec, items) if op == "create" else batch_crud.validate_keys(spec, items)
+    if errors:
+        raise HTTPException(status_code=422, detail={"msg": "Lote inválido; no se aplicó ningún cambio", "errors": errors})
+    if not items:
+        return wire.respond(batch_crud.summary([]))
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        if op == "create":
+            results = batch_crud.insert_rows(cursor, spec, items)
+        elif op == "update":
+            results = batch_crud.update_rows(cursor, spec, items)
+        else:
+            results = batch_crud.delete_rows(cursor, spec, [spec.key_of(i) for i in items])
+        _record_batch(cursor, entity, results)
+        conn.commit()
+    except Error as e:
+        conn.rollback()
+        logger.error(f"Batch {op} {entity} falló: {e}")
+        raise HTTPException(status_code=500, detail=f"Error aplicando lote: {e}")
+    finally:
+        cursor.close()
+        conn.close()
+    return wire.respond(batch_crud.summary(results))
+
+@app.post("/batch/videos", tags=["videos"])
+def create_videos_batch(body: VideoBatch, user_claims: dict = Depends(require_auth)):
+    """Alta de videos por lote; los pares (season_id, video_id) ya existentes se informan como `exists`."""
+    return _run_batch("videos", "create", [i.dict() for i in body.items])
+
+@app.patch("/batch/videos", tags=["videos"])
+def update_videos_batch(body: VideoPatchBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("videos", "update", [i.dict(exclude_unset=True) for i in body.items])
+
+@app.delete("/batch/videos", tags=["videos"])
+def delete_videos_batch(body: VideoKeyBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("videos", "delete", [i.dict() for i in body.items])
+
+@app.post("/batch/seasons", tags=["seasons"])
+def create_seasons_batch(body: SeasonBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("seasons", "create", [i.dict() for i in body.items])
+
+@app.patch("/batch/seasons", tags=["seasons"])
+def update_seasons_batch(body: SeasonPatchBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("seasons", "update", [i.dict(exclude_unset=True) for i in body.items])
+
+@app.delete("/batch/seasons", tags=["seasons"])
+def delete_seasons_batch(body: IdBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("seasons", "delete", [{"id": i} for i in body.ids])
+
+@app.post("/batch/home-carousel", tags=["homecarousel"])
+def create_home_carousel_batch(body: HomeCarouselBatch, user_claims: dict = Depends(require_auth)):
+    """Alta de elementos del carrusel por lote, agregados al final del orden."""
+    return _run_batch("home-carousel", "create", [i.dict() for i in body.items])
+
+@app.patch("/batch/home-carousel", tags=["homecarousel"])
+def update_home_carousel_batch(body: HomeCarouselPatchBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("home-carousel", "update", [i.dict(exclude_unset=True) for i in body.items])
+
+@app.delete("/batch/home-carousel", tags=["homecarousel"])
+def delete_home_carousel_batch(body: IdBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("home-carousel", "delete", [{"id": i} for i in body.ids])
+
+@app.post("/batch/segments", tags=["segments"])
+def create_segments_batch(body: SegmentBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("segments", "create", [i.dict() for i in body.items])
+
+@app.patch("/batch/segments", tags=["segments"])
+def update_segments_batch(body: SegmentPatchBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("segments", "update", [i.dict(exclude_unset=True) for i in body.items])
+
+@app.delete("/batch/segments", tags=["segments"])
+def delete_segments_batch(body: IdBatch, user_claims: dict = Depends(require_auth)):
+    return _run_batch("segments", "delete", [{"id": i} for i in body.ids])
+
 # ——— Endpoint Especial /playlist ———————————————————————
 # Mejorar el endpoint principal de playlists
 @app.get("/playlists", response_model=CompletePlaylistResponse, tags=["playlists"])
@@ -1594,10 +2141,10 @@ def get_complete_playlist_data(
     cursor = conn.cursor(dictionary=True)
     try:
         # Obtener home carousel
-        cursor.execute("""
+        cursor.execute(f"""
         SELECT id, link, imgsrc, video, date_time, active, order_ as order
         FROM lacajita_home_carousel
-        ORDER BY order_
+        ORDER BY {ordering.ORDER_BY}
         """)
         homecarousel = cursor.fetchall()
         # Formatear fechas en carousel
@@ -1608,11 +2155,11 @@ def get_complete_playlist_data(
                 item['date_time'] = format_date('date_time', item)
 
         # Obtener segments activos
-        cursor.execute("""
+        cursor.execute(f"""
         SELECT id, name, livetv, order_ as order, active
         FROM lacajita_segments
         WHERE active = 1
-        ORDER BY order_
+        ORDER BY {ordering.ORDER_BY}
         """)
         segments = cursor.fetchall()
 
@@ -1705,123 +2252,149 @@ def get_complete_playlist_data(
         cursor.close()
         conn.close()
 
-# Agregar endpoint de búsqueda mejorado
-@app.get("/playlists/search", response_model=List[PlaylistComplete], tags=["playlists"])
-def search_playlists(
-    q: str = Query(..., min_length=1, description="Término de búsqueda"),
-    category: Optional[str] = None,
-    subscription: Optional[int] = None,
-    limit: int = Query(10, le=100),
-    offset: int = Query(0, ge=0),
-    user_claims: dict = Depends(require_auth)
-):
-    """Buscar playlists por título, descripción o categoría"""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-    try:
-        # Construir query de búsqueda
-        base_query = """
-        SELECT p.*, s.name as segment_name
-        FROM lacajita_playlists p
-        LEFT JOIN lacajita_segments s ON p.segment_id = s.id
-        WHERE p.active = 1 AND (p.title LIKE %s OR p.description LIKE %s OR p.category LIKE %s)
-        """
-        params = [f"%{q}%", f"%{q}%", f"%{q}%"]
-
-        # Agregar filtros adicionales
-        if category:
-            base_query += " AND p.category = %s"
-            params.append(category)
-        if subscription is not None:
-            base_query += " AND p.subscription = %s"
-            params.append(subscription)
-
-        # Agregar paginación
-        base_query += " ORDER BY p.updated_at DESC LIMIT %s OFFSET %s"
-        params.extend([limit, offset])
-
-        cursor.execute(base_query, params)
-        results = cursor.fetchall()
-
-        # Formatear fechas
-        for playlist in results:
-            playlist['created_at'] = format_date('created_at', playlist)
-            playlist['updated_at'] = format_date('updated_at', playlist)
-
-        return results
-    except Exception as e:
-        logger.error(f"Error en búsqueda de playlists: {str(e)}")
-        raise HTTPException(status_code=500, detail="Error interno del servidor")
-    finally:
-        cursor.close()
-        conn.close()
-
 # Endpoint mejorado para obtener playlists por segment con detalles completos
 @app.get("/playlists/by-segment/{segment_id}", response_model=List[PlaylistComplete], tags=["playlists"])
 def get_playlists_by_segment_with_details(
     segment_id: int,
+    request: Request,
     include_seasons: bool = Query(True, description="Incluir información de seasons"),
     include_videos: bool = Query(False, description="Incluir lista de video IDs"),
     user_claims: dict = Depends(require_auth)
 ):
-    """Obtener todas las playlists de un segment específico con detalles opcionales"""
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
+    """Obtener las playlists activas de un segment, de la más a la menos reciente.
+    Servido desde la instantánea del catálogo; `?fields=`/`?include=` (ver projection.py)
+    tienen prioridad sobre include_seasons/include_videos."""
+    default_include = ["seasons"] * include_seasons + ["seasons.videos"] * (include_seasons and include_videos)
+    proj = _projection_or_400(request, default_include)
+    snapshot = _catalog_snapshot()
+    if segment_id not in snapshot.segments:
+        raise HTTPException(status_code=404, detail="Segment no encontrado")
+    playlists = sorted((p for p in snapshot.playlists.values()
+                        if p.get('segment_id') == segment_id and p.get('active') == 1),
+                       key=_by_updated_at, reverse=True)
+    if proj is None:
+        full = projection.Projection.from_query({"include": ",".join(default_include)})
+        if wire.accepted() is None:
+            return [full.playlist(p, snapshot, _placeholder_fn(full)) for p in playlists]
+        proj = full
+
+    def build():
+        placeholder = _placeholder_fn(proj)
+        return [proj.playlist(p, snapshot, placeholder) for p in playlists]
+    return wire.respond_cached(_catalog_key(request, snapshot.version), build)
+
+# ——— Pantalla de inicio por filas ————————————————————————
+# Primeras playlists de cada segmento y páginas siguientes por cursor (ver segment_rows.py)
+
+HOME_PROJECTION = projection.Projection.from_query({
+    "fields": "id,segment_id,title,img,subscription,updated_at,placeholder",
+    "fields[segment]": "id,name,livetv,order_",
+})
+
+def _rows_or_500() -> segment_rows.SegmentRows:
     try:
-        # Verificar que el segment existe
-        cursor.execute("SELECT id, name, active FROM lacajita_segments WHERE id = %s", (segment_id,))
-        segment = cursor.fetchone()
-        if not segment:
-            raise HTTPException(status_code=404, detail="Segment no encontrado")
-
-        # Obtener playlists del segment
-        cursor.execute("""
-        SELECT id, segment_id, title, description, category, subscription, subscription_cost, active, created_at, updated_at
-        FROM lacajita_playlists
-        WHERE segment_id = %s AND active = 1
-        ORDER BY updated_at DESC
-        """, (segment_id,))
-        playlists = cursor.fetchall()
+        return CATALOG.index("rows")
+    except Exception as e:
+        logger.error(f"Error en las filas de la pantalla de inicio: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
 
-        # Procesar cada playlist
-        for playlist in playlists:
-            playlist['created_at'] = format_date('created_at', playlist)
-            playlist['updated_at'] = format_date('updated_at', playlist)
-            playlist['seasons'] = []
-            if include_seasons:
-                # Obtener seasons para esta playlist
-                cursor.execute("""
-                SELECT id, playlist_id, title, description, date, active
-                FROM lacajita_season
-                WHERE playlist_id = %s AND active = 1
-                ORDER BY date DESC
-                """, (playlist['id'],))
-                seasons = cursor.fetchall()
-                for season in seasons:
-                    season['date'] = format_date('date', season)
-                    # Obtener videos de esta season
-                    season_videos = []
-                    for vi in videos:
-                        if vi['season_id'] == se['id']:
-                            season_videos.append(vi['video_id'])
-                    # Agregar videos a la season
-                    season_dict['videos'] = season_videos
-                    playlist_seasons.append(season_dict)
+def _row_page(rows: segment_rows.SegmentRows, proj: projection.Projection, segment_id: int,
+              limit: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    try:
+        items, next_cursor = rows.page(segment_id, limit, cursor)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Segment no encontrado")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    snapshot = _catalog_snapshot() if proj.include else None
+    placeholder = _placeholder_fn(proj)
+    return {"playlists": [proj.playlist(p, snapshot, placeholder) for p in items], "next_cursor": next_cursor}
+
+@app.get("/home", tags=["playlists"])
+def get_home_rows(
+    request: Request,
+    per_segment: int = Query(segment_rows.DEFAULT_PER_SEGMENT, ge=1, le=segment_rows.MAX_PER_SEGMENT),
+    user_claims: dict = Depends(require_auth)
+):
+    """Segmentos activos en su orden, cada uno con sus primeras `per_segment` playlists y el
+    cursor para pedir más a /home/segments/{segment_id}. Admite `?fields=`/`?include=` (ver projection.py)."""
+    proj = _projection_or_400(request) or HOME_PROJECTION
+    rows = _rows_or_500()
+    livetv = _livetv_channels() if any(s.get('livetv') == 1 for s in rows.segments) else []
+
+    def build():
+        segments = []
+        for sgm in rows.segments:
+            out = proj.project("segment", sgm)
+            if sgm.get('livetv') == 1:
+                out['livetvlist'] = livetv
+            else:
+                out.update(_row_page(rows, proj, sgm['id'], per_segment))
+            segments.append(out)
+        return {"version": rows.version, "segments": segments}
+    return wire.respond_cached(_catalog_key(request, rows.version, hash(wire.encode(livetv, None))), build)
 
-            # Agregar seasons a la playlist
-            playlist_dict['seasons'] = playlist_seasons
+@app.get("/home/segments/{segment_id}", tags=["playlists"])
+def get_home_row_page(
+    segment_id: int,
+    request: Request,
+    limit: int = Query(segment_rows.DEFAULT_PER_SEGMENT, ge=1, le=segment_rows.MAX_PER_SEGMENT),
+    cursor: Optional[str] = None,
+    user_claims: dict = Depends(require_auth)
+):
+    """Siguiente página de la fila de un segmento, desde el `next_cursor` de /home o de la página anterior."""
+    proj = _projection_or_400(request) or HOME_PROJECTION
+    rows = _rows_or_500()
+    return wire.respond_cached(_catalog_key(request, rows.version),
+                               lambda: {"segment_id": segment_id, "version": rows.version,
+                                        **_row_page(rows, proj, segment_id, limit, cursor)})
+
+@app.get("/catalog/stream", tags=["playlists"])
+def stream_catalog(
+    since: Optional[datetime] = Query(None, description="Solo playlists con updated_at >= since (y sus seasons/videos)"),
+    user_claims: dict = Depends(require_auth)
+):
+    """Catálogo completo en NDJSON (segments, playlists, seasons, videos y un registro `end`),
+    leído con cursores sin búfer y enviado a medida que se lee. Ver catalog_stream.py."""
+    conn = get_connection()
+    return StreamingResponse(catalog_stream.records(conn, since), media_type=catalog_stream.MEDIA_TYPE)
 
-        return CompletePlaylistResponse(
-            homecarousel=processed_homecarousel,
-            segments=processed_segments
-        )
-    except Exception as e:
-        logger.error(f"Error obteniendo playlists por segment: {str(e)}")
+@app.get("/catalog/changes", tags=["playlists"])
+def catalog_changes(
+    since: int = Query(..., ge=0, description="Último `seq` recibido (0 = todo el registro retenido)"),
+    limit: int = Query(changelog.MAX_CHANGES, ge=1, le=changelog.MAX_CHANGES, description="Filas del registro por respuesta"),
+    user_claims: dict = Depends(require_auth)
+):
+    """Altas, cambios y bajas del catálogo posteriores a `since`, una entrada por elemento
+    (`{entity, id, op: I|U|D, seq, data}`; ver changelog.py). El cliente guarda `seq` y, si
+    `more`, vuelve a pedir desde ahí. Si `since` ya no está en el registro (retención) o no
+    corresponde a esta base de datos, responde `full: true` con el árbol completo en `catalog`."""
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        first, last = changelog.bounds(cursor)
+        if changelog.is_resumable(since, first, last):
+            return wire.respond(changelog.changes_since(cursor, since, limit))
+        last = changelog.watermark(cursor)  # no saltar seqs aún sin confirmar (ver changelog.py)
+    except Error as e:
+        logger.error(f"Error leyendo {changelog.TABLE}: {str(e)}")
         raise HTTPException(status_code=500, detail="Error interno del servidor")
     finally:
         cursor.close()
         conn.close()
 
+    # `last` se lee antes de recargar: lo que entre mientras tanto llegará otra vez en la
+    # siguiente petición, y las altas/cambios se pueden aplicar dos veces sin problema
+    try:
+        CATALOG.refresh(force=True)
+    except Exception as e:
+        logger.error(f"Error recargando el catálogo: {str(e)}")
+        raise HTTPException(status_code=500, detail="Error interno del servidor")
+    snapshot = _catalog_snapshot()
+    livetv = _livetv_channels() if _has_livetv(snapshot) else []
+    tree = _projected_catalog(CATALOG_TREE_PROJECTION, snapshot, _home_carousel_rows(), livetv)
+    return wire.respond({"since": since, "seq": last, "full": True, "more": False, "catalog": tree})
+
 # Endpoint para estadísticas del sistema
 @app.get("/stats/overview", tags=["statistics"])
 def get_system_overview(user_claims: dict = Depends(require_auth)):
@@ -1838,34 +2411,23 @@ def get_system_overview(user_claims: dict = Depends(require_auth)):
         cursor.execute("SELECT COUNT(*) as count FROM lacajita_segments WHERE active = 1")
         stats['active_segments'] = cursor.fetchone()['count']
 
-        cursor.execute("SELECT COUNT(*) as count FROM lacajita_playlists WHERE active = 1")
-        stats['active_playlists'] = cursor.fetchone()['count']
-
         cursor.execute("SELECT COUNT(*) as count FROM lacajita_season WHERE active = 1")
         stats['active_seasons'] = cursor.fetchone()['count']
 
         cursor.execute("SELECT COUNT(*) as count FROM lacajita_videos WHERE active = 1")
         stats['active_videos'] = cursor.fetchone()['count']
 
-        # Estadísticas por categoría
-        cursor.execute("""
-        SELECT category, COUNT(*) as count
-        FROM lacajita_playlists
-        WHERE active = 1 AND category IS NOT NULL
-        GROUP BY category
-        ORDER BY count DESC
-        """)
-        stats['playlists_by_category'] = cursor.fetchall()
-
-        # Playlists con suscripción
-        cursor.execute("""
-        SELECT SUM(CASE WHEN subscription = 1 THEN 1 ELSE 0 END) as subscription_required,
-               SUM(CASE WHEN subscription = 0 THEN 1 ELSE 0 END) as free_content
-        FROM lacajita_playlists
-        WHERE active = 1
-        """)
-        subscription_stats = cursor.fetchone()
-        stats.update(subscription_stats)
+        # Playlists: conteos del índice de facetas (sin GROUP BY por petición)
+        facets = CATALOG.index("facets")
+        active = facets.any_of("active", [1])
+        stats['active_playlists'] = active.bit_count()
+        counts = facets.counts({}, base=active, facets=["legacy_category", "subscription"])
+        stats['playlists_by_category'] = [
+            {"category": c, "count": n}
+            for c, n in sorted(counts["legacy_category"].items(), key=lambda kv: -kv[1])
+        ]
+        stats['subscription_required'] = counts["subscription"].get("1", 0)
+        stats['free_content'] = counts["subscription"].get("0", 0)
 
         return stats
     except Exception as e:
@@ -2452,4 +3014,4 @@ def check_playlist_health():
     else:
         return health_status
 
-app.mount("/img", StaticFiles(directory="/opt/fastapi-playlists/img"), name="img")
+app.mount("/img", StaticFiles(directory=IMG_DIR), name="img")
@@ -0,0 +1,186 @@
+# batch_crud.py
+# Altas, cambios y bajas por lotes para el CRUD REST de app.py (videos, seasons, carrusel, segmentos)
+"""
+Cada operación de lote se ejecuta en una sola transacción con sentencias multi-row:
+
+- alta:   INSERT ... VALUES (...),(...) por cada 500 filas; los ids autoincrementales se
+          derivan de `lastrowid` (un INSERT multi-row con número de filas conocido recibe
+          ids consecutivos en InnoDB, también con innodb_autoinc_lock_mode=2);
+- cambio: un SELECT de las claves existentes y un UPDATE con `CASE` por columna (en
+          tablas ordenables, `order_` recoloca además la fila, ver ordering.place_by_order);
+- baja:   un SELECT de las claves existentes y un DELETE ... WHERE clave IN (...).
+
+Las funciones reciben un cursor y no hacen commit: el endpoint decide la transacción.
+El resultado es por elemento, en el orden recibido.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import ordering
+
+CHUNK_ROWS = 500
+
+
+class BatchSpec:
+    """Describe una tabla para las operaciones de lote."""
+
+    def __init__(self, table: str, key: Sequence[str], columns: Sequence[str],
+                 defaults: Optional[Dict[str, Callable[[], Any]]] = None, auto_id: bool = False,
+                 required: Sequence[str] = (), ranked: bool = False,
+                 check: Optional[Callable[[Dict[str, Any]], Optional[str]]] = None):
+        self.table = table
+        self.key = tuple(key)
+        self.columns = tuple(columns)      # columnas escribibles (sin la clave autoincremental)
+        self.defaults = defaults or {}     # valor por defecto en altas cuando llega None
+        self.auto_id = auto_id
+        self.required = tuple(required)
+        self.ranked = ranked               # asigna rank_key al final (ver ordering.py)
+        self.check = check                 # validación adicional de una fila de alta
+
+    def key_of(self, item: Dict[str, Any]) -> Tuple:
+        return tuple(item.get(k) for k in self.key)
+
+
+def _chunks(seq: list, size: int = CHUNK_ROWS):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def _key_in(spec: BatchSpec, n: int) -> str:
+    if len(spec.key) == 1:
+        return f"{spec.key[0]} in ({','.join(['%s'] * n)})"
+    one = "(" + ",".join(["%s"] * len(spec.key)) + ")"
+    return f"({', '.join(spec.key)}) in ({','.join([one] * n)})"
+
+
+def _key_label(spec: BatchSpec, key: Tuple) -> Dict[str, Any]:
+    return dict(zip(spec.key, key))
+
+
+def validate_new(spec: BatchSpec, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Errores por elemento de un lote de altas (lista vacía = lote válido)."""
+    errors = []
+    for i, row in enumerate(rows):
+        missing = [c for c in spec.required if row.get(c) in (None, "")]
+        if missing:
+            errors.append({"index": i, "error": f"Campos obligatorios: {', '.join(missing)}"})
+        elif spec.check and (msg := spec.check(row)):
+            errors.append({"index": i, "error": msg})
+    return errors
+
+
+def validate_keys(spec: BatchSpec, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Errores por elemento de cambios/bajas: clave completa y sin repetir."""
+    errors, seen = [], set()
+    for i, item in enumerate(items):
+        key = spec.key_of(item)
+        if any(v in (None, "") for v in key):
+            errors.append({"index": i, "error": f"Clave obligatoria: {', '.join(spec.key)}"})
+        elif key in seen:
+            errors.append({"index": i, "error": "Elemento repetido en el lote"})
+        seen.add(key)
+    return errors
+
+
+def existing_keys(cur, spec: BatchSpec, keys: List[Tuple]) -> set:
+    found = set()
+    for chunk in _chunks(keys):
+        cur.execute(f"select {', '.join(spec.key)} from {spec.table} where {_key_in(spec, len(chunk))}",
+                    [v for key in chunk for v in key])
+        found.update(tuple(r) for r in cur.fetchall())
+    return found
+
+
+def _new_row(spec: BatchSpec, row: Dict[str, Any]) -> Dict[str, Any]:
+    out = {c: row.get(c) for c in spec.columns}
+    for c, default in spec.defaults.items():
+        if out.get(c) is None:
+            out[c] = default()
+    if not spec.auto_id:
+        out.update({k: row[k] for k in spec.key})
+    return out
+
+
+def insert_rows(cur, spec: BatchSpec, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Alta de `rows` (ya validadas). Devuelve los resultados por elemento con la fila guardada."""
+    rows = [_new_row(spec, row) for row in rows]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(rows)
+    pending = list(range(len(rows)))
+    if not spec.auto_id:
+        # clave natural: las existentes (o repetidas en el lote) no se insertan
+        present = existing_keys(cur, spec, list(dict.fromkeys(spec.key_of(r) for r in rows)))
+        pending = []
+        for i, row in enumerate(rows):
+            key = spec.key_of(row)
+            if key in present:
+                results[i] = {"index": i, **_key_label(spec, key), "status": "exists"}
+            else:
+                present.add(key)
+                pending.append(i)
+    columns = list(spec.columns) + ([] if spec.auto_id else list(spec.key))
+    if spec.ranked:
+        columns.append("rank_key")
+        last = ordering.append_key(cur, spec.table) if pending else None
+        for i in pending:
+            rows[i]["rank_key"] = last
+            last = ordering.key_between(last, None)
+    placeholders = "(" + ",".join(["%s"] * len(columns)) + ")"
+    for chunk in _chunks(pending):
+        cur.execute(f"insert into {spec.table} ({', '.join(columns)}) values "
+                    + ",".join([placeholders] * len(chunk)),
+                    [rows[i][c] for i in chunk for c in columns])
+        first_id = cur.lastrowid
+        for n, i in enumerate(chunk):
+            if spec.auto_id:
+                rows[i]["id"] = first_id + n
+            results[i] = {"index": i, "status": "created", "item": rows[i]}
+    return results
+
+
+def update_rows(cur, spec: BatchSpec, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Cambios parciales: cada elemento trae su clave y solo los campos a modificar."""
+    keys = [spec.key_of(item) for item in items]
+    present = existing_keys(cur, spec, keys)
+    results = []
+    todo = []
+    for i, (item, key) in enumerate(zip(items, keys)):
+        if key not in present:
+            results.append({"index": i, **_key_label(spec, key), "status": "not_found"})
+            continue
+        fields = {c: v for c, v in item.items() if c in spec.columns}
+        results.append({"index": i, **_key_label(spec, key), "status": "updated" if fields else "unchanged"})
+        if fields:
+            todo.append((key, fields))
+    match = " and ".join(f"{k}=%s" for k in spec.key)
+    for chunk in _chunks(todo):
+        sets, params = [], []
+        for col in spec.columns:
+            cases = [(key, fields[col]) for key, fields in chunk if col in fields]
+            if not cases:
+                continue
+            sets.append(f"{col} = case " + " ".join([f"when {match} then %s"] * len(cases)) + f" else {col} end")
+            params += [v for key, value in cases for v in (*key, value)]
+        chunk_keys = [key for key, _ in chunk]
+        cur.execute(f"update {spec.table} set {', '.join(sets)} where {_key_in(spec, len(chunk_keys))}",
+                    params + [v for key in chunk_keys for v in key])
+    if spec.ranked:
+        # el orden de lectura es rank_key: un order_ nuevo recoloca la fila según ese valor
+        ordering.place_by_order(cur, spec.table, {key[0]: fields["order_"] for key, fields in todo
+                                                  if fields.get("order_") is not None})
+    return results
+
+
+def delete_rows(cur, spec: BatchSpec, keys: List[Tuple]) -> List[Dict[str, Any]]:
+    present = existing_keys(cur, spec, keys)
+    found = [key for key in keys if key in present]
+    for chunk in _chunks(found):
+        cur.execute(f"delete from {spec.table} where {_key_in(spec, len(chunk))}",
+                    [v for key in chunk for v in key])
+    return [{"index": i, **_key_label(spec, key), "status": "deleted" if key in present else "not_found"}
+            for i, key in enumerate(keys)]
+
+
+def summary(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    counts: Dict[str, int] = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"results": results, **counts}
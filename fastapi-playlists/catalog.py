@@ -0,0 +1,220 @@
+# catalog.py
+# Instantánea en memoria del catálogo (playlists, categorías, segmentos, temporadas, videos) y sus índices
+"""
+Los índices en memoria de app.py (búsqueda, sugerencias, facetas) se construyen a partir
+de una misma instantánea del catálogo, cargada con pocas consultas y compartida.
+
+Frescura: como máximo cada `CATALOG_REFRESH_SECONDS` se lee una firma barata de las
+tablas (conteos y max(updated_at), una sola consulta) y se compara con la anterior:
+
+- solo cambiaron playlists (altas/cambios): se releen las filas con updated_at >= al
+  máximo anterior y se aplican a la instantánea y a los índices (actualización incremental);
+  si después el número de playlists no cuadra con la firma (bajas de otro proceso), recarga.
+  Por eso toda escritura de un playlist fija `updated_at` (app.py, /uiplaylist y
+  /bulk/playlists de Core_M_cajita.py, Lacajita/Api.py), también cuando solo cambian sus
+  categorías: sin ello el cambio no movería la firma;
+- cualquier otro cambio (categorías, segmentos, temporadas, videos) o la antigüedad
+  `CATALOG_FULL_RELOAD_SECONDS` (cambios que no alteran la firma, p. ej. renombrar una
+  categoría): recarga completa y los índices se reconstruyen al pedirse.
+
+Las escrituras hechas en este mismo proceso (CRUD de app.py) se aplican al momento con
+`playlist_saved` / `playlist_removed`; las de Core_M_cajita.py llegan por la firma.
+
+Cada cambio incrementa `version`, que los consumidores pueden usar como etag o para
+invalidar sus propias cachés.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import ordering
+
+REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "5"))
+FULL_RELOAD_SECONDS = float(os.getenv("CATALOG_FULL_RELOAD_SECONDS", "300"))
+
+SIGNATURE_SQL = (
+    "select (select count(*) from lacajita_playlists), (select max(updated_at) from lacajita_playlists),"
+    " (select count(*) from lacajita_playlist_categories), (select count(*) from lacajita_categories),"
+    " (select count(*) from lacajita_segments), (select count(*) from lacajita_season),"
+    " (select count(*) from lacajita_videos)"
+)
+PLAYLISTS_SQL = ("select p.*, s.name as segment_name from lacajita_playlists p"
+                 " left join lacajita_segments s on p.segment_id = s.id")
+
+
+class Snapshot:
+    """Catálogo completo en memoria. `playlists[id]['categories']` son ids de categoría;
+    segmentos en su orden manual, temporadas y videos de la fecha más reciente a la más antigua."""
+
+    def __init__(self, playlists: Dict[str, Dict[str, Any]], categories: Dict[int, str],
+                 segments: Dict[int, Dict[str, Any]], seasons: List[Dict[str, Any]],
+                 videos: List[Dict[str, Any]] = ()):
+        self.playlists = playlists
+        self.categories = categories
+        self.segments = segments
+        self.seasons = seasons
+        self.version = 0
+        self.seasons_by_playlist: Dict[str, List[Dict[str, Any]]] = {}
+        for season in seasons:
+            self.seasons_by_playlist.setdefault(season["playlist_id"], []).append(season)
+        self.videos_by_season: Dict[int, List[Dict[str, Any]]] = {}
+        for video in videos:
+            self.videos_by_season.setdefault(video["season_id"], []).append(video)
+
+    def category_names(self, playlist: Dict[str, Any]) -> List[str]:
+        return [self.categories[c] for c in playlist.get("categories", []) if c in self.categories]
+
+
+def _attach_categories(playlists: Dict[str, Dict[str, Any]], links) -> None:
+    for p in playlists.values():
+        p["categories"] = []
+    for id_playlist, id_category in links:
+        if id_playlist in playlists:
+            playlists[id_playlist]["categories"].append(id_category)
+
+
+def load(cur) -> Snapshot:
+    """Carga la instantánea completa con un cursor de diccionario (seis consultas)."""
+    cur.execute(PLAYLISTS_SQL)
+    playlists = {p["id"]: p for p in cur.fetchall()}
+    cur.execute("select id_playlist, id_category from lacajita_playlist_categories")
+    _attach_categories(playlists, ((r["id_playlist"], r["id_category"]) for r in cur.fetchall()))
+    cur.execute("select id, name from lacajita_categories")
+    categories = {r["id"]: r["name"] for r in cur.fetchall()}
+    cur.execute(f"select * from lacajita_segments order by {ordering.ORDER_BY}")
+    segments = {r["id"]: r for r in cur.fetchall()}
+    cur.execute("select id, playlist_id, title, description, date, active from lacajita_season order by date desc")
+    seasons = cur.fetchall()
+    cur.execute("select season_id, video_id, date, active from lacajita_videos order by date desc")
+    videos = cur.fetchall()
+    return Snapshot(playlists, categories, segments, seasons, videos)
+
+
+def load_playlists_since(cur, since) -> List[Dict[str, Any]]:
+    """Playlists con updated_at >= `since`, con sus categorías."""
+    cur.execute(PLAYLISTS_SQL + " where p.updated_at >= %s", (since,))
+    playlists = {p["id"]: p for p in cur.fetchall()}
+    if playlists:
+        ids = list(playlists)
+        cur.execute("select id_playlist, id_category from lacajita_playlist_categories"
+                    f" where id_playlist in ({','.join(['%s'] * len(ids))})", ids)
+        _attach_categories(playlists, ((r["id_playlist"], r["id_category"]) for r in cur.fetchall()))
+    return list(playlists.values())
+
+
+class Catalog:
+    """Instantánea compartida y los índices derivados registrados con `register`.
+
+    Un índice es cualquier objeto construido por `build(snapshot)`; si además tiene
+    `upsert(playlist)` y `remove(playlist_id)` se actualiza en sitio, si no se reconstruye.
+    """
+
+    def __init__(self, connect: Callable[[], Any], refresh_seconds: float = REFRESH_SECONDS,
+                 full_reload_seconds: float = FULL_RELOAD_SECONDS):
+        self.connect = connect
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self._builders: Dict[str, Callable[[Snapshot], Any]] = {}
+        self._indexes: Dict[str, Any] = {}
+        self._snapshot: Optional[Snapshot] = None
+        self._signature = None
+        self._checked = self._loaded = 0.0
+        self._version = 0
+        self._lock = threading.RLock()
+
+    def register(self, name: str, build: Callable[[Snapshot], Any]) -> None:
+        self._builders[name] = build
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def snapshot(self) -> Snapshot:
+        self.refresh()
+        return self._snapshot
+
+    def index(self, name: str):
+        """Índice `name` al día (lo construye si falta)."""
+        return self.indexed(name)[1]
+
+    def indexed(self, name: str) -> Tuple[Snapshot, Any]:
+        """(instantánea, índice `name`) de la misma versión, para leer filas por los ids del índice."""
+        with self._lock:
+            snapshot = self.snapshot()
+            if name not in self._indexes:
+                self._indexes[name] = self._builders[name](snapshot)
+            return snapshot, self._indexes[name]
+
+    def _bump(self) -> None:
+        self._version += 1
+        self._snapshot.version = self._version
+
+    def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and self._snapshot is not None and now - self._checked < self.refresh_seconds:
+            return
+        with self._lock:
+            if not force and self._snapshot is not None and now - self._checked < self.refresh_seconds:
+                return  # otro hilo acaba de comprobarlo
+            conn = self.connect()
+            cur = conn.cursor(dictionary=True)
+            try:
+                cur.execute(SIGNATURE_SQL)
+                signature = tuple(cur.fetchone().values())
+                old = self._signature
+                if (force or old is None or self._snapshot is None or signature[2:] != old[2:]
+                        or now - self._loaded >= self.full_reload_seconds):
+                    self._reload(cur, now)
+                elif signature[:2] != old[:2]:
+                    for playlist in load_playlists_since(cur, old[1]) if old[1] is not None else []:
+                        self._apply(playlist)
+                    if len(self._snapshot.playlists) != signature[0]:
+                        self._reload(cur, now)  # cambios que updated_at no explica
+                    else:
+                        self._bump()
+                self._signature = signature
+                self._checked = now
+            finally:
+                cur.close()
+                conn.close()
+
+    def _reload(self, cur, now: float) -> None:
+        self._snapshot = load(cur)
+        self._indexes.clear()
+        self._loaded = now
+        self._bump()
+
+    def _apply(self, playlist: Dict[str, Any]) -> None:
+        snapshot = self._snapshot
+        if playlist.get("segment_name") is None and playlist.get("segment_id") in snapshot.segments:
+            playlist["segment_name"] = snapshot.segments[playlist["segment_id"]].get("name")
+        snapshot.playlists[playlist["id"]] = playlist
+        for name, index in list(self._indexes.items()):
+            if hasattr(index, "upsert"):
+                index.upsert(playlist)
+            else:
+                del self._indexes[name]
+
+    def playlist_saved(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Alta o cambio hecho en este proceso; conserva las columnas (y categorías) que la fila no trae.
+        Devuelve la fila completa de la instantánea (None si aún no hay instantánea)."""
+        with self._lock:
+            if self._snapshot is None:
+                return None
+            previous = self._snapshot.playlists.get(row["id"], {"categories": []})
+            playlist = {**previous, **row, "segment_name": None}
+            self._apply(playlist)
+            self._bump()
+            return playlist
+
+    def playlist_removed(self, playlist_id: str) -> None:
+        with self._lock:
+            if self._snapshot is None or self._snapshot.playlists.pop(playlist_id, None) is None:
+                return
+            for name, index in list(self._indexes.items()):
+                if hasattr(index, "remove"):
+                    index.remove(playlist_id)
+                else:
+                    del self._indexes[name]
+            self._bump()
@@ -0,0 +1,105 @@
+# catalog_stream.py
+# Exportación del catálogo completo en NDJSON (una línea JSON por registro), en streaming
+"""
+Para consumidores grandes (indexadores, pre-generación de la app de TV) que no deben
+construir el árbol de /playlists entero en memoria ni esperar a que termine.
+
+Cada línea es un objeto con `type` y las columnas de la fila, en este orden:
+
+    {"type": "segment", ...}     todos los segmentos (pocos; sirven de contexto)
+    {"type": "playlist", ...}    con `categories`: ids de lacajita_playlist_categories
+    {"type": "season", ...}
+    {"type": "video", ...}
+    {"type": "end", "counts": {...}, "since": ...}
+
+Las filas se leen con cursores sin búfer (`buffered=False`) y de `STREAM_BATCH_ROWS` en
+`STREAM_BATCH_ROWS`, así que la memoria del servidor no depende del tamaño del catálogo.
+Si la consulta falla a mitad de camino se emite `{"type": "error"}` y no llega el `end`:
+el cliente debe tratar un stream sin `end` como incompleto.
+
+Con `since` solo se exportan las playlists con `updated_at >= since` y las temporadas y
+videos de esas playlists (lacajita_season y lacajita_videos no tienen updated_at propio).
+"""
+import logging
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Tuple
+
+import fast_json
+
+MEDIA_TYPE = "application/x-ndjson"
+STREAM_BATCH_ROWS = 500
+
+logger = logging.getLogger(__name__)
+
+_PLAYLISTS = ("select p.*, (select group_concat(pc.id_category) from lacajita_playlist_categories pc"
+              " where pc.id_playlist = p.id) as categories from lacajita_playlists p")
+_SEASONS = ("select s.id, s.playlist_id, s.title, s.description, s.date, s.active"
+            " from lacajita_season s join lacajita_playlists p on s.playlist_id = p.id")
+_VIDEOS = ("select v.season_id, v.video_id, v.date, v.active from lacajita_videos v"
+           " join lacajita_season s on v.season_id = s.id join lacajita_playlists p on s.playlist_id = p.id")
+
+
+def line(record: dict) -> bytes:
+    return fast_json.dumps(record) + b"\n"
+
+
+def queries(since: Optional[datetime]) -> List[Tuple[str, str, tuple]]:
+    """(tipo, sql, parámetros) de cada sección del stream."""
+    where, params = (" where p.updated_at >= %s", (since,)) if since else ("", ())
+    return [
+        ("segment", "select * from lacajita_segments order by id", ()),
+        ("playlist", _PLAYLISTS + where + " order by p.id", params),
+        ("season", _SEASONS + where + " order by s.playlist_id, s.id", params),
+        ("video", _VIDEOS + where + " order by v.season_id, v.video_id", params),
+    ]
+
+
+def _categories(value: Any) -> List[int]:
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return [int(c) for c in value.split(",")] if value else []
+
+
+class _QueryError(Exception):
+    """Fallo de execute/fetchmany (el único caso que se informa con un registro `error`)."""
+
+
+def _batches(conn, sql: str, params: tuple, batch_rows: int) -> Iterator[List[dict]]:
+    """Filas de `sql` en lotes, con un cursor sin búfer. Si se abandona a medias (cliente
+    desconectado) el cursor no se cierra: mysql.connector exige leer antes lo pendiente
+    ("Unread result found"); el resultado se descarta al cerrar la conexión."""
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(sql, params)
+        rows = cursor.fetchmany(batch_rows)
+        while rows:
+            yield rows
+            rows = cursor.fetchmany(batch_rows)
+    except Exception as e:
+        raise _QueryError(e) from e
+    cursor.close()
+
+
+def records(conn, since: Optional[datetime] = None, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+    """Líneas NDJSON del catálogo. Cierra `conn` al terminar (o si el cliente se desconecta)."""
+    counts = {}
+    try:
+        for kind, sql, params in queries(since):
+            n = 0
+            for rows in _batches(conn, sql, params, batch_rows):
+                n += len(rows)
+                chunk = []
+                for row in rows:
+                    if kind == "playlist":
+                        row["categories"] = _categories(row.get("categories"))
+                    chunk.append(line({"type": kind, **row}))
+                yield b"".join(chunk)
+            counts[kind] = n
+        yield line({"type": "end", "counts": counts, "since": since})
+    except GeneratorExit:
+        raise  # cliente desconectado: no se puede (ni hace falta) emitir nada más
+    except _QueryError as e:
+        logger.error(f"Error exportando el catálogo en streaming: {e}")
+        yield line({"type": "error", "detail": "Error interno del servidor"})
+    finally:
+        conn.close()
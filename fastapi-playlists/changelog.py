@@ -0,0 +1,256 @@
+# changelog.py
+# Registro de cambios del catálogo (lacajita_changes) y sincronización por diferencias
+"""
+Cada escritura del catálogo (Core_M_cajita.py y el CRUD de app.py) agrega una fila por
+elemento tocado a `lacajita_changes`, con el mismo cursor y antes del commit: el registro
+entra o se descarta junto con el cambio. `seq` es AUTO_INCREMENT, así que crece siempre;
+el cliente guarda el último `seq` recibido y pide solo lo posterior:
+
+    GET /catalog/changes?since=<seq>
+
+Entidades e id registrado:
+
+    playlist      id de lacajita_playlists (sus categorías cuentan como cambio del playlist)
+    season        id de lacajita_season
+    video         "season_id:video_id" (ver `video_key`)
+    segment       id de lacajita_segments (también al reordenar)
+    homecarousel  id de lacajita_home_carousel (también al reordenar)
+    category      id de lacajita_categories
+
+`compact()` deja una entrada por elemento, con la operación neta respecto de `since`:
+alta y baja dentro de la ventana se anulan, alta seguida de cambios sigue siendo alta,
+baja y alta de nuevo (p. ej. un video que se quita y se vuelve a poner) es un cambio.
+
+Orden de commit: AUTO_INCREMENT asigna `seq` al insertar, no al confirmar, así que con
+escrituras concurrentes (Core, app.py, /bulk) el seq N+2 puede estar confirmado mientras
+N+1 sigue en una transacción abierta. Si el lector avanzara hasta N+2 no vería nunca N+1.
+Por eso `read` se detiene en el primer hueco de la secuencia, salvo que la fila siguiente
+tenga más de `CHANGELOG_GAP_SECONDS`: un hueco así es un rollback (o una transacción
+abandonada) y se salta. `watermark` es el último seq seguro en ese sentido, el que se
+devuelve con el catálogo completo y desde el que arranca el push (event_hub.py).
+
+Las filas con más de `CHANGELOG_RETENTION_DAYS` se borran al arrancar y después cada
+`CHANGELOG_PRUNE_SECONDS` (`prune`, `prune_forever`); un `since` anterior a lo que queda
+no se puede responder por diferencias y el endpoint devuelve el catálogo completo.
+"""
+import asyncio
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+TABLE = "lacajita_changes"
+INSERT, UPDATE, DELETE = "I", "U", "D"
+ENTITIES = ("playlist", "season", "video", "segment", "homecarousel", "category")
+
+RETENTION_DAYS = int(os.getenv("CHANGELOG_RETENTION_DAYS", "30"))
+PRUNE_SECONDS = float(os.getenv("CHANGELOG_PRUNE_SECONDS", str(6 * 3600)))
+GAP_SECONDS = int(os.getenv("CHANGELOG_GAP_SECONDS", "60"))  # espera máxima por un seq sin confirmar
+MAX_CHANGES = 1000  # filas del registro por respuesta; el resto con `more`
+CHUNK_ROWS = 500
+
+# Entidad del registro para cada tabla ordenable (ver ordering.TABLES)
+ORDERED_ENTITIES = {"segments": "segment", "homecarousel": "homecarousel"}
+
+CREATE_SQL = f"""create table if not exists {TABLE} (
+    seq bigint unsigned not null auto_increment primary key,
+    entity varchar(16) not null,
+    entity_id varchar(191) not null,
+    op char(1) not null,
+    changed_at timestamp not null default current_timestamp,
+    key idx_{TABLE}_changed_at (changed_at)
+)"""
+
+# Fila actual de cada entidad, para acompañar altas y cambios en la respuesta
+_ROWS_SQL = {
+    "playlist": ("select p.*, (select group_concat(pc.id_category) from lacajita_playlist_categories pc"
+                 " where pc.id_playlist = p.id) as categories from lacajita_playlists p where p.id in ({})"),
+    "season": "select id, playlist_id, title, description, date, active from lacajita_season where id in ({})",
+    "segment": "select * from lacajita_segments where id in ({})",
+    "homecarousel": "select * from lacajita_home_carousel where id in ({})",
+    "category": "select id, name from lacajita_categories where id in ({})",
+}
+_VIDEOS_SQL = "select season_id, video_id, date, active from lacajita_videos where (season_id, video_id) in ({})"
+_READ_COLUMNS = ("seq", "entity", "entity_id", "op", "age")
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(seq: list, size: int = CHUNK_ROWS):
+    for i in range(0, len(seq), size):
+        yield seq[i:i + size]
+
+
+def video_key(season_id: Any, video_id: Any) -> str:
+    return f"{season_id}:{video_id}"
+
+
+def ensure_table(conn) -> None:
+    """Crea la tabla si no existe y borra lo anterior a la retención (migración idempotente)."""
+    cur = conn.cursor()
+    try:
+        cur.execute(CREATE_SQL)
+        prune(cur)
+        conn.commit()
+    finally:
+        cur.close()
+
+
+def record(cur, entity: str, op: str, ids: Iterable[Any]) -> int:
+    """Agrega una fila por id (sin commit: va en la transacción de la escritura)."""
+    rows = [(entity, str(i), op) for i in dict.fromkeys(ids)]
+    for chunk in _chunks(rows):
+        cur.execute(f"insert into {TABLE} (entity, entity_id, op) values " + ",".join(["(%s,%s,%s)"] * len(chunk)),
+                    [v for row in chunk for v in row])
+    return len(rows)
+
+
+def prune(cur, days: int = RETENTION_DAYS) -> None:
+    """Borra lo anterior a `days` días; la última fila se conserva para no perder el `seq` actual."""
+    cur.execute(f"select max(seq) from {TABLE}")
+    last = _first(cur.fetchone())
+    if last:
+        cur.execute(f"delete from {TABLE} where changed_at < now() - interval %s day and seq < %s", (days, last))
+
+
+def prune_with(connect: Callable[[], Any], days: int = RETENTION_DAYS) -> None:
+    conn = connect()
+    try:
+        cur = conn.cursor()
+        try:
+            prune(cur, days)
+            conn.commit()
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+
+async def prune_forever(connect: Callable[[], Any], every: float = PRUNE_SECONDS) -> None:
+    """Poda periódica para procesos de larga vida (la del arranque no basta)."""
+    while True:
+        await asyncio.sleep(every)
+        try:
+            await asyncio.to_thread(prune_with, connect)
+        except Exception as e:
+            logger.error(f"Error podando {TABLE}: {e}")
+
+
+def _first(row) -> Any:
+    if row is None:
+        return None
+    return next(iter(row.values())) if isinstance(row, dict) else row[0]
+
+
+def bounds(cur) -> Tuple[int, int]:
+    """(primer seq retenido, último seq); (0, 0) con la tabla vacía."""
+    cur.execute(f"select min(seq) as first, max(seq) as last from {TABLE}")
+    row = cur.fetchone()
+    if isinstance(row, dict):
+        row = (row["first"], row["last"])
+    return (row[0] or 0, row[1] or 0) if row else (0, 0)
+
+
+def is_resumable(since: int, first: int, last: int) -> bool:
+    """`since` se puede responder por diferencias: nada posterior a él se ha borrado y no
+    es mayor que el último seq (un seq del futuro indica otra base de datos)."""
+    if since > last:
+        return False
+    return first == 0 or since >= first - 1
+
+
+def compact(rows: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Una entrada por (entity, id) con la operación neta, en orden de su último cambio."""
+    net: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for row in rows:
+        key = (row["entity"], row["entity_id"])
+        seen = net.pop(key, None)
+        op = row["op"]
+        if seen is not None:
+            first = seen["first"]
+            if op == DELETE:
+                op = None if first == INSERT else DELETE
+            elif first == INSERT:
+                op = INSERT
+            elif first == DELETE or op == INSERT:
+                op = UPDATE
+        else:
+            first = op
+        net[key] = {"first": first, "op": op, "seq": row["seq"]}  # al final: orden del último cambio
+    return [{"entity": e, "id": i, "op": v["op"], "seq": v["seq"]}
+            for (e, i), v in net.items() if v["op"] is not None]
+
+
+def read(cur, since: int, limit: int = MAX_CHANGES,
+         gap_seconds: int = GAP_SECONDS) -> Tuple[List[Dict[str, Any]], bool]:
+    """Filas posteriores a `since` (como mucho `limit`) hasta el primer hueco reciente de la
+    secuencia, y si quedan más. Tras un hueco no hay `more`: se vuelve a pedir más tarde."""
+    cur.execute(f"select seq, entity, entity_id, op, timestampdiff(second, changed_at, now()) as age"
+                f" from {TABLE} where seq > %s order by seq limit %s", (since, limit + 1))
+    rows = [r if isinstance(r, dict) else dict(zip(_READ_COLUMNS, r)) for r in cur.fetchall()]
+    safe, expected = [], since + 1
+    for row in rows[:limit]:
+        if row["seq"] != expected and row["age"] < gap_seconds:
+            return safe, False  # seq sin confirmar (o rollback reciente): esperar
+        safe.append({c: row[c] for c in _READ_COLUMNS[:-1]})
+        expected = row["seq"] + 1
+    return safe, len(rows) > limit
+
+
+def watermark(cur, gap_seconds: int = GAP_SECONDS) -> int:
+    """Último seq sin huecos pendientes: todo lo anterior ya está confirmado (o se dio por perdido)."""
+    cur.execute(f"select seq from {TABLE} where changed_at < now() - interval %s second"
+                f" order by changed_at desc, seq desc limit 1", (gap_seconds,))
+    seq = _first(cur.fetchone()) or 0  # lo anterior a una fila ya asentada no puede seguir abierto
+    first, _ = bounds(cur)
+    seq = max(seq, first - 1)  # ni lo anterior a la primera fila retenida (podado o tabla nueva)
+    while True:
+        rows, more = read(cur, seq, gap_seconds=gap_seconds)
+        if rows:
+            seq = rows[-1]["seq"]
+        if not more:
+            return seq
+
+
+def _categories(value: Any) -> List[int]:
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode()
+    return [int(c) for c in value.split(",")] if value else []
+
+
+def load_rows(cur, entity: str, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Filas actuales de `ids` por id del registro (cursor de diccionario)."""
+    found: Dict[str, Dict[str, Any]] = {}
+    if entity == "video":
+        pairs = [i.split(":", 1) for i in ids]
+        for chunk in _chunks(pairs):
+            cur.execute(_VIDEOS_SQL.format(",".join(["(%s,%s)"] * len(chunk))), [v for pair in chunk for v in pair])
+            for row in cur.fetchall():
+                found[video_key(row["season_id"], row["video_id"])] = row
+        return found
+    for chunk in _chunks(ids):
+        cur.execute(_ROWS_SQL[entity].format(",".join(["%s"] * len(chunk))), chunk)
+        for row in cur.fetchall():
+            if entity == "playlist":
+                row = {**row, "categories": _categories(row.get("categories"))}
+            found[str(row["id"])] = row
+    return found
+
+
+def changes_since(cur, since: int, limit: int = MAX_CHANGES) -> Dict[str, Any]:
+    """Cambios compactados posteriores a `since`, con la fila actual en altas y cambios.
+    Un elemento que ya no existe (borrado por una escritura que aún no se leyó) sale como baja.
+    `seq` es el valor para la siguiente petición; con `more` hay que volver a pedir."""
+    rows, more = read(cur, since, limit)
+    changes = compact(rows)
+    wanted: Dict[str, List[str]] = {}
+    for c in changes:
+        if c["op"] != DELETE:
+            wanted.setdefault(c["entity"], []).append(c["id"])
+    current = {entity: load_rows(cur, entity, ids) for entity, ids in wanted.items() if entity in ENTITIES}
+    for c in changes:
+        if c["op"] != DELETE:
+            c["data"] = current.get(c["entity"], {}).get(c["id"])
+            if c["data"] is None:
+                c["op"] = DELETE
+    return {"since": since, "seq": rows[-1]["seq"] if rows else since, "full": False, "more": more,
+            "changes": changes}
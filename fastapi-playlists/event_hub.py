@@ -0,0 +1,262 @@
+# event_hub.py
+# Push de cambios del catálogo y métricas del dashboard a las sesiones del panel (Server-Sent Events)
+"""
+En lugar de que cada sesión del panel consulte catálogo y dashboard con temporizadores,
+un único `Hub` por proceso lee lo que cambió y lo reparte a todas las conexiones abiertas
+de `GET /events` (text/event-stream):
+
+    event: ready       id: <seq>  {"seq": ...}             al conectar, sin nada que reenviar
+    event: catalog     id: <seq>  {"seq": ..., "changes": [{"entity", "id", "op"}, ...]}
+    event: dashboard              {"system_summary": {...}, "login_stats": {...}, ...}
+    event: reset       id: <seq>  {"seq": ...}             el cliente debe recargar todo
+
+- catálogo: cada `POLL_SECONDS` una consulta por clave primaria a lacajita_changes (ver
+  changelog.py), que recoge también las escrituras de otros procesos. `seq` es la versión
+  del catálogo y nunca pasa de `changelog.watermark`: un seq confirmado tarde (commit
+  fuera de orden) se publica cuando llega, sin saltarlo; `changes` va compactado y sin filas: el panel pide lo que le interese, p. ej.
+  /catalog/changes?since=<seq anterior>.
+- dashboard: cada `DASHBOARD_SECONDS` se recalculan las métricas (Auth0 y MySQL) una sola
+  vez para todos, y solo se emiten si cambiaron.
+
+Cada evento se serializa una vez y todas las colas reciben los mismos bytes. Sin eventos,
+cada `HEARTBEAT_SECONDS` se envía un comentario para que proxies y navegador no corten.
+El hub solo consulta la base de datos mientras haya alguna conexión abierta.
+
+Reconexión: los eventos del catálogo llevan `id` = seq y el navegador lo devuelve en
+`Last-Event-ID`. Se reenvía lo posterior desde los últimos `BACKLOG_EVENTS` eventos en
+memoria o, si no alcanzan, desde lacajita_changes; solo si ese seq ya no está en el
+registro (o es de otra base de datos) se envía `reset`.
+
+Una conexión que no consume sus eventos (más de `QUEUE_EVENTS` pendientes) se cierra; al
+reconectar recupera lo perdido con `Last-Event-ID`.
+"""
+import asyncio
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import changelog
+import fast_json
+
+MEDIA_TYPE = "text/event-stream"
+POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "2"))
+DASHBOARD_SECONDS = float(os.getenv("EVENTS_DASHBOARD_SECONDS", "60"))
+HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+BACKLOG_EVENTS = 256
+QUEUE_EVENTS = 64
+RETRY_MS = 3000  # espera del navegador antes de reconectar
+
+HEARTBEAT = b": ping\n\n"
+
+logger = logging.getLogger(__name__)
+
+
+def frame(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    """Un evento SSE; el JSON compacto no contiene saltos de línea, así que cabe en un `data:`."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\n".encode() + b"data: " + fast_json.dumps(data) + b"\n\n"
+
+
+def parse_event_id(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _changes(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{"entity": c["entity"], "id": c["id"], "op": c["op"]} for c in changelog.compact(rows)]
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue: "asyncio.Queue[Tuple[Optional[int], Optional[bytes], bool]]" = asyncio.Queue(QUEUE_EVENTS)
+        self.dropped = False
+
+
+class Hub:
+    """Reparte eventos a las conexiones SSE. `connect` abre una conexión MySQL y `dashboard`
+    (opcional) devuelve las métricas del panel; ambos son bloqueantes y corren en un hilo."""
+
+    def __init__(self, connect: Callable[[], Any], dashboard: Optional[Callable[[], Dict[str, Any]]] = None,
+                 poll_seconds: float = POLL_SECONDS, dashboard_seconds: float = DASHBOARD_SECONDS,
+                 heartbeat_seconds: float = HEARTBEAT_SECONDS, backlog: int = BACKLOG_EVENTS):
+        self.connect = connect
+        self.dashboard = dashboard
+        self.poll_seconds = poll_seconds
+        self.dashboard_seconds = dashboard_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.seq: Optional[int] = None
+        self.backlog: "deque[Tuple[int, int, bytes]]" = deque(maxlen=backlog)  # (desde, hasta, frame)
+        self.dashboard_frame: Optional[bytes] = None
+        self.subscribers: set = set()
+        self._conn = None
+        self._db_lock = threading.Lock()  # una sola conexión, compartida por el sondeo y las reanudaciones
+        self._task: Optional[asyncio.Task] = None
+        self._poll_lock: Optional[asyncio.Lock] = None
+        self._next_dashboard = 0.0
+
+    # ---------- base de datos (en un hilo) ----------
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = self.connect()
+            self._conn.autocommit = True  # cada lectura ve lo último confirmado
+        return self._conn.cursor(dictionary=True)
+
+    def _drop_connection(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+    def _read_log(self, since: Optional[int], upto: Optional[int] = None) -> Tuple[int, Optional[List[Dict[str, Any]]]]:
+        """(último seq seguro, filas posteriores a `since` hasta `upto`); filas None si `since`
+        no es reanudable. Con `since` None solo se lee el último seq seguro (`changelog.watermark`)."""
+        with self._db_lock:
+            try:
+                cur = self._cursor()
+                try:
+                    first, last = changelog.bounds(cur)
+                    if since is None:
+                        return changelog.watermark(cur), []
+                    if not changelog.is_resumable(since, first, last):
+                        return changelog.watermark(cur), None
+                    rows: List[Dict[str, Any]] = []
+                    while True:
+                        page, more = changelog.read(cur, rows[-1]["seq"] if rows else since)
+                        rows += [r for r in page if upto is None or r["seq"] <= upto]
+                        if not more or (upto is not None and page[-1]["seq"] >= upto):
+                            return last, rows
+                finally:
+                    cur.close()
+            except Exception:
+                self._drop_connection()  # se reabre en la siguiente lectura
+                raise
+
+    # ---------- publicación ----------
+    def _publish(self, seq: Optional[int], data: bytes, reset: bool = False) -> None:
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait((seq, data, reset))
+            except asyncio.QueueFull:
+                self._drop(sub)
+
+    def _drop(self, sub: _Subscriber) -> None:
+        self.subscribers.discard(sub)
+        sub.dropped = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait((None, None, False))  # despierta al stream para que termine
+
+    async def poll_catalog(self) -> None:
+        if self._poll_lock is None:
+            self._poll_lock = asyncio.Lock()
+        async with self._poll_lock:  # el sondeo periódico y el de la primera conexión no se solapan
+            await self._poll_catalog()
+
+    async def _poll_catalog(self) -> None:
+        since = self.seq
+        try:
+            last, rows = await asyncio.to_thread(self._read_log, since)
+        except Exception as e:
+            logger.error(f"Push: error leyendo {changelog.TABLE}: {e}")
+            return
+        if since is None or rows is None:
+            # primera lectura, o el registro se podó/reinició mientras tanto
+            if since is not None:
+                self.backlog.clear()
+                self._publish(last, frame("reset", {"seq": last}, last), reset=True)
+            self.seq = last
+            return
+        if not rows:
+            return
+        seq = rows[-1]["seq"]
+        data = frame("catalog", {"seq": seq, "changes": _changes(rows)}, seq)
+        self.backlog.append((since, seq, data))
+        self.seq = seq
+        self._publish(seq, data)
+
+    async def poll_dashboard(self) -> None:
+        if self.dashboard is None:
+            return
+        try:
+            metrics = await asyncio.to_thread(self.dashboard)
+        except Exception as e:
+            logger.error(f"Push: error calculando el dashboard: {e}")
+            return
+        data = frame("dashboard", metrics)
+        if data != self.dashboard_frame:
+            self.dashboard_frame = data
+            self._publish(None, data)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._next_dashboard = 0.0  # tras un periodo sin conexiones, recalcular enseguida
+        try:
+            while self.subscribers:
+                await self.poll_catalog()
+                if loop.time() >= self._next_dashboard:
+                    self._next_dashboard = loop.time() + self.dashboard_seconds
+                    await self.poll_dashboard()
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            self._task = None
+
+    # ---------- suscripción ----------
+    async def _replay(self, last_id: int) -> Tuple[int, List[bytes]]:
+        """Eventos que el cliente no recibió después de `last_id` (hasta el seq actual)."""
+        upto = self.seq
+        if upto is None or last_id == upto:
+            return upto, []
+        if self.backlog and self.backlog[0][0] <= last_id < upto:
+            return upto, [data for start, end, data in self.backlog if end > last_id]
+        try:
+            _, rows = await asyncio.to_thread(self._read_log, last_id, upto)
+        except Exception as e:
+            logger.error(f"Push: no se pudo reanudar desde {last_id}: {e}")
+            rows = None
+        if rows is None:
+            return upto, [frame("reset", {"seq": upto}, upto)]
+        if not rows:
+            return upto, [frame("ready", {"seq": upto}, upto)]
+        return upto, [frame("catalog", {"seq": rows[-1]["seq"], "changes": _changes(rows)}, rows[-1]["seq"])]
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """Cuerpo de la respuesta SSE de una conexión."""
+        sub = _Subscriber()
+        self.subscribers.add(sub)
+        try:
+            if self.seq is None:
+                await self.poll_catalog()
+            if self._task is None:
+                self._task = asyncio.create_task(self._run())
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            last_id = parse_event_id(last_event_id)
+            if last_id is None:
+                sent = self.seq
+                yield frame("ready", {"seq": sent}, sent)
+            else:
+                sent, frames = await self._replay(last_id)
+                for data in frames:
+                    yield data
+            if self.dashboard_frame is not None:
+                yield self.dashboard_frame
+            while not sub.dropped:
+                try:
+                    seq, data, reset = await asyncio.wait_for(sub.queue.get(), self.heartbeat_seconds)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                if data is None:
+                    break
+                if reset:
+                    sent = seq  # el registro se podó/reinició: su seq puede ser menor que lo enviado
+                elif seq is not None and sent is not None and seq <= sent:
+                    continue  # ya incluido en lo reenviado
+                yield data
+        finally:
+            self.subscribers.discard(sub)
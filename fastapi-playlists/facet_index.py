@@ -0,0 +1,165 @@
+# facet_index.py
+# Índice de facetas con bitsets (enteros de Python) sobre los ordinales de las playlists
+"""
+Cada playlist recibe un ordinal; para cada valor de cada faceta se guarda un entero cuyo
+bit `i` está encendido si la playlist `i` tiene ese valor. Filtrar es combinar enteros con
+&, | y ~, y contar es `int.bit_count()`: ningún JOIN ni GROUP BY por petición.
+
+Facetas (`FACETS`): segmento, categorías enlazadas (lacajita_playlist_categories),
+categoría libre (columna `category`), suscripción y activo. Los valores se guardan como
+texto, igual que llegan en la query string y como quedan como claves JSON.
+
+Los conteos son "disyuntivos": los de una faceta se calculan con los filtros de las demás,
+así la interfaz muestra cuántas playlists habría al marcar otro valor de esa faceta.
+
+Admite `upsert`/`remove` (los ordinales libres se reutilizan), así que catalog.py lo
+actualiza en sitio; por eso `version` se lee de la instantánea de la que se construyó
+(catalog.py la incrementa en cada cambio aplicado), no se copia al construir.
+
+La categoría libre vacía ("") cuenta como un valor más, igual que en el GROUP BY category
+que reemplaza /stats/overview; solo NULL queda fuera.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+FACETS: Dict[str, Callable[[Dict[str, Any]], Iterable[Any]]] = {
+    "segment": lambda p: [p.get("segment_id")],
+    "category": lambda p: p.get("categories", []),
+    "legacy_category": lambda p: [p.get("category")],
+    "subscription": lambda p: [p.get("subscription")],
+    "active": lambda p: [p.get("active")],
+}
+
+
+class FacetIndex:
+    def __init__(self, snapshot=None):
+        self.snapshot = snapshot
+        self.ids: List[Optional[str]] = []
+        self.ordinal: Dict[str, int] = {}
+        self.bits: Dict[str, Dict[str, int]] = {f: {} for f in FACETS}
+        self.all = 0
+        self._values: List[Optional[Dict[str, Tuple[str, ...]]]] = []
+        self._free: List[int] = []
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "FacetIndex":
+        index = cls(snapshot)
+        for playlist in snapshot.playlists.values():
+            index.upsert(playlist)
+        return index
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version if self.snapshot is not None else 0
+
+    def __len__(self) -> int:
+        return len(self.ordinal)
+
+    def _clear(self, i: int) -> None:
+        bit = 1 << i
+        for facet, values in (self._values[i] or {}).items():
+            for v in values:
+                left = self.bits[facet][v] & ~bit
+                if left:
+                    self.bits[facet][v] = left
+                else:
+                    del self.bits[facet][v]
+        self._values[i] = None
+        self.all &= ~bit
+
+    def upsert(self, playlist: Dict[str, Any]) -> None:
+        pid = playlist["id"]
+        i = self.ordinal.get(pid)
+        if i is None:
+            i = self._free.pop() if self._free else len(self.ids)
+            if i == len(self.ids):
+                self.ids.append(None)
+                self._values.append(None)
+            self.ids[i] = pid
+            self.ordinal[pid] = i
+        else:
+            self._clear(i)
+        bit = 1 << i
+        values = {}
+        for facet, extract in FACETS.items():
+            values[facet] = tuple(dict.fromkeys(str(v) for v in extract(playlist) if v is not None))
+            for v in values[facet]:
+                self.bits[facet][v] = self.bits[facet].get(v, 0) | bit
+        self._values[i] = values
+        self.all |= bit
+
+    def remove(self, playlist_id: str) -> None:
+        i = self.ordinal.pop(playlist_id, None)
+        if i is None:
+            return
+        self._clear(i)
+        self.ids[i] = None
+        self._free.append(i)
+
+    def any_of(self, facet: str, values: Iterable[Any]) -> int:
+        """Playlists con alguno de los `values` en `facet` (OR dentro de la faceta)."""
+        if facet not in self.bits:
+            raise ValueError(f"Faceta desconocida: {facet}")
+        by_value = self.bits[facet]
+        mask = 0
+        for v in values:
+            mask |= by_value.get(str(v), 0)
+        return mask
+
+    def evaluate(self, expr: Dict[str, Any]) -> int:
+        """Expresión arbitraria: {"and": [...]}, {"or": [...]}, {"not": expr} o {faceta: valor | [valores]};
+        un objeto con varias facetas equivale a su AND. ValueError si no es válida."""
+        if not isinstance(expr, dict) or not expr:
+            raise ValueError("Filtro vacío o no es un objeto")
+        mask = self.all
+        for key, value in expr.items():
+            if key == "and":
+                for e in _as_list(value):
+                    mask &= self.evaluate(e)
+            elif key == "or":
+                alt = 0
+                for e in _as_list(value):
+                    alt |= self.evaluate(e)
+                mask &= alt
+            elif key == "not":
+                mask &= ~self.evaluate(value)
+            else:
+                mask &= self.any_of(key, value if isinstance(value, list) else [value])
+        return mask & self.all
+
+    def select(self, selected: Dict[str, List[Any]]) -> int:
+        """AND entre facetas de los OR de cada una."""
+        mask = self.all
+        for facet, values in selected.items():
+            mask &= self.any_of(facet, values)
+        return mask
+
+    def counts(self, selected: Dict[str, List[Any]], base: Optional[int] = None,
+               facets: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, int]]:
+        """Conteos de todos los valores de cada faceta (disyuntivos respecto de `selected`),
+        dentro de `base` (por defecto todas las playlists)."""
+        base = self.all if base is None else base & self.all
+        masks = {f: self.any_of(f, values) for f, values in selected.items()}
+        out = {}
+        for facet in facets or FACETS:
+            scope = base
+            for other, m in masks.items():
+                if other != facet:
+                    scope &= m
+            counts = {v: (b & scope).bit_count() for v, b in self.bits[facet].items()}
+            out[facet] = {v: n for v, n in counts.items() if n}
+        return out
+
+    def members(self, mask: int) -> List[str]:
+        """Ids de las playlists del bitset, en orden de ordinal."""
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(self.ids[low.bit_length() - 1])
+            mask ^= low
+        return out
+
+
+def _as_list(value: Any) -> List[Any]:
+    if not isinstance(value, list):
+        raise ValueError("\"and\"/\"or\" esperan una lista")
+    return value
@@ -0,0 +1,60 @@
+# fast_json.py
+# Respuesta JSON rápida para listados grandes (orjson si está instalado)
+"""
+Por defecto FastAPI valida lo que devuelve el endpoint contra `response_model`, lo pasa por
+`jsonable_encoder` (que recorre y copia cada fila) y lo codifica con `json`. Con filas que
+vienen tal cual de MySQL esa validación no aporta nada y en listados grandes se lleva la
+mayor parte del tiempo (ver scripts/bench_json_responses.py).
+
+Un endpoint opta por el camino rápido devolviendo `respond(filas)`: como es una `Response`,
+FastAPI no valida ni convierte nada y las filas se codifican directamente. `datetime`/`date`
+salen en ISO 8601 (igual que `format_date` o Pydantic, así que esas llamadas sobran) y
+`Decimal` como número. `response_model` se puede dejar en el decorador para la documentación.
+
+orjson es opcional (requirements.txt); sin él se usa `json` con el mismo formato.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # orjson opcional
+    orjson = None
+
+
+def encode_default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode("utf-8", "replace")
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, (datetime, date)):  # solo con json; orjson los codifica solo
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable a JSON")
+
+
+def dumps(content: Any) -> bytes:
+    """JSON compacto en UTF-8."""
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=encode_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def respond(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """Respuesta directa (sin validación ni jsonable_encoder). Conserva las cabeceras que el
+    endpoint haya puesto en su parámetro `response` (p. ej. X-Next-Cursor de keyset.py)."""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
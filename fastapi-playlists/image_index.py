@@ -0,0 +1,260 @@
+# image_index.py
+# Índice de imágenes (./img/index.json) con placeholders de baja calidad (BlurHash + color dominante)
+"""
+Índice de portadas compartido entre Core_M_cajita.py (que lo escribe al subir
+imágenes) y app.py (que lo lee para exponer `placeholder` en los playlists).
+
+Cada entrada guarda un BlurHash (~30 caracteres) y el color dominante, de modo
+que los clientes pintan algo de inmediato y difieren la descarga de la portada.
+
+Pillow es opcional: si no está instalado, las subidas siguen funcionando y
+simplemente no se generan placeholders.
+
+Las escrituras del índice (leer, modificar, reemplazar) se serializan con un lock de
+archivo (`index.json.lock`, flock) además del de hilos: Core_M_cajita.py puede correr con
+varios workers y `rebuild_index` desde la línea de comandos, y un lock solo de proceso
+dejaría que dos subidas simultáneas se pisaran la entrada. Sin fcntl (Windows) queda
+solo el lock de hilos.
+
+Reconstruir el índice para las imágenes existentes:
+  python3 image_index.py img
+"""
+import io
+import json
+import math
+import os
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow opcional
+    Image = None
+
+try:
+    import fcntl
+except ImportError:  # sin flock (Windows): solo el lock de hilos
+    fcntl = None
+
+INDEX_FILENAME = "index.json"
+INDEX_VERSION = 1
+ALLOWED_IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+# Componentes BlurHash (x, y) y tamaño de muestreo: 4x3 sobre 32x32 basta para una portada
+BLURHASH_X = 4
+BLURHASH_Y = 3
+SAMPLE_SIZE = 32
+
+_B83 = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~"
+
+Pixel = Tuple[int, int, int]
+
+
+# ----------------- BlurHash -----------------
+def _encode83(value: int, length: int) -> str:
+    out = []
+    for i in range(1, length + 1):
+        digit = (value // (83 ** (length - i))) % 83
+        out.append(_B83[digit])
+    return "".join(out)
+
+
+def _srgb_to_linear(c: int) -> float:
+    v = c / 255.0
+    if v <= 0.04045:
+        return v / 12.92
+    return ((v + 0.055) / 1.055) ** 2.4
+
+
+def _linear_to_srgb(v: float) -> int:
+    v = max(0.0, min(1.0, v))
+    if v <= 0.0031308:
+        return int(v * 12.92 * 255 + 0.5)
+    return int((1.055 * (v ** (1 / 2.4)) - 0.055) * 255 + 0.5)
+
+
+def _sign_pow(v: float, exp: float) -> float:
+    return math.copysign(abs(v) ** exp, v)
+
+
+def blurhash_encode(pixels: List[Pixel], width: int, height: int,
+                    x_components: int = BLURHASH_X, y_components: int = BLURHASH_Y) -> Tuple[str, str]:
+    """Codifica una lista de píxeles RGB (fila a fila) como BlurHash.
+    Retorna (blurhash, color_dominante_hex). El color dominante es la componente DC
+    (promedio lineal), que es exactamente el color que el cliente verá de fondo.
+    """
+    if not (1 <= x_components <= 9 and 1 <= y_components <= 9):
+        raise ValueError("Componentes BlurHash deben estar entre 1 y 9")
+    if width <= 0 or height <= 0 or len(pixels) != width * height:
+        raise ValueError("Dimensiones no coinciden con los píxeles")
+
+    linear = [(_srgb_to_linear(r), _srgb_to_linear(g), _srgb_to_linear(b)) for r, g, b in pixels]
+    # Precalcular cosenos por eje: evita width*height*components llamadas a cos()
+    cos_x = [[math.cos(math.pi * i * x / width) for x in range(width)] for i in range(x_components)]
+    cos_y = [[math.cos(math.pi * j * y / height) for y in range(height)] for j in range(y_components)]
+
+    factors: List[Tuple[float, float, float]] = []
+    for j in range(y_components):
+        for i in range(x_components):
+            norm = 1.0 if (i == 0 and j == 0) else 2.0
+            r = g = b = 0.0
+            cx = cos_x[i]
+            for y in range(height):
+                cy = cos_y[j][y]
+                row = y * width
+                for x in range(width):
+                    basis = cx[x] * cy
+                    lr, lg, lb = linear[row + x]
+                    r += basis * lr
+                    g += basis * lg
+                    b += basis * lb
+            scale = norm / (width * height)
+            factors.append((r * scale, g * scale, b * scale))
+
+    dc, ac = factors[0], factors[1:]
+    out = _encode83((x_components - 1) + (y_components - 1) * 9, 1)
+
+    if ac:
+        actual_max = max(abs(c) for f in ac for c in f)
+        quantised_max = int(max(0, min(82, math.floor(actual_max * 166 - 0.5))))
+        max_value = (quantised_max + 1) / 166
+        out += _encode83(quantised_max, 1)
+    else:
+        max_value = 1.0
+        out += _encode83(0, 1)
+
+    dc_srgb = tuple(_linear_to_srgb(c) for c in dc)
+    out += _encode83((dc_srgb[0] << 16) + (dc_srgb[1] << 8) + dc_srgb[2], 4)
+
+    for f in ac:
+        q = [int(max(0, min(18, math.floor(_sign_pow(c / max_value, 0.5) * 9 + 9.5)))) for c in f]
+        out += _encode83(q[0] * 19 * 19 + q[1] * 19 + q[2], 2)
+
+    return out, "#{:02x}{:02x}{:02x}".format(*dc_srgb)
+
+
+def compute_placeholder(content: bytes) -> Optional[Dict[str, Any]]:
+    """Genera el placeholder de una imagen (bytes). None si Pillow no está o la imagen es ilegible."""
+    if Image is None:
+        return None
+    try:
+        with Image.open(io.BytesIO(content)) as im:
+            width, height = im.size
+            small = im.convert("RGB")
+            small.thumbnail((SAMPLE_SIZE, SAMPLE_SIZE))
+            w, h = small.size
+            pixels = list(small.getdata())
+    except Exception as e:
+        print(f"No se pudo generar placeholder: {e}")
+        return None
+    blurhash, color = blurhash_encode(pixels, w, h)
+    return {"blurhash": blurhash, "color": color, "width": width, "height": height}
+
+
+# ----------------- Índice en disco -----------------
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {"path": None, "mtime": None, "data": None}
+
+
+def _index_path(img_dir: str) -> Path:
+    return Path(img_dir) / INDEX_FILENAME
+
+
+@contextmanager
+def _index_lock(img_dir: str):
+    """Exclusión entre hilos y entre procesos (flock sobre index.json.lock) para escribir el índice."""
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        with open(Path(img_dir) / f"{INDEX_FILENAME}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def load_index(img_dir: str) -> Dict[str, Dict[str, Any]]:
+    """Lee el índice {filename: {...}} con caché por mtime (barato en cada request)."""
+    path = _index_path(img_dir)
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return {}
+    if _cache["path"] == str(path) and _cache["mtime"] == mtime:
+        return _cache["data"]
+    try:
+        with open(path, "r") as f:
+            data = json.load(f).get("images", {})
+    except Exception as e:
+        print(f"Índice de imágenes ilegible ({path}): {e}")
+        return {}
+    _cache.update(path=str(path), mtime=mtime, data=data)
+    return data
+
+
+def index_mtime(img_dir: str) -> Optional[float]:
+    """Fecha de modificación del índice (None si no existe); cambia con cada portada nueva."""
+    try:
+        return _index_path(img_dir).stat().st_mtime
+    except OSError:
+        return None
+
+
+def _write_index(img_dir: str, images: Dict[str, Dict[str, Any]]) -> None:
+    path = _index_path(img_dir)
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": INDEX_VERSION, "images": images}, f, separators=(",", ":"))
+    os.replace(tmp, path)  # escritura atómica: los lectores nunca ven un índice a medias
+
+
+def update_entry(img_dir: str, filename: str, content: bytes) -> Optional[Dict[str, Any]]:
+    """Calcula y guarda el placeholder de `filename`. Retorna la entrada (o None si no se pudo)."""
+    placeholder = compute_placeholder(content)
+    if placeholder is None:
+        return None
+    with _index_lock(img_dir):
+        images = dict(load_index(img_dir))
+        images[filename] = placeholder
+        _write_index(img_dir, images)
+    return placeholder
+
+
+def placeholder_for(index: Dict[str, Dict[str, Any]], playlist_id: Optional[str],
+                    img: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Busca el placeholder de la portada de un playlist: primero <id>.jpeg (contrato de
+    /upload-image) y luego el nombre de archivo del campo `img`."""
+    if not index:
+        return None
+    if playlist_id:
+        hit = index.get(f"{playlist_id}.jpeg")
+        if hit:
+            return hit
+    if img:
+        return index.get(img.rsplit("/", 1)[-1].split("?", 1)[0])
+    return None
+
+
+def rebuild_index(img_dir: str) -> int:
+    """Recalcula los placeholders de todas las imágenes de `img_dir`. Retorna cuántas se indexaron."""
+    images: Dict[str, Dict[str, Any]] = {}
+    for f in sorted(Path(img_dir).iterdir()):
+        if f.is_file() and f.suffix.lower() in ALLOWED_IMAGE_EXTS:
+            placeholder = compute_placeholder(f.read_bytes())
+            if placeholder is not None:
+                images[f.name] = placeholder
+    with _index_lock(img_dir):
+        _write_index(img_dir, images)
+    return len(images)
+
+
+if __name__ == "__main__":
+    if Image is None:
+        sys.exit("Pillow no está instalado (pip install Pillow)")
+    target = sys.argv[1] if len(sys.argv) > 1 else "img"
+    print(f"Indexadas {rebuild_index(target)} imágenes en {target}/{INDEX_FILENAME}")
@@ -0,0 +1,153 @@
+# keyset.py
+# Paginación por cursor (keyset) para los listados de app.py y Core_M_cajita.py
+"""
+En vez de OFFSET (que lee y descarta todas las filas anteriores), cada página continúa
+desde la clave de ordenación de la última fila entregada:
+
+    WHERE date <= %s AND (date < %s OR (date = %s AND id < %s))
+    ORDER BY date DESC, id DESC LIMIT n+1
+
+Con un índice sobre las columnas de la clave, una página profunda cuesta lo mismo que la
+primera. La última columna de la clave debe ser única (id) para que el orden sea total.
+
+El cursor es opaco para el cliente: JSON en base64url con los valores de la clave de la
+última fila (los datetime viajan en ISO). Un cursor mal formado es ValueError; los
+endpoints responden 400.
+
+Los listados que devuelven una lista JSON entregan el cursor siguiente en la cabecera
+`X-Next-Cursor` (ausente en la última página), así la forma del cuerpo no cambia.
+"""
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def clamp_limit(limit: Optional[int], default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def _encode_value(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return {"dt": v.isoformat()}
+    if isinstance(v, date):
+        return {"d": v.isoformat()}
+    return v
+
+
+def _decode_value(v: Any) -> Any:
+    if isinstance(v, dict):
+        if "dt" in v:
+            return datetime.fromisoformat(v["dt"])
+        if "d" in v:
+            return date.fromisoformat(v["d"])
+        raise ValueError("valor de cursor desconocido")
+    return v
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """Valores de la clave guardados en `cursor`. ValueError si no es un cursor válido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise ValueError("cursor inválido")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("cursor inválido")
+    return [_decode_value(v) for v in values]
+
+
+class Keyset:
+    """Clave de ordenación de un listado: columnas (la última única) y sentido.
+
+    `nullable_first`: la primera columna admite NULL (p. ej. `date`); MySQL ordena los NULL
+    primero en ASC y al final en DESC, y la condición de continuación lo respeta.
+    """
+
+    def __init__(self, columns: Sequence[str], desc: bool = False, nullable_first: bool = False):
+        self.columns = tuple(columns)
+        self.desc = desc
+        self.nullable_first = nullable_first
+        # nombre de la columna en las filas devueltas ("pl.id" -> "id")
+        self.fields = tuple(c.split(".")[-1] for c in self.columns)
+
+    def order_by(self) -> str:
+        direction = " DESC" if self.desc else ""
+        return ", ".join(c + direction for c in self.columns)
+
+    def _first(self, value: Any) -> Tuple[Optional[str], list]:
+        """Condición de la primera columna estrictamente posterior a `value` (None = ninguna fila)."""
+        col, op = self.columns[0], "<" if self.desc else ">"
+        if not self.nullable_first:
+            return f"{col} {op} %s", [value]
+        if value is None:
+            return (None, []) if self.desc else (f"{col} IS NOT NULL", [])
+        if self.desc:
+            return f"({col} < %s OR {col} IS NULL)", [value]
+        return f"{col} > %s", [value]
+
+    def after(self, cursor: str) -> Tuple[str, list]:
+        """(sql, params) de las filas posteriores al cursor. ValueError si el cursor no vale."""
+        values = decode_cursor(cursor, len(self.columns))
+        op = "<" if self.desc else ">"
+        terms, params = [], []
+        first_sql, first_params = self._first(values[0])
+        if first_sql:
+            terms.append(first_sql)
+            params += first_params
+        for i in range(1, len(self.columns)):
+            eqs = []
+            for j in range(i):
+                if j == 0 and values[0] is None:
+                    eqs.append(f"{self.columns[0]} IS NULL")
+                else:
+                    eqs.append(f"{self.columns[j]} = %s")
+                    params.append(values[j])
+            terms.append("(" + " AND ".join(eqs + [f"{self.columns[i]} {op} %s"]) + ")")
+            params.append(values[i])
+        sql = "(" + " OR ".join(terms) + ")"
+        if not self.nullable_first and len(self.columns) > 1:
+            # cota sobre la primera columna para que el optimizador use el índice como rango
+            sql = f"{self.columns[0]} {'<=' if self.desc else '>='} %s AND {sql}"
+            params.insert(0, values[0])
+        return sql, params
+
+    def cursor_of(self, row: Dict[str, Any]) -> str:
+        return encode_cursor([row[f] for f in self.fields])
+
+    def page(self, rows: List[Dict[str, Any]], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """Recorta `rows` (leídas con LIMIT limit+1) y devuelve (filas, cursor siguiente o None)."""
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, self.cursor_of(rows[-1])
+
+
+def fetch_page(cur, ks: Keyset, sql: str, params: Sequence[Any], limit: int):
+    """Ejecuta `sql` (filtrado y ordenado por `ks`) con LIMIT limit+1: (filas, cursor siguiente o None)."""
+    cur.execute(sql + " LIMIT %s", list(params) + [limit + 1])
+    return ks.page(cur.fetchall(), limit)
+
+
+def ensure_index(conn, table: str, name: str, columns: Sequence[str]) -> None:
+    """Crea el índice de la clave si no existe (migración idempotente al arrancar)."""
+    cur = conn.cursor()
+    try:
+        cur.execute("select count(*) from information_schema.statistics"
+                    " where table_schema = database() and table_name=%s and index_name=%s", (table, name))
+        if not cur.fetchone()[0]:
+            cur.execute(f"alter table {table} add index {name} ({', '.join(columns)})")
+            conn.commit()
+    finally:
+        cur.close()
@@ -0,0 +1,249 @@
+# ordering.py
+# Orden manual de segmentos y carrusel con claves de rango fraccionarias (rank_key)
+"""
+Motor de orden compartido entre Core_M_cajita.py (que reordena) y app.py (que lee).
+
+Cada fila lleva una clave `rank_key` (cadena base62 comparada byte a byte, columna
+ascii_bin): el orden es el de las claves. Mover un elemento solo reescribe su propia
+clave, generada entre la de sus nuevos vecinos (`key_between`), así que mover un
+segmento cuesta un SELECT y un UPDATE de una fila sin importar cuántos haya.
+
+Las claves crecen ~1 carácter cada 6 inserciones en el mismo hueco; cuando una pasa de
+`REBALANCE_KEY_LEN` se reparten de nuevo todas las claves de la tabla (`rebalance`) en
+un solo UPDATE con CASE, igual que un reordenamiento completo (`apply_permutation`).
+Un reordenamiento parcial (solo algunos ids) los reordena entre sí en los lugares que ya
+ocupan, con claves entre las de sus vecinos no listados, que no cambian.
+
+`order_` se mantiene como valor heredado para clientes antiguos: se actualiza en los
+reordenamientos completos, pero el orden real es `ORDER_BY`. Un `order_` nuevo enviado
+por un cliente antiguo conserva su significado de siempre, un valor por el que se ordena:
+la fila se coloca donde la pondría `ORDER BY order_, id` (`place_by_order`); escribir solo
+`order_` no cambiaría el orden.
+
+Migración: `ensure_rank_columns` añade la columna e inicializa las claves desde
+`order_` (se ejecuta al arrancar Core_M_cajita.py y app.py).
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"  # orden ASCII
+BASE = len(DIGITS)
+_VALUE = {c: i for i, c in enumerate(DIGITS)}
+
+RANK_COLUMN_LEN = 64
+REBALANCE_KEY_LEN = 16
+
+# Entidades ordenables expuestas por la API -> tabla
+TABLES: Dict[str, str] = {
+    "segments": "lacajita_segments",
+    "homecarousel": "lacajita_home_carousel",
+}
+
+# Filas sin clave (insertadas por clientes antiguos) al final, en su orden heredado
+ORDER_BY = "rank_key IS NULL, rank_key, order_, id"
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Clave estrictamente entre `a` y `b` (None = extremo). Nunca termina en '0',
+    de modo que siempre existe una clave entre dos claves distintas."""
+    a = a or ""
+    if b is not None and not a < b:
+        raise ValueError(f"rank keys fuera de orden: {a!r} >= {b!r}")
+    if b is not None:
+        # prefijo común (con `a` rellenada con ceros)
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else "0") == b[n]:
+            n += 1
+        if n:
+            return b[:n] + key_between(a[n:], b[n:])
+    da = _VALUE[a[0]] if a else 0
+    db = _VALUE[b[0]] if b is not None else BASE
+    if db - da > 1:
+        return DIGITS[(da + db) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]  # b[0] < b porque b no termina en '0'
+    return DIGITS[da] + key_between(a[1:], None)
+
+
+def spread_keys(n: int) -> List[str]:
+    """n claves cortas repartidas uniformemente (rebalanceo e inicialización)."""
+    width = 1
+    while BASE ** width <= n + 1:
+        width += 1
+    span = BASE ** width
+    keys = []
+    for i in range(1, n + 1):
+        v = i * span // (n + 1)
+        digits = []
+        for _ in range(width):
+            v, r = divmod(v, BASE)
+            digits.append(DIGITS[r])
+        keys.append("".join(reversed(digits)).rstrip("0"))
+    return keys
+
+
+def needs_rebalance(key: str) -> bool:
+    return len(key) > REBALANCE_KEY_LEN
+
+
+def _case_update(table: str, ids: Sequence[int], keys: Sequence[str],
+                 orders: Optional[Sequence[int]] = None) -> Tuple[str, list]:
+    """UPDATE ... SET rank_key = CASE id WHEN .. THEN .. END [, order_ = CASE ...] WHERE id IN (...)."""
+    whens = " ".join(["when %s then %s"] * len(ids))
+    sql = f"update {table} set rank_key = case id {whens} end"
+    params: list = [v for pair in zip(ids, keys) for v in pair]
+    if orders is not None:
+        sql += f", order_ = case id {whens} end"
+        params += [v for pair in zip(ids, orders) for v in pair]
+    sql += f" where id in ({','.join(['%s'] * len(ids))})"
+    return sql, params + list(ids)
+
+
+def _spread(cur, table: str, ids: Sequence[int], orders: Optional[Sequence[int]] = None) -> None:
+    """Claves nuevas repartidas para todas las filas (`ids` en orden) y `order_` = `orders` o 1..n."""
+    if not ids:
+        return
+    if orders is None:
+        orders = list(range(1, len(ids) + 1))
+    cur.execute(*_case_update(table, ids, spread_keys(len(ids)), orders))
+
+
+def _current(cur, table: str) -> List[Tuple[int, Optional[str], Optional[int]]]:
+    """(id, rank_key, order_) de todas las filas en el orden actual."""
+    cur.execute(f"select id, rank_key, order_ from {table} order by {ORDER_BY}")
+    return [tuple(r) for r in cur.fetchall()]
+
+
+def _rekey(cur, table: str, final: List[int], keys: Dict[int, Optional[str]], moved: set,
+           orders: Optional[Dict[int, int]] = None) -> None:
+    """Deja la tabla en el orden `final` dando clave nueva solo a `moved`, entre las de sus
+    vecinos (que conservan la suya); un UPDATE con CASE. Si los vecinos tienen claves nulas o
+    repetidas, o una clave nueva sale demasiado larga, se reparten todas (`_spread`)."""
+    fixed = [keys[i] for i in final if i not in moved]
+    new: Dict[int, str] = {}
+    if None not in fixed and all(a < b for a, b in zip(fixed, fixed[1:])):
+        prev = None
+        for n, item_id in enumerate(final):
+            if item_id in moved:
+                nxt = next((keys[i] for i in final[n + 1:] if i not in moved), None)
+                new[item_id] = key_between(prev, nxt)
+            prev = new.get(item_id, keys[item_id])
+    if len(new) < len(moved) or any(needs_rebalance(k) for k in new.values()):
+        _spread(cur, table, final)
+        return
+    ids = [i for i in final if i in moved]
+    if ids:
+        cur.execute(*_case_update(table, ids, [new[i] for i in ids], [orders[i] for i in ids] if orders else None))
+
+
+def apply_permutation(cur, table: str, ids: Sequence[int], orders: Optional[Sequence[int]] = None) -> List[int]:
+    """Aplica un orden en un único UPDATE y devuelve los ids existentes ordenados. Con todas las
+    filas se reparten claves nuevas y `order_` = `orders` o 1..n; con una parte, esos ids se
+    reordenan entre sí en los lugares que ya ocupan (el resto no se toca) y `order_` solo se
+    escribe si llega `orders`."""
+    order_of = dict(zip(ids, orders)) if orders is not None else None
+    rows = _current(cur, table)
+    keys = {r[0]: r[1] for r in rows}
+    listed = [i for i in dict.fromkeys(ids) if i in keys]
+    if not listed:
+        return []
+    if len(listed) == len(keys):
+        _spread(cur, table, listed, [order_of[i] for i in listed] if order_of else None)
+        return listed
+    chosen = set(listed)
+    pending = iter(listed)
+    final = [next(pending) if r[0] in chosen else r[0] for r in rows]
+    _rekey(cur, table, final, keys, chosen, order_of)
+    return listed
+
+
+def rebalance(cur, table: str) -> int:
+    """Reparte de nuevo todas las claves de la tabla respetando el orden actual."""
+    cur.execute(f"select id from {table} order by {ORDER_BY}")
+    ids = [r[0] for r in cur.fetchall()]
+    _spread(cur, table, ids)
+    return len(ids)
+
+
+def append_key(cur, table: str) -> str:
+    """Clave para una fila nueva al final de la lista."""
+    cur.execute(f"select max(rank_key) from {table}")
+    row = cur.fetchone()
+    return key_between(row[0] if row else None, None)
+
+
+def _neighbours(cur, table: str, item_id: int, after_id: Optional[int], before_id: Optional[int]):
+    if after_id is not None:
+        cur.execute(f"select id, rank_key from {table} where id<>%s and rank_key >="
+                    f" (select rank_key from {table} where id=%s) order by rank_key limit 2",
+                    (item_id, after_id))
+        rows = cur.fetchall()
+        if not rows or rows[0][0] != after_id:
+            return None
+        return rows[0][1], rows[1][1] if len(rows) > 1 else None
+    if before_id is not None:
+        cur.execute(f"select id, rank_key from {table} where id<>%s and rank_key <="
+                    f" (select rank_key from {table} where id=%s) order by rank_key desc limit 2",
+                    (item_id, before_id))
+        rows = cur.fetchall()
+        if not rows or rows[0][0] != before_id:
+            return None
+        return rows[1][1] if len(rows) > 1 else None, rows[0][1]
+    cur.execute(f"select max(rank_key) from {table} where id<>%s", (item_id,))
+    row = cur.fetchone()
+    return (row[0] if row else None), None
+
+
+def move(cur, table: str, item_id: int, after_id: Optional[int] = None,
+         before_id: Optional[int] = None) -> str:
+    """Coloca `item_id` justo después de `after_id` (o antes de `before_id`; sin ninguno, al final).
+    Un SELECT de los vecinos y un UPDATE de una fila. LookupError si el vecino no existe."""
+    if item_id in (after_id, before_id):
+        raise ValueError("Un elemento no puede moverse respecto a sí mismo")
+    bounds = _neighbours(cur, table, item_id, after_id, before_id)
+    if bounds is None or (bounds[0] is not None and bounds[1] is not None and bounds[0] >= bounds[1]):
+        # vecino sin clave o claves repetidas (escrituras concurrentes): normalizar y reintentar
+        rebalance(cur, table)
+        bounds = _neighbours(cur, table, item_id, after_id, before_id)
+        if bounds is None:
+            raise LookupError(f"Elemento {after_id if after_id is not None else before_id} no encontrado")
+    key = key_between(*bounds)
+    cur.execute(f"update {table} set rank_key=%s where id=%s", (key, item_id))
+    if cur.rowcount == 0:
+        raise LookupError(f"Elemento {item_id} no encontrado")
+    return key
+
+
+def place_by_order(cur, table: str, orders: Dict[int, int]) -> None:
+    """`order_` nuevo de clientes antiguos (PUT/PATCH): cada fila se coloca donde la pondría
+    `ORDER BY order_, id`, antes del primer elemento con (order_, id) mayor. Un SELECT y un
+    UPDATE con CASE de las filas movidas; el resto conserva su clave."""
+    if not orders:
+        return
+    rows = _current(cur, table)
+    keys = {r[0]: r[1] for r in rows}
+    value = {r[0]: r[2] or 0 for r in rows}
+    moved = [i for i in orders if i in keys]
+    value.update({i: orders[i] for i in moved})
+    final = [r[0] for r in rows if r[0] not in orders]
+    for item_id in sorted(moved, key=lambda i: (value[i], i)):
+        after = ((value[o], o) > (value[item_id], item_id) for o in final)
+        final.insert(next((n for n, bigger in enumerate(after) if bigger), len(final)), item_id)
+    _rekey(cur, table, final, keys, set(moved))
+
+
+def ensure_rank_columns(conn) -> None:
+    """Añade `rank_key` donde falte e inicializa las claves nulas desde el orden heredado."""
+    cur = conn.cursor()
+    try:
+        for table in TABLES.values():
+            cur.execute("select count(*) from information_schema.columns"
+                        " where table_schema = database() and table_name=%s and column_name='rank_key'", (table,))
+            if not cur.fetchone()[0]:
+                cur.execute(f"alter table {table} add column rank_key varchar({RANK_COLUMN_LEN})"
+                            f" character set ascii collate ascii_bin null, add index idx_{table}_rank (rank_key)")
+            cur.execute(f"select count(*) from {table} where rank_key is null")
+            if cur.fetchone()[0]:
+                rebalance(cur, table)
+        conn.commit()
+    finally:
+        cur.close()
@@ -0,0 +1,114 @@
+# projection.py
+# Proyecciones (?fields=) y expansiones (?include=) de los endpoints del catálogo
+"""
+Parámetros (estilo JSON:API):
+
+    ?fields=id,title,img                   campos de la entidad principal (playlist)
+    ?fields[season]=id,title&fields[video]=video_id
+    ?include=seasons,seasons.videos        expansiones; sin include no se anidan temporadas
+
+Cada combinación (entidad, campos) se prepara una sola vez como una función fila -> dict
+con solo esos campos (caché LRU), así los campos no pedidos ni se copian ni se serializan.
+
+Sin `fields[video]` los videos de una temporada se devuelven como lista de ids, igual
+que en /playlists.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+ENTITY_FIELDS: Dict[str, Tuple[str, ...]] = {
+    "playlist": ("id", "segment_id", "title", "description", "img", "category", "subscription",
+                 "subscription_cost", "active", "created_at", "updated_at", "categories", "placeholder"),
+    "season": ("id", "playlist_id", "title", "description", "date", "active"),
+    "video": ("season_id", "video_id", "date", "active"),
+    "segment": ("id", "name", "livetv", "order_", "active"),
+    "homecarousel": ("id", "link", "imgsrc", "video", "date_time", "active", "order_"),
+}
+INCLUDES = frozenset({"seasons", "seasons.videos"})
+
+
+def _plain(value: Any) -> Any:
+    """Valor listo para JSON: fechas en ISO y DECIMAL como float."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+@lru_cache(maxsize=256)
+def compile_projection(fields: Tuple[str, ...]) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    """Función fila -> dict con solo `fields`, lista para JSON. Los nombres ya vienen validados."""
+    names = tuple(fields)
+    return lambda r: {f: _plain(r.get(f)) for f in names}
+
+
+def _split(raw: str) -> List[str]:
+    return [v.strip() for v in raw.split(",") if v.strip()]
+
+
+class Projection:
+    def __init__(self, fields: Dict[str, Tuple[str, ...]], include: FrozenSet[str]):
+        self.fields = fields
+        self.include = include
+        self.compiled = {e: compile_projection(f) for e, f in fields.items()}
+
+    @classmethod
+    def from_query(cls, query: Mapping[str, str], primary: str = "playlist",
+                   default_include: Iterable[str] = ()) -> Optional["Projection"]:
+        """Proyección pedida en la query string, o None si no hay fields/include.
+        ValueError (-> 400) con entidades, campos o expansiones desconocidos."""
+        requested: Dict[str, List[str]] = {}
+        include = None
+        for key, raw in query.items():
+            if key == "fields":
+                requested[primary] = _split(raw)
+            elif key.startswith("fields[") and key.endswith("]"):
+                requested[key[7:-1]] = _split(raw)
+            elif key == "include":
+                include = frozenset(_split(raw))
+        if not requested and include is None:
+            return None
+        for entity, names in requested.items():
+            if entity not in ENTITY_FIELDS:
+                raise ValueError(f"Entidad desconocida en fields: {entity}")
+            unknown = [n for n in names if n not in ENTITY_FIELDS[entity]]
+            if unknown:
+                raise ValueError(f"Campos desconocidos de {entity}: {', '.join(unknown)}")
+        include = frozenset(default_include) if include is None else include
+        if include - INCLUDES:
+            raise ValueError(f"include admite: {', '.join(sorted(INCLUDES))}")
+        if "seasons.videos" in include:
+            include |= {"seasons"}
+        fields = {e: tuple(dict.fromkeys(requested.get(e) or ENTITY_FIELDS[e]))
+                  for e in ENTITY_FIELDS if e != "video" or "video" in requested}
+        return cls(fields, include)
+
+    def wants(self, entity: str, field: str) -> bool:
+        return field in self.fields.get(entity, ())
+
+    def project(self, entity: str, row: Mapping[str, Any]) -> Dict[str, Any]:
+        return self.compiled[entity](row)
+
+    def season(self, season: Mapping[str, Any], snapshot) -> Dict[str, Any]:
+        out = self.project("season", season)
+        if "seasons.videos" in self.include:
+            videos = [v for v in snapshot.videos_by_season.get(season["id"], ()) if v.get("active") == 1]
+            if "video" in self.compiled:
+                out["videos"] = [self.project("video", v) for v in videos]
+            else:
+                out["videos"] = [v["video_id"] for v in videos]
+        return out
+
+    def playlist(self, playlist: Mapping[str, Any], snapshot,
+                 placeholder: Optional[Callable[[Mapping[str, Any]], Any]] = None) -> Dict[str, Any]:
+        """Playlist proyectada; `placeholder(playlist)` calcula ese campo si se pidió."""
+        out = self.project("playlist", playlist)
+        if placeholder is not None and "placeholder" in out:
+            out["placeholder"] = placeholder(playlist)
+        if "seasons" in self.include:
+            out["seasons"] = [self.season(s, snapshot) for s in snapshot.seasons_by_playlist.get(playlist["id"], ())
+                              if s.get("active") == 1]
+        return out
@@ -0,0 +1,154 @@
+"""
+Benchmark de los endpoints de escritura del panel (/uiplaylist, /iuseasonvideos, /usegments):
+implementación anterior (un execute y un commit por fila) frente a la transaccional actual.
+
+Sin base de datos: una conexión simulada espera `--rtt` ms por cada viaje al servidor y
+`--fsync` ms por cada commit (InnoDB con innodb_flush_log_at_trx_commit=1).
+Como mysql.connector, `executemany` de un INSERT ... VALUES se envía como una sola sentencia
+multi-row; el de un UPDATE sigue siendo un viaje por fila.
+
+Uso:
+  python3 scripts/bench_admin_writes.py
+  python3 scripts/bench_admin_writes.py --videos 300 --rtt 1 --fsync 4
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import Core_M_cajita  # noqa: E402
+
+
+class SimCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+
+    def execute(self, sql, params=None):
+        self.conn.round_trip()
+        # el playlist existe (upsert -> 2 filas afectadas) con una categoría guardada
+        self.rows = [(1,)] if sql.lstrip().lower().startswith("select") else []
+        self.rowcount = 2
+
+    def executemany(self, sql, seq):
+        seq = list(seq)
+        if sql.lstrip().lower().startswith("insert") and seq:
+            self.conn.round_trip()
+        else:
+            for params in seq:
+                self.execute(sql, params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def close(self):
+        pass
+
+
+class SimConnection:
+    def __init__(self, rtt: float, fsync: float):
+        self.rtt, self.fsync = rtt, fsync
+        self.trips = self.commits = 0
+
+    def round_trip(self):
+        self.trips += 1
+        time.sleep(self.rtt)
+
+    def cursor(self, **kwargs):
+        return SimCursor(self)
+
+    def commit(self):
+        self.round_trip()
+        self.commits += 1
+        time.sleep(self.fsync)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+# Implementación anterior, conservada solo para comparar
+def old_ui_playlist(conn, pl):
+    cur = conn.cursor()
+    cur.execute("select 1 from lacajita_playlists where id=%s", (pl.id,))
+    cur.fetchall()
+    cur.execute("update lacajita_playlists set id=%s, segment_id=%s, img=%s, title=%s, description=%s where id=%s",
+                (pl.id, pl.segid, pl.img, pl.title, pl.desc, pl.id))
+    cur.execute("delete from lacajita_playlist_categories where id_playlist=%s", (pl.id,))
+    conn.commit()
+    for c in pl.categories:
+        cur.execute("insert into lacajita_playlist_categories(id_playlist, id_category) values(%s,%s)", (pl.id, c))
+        conn.commit()
+
+
+def old_season_videos(conn, sv):
+    cur = conn.cursor()
+    cur.execute('DELETE FROM lacajita_videos where season_id=%s', (sv.season_id,))
+    conn.commit()
+    for v in sv.videoarr:
+        cur.execute('insert into lacajita_videos(season_id, video_id) values(%s,%s)', (sv.season_id, v))
+        conn.commit()
+
+
+def old_segments(conn, se):
+    cur = conn.cursor()
+    for l in se.arrorder:
+        cur.execute('update lacajita_segments set order_=%s where id=%s', (l['order_'], l['id']))
+        conn.commit()
+
+
+def _measure(fn, payload, rtt, fsync):
+    conn = SimConnection(rtt, fsync)
+    t0 = time.perf_counter()
+    fn(conn, payload)
+    return time.perf_counter() - t0, conn.trips, conn.commits
+
+
+def _current(handler):
+    """Ejecuta el endpoint actual de Core_M_cajita sobre la conexión simulada."""
+    def run(conn, payload):
+        original = Core_M_cajita.getConnection
+        Core_M_cajita.getConnection = lambda: conn
+        try:
+            handler(payload, user={})
+        finally:
+            Core_M_cajita.getConnection = original
+    return run
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--videos", type=int, default=300, help="Videos de la temporada")
+    p.add_argument("--categories", type=int, default=20, help="Categorías del playlist")
+    p.add_argument("--segments", type=int, default=30, help="Segmentos reordenados")
+    p.add_argument("--rtt", type=float, default=0.5, help="Latencia por viaje al servidor (ms)")
+    p.add_argument("--fsync", type=float, default=2.0, help="Coste de cada commit (ms)")
+    args = p.parse_args()
+    rtt, fsync = args.rtt / 1000, args.fsync / 1000
+
+    cases = [
+        ("/uiplaylist", old_ui_playlist, _current(Core_M_cajita.uiPlaylist),
+         Core_M_cajita.PlaylistModel(id="pl1", segid=1, img=None, title="T", desc="",
+                                     categories=list(range(args.categories)))),
+        ("/iuseasonvideos", old_season_videos, _current(Core_M_cajita.iuseasonvideos),
+         Core_M_cajita.SeasVideosModel(season_id=1, videoarr=[f"v{i:04d}" for i in range(args.videos)])),
+        ("/usegments", old_segments, _current(Core_M_cajita.updateSegments),
+         Core_M_cajita.SegmentsOrder(arrorder=[{"id": i, "order_": i} for i in range(args.segments)])),
+    ]
+    print(f"{'endpoint':<18}{'antes (ms)':>12}{'viajes':>8}{'commits':>9}{'ahora (ms)':>12}{'viajes':>8}{'commits':>9}")
+    for name, old, new, payload in cases:
+        t_old, trips_old, commits_old = _measure(old, payload, rtt, fsync)
+        t_new, trips_new, commits_new = _measure(new, payload, rtt, fsync)
+        print(f"{name:<18}{t_old * 1000:>12.1f}{trips_old:>8}{commits_old:>9}"
+              f"{t_new * 1000:>12.1f}{trips_new:>8}{commits_new:>9}")
+
+
+if __name__ == "__main__":
+    main()
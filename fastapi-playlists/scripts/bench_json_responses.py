@@ -0,0 +1,133 @@
+"""
+Benchmark de la serialización de respuestas por endpoint: camino estándar de FastAPI
+(validación contra response_model + jsonable_encoder + json) frente a fast_json.respond.
+
+Sin base de datos ni servidor: se generan filas con la forma de las de MySQL (datetime,
+Decimal) y se mide solo lo que ocurre después de fetchall(). Para los endpoints con
+response_model el camino estándar valida con Pydantic (TypeAdapter) como hace FastAPI;
+el árbol de /playlists incluye además las llamadas a format_date que hacía por fila.
+
+Uso:
+  python3 scripts/bench_json_responses.py
+  python3 scripts/bench_json_responses.py --playlists 2000 --seasons 4 --videos 12 --repeat 5
+"""
+
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["SENTRY_DSN"] = ""
+os.environ.setdefault("IMG_DIR", tempfile.mkdtemp())
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+import app as rest  # noqa: E402
+import fast_json  # noqa: E402
+
+T0 = datetime(2024, 1, 1, 12, 30)
+
+
+def make_rows(n_playlists: int, seasons_per: int, videos_per: int):
+    playlists, seasons, videos = [], [], []
+    for i in range(n_playlists):
+        playlists.append({
+            "id": f"pl-{i:06d}", "segment_id": i % 12 + 1, "title": f"Playlist número {i}",
+            "description": "Descripción de la playlist " * 8, "img": f"https://cdn.example/{i}.jpg",
+            "category": "Cine", "subscription": i % 2, "subscription_cost": Decimal("4.99"), "active": 1,
+            "created_at": T0, "updated_at": T0 + timedelta(minutes=i),
+        })
+        for s in range(seasons_per):
+            sid = i * seasons_per + s
+            seasons.append({"id": sid, "playlist_id": f"pl-{i:06d}", "title": f"Temporada {s + 1}",
+                            "description": "Temporada " * 6, "date": T0 + timedelta(days=s), "active": 1})
+            for v in range(videos_per):
+                videos.append({"season_id": sid, "video_id": f"v{sid:07d}{v:02d}",
+                               "date": T0 + timedelta(hours=v), "active": 1})
+    return playlists, seasons, videos
+
+
+def tree(playlists, seasons, videos):
+    """Forma del árbol de /playlists (segmentos -> playlists -> seasons -> ids de videos)."""
+    by_season = {}
+    for v in videos:
+        by_season.setdefault(v["season_id"], []).append(v)
+    by_playlist = {}
+    for s in seasons:
+        by_playlist.setdefault(s["playlist_id"], []).append(s)
+    segments = {}
+    for p in playlists:
+        for s in by_playlist.get(p["id"], []):
+            s["videos"] = [v["video_id"] for v in by_season.get(s["id"], [])]
+        p["seasons"] = by_playlist.get(p["id"], [])
+        p["categories"] = [1, 2]
+        segments.setdefault(p["segment_id"], {"id": p["segment_id"], "name": "Segmento", "livetv": 0,
+                                              "playlist": []})["playlist"].append(p)
+    return {"homecarousel": [], "segments": list(segments.values()), "categories": []}
+
+
+def format_dates(data):
+    """Lo que hacía el árbol de /playlists antes de devolverlo: format_date en cada fila."""
+    for sgm in data["segments"]:
+        for pl in sgm["playlist"]:
+            pl["created_at"] = rest.format_date("created_at", pl)
+            pl["updated_at"] = rest.format_date("updated_at", pl)
+            for se in pl["seasons"]:
+                se["date"] = rest.format_date("date", se)
+    return data
+
+
+def standard(content, model=None):
+    if model is not None:
+        content = TypeAdapter(model).validate_python(content)
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast(content, model=None):
+    return fast_json.respond(content).body
+
+
+def timed(fn, make, repeat):
+    best = float("inf")
+    size = 0
+    for _ in range(repeat):
+        data = make()
+        t = time.perf_counter()
+        size = len(fn(data))
+        best = min(best, time.perf_counter() - t)
+    return best, size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--playlists", type=int, default=1000)
+    ap.add_argument("--seasons", type=int, default=3)
+    ap.add_argument("--videos", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    playlists, seasons, videos = make_rows(args.playlists, args.seasons, args.videos)
+    cases = [
+        ("GET /videos", lambda: copy.copy(videos), List[rest.Video], None),
+        ("GET /seasons", lambda: copy.copy(seasons), List[rest.Season], None),
+        ("GET /playlists (árbol)", lambda: tree(*copy.deepcopy((playlists, seasons, videos))), None, format_dates),
+    ]
+    print(f"encoder rápido: {'orjson' if fast_json.orjson else 'json (sin orjson)'}; "
+          f"{len(playlists)} playlists, {len(seasons)} seasons, {len(videos)} videos")
+    print(f"{'endpoint':<26}{'estándar ms':>13}{'rápido ms':>12}{'x':>7}{'bytes':>12}")
+    for name, make, model, prepare in cases:
+        before, size = timed(lambda d: standard(prepare(d) if prepare else d, model), make, args.repeat)
+        after, _ = timed(lambda d: fast(d), make, args.repeat)
+        print(f"{name:<26}{before * 1000:>13.1f}{after * 1000:>12.1f}{before / after:>7.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
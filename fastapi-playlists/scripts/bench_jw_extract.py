@@ -0,0 +1,94 @@
+"""
+Benchmark del extractor de configuración JWPlayer (jw_extract.py) frente a las regex anteriores.
+
+Genera páginas sintéticas grandes y mide:
+- regex antiguas (`[\\s\\S]*?` sobre todo el documento) vs. escáner de una pasada;
+- bytes leídos en modo streaming cuando el setup() aparece al principio de la página.
+
+Uso:
+  python3 scripts/bench_jw_extract.py            # páginas de 0.25, 0.5 y 1 MB
+  python3 scripts/bench_jw_extract.py --sizes 2 4  # ojo: las regex tardan minutos en "adversarial"
+"""
+
+import argparse
+import json
+import re
+import time
+
+from jw_extract import extract_jwplayer_config, scan_chunks, _attempt_json_load, CHUNK_SIZE
+
+# Implementación anterior, conservada solo para comparar
+_old_setup_regex = re.compile(r"jwplayer\([^)]*\)\.setup\s*\(\s*({[\s\S]*?})\s*\)", re.IGNORECASE)
+_old_playlist_regex = re.compile(r"playlist\s*:\s*(\[[\s\S]*?\])", re.IGNORECASE)
+
+
+def old_extract(html: str):
+    m = _old_setup_regex.search(html)
+    if m:
+        parsed = _attempt_json_load(m.group(1))
+        if parsed is not None:
+            return parsed
+    m2 = _old_playlist_regex.search(html)
+    if m2:
+        parsed = _attempt_json_load(m2.group(1))
+        if parsed is not None:
+            return {"playlist": parsed}
+    return None
+
+
+def _config(n_items: int = 50) -> str:
+    items = [{"mediaid": f"m{i:04d}", "title": f"Video {i} }})", "file": f"https://cdn/v{i}.mp4",
+              "image": f"https://cdn/p{i}.jpg", "tracks": [{"file": f"https://cdn/t{i}.vtt"}]}
+             for i in range(n_items)]
+    return json.dumps({"playlist": items, "width": "100%", "aspectratio": "16:9"})
+
+
+def make_page(size_mb: float, position: str) -> str:
+    """Página de ~size_mb MB con scripts de relleno (muchas llaves y `jwplayer(` sueltos)."""
+    filler_unit = ('<div class="c">{"k": [1, 2, {"x": "y"}]} texto</div>\n'
+                   '<script>function f(a){ if(a){ return {b: a}; } } jwplayer("ad").on("ready", f);</script>\n')
+    filler = filler_unit * max(1, int(size_mb * 1024 * 1024 / len(filler_unit)))
+    setup = f'<script>jwplayer("player").setup({_config()});</script>\n'
+    if position == "start":
+        return "<html><body>" + setup + filler + "</body></html>"
+    if position == "end":
+        return "<html><body>" + filler + setup + "</body></html>"
+    # sin setup() válido: llamadas `setup({...}, cb)` sin `})`; cada una obliga a la regex lazy
+    # a recorrer el resto del documento (cuadrático), el escáner las descarta en el acto
+    bad = '<script>jwplayer("ad").setup({k: v}, cb);</script>\n'
+    return "<html><body>" + (filler_unit * 20 + bad) * max(1, len(filler) // (len(filler_unit) * 20)) + "</body></html>"
+
+
+def _time(fn, *args, repeat: int = 3):
+    """Mejor tiempo de `repeat` ejecuciones y el resultado de la última."""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--sizes", type=float, nargs="*", default=[0.25, 0.5, 1], help="Tamaños de página en MB")
+    args = p.parse_args()
+
+    print(f"{'página':<16}{'regex (s)':>12}{'regex ok':>10}{'escáner (s)':>14}{'stream leído':>16}")
+    for size in args.sizes:
+        for position in ("start", "end", "adversarial"):
+            html = make_page(size, position)
+            expected = json.loads(_config()) if position != "adversarial" else None
+            t_old, old_result = _time(old_extract, html, repeat=1 if position == "adversarial" else 3)
+            t_new, new_result = _time(extract_jwplayer_config, html)
+            assert new_result == expected
+            # Las regex cortan en el primer `})` (aquí dentro de un título): resultado incorrecto
+            old_ok = old_result == expected
+            body = html.encode("utf-8")
+            _, read = scan_chunks(body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE))
+            label = f"{size:g}MB/{position}"
+            print(f"{label:<16}{t_old:>12.4f}{str(old_ok):>10}{t_new:>14.4f}{read / len(body):>15.1%}")
+
+
+if __name__ == "__main__":
+    main()
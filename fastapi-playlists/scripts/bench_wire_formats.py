@@ -0,0 +1,71 @@
+"""
+Benchmark de formatos de respuesta para el árbol del catálogo (/playlists): JSON (orjson y
+json estándar), MessagePack y CBOR. Mide tamaño (también comprimido con gzip, como lo
+serviría un proxy) y tiempos de codificación y decodificación.
+
+El catálogo sintético tiene la misma forma que la respuesta real (segmentos -> playlists ->
+seasons -> ids de videos, fechas y DECIMAL incluidos), generado con
+scripts/bench_json_responses.py. La decodificación se mide en Python; en el cliente de TV
+las proporciones entre formatos son parecidas.
+
+Uso:
+  python3 scripts/bench_wire_formats.py
+  python3 scripts/bench_wire_formats.py --playlists 3000 --seasons 4 --videos 12 --repeat 5
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import bench_json_responses as shapes  # noqa: E402
+import fast_json  # noqa: E402
+import wire  # noqa: E402
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    out = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t)
+    return best, out
+
+
+def formats():
+    out = [("json (estándar)", lambda c: json.dumps(c, default=fast_json.encode_default, ensure_ascii=False,
+                                                     separators=(",", ":")).encode(), json.loads)]
+    if fast_json.orjson is not None:
+        out.append(("json (orjson)", lambda c: wire.encode(c, None), fast_json.orjson.loads))
+    if wire.msgpack is not None:
+        out.append(("msgpack", lambda c: wire.encode(c, wire.MSGPACK), lambda b: wire.decode(b, wire.MSGPACK)))
+    if wire.cbor2 is not None:
+        out.append(("cbor", lambda c: wire.encode(c, wire.CBOR), lambda b: wire.decode(b, wire.CBOR)))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--playlists", type=int, default=1000)
+    ap.add_argument("--seasons", type=int, default=3)
+    ap.add_argument("--videos", type=int, default=10)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    catalog = shapes.tree(*shapes.make_rows(args.playlists, args.seasons, args.videos))
+    print(f"{args.playlists} playlists x {args.seasons} seasons x {args.videos} videos")
+    print(f"{'formato':<18}{'bytes':>11}{'gzip':>10}{'codificar ms':>14}{'decodificar ms':>16}")
+    for name, encode, decode in formats():
+        enc, body = best_of(lambda: encode(catalog), args.repeat)
+        dec, _ = best_of(lambda: decode(body), args.repeat)
+        print(f"{name:<18}{len(body):>11}{len(gzip.compress(body, 6)):>10}{enc * 1000:>14.1f}{dec * 1000:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
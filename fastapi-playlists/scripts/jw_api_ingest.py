@@ -1,5 +1,7 @@
 """
-Ingest playlists from JW Player API (v2) and upsert into local backend.
+Ingest playlists from JW Player API (v2) and upsert into local backend (batched POST /bulk/playlists).
+Each playlist's media are synced as seasons/videos (POST /bulk/seasons): new video ids are
+inserted, removed ones deactivated, unchanged rows left alone.
 
 Env vars required:
 - JW_API_KEY: API key/token for JW Player (sent as 'Authorization: Bearer <key>')
@@ -9,6 +11,16 @@ Env vars required:
 Optional:
 - API_TOKEN: Bearer token for backend (if not present, script will attempt to get one using SECRET_KEY and /auth/client-credentials)
 - SECRET_KEY: backend secret to obtain client-credentials token
+- JW_BATCH_SIZE: playlists per /bulk/playlists request (default 200)
+- JW_SEGMENT_ID: segment assigned to ingested playlists
+- JW_STATE_PATH: SQLite state file (default scripts/jw_state.sqlite); unchanged items are skipped
+- JW_CONCURRENCY / JW_RATE: parallel JW requests and max requests/sec per host (default 4 / 2.0)
+- JW_PAGE_LENGTH: playlists per listing page (default 100); all pages are fetched, not just the first
+- Every run keeps a journal in the state file (pages and batches done, per-stage timings);
+  after a crash, --resume continues from the last completed page.
+- --daemon keeps the process alive and re-runs the catalog on an adaptive interval (see
+  jw_daemon.py); sessions and the backend token are reused between cycles.
+- JW_SEASON_TITLE: season for media without a `seasonNumber` custom param (default "Temporada 1")
 
 Usage:
   export JW_API_KEY="..."
@@ -18,14 +30,26 @@ Usage:
 
 """
 import os
+import math
 import requests
 import logging
 import argparse
-from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Optional, List, Dict, Tuple, Iterable, Iterator, Callable, Any
+
+from jw_http import (HostRateLimiter, RunStats, make_session, request_with_retry,
+                     post_playlist_batch, post_season_batch, season_key, BackendAuth,
+                     BULK_OK_STATUS, SEASON_OK_STATUS)
+from jw_daemon import CHANGED, UNCHANGED, FAILED, add_daemon_args, run_daemon
+from jw_state import IngestState, RunJournal, DEFAULT_STATE_PATH, content_hash, stable_id
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 JW_API_BASE = "https://api.jwplayer.com/v2"
+JW_DELIVERY_BASE = "https://cdn.jwplayer.com/v2"
+PAGE_LENGTH = 100
+MEDIA_PAGE_LIMIT = 500
+DEFAULT_SEASON_TITLE = 'Temporada 1'
 
 
 def fetch_backend_token_if_needed(api_url: str) -> Optional[str]:
@@ -48,69 +72,338 @@ def fetch_backend_token_if_needed(api_url: str) -> Optional[str]:
     return None
 
 
-def list_jw_playlists(api_key: str, site_id: str, page: int = 1, per_page: int = 50) -> List[Dict]:
-    headers = {
-        'Authorization': f'Bearer {api_key}',
-        'Accept': 'application/json'
-    }
-    playlists: List[Dict] = []
+def list_jw_playlists(session: requests.Session, site_id: str, page: int = 1, page_length: int = PAGE_LENGTH,
+                      limiter: Optional[HostRateLimiter] = None) -> Tuple[List[Dict], int]:
+    """Fetches one page of the site's playlists. Returns (playlists, total).
+
+    Listing pages are not fetched conditionally: an unchanged page says nothing about the
+    playlists' media, which is synced as seasons/videos. Unchanged items are skipped later
+    by content hash, so they cost no backend writes."""
     url = f"{JW_API_BASE}/sites/{site_id}/playlists"
-    params = {'page': page, 'per_page': per_page}
-    try:
-        r = requests.get(url, headers=headers, params=params, timeout=15)
+    params = {'page': page, 'page_length': page_length}
+    r = request_with_retry(session, 'GET', url, limiter=limiter, params=params, timeout=15)
+    r.raise_for_status()
+    data = r.json()
+    # JW returns 'playlists' or 'results' depending on endpoint
+    items = data.get('playlists') or data.get('results') or data
+    if isinstance(items, dict) and 'items' in items:
+        items = items['items']
+    if not isinstance(items, list):
+        logging.warning('Unexpected playlists payload shape: %s', type(items))
+        items = []
+    total = int(data.get('total') or len(items)) if isinstance(data, dict) else len(items)
+    return items, total
+
+
+def fetch_playlist_media(session: requests.Session, playlist_id: str,
+                         limiter: Optional[HostRateLimiter] = None) -> List[Dict]:
+    """Media list of a playlist from the Delivery API, following `links.next` pagination."""
+    media: List[Dict] = []
+    url: Optional[str] = f"{JW_DELIVERY_BASE}/playlists/{playlist_id}"
+    params: Optional[Dict] = {'page_limit': MEDIA_PAGE_LIMIT}
+    while url:
+        r = request_with_retry(session, 'GET', url, limiter=limiter, params=params, timeout=15)
+        if r.status_code == 404:
+            break  # empty or deleted playlist
         r.raise_for_status()
         data = r.json()
-        # JW returns 'playlists' or 'results' depending on endpoint
-        items = data.get('playlists') or data.get('results') or data
-        if isinstance(items, list):
-            playlists.extend(items)
-        elif isinstance(items, dict) and 'items' in items:
-            playlists.extend(items['items'])
-        else:
-            logging.warning('Unexpected playlists payload shape: %s', type(items))
-    except Exception as e:
-        logging.error('Error fetching JW playlists: %s', e)
-    return playlists
+        media.extend(data.get('playlist') or [])
+        url = (data.get('links') or {}).get('next')
+        params = None  # the next link already carries its query string
+    return media
+
+
+_DONE = object()
+
 
+def bounded_map(pool: ThreadPoolExecutor, fn: Callable, items: Iterable, window: int) -> Iterator[Tuple[object, object]]:
+    """Like pool.map but yielding (item, result|exception) as they complete, with at most `window`
+    tasks in flight, so memory stays bounded regardless of how many items there are."""
+    pending = {}
+    it = iter(items)
+    for item in it:
+        pending[pool.submit(fn, item)] = item
+        if len(pending) >= window:
+            break
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            item = pending.pop(fut)
+            exc = fut.exception()
+            yield item, (exc if exc is not None else fut.result())
+            nxt = next(it, _DONE)
+            if nxt is not _DONE:
+                pending[pool.submit(fn, nxt)] = nxt
 
-def normalize_jw_playlist(pl: Dict) -> Dict:
+
+def normalize_jw_playlist(pl: Dict, media: Optional[List[Dict]] = None) -> Dict:
+    """`media` None means the media list could not be fetched: seasons are then left untouched."""
+    meta = pl.get('metadata') or pl.get('meta') or {}
     return {
         'id': pl.get('id') or pl.get('playlist_id') or pl.get('uid'),
-        'title': pl.get('name') or pl.get('title'),
-        'description': pl.get('description') or pl.get('meta', {}).get('description'),
-        'image': pl.get('image') or pl.get('poster') or pl.get('thumbnail'),
+        'title': pl.get('name') or pl.get('title') or meta.get('title'),
+        'description': pl.get('description') or meta.get('description'),
+        # Fall back to the first media poster when the playlist has no image of its own
+        'image': pl.get('image') or pl.get('poster') or pl.get('thumbnail') or next(
+            (m.get('image') for m in media or [] if m.get('image')), None),
+        'media': media,
         'raw': pl,
     }
 
 
-def upsert_backend_playlist(api_url: str, token: Optional[str], normalized: Dict, dry_run: bool = True) -> bool:
-    payload = {
-        'id': normalized['id'] or f"jw-{abs(hash(normalized.get('title') or 'no-title'))}",
-        'segid': 0,
+def backend_payload(normalized: Dict, segid: int = 0) -> Dict:
+    """Payload for /bulk/playlists. No `categories` key, so manually assigned categories are kept."""
+    return {
+        # Stable SHA-1 id when JW gives none: Python's hash() is randomized per process
+        'id': normalized['id'] or stable_id(normalized.get('title') or 'no-title', normalized.get('image')),
+        'segid': segid,
         'img': normalized.get('image'),
         'title': normalized.get('title') or '',
         'desc': normalized.get('description') or '',
-        'categories': [],
     }
-    logging.info('Prepared payload id=%s title=%s', payload['id'], payload['title'][:60])
+
+
+def season_payloads(playlist_id: str, media: List[Dict], default_title: str = DEFAULT_SEASON_TITLE,
+                    known_titles: Iterable[str] = ()) -> List[Dict]:
+    """Maps a playlist's media to /bulk/seasons payloads. Media carrying a `seasonNumber` (or
+    `season`) custom param are grouped per season; everything else goes to `default_title`.
+    Each payload lists the full set of video ids: the backend deactivates the ones missing.
+    Seasons synced before (`known_titles`) that no longer have media get an empty list, and so
+    does the default season when the playlist has no media at all: the backend deactivates all
+    their videos (and does not create a season for an empty list)."""
+    groups: Dict[str, List[str]] = {}
+    for m in media:
+        vid = m.get('mediaid') or m.get('id')
+        if not vid:
+            continue
+        number = m.get('seasonNumber') or m.get('season')
+        title = f'Temporada {number}' if number else default_title
+        groups.setdefault(title, []).append(vid)
+    for title in known_titles:
+        groups.setdefault(title, [])
+    if not media:
+        groups.setdefault(default_title, [])
+    return [{'playlist_id': playlist_id, 'title': title, 'videos': videos} for title, videos in groups.items()]
+
+
+def upsert_backend_batch(session: requests.Session, api_url: str, normalized: List[Dict], dry_run: bool = True,
+                         state: Optional[IngestState] = None, stats: Optional[RunStats] = None,
+                         force: bool = False, segid: int = 0,
+                         default_season: str = DEFAULT_SEASON_TITLE,
+                         timings: Optional[Dict[str, float]] = None) -> int:
+    """Upserts one batch through POST /bulk/playlists, then syncs the media of those playlists
+    through POST /bulk/seasons. Unchanged items and seasons are skipped. Returns failures."""
+    stats = stats or RunStats()
+    pending = []
+    ready = []  # playlists that exist in the backend after this batch (unchanged or applied)
+    for pl in normalized:
+        payload = backend_payload(pl, segid)
+        digest = content_hash(payload)
+        if state and not force and state.is_unchanged(payload['id'], digest):
+            stats.incr('items_unchanged')
+            ready.append((payload['id'], pl))
+            continue
+        pending.append((payload, digest, pl))
+    failures = 0
+    if pending:
+        logging.info('Prepared batch of %d payloads (first id=%s)', len(pending), pending[0][0]['id'])
+        if dry_run:
+            ready += [(pl['id'], n) for pl, _, n in pending]
+        else:
+            with stats.timed('post_playlists', timings):
+                statuses = post_playlist_batch(session, api_url, [pl for pl, _, _ in pending])
+            stats.incr('batches')
+            applied = [(pl['id'], digest) for pl, digest, _ in pending if statuses.get(pl['id']) in BULK_OK_STATUS]
+            stats.incr('upserted', len(applied))
+            failures = len(pending) - len(applied)
+            stats.incr('item_failures', failures)
+            if state and applied:
+                state.mark_items(applied)
+            ready += [(pl['id'], n) for pl, _, n in pending if statuses.get(pl['id']) in BULK_OK_STATUS]
+
+    seasons = []
+    for pid, pl in ready:
+        if pl.get('media') is None:
+            continue  # media list unknown (fetch failed): do not deactivate anything
+        prefix = season_key(pid, '')
+        known = [key[len(prefix):] for key in state.items_with_prefix(prefix)] if state else []
+        for payload in season_payloads(pid, pl['media'], default_season, known):
+            digest = content_hash(payload)
+            key = season_key(pid, payload['title'])
+            if state and not force and state.is_unchanged(key, digest):
+                stats.incr('seasons_unchanged')
+                continue
+            seasons.append((key, payload, digest))
+    if not seasons:
+        return failures
+    logging.info('Prepared %d seasons with %d videos', len(seasons), sum(len(p['videos']) for _, p, _ in seasons))
     if dry_run:
-        return True
-    headers = {'Content-Type': 'application/json'}
-    if token:
-        headers['Authorization'] = token
-    try:
-        r = requests.post(f"{api_url.rstrip('/')}/uiplaylist", json=payload, headers=headers, timeout=15)
-        r.raise_for_status()
-        logging.info('Upsert OK %s', payload['id'])
-        return True
-    except Exception as e:
-        logging.error('Upsert failed for %s: %s', payload['id'], e)
-        return False
+        return failures
+    with stats.timed('post_seasons', timings):
+        statuses = post_season_batch(session, api_url, [p for _, p, _ in seasons])
+    synced = [(key, digest) for key, _, digest in seasons if statuses.get(key) in SEASON_OK_STATUS]
+    stats.incr('seasons_synced', len(synced))
+    stats.incr('season_failures', len(seasons) - len(synced))
+    if state and synced:
+        state.mark_items(synced)
+    return failures + len(seasons) - len(synced)
+
+
+class CatalogIngest:
+    """Walks the whole JW catalog and streams it into the backend.
+
+    Page 1 is fetched first to learn `total`; the remaining pages and every playlist's media
+    list are fetched in parallel (bounded in-flight windows, per-host rate limit) and flushed
+    to /bulk/playlists + /bulk/seasons every `batch_size` playlists, so memory does not grow
+    with the site.
+    """
+
+    def __init__(self, jw: requests.Session, delivery: requests.Session, backend: requests.Session,
+                 site_id: str, api_url: str, concurrency: int = 4, rate: float = 2.0,
+                 page_length: int = PAGE_LENGTH, batch_size: int = 200, segid: int = 0,
+                 state: Optional[IngestState] = None, force: bool = False, dry_run: bool = True,
+                 default_season: str = DEFAULT_SEASON_TITLE, journal: Optional[RunJournal] = None):
+        self.jw, self.delivery, self.backend = jw, delivery, backend
+        self.site_id, self.api_url = site_id, api_url
+        self.concurrency = max(1, concurrency)
+        self.limiter = HostRateLimiter(rate, burst=max(1.0, float(self.concurrency)))
+        self.page_length = page_length
+        self.batch_size = max(1, batch_size)
+        self.segid = segid
+        self.default_season = default_season
+        self.state, self.force, self.dry_run = state, force, dry_run
+        self.stats = RunStats()
+        self.buffer: List[Dict] = []
+        self.buffer_pages: List[Tuple[int, Dict[str, float], bool]] = []
+        # Run journal (checkpoints for --resume); None on dry-run
+        self.journal = journal
+
+    def page_step(self, page: int) -> str:
+        return f'{self.page_length}:{page}'
+
+    def fetch_page(self, page: int):
+        timings: Dict[str, float] = {}
+        with self.stats.timed('list', timings):
+            items, total = list_jw_playlists(self.jw, self.site_id, page, self.page_length, limiter=self.limiter)
+        return items, total, timings
+
+    def fetch_media(self, playlist: Dict) -> List[Dict]:
+        pid = playlist.get('id') or playlist.get('playlist_id')
+        return fetch_playlist_media(self.delivery, pid, limiter=self.limiter) if pid else []
+
+    def flush(self) -> None:
+        # The buffer holds whole pages and can exceed batch_size (page_length > batch_size):
+        # it is sent in requests of at most batch_size playlists
+        failures = 0
+        for start in range(0, len(self.buffer), self.batch_size):
+            batch = self.buffer[start:start + self.batch_size]
+            timings: Dict[str, float] = {}
+            failed = upsert_backend_batch(self.backend, self.api_url, batch, dry_run=self.dry_run,
+                                          state=self.state, stats=self.stats, force=self.force,
+                                          segid=self.segid, default_season=self.default_season,
+                                          timings=timings)
+            failures += failed
+            if self.journal:
+                self.journal.step_done('batch', f"{batch[0]['id']}+{len(batch)}", timings,
+                                       {'size': len(batch), 'failures': failed})
+        # A page is checkpointed once all of its playlists were applied; failed items keep the
+        # page open so that --resume retries it (applied ones are then skipped by content hash)
+        if self.journal and not failures:
+            for page, timings, complete in self.buffer_pages:
+                if complete:
+                    self.journal.step_done('page', self.page_step(page), timings)
+        self.buffer, self.buffer_pages = [], []
+
+    def consume_page(self, page: int, result, media_pool: ThreadPoolExecutor) -> None:
+        if isinstance(result, Exception):
+            logging.error('Error fetching JW playlists page %d: %s', page, result)
+            self.stats.incr('page_failures')
+            return
+        items, _, timings = result
+        self.stats.incr('pages')
+        self.stats.incr('items', len(items))
+        complete = True
+        with self.stats.timed('media', timings):
+            for pl, media in bounded_map(media_pool, self.fetch_media, items, self.concurrency * 2):
+                if isinstance(media, Exception):
+                    logging.warning('Media list of playlist %s failed: %s', pl.get('id'), media)
+                    self.stats.incr('media_failures')
+                    complete = False
+                    media = None
+                self.stats.incr('media', len(media or []))
+                self.buffer.append(normalize_jw_playlist(pl, media))
+        self.buffer_pages.append((page, timings, complete))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def run(self) -> RunStats:
+        with ThreadPoolExecutor(max_workers=self.concurrency) as page_pool, \
+                ThreadPoolExecutor(max_workers=self.concurrency) as media_pool:
+            try:
+                first = self.fetch_page(1)
+            except Exception as e:
+                logging.error('Error fetching JW playlists: %s', e)
+                self.stats.incr('page_failures')
+                return self.stats
+            total = first[1]
+            pages = max(1, math.ceil(total / self.page_length))
+            logging.info('Site has %d playlists in %d pages', total, pages)
+            done = set()
+            if self.journal and self.journal.resumed:
+                done = self.journal.completed('page')
+                logging.info('Resuming run %d: %d pages already done', self.journal.run_id, len(done))
+                self.stats.incr('pages_resumed', len(done))
+            # Page 1 is always fetched (it carries the total) but only applied if not done yet
+            if self.page_step(1) not in done:
+                self.consume_page(1, first, media_pool)
+            todo = [p for p in range(2, pages + 1) if self.page_step(p) not in done]
+            for page, result in bounded_map(page_pool, self.fetch_page, todo, self.concurrency):
+                self.consume_page(page, result, media_pool)
+            self.flush()
+        return self.stats
+
+
+def run_failures(stats: RunStats) -> int:
+    return sum(stats.get(k) for k in ('page_failures', 'media_failures', 'item_failures', 'season_failures'))
+
+
+def daemon_cycle(make_ingest: Callable[[Optional[RunJournal]], 'CatalogIngest'],
+                 state: Optional[IngestState], params: Optional[Dict[str, Any]] = None) -> str:
+    """One scheduled pass over the catalog. Each cycle is a journaled run; a cycle cut short
+    (crash, SIGTERM) is resumed by the next one instead of starting over, as long as it was
+    started with the same `params`."""
+    journal = RunJournal(state, 'jw_api_ingest', resume=True, params=params) if state else None
+    stats = make_ingest(journal).run()
+    failed = run_failures(stats)
+    if journal:
+        journal.finish('incomplete' if failed else 'finished', stats.summary())
+    stats.log_summary('Ingest summary')
+    if failed:
+        return FAILED
+    return CHANGED if stats.get('upserted') or stats.get('seasons_synced') else UNCHANGED
 
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument('--dry-run', action='store_true')
+    p.add_argument('--state', default=os.environ.get('JW_STATE_PATH', DEFAULT_STATE_PATH),
+                   help='SQLite state file (content hash per playlist and season)')
+    p.add_argument('--force', action='store_true', help='Ignore saved state and re-upsert everything')
+    p.add_argument('--resume', action='store_true',
+                   help='Continue the last interrupted run, skipping listing pages already applied')
+    p.add_argument('--batch-size', type=int, default=int(os.environ.get('JW_BATCH_SIZE', '200')),
+                   help='Playlists per request to /bulk/playlists')
+    p.add_argument('--segment-id', type=int, default=int(os.environ.get('JW_SEGMENT_ID', '0')),
+                   help='Segment assigned to ingested playlists (backend requires > 0)')
+    p.add_argument('--concurrency', type=int, default=int(os.environ.get('JW_CONCURRENCY', '4')),
+                   help='Parallel JW requests (listing pages and media lists)')
+    p.add_argument('--rate', type=float, default=float(os.environ.get('JW_RATE', '2.0')),
+                   help='Max JW requests per second per host (0 = unlimited)')
+    p.add_argument('--page-length', type=int, default=int(os.environ.get('JW_PAGE_LENGTH', str(PAGE_LENGTH))),
+                   help='Playlists per listing page')
+    p.add_argument('--season-title', default=os.environ.get('JW_SEASON_TITLE', DEFAULT_SEASON_TITLE),
+                   help='Season for media without a seasonNumber custom param')
+    add_daemon_args(p)
     args = p.parse_args()
 
     jw_key = os.environ.get('JW_API_KEY')
@@ -122,13 +415,45 @@ def main():
         return
 
     token = fetch_backend_token_if_needed(api_url)
+    pool = max(1, args.concurrency)
+    jw = make_session(pool_size=pool, headers={'Authorization': f'Bearer {jw_key}', 'Accept': 'application/json'})
+    # The Delivery API is public: do not leak the management key to the CDN host
+    delivery = make_session(pool_size=pool, headers={'Accept': 'application/json'})
+    backend = make_session(pool_size=2)
+    # Token reused across daemon cycles and refreshed only on 401
+    backend.auth = BackendAuth(api_url, token, lambda: fetch_backend_token_if_needed(api_url))
+    # Dry-run does not touch the state; --force ignores it when reading but still updates it
+    state = None if args.dry_run else IngestState(args.state)
 
-    playlists = list_jw_playlists(jw_key, site_id)
-    logging.info('Found %d playlists', len(playlists))
-    normalized = [normalize_jw_playlist(p) for p in playlists]
+    def make_ingest(journal: Optional[RunJournal]) -> CatalogIngest:
+        return CatalogIngest(jw, delivery, backend, site_id, api_url, concurrency=args.concurrency,
+                             rate=args.rate, page_length=max(1, args.page_length), batch_size=args.batch_size,
+                             segid=args.segment_id, state=state, force=args.force, dry_run=args.dry_run,
+                             default_season=args.season_title, journal=journal)
 
-    for pl in normalized:
-        upsert_backend_playlist(api_url, token, pl, dry_run=args.dry_run)
+    # A run is only resumed with the same params: its pages and batches mean nothing otherwise
+    params = {'site_id': site_id, 'page_length': max(1, args.page_length), 'batch_size': args.batch_size,
+              'segment_id': args.segment_id}
+    if args.daemon:
+        try:
+            # The whole site is one scheduled source: its interval adapts to how often it changes
+            run_daemon({f'site:{site_id}': lambda: daemon_cycle(make_ingest, state, params)}, args,
+                       concurrency=1)
+        finally:
+            if state:
+                state.close()
+        return
+
+    journal = RunJournal(state, 'jw_api_ingest', resume=args.resume, params=params) if state else None
+    try:
+        stats = make_ingest(journal).run()
+        # A crash before this point leaves the run 'running', so that --resume picks it up
+        if journal:
+            journal.finish('incomplete' if run_failures(stats) else 'finished', stats.summary())
+    finally:
+        if state:
+            state.close()
+    stats.log_summary('Ingest summary')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,293 @@
+"""
+Modo daemon (`--daemon`) de los scripts de ingestión JW: planificador interno en un solo proceso.
+
+Frente a cron/systemd timer (un proceso por ejecución, misma cadencia para todo):
+- Cada fuente tiene su propio intervalo adaptativo: si cambió se acorta (÷2), si no cambió
+  se alarga (×1.5), siempre entre `min_interval` y `max_interval`.
+- Jitter sobre cada próxima ejecución para que las fuentes no se disparen a la vez.
+- La Session HTTP y el token del backend se crean una vez y se reutilizan entre ciclos
+  (el token se renueva solo ante un 401, ver `jw_http.BackendAuth`).
+- Estado consultable: archivo JSON (escritura atómica) y, opcionalmente, `GET /status`
+  en un puerto local con próximas ejecuciones, intervalos y últimas duraciones.
+- SIGTERM/SIGINT terminan las tareas en curso, escriben el estado y salen.
+
+Los intervalos aprendidos se recuperan del archivo de estado al reiniciar.
+
+Uso:
+  python3 scripts/jw_ingest.py --daemon --min-interval 900 --max-interval 21600 --status-port 8790
+  python3 scripts/jw_api_ingest.py --daemon --segment-id 3
+"""
+
+import heapq
+import json
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+DEFAULT_STATUS_PATH = "scripts/jw_daemon_status.json"
+
+# Resultados que devuelve cada tarea
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+FAILED = "failed"
+
+SPEEDUP = 0.5    # factor del intervalo cuando la fuente cambió
+SLOWDOWN = 1.5   # factor cuando no cambió
+FAILURE_RETRY = 0.25  # primer reintento tras un fallo (fracción del intervalo); luego se duplica
+STARTUP_SPREAD = 60.0  # segundos en los que se reparten las primeras ejecuciones
+
+
+class SourceSchedule:
+    """Planificación de una fuente: intervalo adaptativo y métricas de la última ejecución."""
+
+    def __init__(self, key: str, interval: float):
+        self.key = key
+        self.interval = interval
+        self.next_run = 0.0
+        self.last_run: Optional[float] = None
+        self.last_duration: Optional[float] = None
+        self.last_result: Optional[str] = None
+        self.last_changed: Optional[float] = None
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    def as_dict(self) -> Dict:
+        return {
+            "interval_s": round(self.interval, 1),
+            "next_run": _iso(self.next_run),
+            "last_run": _iso(self.last_run),
+            "last_duration_s": None if self.last_duration is None else round(self.last_duration, 3),
+            "last_result": self.last_result,
+            "last_changed": _iso(self.last_changed),
+            "runs": self.runs,
+            "failures": self.failures,
+        }
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return None if not ts else time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+class Scheduler:
+    """Ejecuta `jobs[key]()` (que devuelve CHANGED/UNCHANGED/FAILED) según la planificación de cada key."""
+
+    def __init__(self, jobs: Dict[str, Callable[[], str]], min_interval: float = 900,
+                 max_interval: float = 6 * 3600, initial_interval: Optional[float] = None,
+                 jitter: float = 0.1, concurrency: int = 4, status_path: Optional[str] = DEFAULT_STATUS_PATH,
+                 clock: Callable[[], float] = time.time, on_cycle: Optional[Callable[[], Any]] = None):
+        self.jobs = jobs
+        # Se llama al terminar cada ciclo (tandas de tareas hasta que no queda ninguna en curso)
+        self.on_cycle = on_cycle
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.jitter = max(0.0, min(jitter, 0.9))
+        self.concurrency = max(1, concurrency)
+        self.status_path = status_path
+        self.clock = clock
+        self.started = clock()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        start_interval = initial_interval or min_interval
+        self.sources: Dict[str, SourceSchedule] = {k: SourceSchedule(k, start_interval) for k in jobs}
+        self._restore()
+        now = clock()
+        # Primera ejecución repartida en los primeros segundos para no lanzar todo a la vez
+        spread = min(STARTUP_SPREAD, self.min_interval)
+        for s in self.sources.values():
+            s.next_run = now + random.uniform(0, spread)
+        self.heap: List[Tuple[float, str]] = [(s.next_run, k) for k, s in self.sources.items()]
+        heapq.heapify(self.heap)
+
+    # ---- planificación ----
+    def next_interval(self, s: SourceSchedule, result: str) -> float:
+        if result == FAILED:
+            # Reintento temprano con backoff exponencial; el intervalo aprendido no cambia
+            s.consecutive_failures += 1
+            delay = s.interval * FAILURE_RETRY * (2 ** (s.consecutive_failures - 1))
+            return min(self.max_interval, max(self.min_interval * FAILURE_RETRY, delay))
+        s.consecutive_failures = 0
+        if result == CHANGED:
+            s.interval = max(self.min_interval, s.interval * SPEEDUP)
+        else:
+            s.interval = min(self.max_interval, s.interval * SLOWDOWN)
+        return s.interval
+
+    def record(self, key: str, result: str, started: float, duration: float) -> None:
+        with self.lock:
+            s = self.sources[key]
+            s.runs += 1
+            s.last_run, s.last_duration, s.last_result = started, duration, result
+            if result == CHANGED:
+                s.last_changed = started
+            elif result == FAILED:
+                s.failures += 1
+            delay = self.next_interval(s, result)
+            s.next_run = self.clock() + delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+            heapq.heappush(self.heap, (s.next_run, key))
+
+    def _run_job(self, key: str) -> None:
+        started = self.clock()
+        t0 = time.monotonic()
+        try:
+            result = self.jobs[key]()
+        except Exception as e:
+            logging.exception("Tarea %s falló: %s", key, e)
+            result = FAILED
+        duration = time.monotonic() - t0
+        self.record(key, result if result in (CHANGED, UNCHANGED, FAILED) else FAILED, started, duration)
+        logging.info("%s -> %s en %.1fs; próxima en %.0fs", key, result, duration,
+                     self.sources[key].next_run - self.clock())
+        self.write_status()
+
+    def due(self) -> List[str]:
+        now = self.clock()
+        out = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                ts, key = heapq.heappop(self.heap)
+                if ts == self.sources[key].next_run:  # entradas obsoletas se descartan
+                    out.append(key)
+        return out
+
+    def seconds_to_next(self) -> float:
+        with self.lock:
+            return max(0.0, self.heap[0][0] - self.clock()) if self.heap else self.min_interval
+
+    def run_forever(self, poll: float = 30.0) -> None:
+        """Bucle principal: lanza las fuentes vencidas (máx. `concurrency` a la vez) y duerme hasta la siguiente."""
+        running: Dict[str, Future] = {}
+        busy = False
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="jw-daemon") as pool:
+            self.write_status()
+            while not self.stop_event.is_set():
+                for key in [k for k, f in running.items() if f.done()]:
+                    running.pop(key)
+                if busy and not running:
+                    busy = False
+                    self.end_cycle()
+                for key in self.due():
+                    if key in running:  # aún en curso: se vuelve a planificar al terminar
+                        continue
+                    running[key] = pool.submit(self._run_job, key)
+                    busy = True
+                self.stop_event.wait(min(poll, max(0.5, self.seconds_to_next())))
+            logging.info("Deteniendo daemon: esperando %d tareas en curso", len(running))
+        if busy:
+            self.end_cycle()
+        self.write_status()
+
+    def end_cycle(self) -> None:
+        if self.on_cycle is None:
+            return
+        try:
+            self.on_cycle()
+        except Exception as e:
+            logging.exception("Fin de ciclo falló: %s", e)
+
+    def stop(self, *_args) -> None:
+        self.stop_event.set()
+
+    # ---- estado ----
+    def status(self) -> Dict:
+        with self.lock:
+            sources = {k: s.as_dict() for k, s in self.sources.items()}
+        return {
+            "pid": os.getpid(),
+            "started": _iso(self.started),
+            "updated": _iso(self.clock()),
+            "uptime_s": round(self.clock() - self.started, 1),
+            "sources": sources,
+        }
+
+    def write_status(self) -> None:
+        if not self.status_path:
+            return
+        data = self.status()
+        tmp = f"{self.status_path}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp, self.status_path)  # los lectores nunca ven un archivo a medias
+        except OSError as e:
+            logging.warning("No se pudo escribir el estado del daemon %s: %s", self.status_path, e)
+
+    def _restore(self) -> None:
+        """Recupera los intervalos aprendidos y contadores de un arranque anterior."""
+        if not self.status_path or not os.path.exists(self.status_path):
+            return
+        try:
+            with open(self.status_path) as f:
+                previous = json.load(f).get("sources", {})
+        except (OSError, ValueError):
+            return
+        for key, s in self.sources.items():
+            prev = previous.get(key)
+            if prev and prev.get("interval_s"):
+                s.interval = min(self.max_interval, max(self.min_interval, float(prev["interval_s"])))
+                s.runs = int(prev.get("runs") or 0)
+                s.failures = int(prev.get("failures") or 0)
+                s.last_result = prev.get("last_result")
+                s.last_duration = prev.get("last_duration_s")
+
+
+def serve_status(scheduler: Scheduler, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """`GET /status` con el mismo JSON que el archivo de estado (hilo en segundo plano)."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("/status", ""):
+                self.send_error(404)
+                return
+            body = json.dumps(scheduler.status()).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="jw-daemon-status", daemon=True).start()
+    logging.info("Estado del daemon en http://%s:%d/status", host, port)
+    return server
+
+
+def add_daemon_args(p) -> None:
+    """Opciones comunes de --daemon para jw_ingest.py y jw_api_ingest.py."""
+    p.add_argument("--daemon", action="store_true", help="Proceso persistente con planificador interno")
+    p.add_argument("--min-interval", type=float, default=float(os.environ.get("JW_MIN_INTERVAL", "900")),
+                   help="Intervalo mínimo por fuente en segundos (fuentes que cambian a menudo)")
+    p.add_argument("--max-interval", type=float, default=float(os.environ.get("JW_MAX_INTERVAL", str(6 * 3600))),
+                   help="Intervalo máximo por fuente en segundos (fuentes que no cambian)")
+    p.add_argument("--jitter", type=float, default=float(os.environ.get("JW_JITTER", "0.1")),
+                   help="Jitter relativo sobre cada próxima ejecución (0.1 = ±10%%)")
+    p.add_argument("--status-file", default=os.environ.get("JW_STATUS_PATH", DEFAULT_STATUS_PATH),
+                   help="Archivo JSON con el estado del daemon")
+    p.add_argument("--status-port", type=int, default=int(os.environ.get("JW_STATUS_PORT", "0")),
+                   help="Puerto local para GET /status (0 = desactivado)")
+
+
+def run_daemon(jobs: Dict[str, Callable[[], str]], args, concurrency: int = 4,
+               on_cycle: Optional[Callable[[], Any]] = None) -> None:
+    scheduler = Scheduler(jobs, min_interval=args.min_interval, max_interval=args.max_interval,
+                          jitter=args.jitter, concurrency=concurrency, status_path=args.status_file,
+                          on_cycle=on_cycle)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    signal.signal(signal.SIGINT, scheduler.stop)
+    server = serve_status(scheduler, args.status_port) if args.status_port else None
+    logging.info("Daemon iniciado con %d fuentes (intervalo %.0f-%.0fs)", len(jobs),
+                 scheduler.min_interval, scheduler.max_interval)
+    try:
+        scheduler.run_forever()
+    finally:
+        if server:
+            server.shutdown()
@@ -0,0 +1,268 @@
+"""
+Extracción de la configuración JWPlayer desde HTML en una sola pasada (usado por jw_ingest.py).
+
+Las regex anteriores (`({[\\s\\S]*?})\\s*\\)`) retrocedían sobre todo el documento en páginas
+de varios MB y cortaban el objeto en el primer `})` (p. ej. dentro de un string o de una
+función anidada). `ConfigScanner` en cambio:
+
+- localiza los anclajes `jwplayer(...).setup(` y `playlist:`;
+- extrae el objeto/array balanceado respetando strings ('...', "...", `...`), escapes y
+  comentarios JS, saltando con regex directamente al siguiente carácter relevante;
+- acepta el documento por trozos (`feed`) y avisa en cuanto encuentra un `setup(...)` válido,
+  de modo que el resto de la respuesta no se descarga (`scan_response` con `iter_content`).
+
+Cada carácter se examina un número acotado de veces: tiempo lineal en el tamaño de la página.
+Benchmark: `python3 scripts/bench_jw_extract.py`.
+"""
+
+import codecs
+import json
+import logging
+import re
+from typing import Optional, Iterable, Tuple
+
+import requests
+
+_json_like_fix_trailing_comma = re.compile(r",\s*([}\]])")
+
+# Una sola regex con alternativas: cada búsqueda se detiene en el anclaje más cercano, sea cual sea.
+# El argumento de jwplayer(...) se acota para que un "jwplayer(" suelto no dispare búsquedas largas
+_ANCHOR = re.compile(r"(?P<setup>jwplayer\s*\([^()]{0,256}\)\s*\.\s*setup\s*\(\s*)|(?P<playlist>playlist\s*:\s*)",
+                     re.IGNORECASE)
+# Caracteres que se conservan entre trozos para no perder un anclaje partido en dos
+ANCHOR_TAIL = 320
+
+_CODE_STOP = re.compile(r"[{}\[\]\"'`/]")
+_STRING_STOP = {q: re.compile(r"[\\%s]" % q) for q in "\"'`"}
+
+CHUNK_SIZE = 64 * 1024
+# Un objeto de configuración mayor que esto se descarta (evita acumular páginas enteras)
+MAX_CONFIG_CHARS = 8 * 1024 * 1024
+
+
+def _attempt_json_load(s: str):
+    """Intentar parsear una cadena como JSON tolerante: primero como JSON puro,
+    luego reemplazando comillas simples por dobles y eliminando comas finales.
+    No es 100% robusto pero funciona en muchos embeds simples."""
+    try:
+        return json.loads(s)
+    except Exception:
+        # intentar arreglos simples
+        try:
+            s2 = s.replace("\\'", "\\\\'")
+            s2 = s2.replace("'", '"')
+            s2 = _json_like_fix_trailing_comma.sub(r"\1", s2)
+            return json.loads(s2)
+        except Exception as e:
+            logging.debug("json tolerant parse failed: %s", e)
+            return None
+
+
+class ConfigScanner:
+    """Escáner incremental: `feed(trozo)` devuelve True cuando ya encontró un setup() válido."""
+
+    def __init__(self):
+        self.buf = ""
+        self.search_pos = 0          # desde dónde buscar anclajes en `buf`
+        self.capture: Optional[str] = None  # 'setup' | 'playlist' mientras se extrae un valor
+        self.start = 0               # índice del '{' / '[' inicial
+        self.pos = 0                 # siguiente carácter por examinar
+        self.depth = 0
+        self.mode = "code"           # code | string | line_comment | block_comment
+        self.quote = ""
+        self.comment_start = 0
+        self.comments = []           # tramos (inicio, fin) de comentarios dentro del valor
+        self.config: Optional[dict] = None
+        self.fallback: Optional[dict] = None  # primer `playlist: [...]` parseable
+        self.chars_read = 0
+
+    @property
+    def done(self) -> bool:
+        return self.config is not None
+
+    def result(self) -> Optional[dict]:
+        return self.config if self.config is not None else self.fallback
+
+    def feed(self, chunk: str) -> bool:
+        if self.done:
+            return True
+        self.buf += chunk
+        self.chars_read += len(chunk)
+        while not self.done:
+            if self.capture is None:
+                if not self._find_anchor():
+                    break
+            elif not self._scan_value():
+                break
+        return self.done
+
+    def finish(self) -> Optional[dict]:
+        """Fin del documento: un valor a medias se descarta."""
+        self.capture = None
+        return self.result()
+
+    # ---- anclajes ----
+    def _find_anchor(self) -> bool:
+        """Busca el siguiente anclaje. False si hacen falta más datos."""
+        buf = self.buf
+        m = _ANCHOR.search(buf, self.search_pos)
+        if m is None:
+            # Nada que capturar: recortar el buffer dejando solo la cola por si hay un anclaje partido
+            keep_from = max(self.search_pos, len(buf) - ANCHOR_TAIL)
+            self.buf = buf[keep_from:]
+            self.search_pos = 0
+            return False
+        kind = m.lastgroup
+        end = m.end()
+        if end >= len(buf):
+            # El anclaje (o los espacios tras él) llega al final del trozo: esperar más datos
+            self.buf = buf[m.start():]
+            self.search_pos = 0
+            return False
+        opener = "{" if kind == "setup" else "["
+        if buf[end] != opener or (kind == "playlist" and self.fallback is not None):
+            self.search_pos = m.start() + 1
+            return True
+        self.capture = kind
+        # Lo anterior al valor ya no hace falta
+        self.buf = buf[end:]
+        self.search_pos = 0
+        self.start = self.pos = 0
+        self.depth = 0
+        self.mode = "code"
+        self.comments = []
+        return True
+
+    # ---- valor balanceado ----
+    def _scan_value(self) -> bool:
+        """Avanza sobre el valor capturado. False si hacen falta más datos."""
+        buf = self.buf
+        n = len(buf)
+        pos = self.pos
+        while True:
+            if self.mode == "code":
+                m = _CODE_STOP.search(buf, pos)
+                if not m:
+                    pos = n
+                    break
+                i = m.start()
+                c = buf[i]
+                if c in "{[":
+                    self.depth += 1
+                elif c in "}]":
+                    self.depth -= 1
+                    if self.depth == 0:
+                        self.pos = i + 1
+                        self._complete(i + 1)
+                        return True
+                elif c == "/":
+                    if i + 1 >= n:
+                        pos = i  # decidir con el siguiente trozo
+                        break
+                    nxt = buf[i + 1]
+                    if nxt in "/*":
+                        self.mode = "line_comment" if nxt == "/" else "block_comment"
+                        self.comment_start = i
+                        i += 1
+                else:
+                    self.mode = "string"
+                    self.quote = c
+                pos = i + 1
+            elif self.mode == "string":
+                m = _STRING_STOP[self.quote].search(buf, pos)
+                if not m:
+                    pos = n
+                    break
+                i = m.start()
+                if buf[i] == "\\":
+                    if i + 1 >= n:
+                        pos = i
+                        break
+                    pos = i + 2
+                else:
+                    self.mode = "code"
+                    pos = i + 1
+            elif self.mode == "line_comment":
+                i = buf.find("\n", pos)
+                if i < 0:
+                    pos = n
+                    break
+                self.mode = "code"
+                self.comments.append((self.comment_start, i))
+                pos = i + 1
+            else:  # block_comment
+                i = buf.find("*/", pos)
+                if i < 0:
+                    pos = max(pos, n - 1)
+                    break
+                self.mode = "code"
+                self.comments.append((self.comment_start, i + 2))
+                pos = i + 2
+        self.pos = pos
+        if pos - self.start > MAX_CONFIG_CHARS:
+            logging.warning("Configuración jwplayer de más de %d caracteres; descartada", MAX_CONFIG_CHARS)
+            self._abandon()
+            return True
+        return False
+
+    def _complete(self, end: int) -> None:
+        text = self.buf[self.start:end]
+        if self.comments:
+            # JSON no admite comentarios JS: quitarlos (los tramos vienen del propio escaneo)
+            parts, prev = [], self.start
+            for c_start, c_end in self.comments:
+                parts.append(self.buf[prev:c_start])
+                prev = c_end
+            parts.append(self.buf[prev:end])
+            text = "".join(parts)
+        parsed = _attempt_json_load(text)
+        if self.capture == "setup" and isinstance(parsed, dict):
+            self.config = parsed
+        elif self.capture == "playlist" and isinstance(parsed, list) and self.fallback is None:
+            self.fallback = {"playlist": parsed}
+        if self.capture == "setup" and self.config is None:
+            # setup() no parseable: reintentar desde dentro (puede contener un `playlist: [...]`)
+            self.search_pos = self.start
+        else:
+            self.search_pos = end
+        self.capture = None
+
+    def _abandon(self) -> None:
+        self.search_pos = self.start + 1
+        self.capture = None
+
+
+def extract_jwplayer_config(html: str) -> Optional[dict]:
+    """Extrae el objeto pasado a jwplayer(...).setup({...}) o el playlist array.
+    Retorna dict con los campos encontrados (puede contener 'playlist' o props directas).
+    """
+    scanner = ConfigScanner()
+    scanner.feed(html)
+    return scanner.finish()
+
+
+def _response_charset(r: requests.Response) -> str:
+    # requests asume ISO-8859-1 para text/* sin charset; las páginas actuales son UTF-8
+    content_type = r.headers.get("Content-Type", "")
+    return r.encoding if "charset=" in content_type.lower() and r.encoding else "utf-8"
+
+
+def scan_chunks(chunks: Iterable[bytes], encoding: str = "utf-8") -> Tuple[Optional[dict], int]:
+    """Decodifica y escanea trozos hasta encontrar la configuración. Retorna (config, bytes leídos)."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    scanner = ConfigScanner()
+    read = 0
+    for chunk in chunks:
+        read += len(chunk)
+        if scanner.feed(decoder.decode(chunk)):
+            return scanner.result(), read
+    scanner.feed(decoder.decode(b"", final=True))
+    return scanner.finish(), read
+
+
+def scan_response(r: requests.Response, chunk_size: int = CHUNK_SIZE) -> Tuple[Optional[dict], int]:
+    """Lee una respuesta pedida con stream=True solo hasta encontrar la configuración y la cierra."""
+    try:
+        return scan_chunks(r.iter_content(chunk_size=chunk_size), _response_charset(r))
+    finally:
+        r.close()
@@ -0,0 +1,272 @@
+"""
+Utilidades HTTP compartidas por los scripts de ingestión JW (jw_ingest.py / jw_api_ingest.py).
+
+- Limitador por host (token bucket) para no saturar los sitios de origen.
+- Reintentos con backoff exponencial + jitter ante 429/5xx (respeta Retry-After).
+- Contadores thread-safe para el resumen de cada ejecución (pages/sec, items/sec, fallos).
+"""
+
+import random
+import threading
+import time
+import logging
+import requests
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from requests.auth import AuthBase
+from typing import Optional, Dict, List, Iterator, Callable
+from urllib.parse import urlparse
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+USER_AGENT = "jw-ingest/1.0 (+https://example.com)"
+
+
+class TokenBucket:
+    """Token bucket clásico: `rate` tokens/seg con ráfagas de hasta `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst if burst is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Bloquea hasta disponer de un token."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class HostRateLimiter:
+    """Un TokenBucket por hostname; se crean bajo demanda."""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str) -> None:
+        host = urlparse(url).hostname or ""
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = self.buckets[host] = TokenBucket(self.rate, self.burst)
+        bucket.acquire()
+
+
+def make_session(pool_size: int = 10, headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """Session con pool de conexiones dimensionado a la concurrencia (evita 'pool is full')."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({"User-Agent": USER_AGENT})
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+def _retry_after_seconds(r: requests.Response) -> Optional[float]:
+    value = r.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # formato fecha HTTP: usar backoff normal
+
+
+def request_with_retry(session: requests.Session, method: str, url: str,
+                       limiter: Optional[HostRateLimiter] = None, retries: int = 4,
+                       backoff_base: float = 0.5, backoff_cap: float = 30.0,
+                       **kwargs) -> requests.Response:
+    """Ejecuta la petición respetando el limitador del host y reintentando 429/5xx
+    y errores de conexión con backoff exponencial "full jitter". Devuelve la última
+    respuesta (aunque sea de error) o relanza la última excepción de red."""
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(url)
+        try:
+            r = session.request(method, url, **kwargs)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt >= retries:
+                raise
+            delay = random.uniform(0, min(backoff_cap, backoff_base * (2 ** attempt)))
+            logging.warning("%s %s falló (%s); reintento %d en %.1fs", method, url, e, attempt + 1, delay)
+        else:
+            if r.status_code not in RETRY_STATUS or attempt >= retries:
+                return r
+            delay = _retry_after_seconds(r)
+            if delay is None:
+                delay = random.uniform(0, min(backoff_cap, backoff_base * (2 ** attempt)))
+            logging.warning("%s %s -> %d; reintento %d en %.1fs", method, url, r.status_code, attempt + 1, delay)
+        attempt += 1
+        time.sleep(delay)
+
+
+class RunStats:
+    """Contadores thread-safe de una ejecución de ingestión."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts: Dict[str, int] = {}
+        self.timings: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def timed(self, stage: str, into: Optional[Dict[str, float]] = None) -> Iterator[None]:
+        """Acumula la duración de la etapa en el resumen (t_<stage>) y, si se pasa, en `into`
+        (los tiempos del paso que se guardan en el diario)."""
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - t0
+            with self.lock:
+                self.timings[stage] = self.timings.get(stage, 0.0) + elapsed
+            if into is not None:
+                into[stage] = round(into.get(stage, 0.0) + elapsed, 4)
+
+    def incr(self, name: str, n: int = 1) -> None:
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + n
+
+    def get(self, name: str) -> int:
+        with self.lock:
+            return self.counts.get(name, 0)
+
+    def summary(self) -> Dict[str, float]:
+        elapsed = max(1e-6, time.monotonic() - self.started)
+        with self.lock:
+            out: Dict[str, float] = dict(self.counts)
+            out.update({f"t_{stage}": round(t, 2) for stage, t in self.timings.items()})
+        out["elapsed_s"] = round(elapsed, 2)
+        out["pages_per_sec"] = round(out.get("pages", 0) / elapsed, 2)
+        out["items_per_sec"] = round(out.get("items", 0) / elapsed, 2)
+        return out
+
+    def log_summary(self, label: str = "Resumen") -> Dict[str, float]:
+        s = self.summary()
+        logging.info("%s: %s", label, " ".join(f"{k}={v}" for k, v in sorted(s.items())))
+        return s
+
+    def log_and_reset(self, label: str = "Resumen") -> Dict[str, float]:
+        """Registra lo acumulado y vuelve a cero (fin de un ciclo de --daemon: cada resumen
+        cubre solo su ciclo y los contadores no crecen durante toda la vida del proceso)."""
+        done = RunStats()
+        with self.lock:
+            done.started, done.counts, done.timings = self.started, self.counts, self.timings
+            self.started, self.counts, self.timings = time.monotonic(), {}, {}
+        return done.log_summary(label)
+
+
+# ---- Backend ----
+class BackendAuth(AuthBase):
+    """Bearer del backend, aplicado solo a las URLs bajo `api_url` (la Session compartida también
+    descarga páginas de terceros y no debe enviarles el token). Ante un 401 pide un token nuevo
+    con `refresh` y reintenta una vez: un proceso largo (--daemon) reutiliza el mismo token
+    entre ciclos y solo lo renueva cuando expira."""
+
+    def __init__(self, api_url: str, token: Optional[str], refresh: Optional[Callable[[], Optional[str]]] = None):
+        self.prefix = api_url.rstrip("/")
+        self.token = token
+        self.refresh = refresh
+        self.lock = threading.Lock()
+
+    def __call__(self, r: requests.PreparedRequest) -> requests.PreparedRequest:
+        if not (r.url or "").startswith(self.prefix):
+            return r
+        if self.token:
+            r.headers["Authorization"] = self.token
+        if self.refresh:
+            r.register_hook("response", self._handle_401)
+        return r
+
+    def _handle_401(self, resp: requests.Response, **kwargs) -> requests.Response:
+        if resp.status_code != 401 or getattr(resp.request, "_auth_retried", False):
+            return resp
+        sent = resp.request.headers.get("Authorization")
+        with self.lock:
+            if self.token == sent:  # otro hilo puede haberlo renovado ya
+                fresh = self.refresh()
+                if not fresh or fresh == self.token:
+                    return resp
+                logging.info("Token del backend renovado tras 401")
+                self.token = fresh
+        retry = resp.request.copy()
+        retry.headers["Authorization"] = self.token
+        retry._auth_retried = True
+        resp.content  # liberar la conexión antes de reenviar
+        resp.close()
+        new = resp.connection.send(retry, **kwargs)
+        new.history.append(resp)
+        new.request = retry
+        return new
+
+
+BULK_PLAYLISTS_PATH = "/bulk/playlists"
+BULK_OK_STATUS = {"inserted", "updated"}
+
+
+def post_playlist_batch(session: requests.Session, api_url: str, payloads: List[Dict],
+                        retries: int = 4, timeout: float = 60) -> Dict[str, str]:
+    """Envía un lote a POST /bulk/playlists y devuelve {id: status} por item.
+    Si la petición entera falla, todos los items quedan con status 'error'."""
+    url = f"{api_url.rstrip('/')}{BULK_PLAYLISTS_PATH}"
+    try:
+        r = request_with_retry(session, "POST", url, retries=retries, json={"playlists": payloads}, timeout=timeout)
+        if r.status_code not in (200, 201):
+            logging.error("Lote de %d playlists rechazado: %s %s", len(payloads), r.status_code, r.text[:200])
+            return {p["id"]: "error" for p in payloads}
+        statuses = {res.get("id"): res.get("status") for res in r.json().get("results", [])}
+    except Exception as e:
+        logging.error("Error enviando lote al backend: %s", e)
+        return {p["id"]: "error" for p in payloads}
+    for res_id, status in statuses.items():
+        if status not in BULK_OK_STATUS:
+            logging.warning("Playlist %s no aplicado: %s", res_id, status)
+    return {p["id"]: statuses.get(p["id"], "error") for p in payloads}
+
+
+BULK_SEASONS_PATH = "/bulk/seasons"
+SEASON_OK_STATUS = {"created", "updated", "unchanged"}
+
+
+def season_key(playlist_id: str, title: str) -> str:
+    """Clave de una temporada en el estado local y en las respuestas de /bulk/seasons."""
+    return f"season:{playlist_id}:{title}"
+
+
+def post_season_batch(session: requests.Session, api_url: str, payloads: List[Dict],
+                      retries: int = 4, timeout: float = 120) -> Dict[str, str]:
+    """Envía un lote a POST /bulk/seasons y devuelve {season_key: status}."""
+    url = f"{api_url.rstrip('/')}{BULK_SEASONS_PATH}"
+    keys = [season_key(p["playlist_id"], p["title"]) for p in payloads]
+    try:
+        r = request_with_retry(session, "POST", url, retries=retries, json={"seasons": payloads}, timeout=timeout)
+        if r.status_code not in (200, 201):
+            logging.error("Lote de %d temporadas rechazado: %s %s", len(payloads), r.status_code, r.text[:200])
+            return {k: "error" for k in keys}
+        data = r.json()
+    except Exception as e:
+        logging.error("Error enviando temporadas al backend: %s", e)
+        return {k: "error" for k in keys}
+    statuses = {season_key(res.get("playlist_id"), res.get("title")): res.get("status") for res in data.get("results", [])}
+    for key, status in statuses.items():
+        if status not in SEASON_OK_STATUS:
+            logging.warning("Temporada %s no aplicada: %s", key, status)
+    logging.info("Temporadas: %s videos nuevos, %s reactivados, %s desactivados",
+                 data.get("added"), data.get("reactivated"), data.get("deactivated"))
+    return {k: statuses.get(k, "error") for k in keys}
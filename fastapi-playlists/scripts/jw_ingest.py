@@ -1,70 +1,55 @@
 """
 Script ligero para extraer playlists/medios de páginas con embed JWPlayer
 - Enfoque: buscar `jwplayer(...).setup({...})` o estructuras `playlist: [...]` en el HTML
-- Normalizar y enviar los metadatos al backend mediante el endpoint existente `uiplaylist` (o adaptar)
+- Normalizar y enviar los metadatos al backend en lotes mediante `POST /bulk/playlists`
 
 Uso:
   export API_URL=https://mi-backend.example.com/api
   export API_TOKEN="Bearer ..."
-  python3 scripts/jw_ingest.py --config scripts/jw_sources.json
+  python3 scripts/jw_ingest.py --config scripts/jw_sources.json --concurrency 8 --rate 2 --segment-id 3
+
+Las fuentes se procesan en paralelo (--concurrency) con un token bucket por host (--rate req/s)
+y reintentos con backoff exponencial + jitter ante 429/5xx. Al final se registra un resumen
+(pages/sec, items/sec, fallos, fuentes/items sin cambios).
+
+Fuentes: cada entrada de --config es una URL (cada elemento del reproductor se ingiere como
+playlist) o un objeto {"url": ..., "playlist_id": ..., "season": "Temporada 1"}: entonces los
+elementos se sincronizan como videos de esa temporada vía `POST /bulk/seasons` (altas nuevas,
+bajas lógicas de los que ya no están, filas sin cambios intactas).
+
+Reanudación: cada ejecución lleva un diario en el mismo SQLite (fuentes y lotes completados,
+con tiempos por etapa). Si el proceso muere, `--resume` continúa la última ejecución sin
+repetir las fuentes terminadas; cada lote es una transacción en el backend.
+
+Re-ingestión idempotente: `--state` (SQLite) guarda ETag/Last-Modified por fuente y un hash por
+item; las fuentes que responden 304 y los items sin cambios se omiten. `--force` reprocesa todo.
+
+Modo daemon: `--daemon` mantiene el proceso vivo con un planificador interno (ver jw_daemon.py):
+intervalo propio por fuente según cuánto cambia, jitter, Session y token reutilizados y estado
+en `--status-file` / `--status-port`.
 
 Este script evita ejecutar JavaScript (no headless). Si las páginas requieren JS para construir el objeto jwplayer, usar Playwright/Headless (se documenta al final).
 """
 
-import re
 import json
 import argparse
 import logging
 import requests
-from typing import Optional, List, Dict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Tuple
 from urllib.parse import urlparse
 import os
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
-
-# --- Helpers de parsing ---
-_setup_regex = re.compile(r"jwplayer\([^)]*\)\.setup\s*\(\s*({[\s\S]*?})\s*\)", re.IGNORECASE)
-_playlist_regex = re.compile(r"playlist\s*:\s*(\[[\s\S]*?\])", re.IGNORECASE)
-_json_like_fix_trailing_comma = re.compile(r",\s*([}\]])")
-
+from jw_http import (HostRateLimiter, RunStats, make_session, request_with_retry,
+                     post_playlist_batch, post_season_batch, season_key, BackendAuth,
+                     BULK_OK_STATUS, SEASON_OK_STATUS)
+from jw_state import IngestState, RunJournal, DEFAULT_STATE_PATH, content_hash, stable_id
+from jw_daemon import CHANGED, UNCHANGED, FAILED, add_daemon_args, run_daemon
+from jw_extract import extract_jwplayer_config, scan_response  # noqa: F401 (extract_* se re-exporta)
 
-def _attempt_json_load(s: str) -> Optional[dict]:
-    """Intentar parsear una cadena como JSON tolerante: primero como JSON puro,
-    luego reemplazando comillas simples por dobles y eliminando comas finales.
-    No es 100% robusto pero funciona en muchos embeds simples."""
-    try:
-        return json.loads(s)
-    except Exception:
-        # intentar arreglos simples
-        try:
-            s2 = s.replace("\\'", "\\\\'")
-            s2 = s2.replace("'", '"')
-            s2 = _json_like_fix_trailing_comma.sub(r"\1", s2)
-            return json.loads(s2)
-        except Exception as e:
-            logging.debug("json tolerant parse failed: %s", e)
-            return None
-
-
-def extract_jwplayer_config(html: str) -> Optional[dict]:
-    """Extrae el objeto pasado a jwplayer(...).setup({...}) o el playlist array.
-    Retorna dict con los campos encontrados (puede contener 'playlist' o props directas).
-    """
-    m = _setup_regex.search(html)
-    if m:
-        obj_text = m.group(1)
-        parsed = _attempt_json_load(obj_text)
-        if parsed is not None:
-            return parsed
-    # fallback: buscar playlist: [ ... ]
-    m2 = _playlist_regex.search(html)
-    if m2:
-        arr_text = m2.group(1)
-        parsed = _attempt_json_load(arr_text)
-        if parsed is not None:
-            return {"playlist": parsed}
-    return None
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
 
+DEFAULT_SEASON_TITLE = "Temporada 1"
 
 def normalize_playlist_entry(entry: dict) -> Dict:
     """Normaliza una entrada de playlist/video del JWPlayer a un dict simple.
@@ -86,77 +71,230 @@ def normalize_playlist_entry(entry: dict) -> Dict:
     return out
 
 
+def playlist_payload(p: Dict, segid: int = 0) -> Dict:
+    """Payload para /bulk/playlists a partir de un item normalizado. Sin media id se usa un id
+    estable (SHA-1 de título + primer archivo) para que re-ingestar no duplique filas.
+    Sin `categories`: el backend conserva las categorías asignadas a mano."""
+    first_file = p["sources"][0].get("file") if p.get("sources") else None
+    return {
+        "id": p["id"] or stable_id(p.get("title") or "no-title", first_file),
+        "segid": segid,
+        "img": p.get("poster"),
+        "title": p.get("title") or "",
+        "desc": p.get("description") or "",
+    }
+
+
+def source_url(source) -> str:
+    return source if isinstance(source, str) else source["url"]
+
+
 class JWIngest:
-    def __init__(self, api_url: str, api_token: Optional[str] = None, allowed_hosts: Optional[List[str]] = None):
+    def __init__(self, api_url: str, api_token: Optional[str] = None, allowed_hosts: Optional[List[str]] = None,
+                 concurrency: int = 4, rate: float = 2.0, retries: int = 4,
+                 state: Optional[IngestState] = None, force: bool = False,
+                 batch_size: int = 200, segment_id: int = 0, journal: Optional[RunJournal] = None,
+                 token_refresh=None):
         self.api_url = api_url.rstrip("/")
         self.api_token = api_token
         self.allowed_hosts = allowed_hosts
-        self.session = requests.Session()
-        if api_token:
-            self.session.headers.update({"Authorization": api_token})
-        self.session.headers.update({"User-Agent": "jw-ingest/1.0 (+https://example.com)"})
-    def fetch(self, url: str) -> Optional[str]:
+        self.concurrency = max(1, concurrency)
+        self.retries = retries
+        # Una sola Session compartida por los workers, con pool del tamaño de la concurrencia
+        self.session = make_session(pool_size=self.concurrency)
+        # El token solo viaja al backend (no a las páginas de origen) y se renueva ante un 401
+        self.session.auth = BackendAuth(self.api_url, api_token, token_refresh)
+        # Token bucket por host de origen: `rate` peticiones/seg (el backend propio no se limita)
+        self.limiter = HostRateLimiter(rate)
+        self.stats = RunStats()
+        # Estado local (ETag/Last-Modified + hash por item); None = procesar todo siempre.
+        # Con force se ignora al leer pero se sigue actualizando.
+        self.state = state
+        self.force = force
+        self.batch_size = max(1, batch_size)
+        self.segment_id = segment_id
+        # Diario de la ejecución (checkpoints para --resume); None en dry-run
+        self.journal = journal
+
+    def fetch_response(self, url: str, stream: bool = False) -> Optional[requests.Response]:
+        """GET condicional: devuelve la respuesta (200 o 304) o None si falló.
+        Con stream=True el cuerpo queda sin leer (ver `scan_response`)."""
         parsed = urlparse(url)
         if self.allowed_hosts and parsed.hostname not in self.allowed_hosts:
             logging.warning("Host %s no está en allowed_hosts; saltando", parsed.hostname)
             return None
+        headers = self.state.conditional_headers(url) if (self.state and not self.force) else {}
         try:
-            r = self.session.get(url, timeout=15)
+            r = request_with_retry(self.session, "GET", url, limiter=self.limiter,
+                                   retries=self.retries, headers=headers, timeout=15, stream=stream)
+            if r.status_code == 304:
+                return r
             r.raise_for_status()
-            return r.text
+            self.stats.incr("pages")
+            return r
         except Exception as e:
             logging.error("Error fetching %s: %s", url, e)
             return None
 
-    def ingest_source(self, url: str, dry_run: bool = False) -> bool:
+    def fetch(self, url: str) -> Optional[str]:
+        r = self.fetch_response(url)
+        return r.text if r is not None and r.status_code != 304 else None
+
+    def ingest_source(self, source, dry_run: bool = False) -> bool:
+        """`source` es una URL (cada elemento se ingiere como playlist) o un dict
+        {"url", "playlist_id", "season"} (los elementos son los videos de esa temporada)."""
+        return self.ingest_source_result(source, dry_run) != FAILED
+
+    def ingest_source_result(self, source, dry_run: bool = False) -> str:
+        """Como `ingest_source`, pero devuelve CHANGED / UNCHANGED / FAILED (lo usa el planificador
+        de --daemon para adaptar el intervalo de cada fuente)."""
+        url, target = source_url(source), (None if isinstance(source, str) else source)
         logging.info("Procesando %s", url)
-        html = self.fetch(url)
-        if not html:
+        timings: Dict[str, float] = {}
+        with self.stats.timed("fetch", timings):
+            resp = self.fetch_response(url, stream=True)
+        if resp is not None and resp.status_code == 304:
+            logging.info("Sin cambios (304) %s; omitida", url)
+            self.stats.incr("sources_unchanged")
+            self.checkpoint(url, timings, {"unchanged": True})
+            return UNCHANGED
+        if resp is None:
             logging.error("No HTML recuperado para %s", url)
-            return False
-        cfg = extract_jwplayer_config(html)
+            self.stats.incr("failures")
+            return FAILED
+        # Se lee el cuerpo por trozos solo hasta encontrar el setup(); el resto no se descarga
+        try:
+            with self.stats.timed("fetch", timings):
+                cfg, read = scan_response(resp)
+        except Exception as e:
+            logging.error("Error leyendo %s: %s", url, e)
+            self.stats.incr("failures")
+            return FAILED
+        self.stats.incr("bytes_read", read)
         if not cfg:
             logging.error("No se encontró configuración jwplayer en %s", url)
-            return False
+            self.stats.incr("failures")
+            return FAILED
 
         playlist = cfg.get("playlist")
         # Algunas integraciones devuelven 'file' y 'title' directamente
         if not playlist and cfg.get("file"):
             playlist = [cfg]
 
-        if not playlist:
+        # Una lista vacía explícita para una temporada es válida: se quedó sin videos (ver sync_season)
+        if not playlist and not (target and cfg.get("playlist") == []):
             logging.error("No se pudo extraer lista de reproducción desde %s", url)
-            return False
+            self.stats.incr("failures")
+            return FAILED
 
         normalized = [normalize_playlist_entry(item) for item in playlist]
-        logging.info("Encontrados %d elementos", len(normalized))
+        logging.info("Encontrados %d elementos en %s", len(normalized), url)
+        self.stats.incr("items", len(normalized))
 
         if dry_run:
             logging.info("Dry-run: muestra de elementos: %s", json.dumps(normalized[:2], indent=2))
-            return True
-
-        # Mapear y llamar a endpoint backend: se asume `uiplaylist` acepta un objeto playlist
-        # Adaptar según API local: aquí usamos /api/uiplaylist POST con body { id, segid, img, title, description, categories }
+            return UNCHANGED
+
+        with self.stats.timed("post", timings):
+            if target:
+                failed, changed = self.sync_season(target, playlist)
+            else:
+                failed, changed = self.sync_playlists(normalized, url)
+
+        # Guardar validadores solo si todo se aplicó: si algo falló, la próxima ejecución re-descarga
+        if self.state and not failed:
+            self.state.save_validators(url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"))
+            self.checkpoint(url, timings, {"items": len(normalized)})
+        if failed:
+            return FAILED
+        return CHANGED if changed else UNCHANGED
+
+    def checkpoint(self, url: str, timings: Dict[str, float], info: Dict) -> None:
+        """Fuente completada: `--resume` ya no la vuelve a procesar en esta ejecución."""
+        if self.journal:
+            self.journal.step_done("source", url, timings, info)
+
+    def sync_playlists(self, normalized: List[Dict], url: str = "") -> Tuple[int, int]:
+        """Cada elemento como playlist. Solo se envían los items cuyo payload cambió; en lotes a
+        /bulk/playlists (una transacción por lote). Retorna (fallos, aplicados).
+        Al reanudar, los lotes ya aplicados no se repiten: sus items figuran como sin cambios."""
+        pending = []
         for p in normalized:
-            payload = {
-                "id": p["id"] or f"jw-{abs(hash(p.get('title') or 'no-title'))}",
-                "segid": 0,
-                "img": p.get("poster"),
-                "title": p.get("title") or "",
-                "desc": p.get("description") or "",
-                "categories": [],
-            }
-            try:
-                endpoint = f"{self.api_url}/uiplaylist"
-                logging.info("Upsert playlist id=%s -> %s", payload['id'], endpoint)
-                r = self.session.post(endpoint, json=payload, timeout=15)
-                if r.status_code not in (200,201):
-                    logging.error("Upsert fallo para %s: %s %s", payload['id'], r.status_code, r.text[:200])
-                else:
-                    logging.info("Upsert OK %s", payload['id'])
-            except Exception as e:
-                logging.error("Error enviando al backend: %s", e)
-        return True
+            payload = playlist_payload(p, self.segment_id)
+            digest = content_hash(payload)
+            if self.state and not self.force and self.state.is_unchanged(payload["id"], digest):
+                self.stats.incr("items_unchanged")
+                continue
+            pending.append((payload, digest))
+
+        failed = changed = 0
+        for n, batch in enumerate(pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)):
+            timings: Dict[str, float] = {}
+            with self.stats.timed("batch", timings):
+                statuses = post_playlist_batch(self.session, self.api_url, [pl for pl, _ in batch],
+                                               retries=self.retries)
+            self.stats.incr("batches")
+            applied = [(pl["id"], digest) for pl, digest in batch if statuses.get(pl["id"]) in BULK_OK_STATUS]
+            self.stats.incr("upserted", len(applied))
+            self.stats.incr("item_failures", len(batch) - len(applied))
+            failed += len(batch) - len(applied)
+            changed += len(applied)
+            if self.state and applied:
+                self.state.mark_items(applied)
+            if self.journal:
+                self.journal.step_done("batch", f"{url}#{n}:{batch[0][0]['id']}", timings,
+                                       {"size": len(batch), "applied": len(applied)})
+        return failed, changed
+
+    def sync_season(self, target: Dict, playlist: List[dict]) -> Tuple[int, int]:
+        """Los elementos de la página como videos de una temporada de un playlist existente
+        (POST /bulk/seasons: altas, bajas lógicas y reactivaciones por diferencia).
+        Retorna (fallos, temporadas modificadas)."""
+        payload = {
+            "playlist_id": target["playlist_id"],
+            "title": target.get("season") or DEFAULT_SEASON_TITLE,
+            "videos": [item["mediaid"] for item in playlist if item.get("mediaid")],
+        }
+        if playlist and not payload["videos"]:
+            # Sin mediaid no hay ids de video fiables; enviar [] desactivaría toda la temporada.
+            # Una fuente sin elementos sí envía []: la temporada se quedó vacía y se desactiva entera
+            logging.error("Ningún elemento con mediaid para la temporada %s", payload["title"])
+            self.stats.incr("season_failures")
+            return 1, 0
+        key = season_key(payload["playlist_id"], payload["title"])
+        digest = content_hash(payload)
+        if self.state and not self.force and self.state.is_unchanged(key, digest):
+            self.stats.incr("seasons_unchanged")
+            return 0, 0
+        status = post_season_batch(self.session, self.api_url, [payload], retries=self.retries).get(key)
+        if status not in SEASON_OK_STATUS:
+            self.stats.incr("season_failures")
+            return 1, 0
+        self.stats.incr("seasons_synced")
+        if self.state:
+            self.state.mark_items([(key, digest)])
+        return 0, int(status != "unchanged")
+
+    def ingest_all(self, sources: List, dry_run: bool = False) -> Dict[str, float]:
+        """Procesa todas las fuentes en paralelo (máx. `concurrency` a la vez) y devuelve el resumen."""
+        self.stats = RunStats()
+        if self.journal and self.journal.resumed:
+            done = self.journal.completed("source")
+            pending = [s for s in sources if source_url(s) not in done]
+            logging.info("Reanudando ejecución %d: %d fuentes ya completadas", self.journal.run_id,
+                         len(sources) - len(pending))
+            self.stats.incr("sources_resumed", len(sources) - len(pending))
+            sources = pending
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="jw-ingest") as pool:
+            futures = {pool.submit(self.ingest_source, s, dry_run): s for s in sources}
+            for fut in as_completed(futures):
+                try:
+                    fut.result()
+                except Exception as e:
+                    logging.exception("Fallo inesperado procesando %s: %s", futures[fut], e)
+                    self.stats.incr("failures")
+        self.stats.incr("sources", len(sources))
+        return self.stats.log_summary("Resumen ingestión")
 
 
 def fetch_api_token_if_needed(api_url: str) -> Optional[str]:
@@ -189,74 +327,25 @@ def fetch_api_token_if_needed(api_url: str) -> Optional[str]:
         logging.error('No se pudo obtener token del backend: %s', e)
         return None
 
-    def fetch(self, url: str) -> Optional[str]:
-        parsed = urlparse(url)
-        if self.allowed_hosts and parsed.hostname not in self.allowed_hosts:
-            logging.warning("Host %s no está en allowed_hosts; saltando", parsed.hostname)
-            return None
-        try:
-            r = self.session.get(url, timeout=15)
-            r.raise_for_status()
-            return r.text
-        except Exception as e:
-            logging.error("Error fetching %s: %s", url, e)
-            return None
-
-    def ingest_source(self, url: str, dry_run: bool = False) -> bool:
-        logging.info("Procesando %s", url)
-        html = self.fetch(url)
-        if not html:
-            logging.error("No HTML recuperado para %s", url)
-            return False
-        cfg = extract_jwplayer_config(html)
-        if not cfg:
-            logging.error("No se encontró configuración jwplayer en %s", url)
-            return False
-
-        playlist = cfg.get("playlist")
-        # Algunas integraciones devuelven 'file' y 'title' directamente
-        if not playlist and cfg.get("file"):
-            playlist = [cfg]
-
-        if not playlist:
-            logging.error("No se pudo extraer lista de reproducción desde %s", url)
-            return False
-
-        normalized = [normalize_playlist_entry(item) for item in playlist]
-        logging.info("Encontrados %d elementos", len(normalized))
-
-        if dry_run:
-            logging.info("Dry-run: muestra de elementos: %s", json.dumps(normalized[:2], indent=2))
-            return True
-
-        # Mapear y llamar a endpoint backend: se asume `uiplaylist` acepta un objeto playlist
-        # Adaptar según API local: aquí usamos /api/uiplaylist POST con body { id, segid, img, title, description, categories }
-        for p in normalized:
-            payload = {
-                "id": p["id"] or f"jw-{abs(hash(p.get('title') or 'no-title'))}",
-                "segid": 0,
-                "img": p.get("poster"),
-                "title": p.get("title") or "",
-                "desc": p.get("description") or "",
-                "categories": [],
-            }
-            try:
-                endpoint = f"{self.api_url}/uiplaylist"
-                logging.info("Upsert playlist id=%s -> %s", payload['id'], endpoint)
-                r = self.session.post(endpoint, json=payload, timeout=15)
-                if r.status_code not in (200,201):
-                    logging.error("Upsert fallo para %s: %s %s", payload['id'], r.status_code, r.text[:200])
-                else:
-                    logging.info("Upsert OK %s", payload['id'])
-            except Exception as e:
-                logging.error("Error enviando al backend: %s", e)
-        return True
-
 
 def main():
     p = argparse.ArgumentParser()
     p.add_argument("--config", default="scripts/jw_sources.json", help="Archivo JSON con lista de URLs")
     p.add_argument("--dry-run", action="store_true")
+    p.add_argument("--concurrency", type=int, default=int(os.environ.get('JW_CONCURRENCY', '4')),
+                   help="Fuentes procesadas en paralelo (límite global)")
+    p.add_argument("--rate", type=float, default=float(os.environ.get('JW_RATE', '2')),
+                   help="Peticiones por segundo permitidas por host de origen (0 = sin límite)")
+    p.add_argument("--state", default=os.environ.get('JW_STATE_PATH', DEFAULT_STATE_PATH),
+                   help="Archivo SQLite con ETag/Last-Modified por fuente y hash por item")
+    p.add_argument("--force", action="store_true", help="Ignorar el estado guardado y reprocesar todo")
+    p.add_argument("--resume", action="store_true",
+                   help="Continuar la última ejecución interrumpida (omite las fuentes ya completadas)")
+    p.add_argument("--batch-size", type=int, default=int(os.environ.get('JW_BATCH_SIZE', '200')),
+                   help="Playlists por petición a /bulk/playlists")
+    p.add_argument("--segment-id", type=int, default=int(os.environ.get('JW_SEGMENT_ID', '0')),
+                   help="Segmento asignado a los playlists ingeridos (el backend exige > 0)")
+    add_daemon_args(p)
     args = p.parse_args()
 
     api_url = os.environ.get('API_URL') or os.environ.get('BACKEND_API') or 'http://localhost:8000/api'
@@ -276,10 +365,34 @@ def main():
     # Si no se pasó API_TOKEN buscarlo vía SECRET_KEY en el backend
     if not api_token:
         api_token = fetch_api_token_if_needed(api_url)
-    ing = JWIngest(api_url=api_url, api_token=api_token, allowed_hosts=allowed)
-
-    for s in sources:
-        ing.ingest_source(s, dry_run=args.dry_run)
+    # En dry-run no se consulta ni actualiza el estado (se quiere ver todo lo que se enviaría)
+    state = None if args.dry_run else IngestState(args.state)
+    # En --daemon cada fuente se replanifica sola: no hay ejecución global que reanudar
+    journal = RunJournal(state, "jw_ingest", resume=args.resume,
+                         params={"config": os.path.abspath(args.config), "segment_id": args.segment_id,
+                                 "batch_size": args.batch_size}) \
+        if state and not args.daemon else None
+    ing = JWIngest(api_url=api_url, api_token=api_token, allowed_hosts=allowed,
+                   concurrency=args.concurrency, rate=args.rate, state=state, force=args.force,
+                   batch_size=args.batch_size, segment_id=args.segment_id, journal=journal,
+                   token_refresh=lambda: fetch_api_token_if_needed(api_url))
+    try:
+        if args.daemon:
+            # Una Session, un token y un estado para toda la vida del proceso
+            jobs = {source_url(src): (lambda src=src: ing.ingest_source_result(src, dry_run=args.dry_run))
+                    for src in sources}
+            # Las estadísticas se registran y reinician al terminar cada ciclo, no solo al salir
+            run_daemon(jobs, args, concurrency=args.concurrency,
+                       on_cycle=lambda: ing.stats.log_and_reset("Resumen ciclo"))
+            return
+        summary = ing.ingest_all(sources, dry_run=args.dry_run)
+        # Si el proceso muere antes de llegar aquí, la ejecución queda 'running' y --resume la continúa
+        if journal:
+            failed = summary.get("failures", 0) + summary.get("item_failures", 0) + summary.get("season_failures", 0)
+            journal.finish("incomplete" if failed else "finished", summary)
+    finally:
+        if state:
+            state.close()
 
 
 if __name__ == '__main__':
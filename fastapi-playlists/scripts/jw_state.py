@@ -0,0 +1,176 @@
+"""
+Estado local de ingestión JW (SQLite) compartido por jw_ingest.py y jw_api_ingest.py.
+
+- Validadores HTTP por URL de origen (ETag / Last-Modified) para peticiones condicionales:
+  una fuente sin cambios responde 304 y no se vuelve a parsear ni a enviar.
+- Hash de contenido por item normalizado: si el payload no cambió desde el último
+  upsert correcto, el item se omite.
+- IDs estables (SHA-1) para items sin media id; `hash()` de Python cambia en cada proceso.
+- Diario de ejecución (`RunJournal`): fuentes/páginas/lotes completados con tiempos por etapa,
+  para que `--resume` continúe una ejecución interrumpida desde el último checkpoint.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple, Dict, Any, Iterable, List, Set
+
+DEFAULT_STATE_PATH = "scripts/jw_state.sqlite"
+
+
+def stable_id(*parts: Optional[str], prefix: str = "jw-") -> str:
+    """ID determinista a partir de las partes dadas (mismo input -> mismo id en cualquier ejecución)."""
+    key = "\x1f".join((p or "").strip() for p in parts)
+    return prefix + hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+def content_hash(payload: Dict[str, Any]) -> str:
+    """Hash del payload normalizado (JSON canónico: claves ordenadas, sin espacios)."""
+    canon = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha1(canon.encode("utf-8")).hexdigest()
+
+
+class IngestState:
+    """Almacén SQLite thread-safe (una conexión compartida protegida por lock)."""
+
+    def __init__(self, path: str = DEFAULT_STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS sources ("
+                " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, checked_at REAL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS items ("
+                " item_id TEXT PRIMARY KEY, hash TEXT NOT NULL, updated_at REAL)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT, script TEXT NOT NULL, params TEXT,"
+                " status TEXT NOT NULL, started_at REAL, finished_at REAL, summary TEXT)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS run_steps ("
+                " run_id INTEGER NOT NULL, kind TEXT NOT NULL, step TEXT NOT NULL, timings TEXT,"
+                " info TEXT, completed_at REAL, PRIMARY KEY (run_id, kind, step))"
+            )
+
+    # ---- fuentes ----
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para `url` (vacío si no hay validadores)."""
+        with self.lock:
+            row = self.conn.execute("SELECT etag, last_modified FROM sources WHERE url=?", (url,)).fetchone()
+        headers: Dict[str, str] = {}
+        if row:
+            if row[0]:
+                headers["If-None-Match"] = row[0]
+            if row[1]:
+                headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def save_validators(self, url: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO sources(url, etag, last_modified, checked_at) VALUES (?,?,?,?) "
+                "ON CONFLICT(url) DO UPDATE SET etag=excluded.etag, last_modified=excluded.last_modified, "
+                "checked_at=excluded.checked_at",
+                (url, etag, last_modified, time.time()),
+            )
+
+    # ---- items ----
+    def is_unchanged(self, item_id: str, digest: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT hash FROM items WHERE item_id=?", (item_id,)).fetchone()
+        return bool(row) and row[0] == digest
+
+    def items_with_prefix(self, prefix: str) -> List[str]:
+        """Ids registrados que empiezan por `prefix` (p. ej. las temporadas ya sincronizadas de un playlist)."""
+        with self.lock:
+            rows = self.conn.execute("SELECT item_id FROM items WHERE substr(item_id, 1, ?) = ?",
+                                     (len(prefix), prefix)).fetchall()
+        return [r[0] for r in rows]
+
+    def mark_items(self, pairs: Iterable[Tuple[str, str]]) -> None:
+        """Registra (item_id, hash) tras un upsert correcto."""
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO items(item_id, hash, updated_at) VALUES (?,?,?) "
+                "ON CONFLICT(item_id) DO UPDATE SET hash=excluded.hash, updated_at=excluded.updated_at",
+                [(i, h, now) for i, h in pairs],
+            )
+
+    def close(self) -> None:
+        with self.lock:
+            self.conn.close()
+
+
+class RunJournal:
+    """Diario de una ejecución dentro del mismo SQLite del estado.
+
+    Un paso (fuente, página, lote) se registra solo cuando terminó por completo; al reanudar
+    se omiten los pasos ya registrados. Los lotes del backend son idempotentes (upsert y
+    sincronización por diferencia), así que repetir el lote en curso al caer es seguro.
+
+    Solo se reanuda una ejecución con los mismos `params` (sitio, config, tamaño de página...):
+    con otros, sus pasos no corresponden a esta ejecución y se empieza una nueva.
+    """
+
+    def __init__(self, state: IngestState, script: str, resume: bool = False,
+                 params: Optional[Dict[str, Any]] = None):
+        self.state = state
+        self.script = script
+        self.resumed = False
+        params_json = json.dumps(params or {}, sort_keys=True)
+        with state.lock, state.conn:
+            row = None
+            if resume:
+                row = state.conn.execute(
+                    "SELECT id, params FROM runs WHERE script=? AND status IN ('running','incomplete')"
+                    " ORDER BY id DESC LIMIT 1",
+                    (script,),
+                ).fetchone()
+                if row and row[1] != params_json:
+                    logging.warning("No se reanuda la ejecución %d: parámetros distintos (%s != %s)",
+                                    row[0], row[1], params_json)
+                    row = None
+            if row:
+                self.run_id = row[0]
+                self.resumed = True
+            else:
+                # Las ejecuciones a medias que no se reanudan quedan marcadas como abandonadas
+                state.conn.execute("UPDATE runs SET status='abandoned' WHERE script=?"
+                                   " AND status IN ('running','incomplete')", (script,))
+                cur = state.conn.execute(
+                    "INSERT INTO runs(script, params, status, started_at) VALUES (?,?, 'running', ?)",
+                    (script, params_json, time.time()),
+                )
+                self.run_id = cur.lastrowid
+
+    def completed(self, kind: str) -> Set[str]:
+        with self.state.lock:
+            rows = self.state.conn.execute(
+                "SELECT step FROM run_steps WHERE run_id=? AND kind=?", (self.run_id, kind)
+            ).fetchall()
+        return {r[0] for r in rows}
+
+    def step_done(self, kind: str, step: str, timings: Optional[Dict[str, float]] = None,
+                  info: Optional[Dict[str, Any]] = None) -> None:
+        with self.state.lock, self.state.conn:
+            self.state.conn.execute(
+                "INSERT OR REPLACE INTO run_steps(run_id, kind, step, timings, info, completed_at) VALUES (?,?,?,?,?,?)",
+                (self.run_id, kind, step, json.dumps(timings or {}), json.dumps(info or {}, default=str), time.time()),
+            )
+
+    def finish(self, status: str = "finished", summary: Optional[Dict[str, Any]] = None) -> None:
+        """`incomplete` (hubo fallos) también se puede continuar con --resume."""
+        with self.state.lock, self.state.conn:
+            self.state.conn.execute(
+                "UPDATE runs SET status=?, finished_at=?, summary=? WHERE id=?",
+                (status, time.time(), json.dumps(summary or {}), self.run_id),
+            )
@@ -0,0 +1,136 @@
+"""
+Prueba de carga del CRUD por lotes de app.py: N altas de videos con `POST /videos` (una por
+petición) frente a `POST /batch/videos` (lotes de --batch-size), y la baja con `DELETE /batch/videos`.
+
+Dos modos:
+- simulado (por defecto): app.py en proceso (TestClient) sobre la conexión simulada de
+  bench_admin_writes.py (`--rtt` ms por viaje, `--fsync` ms por commit), sin servidor ni BD;
+- real: `--url https://host/api --token ... --season-id 123` contra un despliegue; los videos
+  creados (ids `loadtest-*`) se borran al terminar.
+
+Uso:
+  python3 scripts/load_batch_crud.py --items 500
+  python3 scripts/load_batch_crud.py --url http://127.0.0.1:8000 --token $TOKEN --season-id 99 --concurrency 8
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_admin_writes import SimConnection, SimCursor
+
+
+class LoadCursor(SimCursor):
+    """Como SimCursor, pero devuelve filas con la forma que esperan los endpoints de app.py."""
+
+    def __init__(self, conn, dictionary=False):
+        super().__init__(conn)
+        self.dictionary = dictionary
+        self.lastrowid = 1
+
+    def execute(self, sql, params=None):
+        self.conn.round_trip()
+        self.rowcount = 1
+        # relectura tras el alta individual; el SELECT de claves del lote no encuentra nada
+        if self.dictionary and sql.lstrip().lower().startswith("select"):
+            self.rows = [{"season_id": params[0], "video_id": params[1], "date": None, "active": 1}]
+        else:
+            self.rows = []
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+
+class LoadConnection(SimConnection):
+    def cursor(self, dictionary=False, **kwargs):
+        return LoadCursor(self, dictionary)
+
+
+def _simulated_client(rtt: float, fsync: float):
+    os.environ["SENTRY_DSN"] = ""  # .env (cargado por Core_M_cajita) trae el DSN real
+    os.environ.setdefault("IMG_DIR", tempfile.mkdtemp())
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    from fastapi.testclient import TestClient
+    import app as rest
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # una línea por petición
+
+    rest.app.dependency_overrides[rest.require_auth] = lambda: {"sub": "load-test"}
+    rest.get_connection = lambda: LoadConnection(rtt, fsync)
+    return TestClient(rest.app)
+
+
+def _live_client(url: str, token: str):
+    import requests
+
+    session = requests.Session()
+    session.headers["Authorization"] = f"Bearer {token}"
+
+    class Live:
+        def request(self, method, path, **kwargs):
+            return session.request(method, url.rstrip("/") + path, timeout=60, **kwargs)
+    return Live()
+
+
+def _run(client, calls, concurrency: int):
+    """Ejecuta las llamadas (method, path, json) y devuelve (segundos, errores)."""
+    def one(call):
+        method, path, body = call
+        r = client.request(method, path, json=body)
+        return r.status_code < 300
+
+    t0 = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            ok = list(pool.map(one, calls))
+    else:
+        ok = [one(c) for c in calls]
+    return time.perf_counter() - t0, ok.count(False)
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--items", type=int, default=300, help="Videos a crear en cada variante")
+    p.add_argument("--batch-size", type=int, default=100)
+    p.add_argument("--concurrency", type=int, default=1, help="Peticiones simultáneas")
+    p.add_argument("--url", help="API real (sin esto se usa el modo simulado)")
+    p.add_argument("--token", default=os.environ.get("API_TOKEN"))
+    p.add_argument("--season-id", type=int, default=1, help="Temporada donde crear los videos de prueba")
+    p.add_argument("--rtt", type=float, default=0.5, help="Modo simulado: ms por viaje al servidor")
+    p.add_argument("--fsync", type=float, default=2.0, help="Modo simulado: ms por commit")
+    args = p.parse_args()
+
+    if args.url:
+        if not args.token:
+            p.error("--token (o API_TOKEN) es obligatorio con --url")
+        client = _live_client(args.url, args.token)
+    else:
+        client = _simulated_client(args.rtt / 1000, args.fsync / 1000)
+
+    run_id = uuid.uuid4().hex[:8]
+    single = [{"season_id": args.season_id, "video_id": f"loadtest-{run_id}-s{i}"} for i in range(args.items)]
+    batched = [{"season_id": args.season_id, "video_id": f"loadtest-{run_id}-b{i}"} for i in range(args.items)]
+    batches = [batched[i:i + args.batch_size] for i in range(0, len(batched), args.batch_size)]
+
+    t_single, err_single = _run(client, [("POST", "/videos", v) for v in single], args.concurrency)
+    t_batch, err_batch = _run(client, [("POST", "/batch/videos", {"items": b}) for b in batches], args.concurrency)
+    cleanup = single + batched
+    t_delete, err_delete = _run(client, [("DELETE", "/batch/videos", {"items": cleanup[i:i + args.batch_size]})
+                                         for i in range(0, len(cleanup), args.batch_size)], args.concurrency)
+
+    print(f"{'variante':<26}{'peticiones':>11}{'s':>9}{'videos/s':>11}{'errores':>9}")
+    n_delete = -(-len(cleanup) // args.batch_size)
+    for label, n_requests, n_videos, secs, errors in (
+        ("POST /videos (1 a 1)", len(single), len(single), t_single, err_single),
+        (f"POST /batch/videos ({args.batch_size})", len(batches), len(batched), t_batch, err_batch),
+        ("DELETE /batch/videos", n_delete, len(cleanup), t_delete, err_delete),
+    ):
+        print(f"{label:<26}{n_requests:>11}{secs:>9.2f}{n_videos / secs:>11.0f}{errors:>9}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+# search_index.py
+# Índice invertido en memoria para /playlists/search: plegado de acentos, raíces en español y BM25
+"""
+Texto -> términos:
+- `fold`: minúsculas y sin diacríticos (NFKD), así "acción", "ACCION" y "accion" coinciden;
+- `STOPWORDS`: palabras vacías del español (y algunas del inglés) que no se indexan;
+- `stem`: raíz "ligera" (plurales, género y sufijos derivativos frecuentes), suficiente para
+  que "documentales" encuentre "documental" y "aventuras" encuentre "aventura".
+
+Puntuación BM25 con pesos por campo (estilo BM25F): la frecuencia de un término en un
+documento es la suma de sus apariciones en cada campo multiplicadas por `FIELD_BOOSTS`
+(el título pesa más que la descripción), igual que la longitud del documento.
+
+El índice se construye desde la instantánea de catalog.py y admite `upsert`/`remove`,
+así que las altas y cambios de playlists se aplican sin reconstruirlo.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+FIELD_BOOSTS = {"title": 3.0, "category": 1.5, "segment": 1.0, "description": 1.0}
+K1 = 1.2
+B = 0.75
+
+STOPWORDS = frozenset("""
+a al algo algunas algunos ante antes como con contra cual cuando de del desde donde durante
+e el ella ellas ellos en entre era es esa esas ese eso esos esta estas este esto estos fue ha
+hay la las le les lo los mas me mi mis mucho muy ni no nos o otra otras otro otros para pero
+poco por porque que quien se sin sobre su sus tambien te tu un una uno unos y ya yo
+the of and or to in on for with
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9ñ]+")
+_VOWELS = set("aeiou")
+
+# Sufijos derivativos, de más largo a más corto; la raíz resultante conserva al menos 3 letras
+_SUFFIXES = (
+    "amientos", "imientos", "amiento", "imiento", "aciones", "uciones", "idades", "mente",
+    "acion", "ucion", "idad", "ables", "ibles", "istas", "ismos", "able", "ible", "ista", "ismo",
+    "osos", "osas", "oso", "osa",
+)
+
+
+def fold(text: str) -> str:
+    """Minúsculas sin diacríticos; la ñ se conserva (año != ano)."""
+    text = text.lower().replace("ñ", "\0")
+    text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    return text.replace("\0", "ñ")
+
+
+def stem(word: str) -> str:
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    if word.endswith("es") and len(word) > 4 and word[-3] not in _VOWELS:
+        word = word[:-2]          # canciones -> cancion, documentales -> documental
+    elif word.endswith("s") and len(word) > 4:
+        word = word[:-1]          # peliculas -> pelicula
+    if word[-1] in "aoe" and len(word) > 4:
+        word = word[:-1]          # pelicula -> pelicul, serie -> seri
+    return word
+
+
+def words(text: Optional[str]) -> List[str]:
+    """Palabras plegadas del texto."""
+    return _TOKEN.findall(fold(text)) if text else []
+
+
+def tokens(text: Optional[str]) -> List[str]:
+    """Palabras plegadas del texto, sin palabras vacías (antes de sacar raíces)."""
+    return [t for t in words(text) if t not in STOPWORDS]
+
+
+def terms(text: Optional[str]) -> List[str]:
+    return [stem(t) for t in tokens(text)]
+
+
+def playlist_fields(playlist: Dict[str, Any], category_names: Iterable[str] = ()) -> Dict[str, str]:
+    """Campos indexados de una playlist (la categoría libre más las categorías enlazadas)."""
+    return {
+        "title": playlist.get("title") or "",
+        "category": " ".join([playlist.get("category") or "", *category_names]),
+        "segment": playlist.get("segment_name") or "",
+        "description": playlist.get("description") or "",
+    }
+
+
+class SearchIndex:
+    """Índice invertido término -> {playlist_id: frecuencia ponderada}."""
+
+    def __init__(self, category_names: Callable[[Dict[str, Any]], List[str]] = lambda p: []):
+        self.category_names = category_names
+        self.postings: Dict[str, Dict[str, float]] = {}
+        self.doc_len: Dict[str, float] = {}
+        self.doc_terms: Dict[str, Tuple[str, ...]] = {}
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.total_len = 0.0
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "SearchIndex":
+        index = cls(snapshot.category_names)
+        for playlist in snapshot.playlists.values():
+            index.upsert(playlist)
+        return index
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def upsert(self, playlist: Dict[str, Any]) -> None:
+        doc_id = playlist["id"]
+        self.remove(doc_id)
+        freqs: Dict[str, float] = {}
+        length = 0.0
+        for field, text in playlist_fields(playlist, self.category_names(playlist)).items():
+            boost = FIELD_BOOSTS[field]
+            for term in terms(text):
+                freqs[term] = freqs.get(term, 0.0) + boost
+                length += boost
+        for term, tf in freqs.items():
+            self.postings.setdefault(term, {})[doc_id] = tf
+        self.docs[doc_id] = playlist
+        self.doc_terms[doc_id] = tuple(freqs)
+        self.doc_len[doc_id] = length
+        self.total_len += length
+
+    def remove(self, doc_id: str) -> None:
+        if doc_id not in self.docs:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            del posting[doc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        del self.docs[doc_id]
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """Puntuación BM25 de cada documento que contiene algún término de la consulta."""
+        n = len(self.docs)
+        if not n:
+            return {}
+        avgdl = self.total_len / n or 1.0
+        out: Dict[str, float] = {}
+        for term in set(terms(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = K1 * (1 - B + B * self.doc_len[doc_id] / avgdl)
+                out[doc_id] = out.get(doc_id, 0.0) + idf * tf * (K1 + 1) / (tf + norm)
+        return out
+
+    def search(self, query: str, accept: Optional[Callable[[Dict[str, Any]], bool]] = None,
+               limit: int = 10, offset: int = 0) -> List[Tuple[float, Dict[str, Any]]]:
+        """(puntuación, playlist) de mayor a menor relevancia; empates por updated_at más reciente."""
+        hits = ((score, self.docs[doc_id]) for doc_id, score in self.scores(query).items())
+        if accept is not None:
+            hits = ((score, doc) for score, doc in hits if accept(doc))
+        top = heapq.nlargest(offset + limit, hits, key=lambda h: (h[0], str(h[1].get("updated_at") or "")))
+        return top[offset:]
@@ -0,0 +1,71 @@
+# segment_rows.py
+# Filas de la pantalla de inicio: playlists activas de cada segmento, ya ordenadas
+"""
+La pantalla de inicio de la app de TV muestra una fila por segmento y solo las primeras
+playlists de cada una; el resto se carga al desplazarse. En vez de mandar el árbol entero
+de /playlists, `SegmentRows` guarda por segmento la tupla de sus playlists activas en orden
+(updated_at DESC, id DESC; sin fecha al final, como MySQL) y una página es un corte de esa
+tupla.
+
+La continuación usa un cursor keyset (ver keyset.py) con la clave de la última playlist
+entregada, no un desplazamiento: si entre dos páginas se edita una playlist, la fila no
+repite ni salta elementos por ese motivo. La posición del cursor se busca con bisect.
+
+Se construye desde la instantánea de catalog.py y no tiene `upsert`: tras cualquier
+cambio el catálogo la reconstruye al pedirse (un ordenamiento por segmento).
+"""
+import bisect
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import keyset
+
+DEFAULT_PER_SEGMENT = 10
+MAX_PER_SEGMENT = 50
+
+
+def _key(playlist: Dict[str, Any]) -> Tuple[bool, datetime, str]:
+    updated_at = playlist.get("updated_at")
+    return updated_at is not None, updated_at or datetime.min, str(playlist["id"])
+
+
+class SegmentRows:
+    def __init__(self, version: int = 0):
+        self.version = version
+        self.segments: List[Dict[str, Any]] = []
+        self.rows: Dict[Any, Tuple[Dict[str, Any], ...]] = {}
+        self._asc_keys: Dict[Any, List[Tuple[bool, datetime, str]]] = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> "SegmentRows":
+        index = cls(snapshot.version)
+        by_segment: Dict[Any, List[Dict[str, Any]]] = {}
+        for p in snapshot.playlists.values():
+            if p.get("active") == 1:
+                by_segment.setdefault(p.get("segment_id"), []).append(p)
+        for segment in snapshot.segments.values():  # ya en el orden manual de los segmentos
+            if segment.get("active") != 1:
+                continue
+            index.segments.append(segment)
+            row = sorted(by_segment.get(segment["id"], []), key=_key, reverse=True)
+            index.rows[segment["id"]] = tuple(row)
+            index._asc_keys[segment["id"]] = [_key(p) for p in reversed(row)]
+        return index
+
+    def page(self, segment_id: Any, limit: int, cursor: Optional[str] = None
+             ) -> Tuple[Tuple[Dict[str, Any], ...], Optional[str]]:
+        """(playlists, cursor siguiente o None) de la fila del segmento.
+        KeyError si el segmento no existe o está inactivo; ValueError si el cursor no es válido."""
+        row = self.rows[segment_id]
+        start = 0
+        if cursor:
+            updated_at, playlist_id = keyset.decode_cursor(cursor, 2)
+            if updated_at is not None and not isinstance(updated_at, datetime):
+                raise ValueError("cursor inválido")
+            after = (updated_at is not None, updated_at or datetime.min, str(playlist_id))
+            start = len(row) - bisect.bisect_left(self._asc_keys[segment_id], after)
+        items = row[start:start + limit]
+        if start + limit >= len(row):
+            return items, None
+        last = items[-1]
+        return items, keyset.encode_cursor([last.get("updated_at"), last["id"]])
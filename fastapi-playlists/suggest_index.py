@@ -0,0 +1,125 @@
+# suggest_index.py
+# Autocompletado por prefijo (/playlists/suggest) con un arreglo ordenado y bisect
+"""
+Cada título (playlist, temporada) y nombre de categoría se normaliza con el mismo plegado
+de search_index.py y se indexa una clave por cada palabra no vacía desde la que puede
+empezar la búsqueda: "Acción en la montaña" -> "accion en la montana", "montana".
+Las claves se guardan en una lista ordenada; un prefijo es el rango
+[bisect_left(p), bisect_left(p + "\\uffff")) y de ahí se eligen las k de mayor peso.
+
+Un arreglo ordenado ocupa bastante menos que un trie de nodos dict en Python y da el mismo
+O(log n) para ubicar el prefijo; los metadatos van en arreglos paralelos (`array`).
+Los prefijos de una o dos letras, que abarcan más claves, se cachean.
+
+Peso (0..1] por tipo: `KIND_BOOST` por 0.5 + 0.5 * señal, donde la señal es la recencia
+(updated_at de la playlist, fecha de la temporada) o la popularidad de la categoría
+(playlists enlazadas respecto de la más usada).
+
+No admite cambios en sitio: catalog.py lo reconstruye al cambiar la versión del catálogo.
+"""
+import heapq
+import sys
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from search_index import STOPWORDS, words
+
+KINDS = ("playlist", "season", "category")
+KIND_BOOST = {"playlist": 1.0, "category": 0.9, "season": 0.6}
+RECENCY_DAYS = 30.0
+CACHED_PREFIX_LEN = 2
+MAX_K = 50
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join(words(text))
+
+
+def _recency(value, now: datetime) -> float:
+    if not isinstance(value, datetime):
+        return 0.0
+    age_days = max(0.0, (now - value).total_seconds() / 86400)
+    return 1.0 / (1.0 + age_days / RECENCY_DAYS)
+
+
+class SuggestIndex:
+    def __init__(self, entries: Iterable[Tuple[str, str, Any, float]], version: int = 0):
+        """`entries`: (texto, tipo, id, peso). Se descartan los textos vacíos."""
+        self.version = version
+        self.texts: List[str] = []
+        self.refs: List[Any] = []
+        self.kinds = bytearray()
+        self.weights = array("d")
+        pairs = []
+        for text, kind, ref, weight in entries:
+            tokens = words(text)
+            if not tokens:
+                continue
+            n = len(self.texts)
+            self.texts.append(text)
+            self.refs.append(ref)
+            self.kinds.append(KINDS.index(kind))
+            self.weights.append(weight)
+            for i, word in enumerate(tokens):
+                if i == 0 or word not in STOPWORDS:
+                    pairs.append((" ".join(tokens[i:]), n))
+        pairs.sort()
+        self.keys: List[str] = [k for k, _ in pairs]
+        self.entries = array("I", (e for _, e in pairs))
+        self._cache: Dict[Tuple[str, Optional[int]], List[int]] = {}
+
+    @classmethod
+    def from_snapshot(cls, snapshot, now: Optional[datetime] = None) -> "SuggestIndex":
+        now = now or datetime.now()
+        active = {pid: p for pid, p in snapshot.playlists.items() if p.get("active") == 1}
+        uses: Dict[Any, int] = {}
+        for p in active.values():
+            for c in p.get("categories", []):
+                uses[c] = uses.get(c, 0) + 1
+        most = max(uses.values(), default=1)
+
+        def weight(kind: str, signal: float) -> float:
+            return KIND_BOOST[kind] * (0.5 + 0.5 * signal)
+
+        entries = [(p.get("title"), "playlist", pid, weight("playlist", _recency(p.get("updated_at"), now)))
+                   for pid, p in active.items()]
+        entries += [(s.get("title"), "season", s["id"], weight("season", _recency(s.get("date"), now)))
+                    for s in snapshot.seasons if s.get("active") == 1 and s.get("playlist_id") in active]
+        entries += [(name, "category", cid, weight("category", uses.get(cid, 0) / most))
+                    for cid, name in snapshot.categories.items()]
+        return cls(entries, version=snapshot.version)
+
+    def _matches(self, prefix: str, kind: Optional[int], k: int) -> List[int]:
+        lo = bisect_left(self.keys, prefix)
+        hi = bisect_left(self.keys, prefix + "\uffff", lo)
+        found = set(self.entries[lo:hi])
+        if kind is not None:
+            found = {e for e in found if self.kinds[e] == kind}
+        return heapq.nlargest(k, found, key=lambda e: (self.weights[e], -len(self.texts[e])))
+
+    def suggest(self, prefix: str, k: int = 10, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Las `k` (máx. MAX_K) sugerencias de mayor peso con una palabra que empieza por `prefix`."""
+        p = normalize(prefix)
+        if not p:
+            return []
+        k = min(k, MAX_K)
+        kind_id = KINDS.index(kind) if kind else None
+        if len(p) <= CACHED_PREFIX_LEN:
+            ranked = self._cache.get((p, kind_id))
+            if ranked is None:
+                ranked = self._cache[(p, kind_id)] = self._matches(p, kind_id, MAX_K)
+        else:
+            ranked = self._matches(p, kind_id, k)
+        return [{"text": self.texts[e], "type": KINDS[self.kinds[e]], "id": self.refs[e],
+                 "weight": round(self.weights[e], 4)} for e in ranked[:k]]
+
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño del índice (bytes aproximados de listas, cadenas y arreglos; sin la caché)."""
+        size = (sys.getsizeof(self.keys) + sum(sys.getsizeof(k) for k in self.keys)
+                + sys.getsizeof(self.texts) + sum(sys.getsizeof(t) for t in self.texts)
+                + sys.getsizeof(self.refs) + sys.getsizeof(self.kinds)
+                + sys.getsizeof(self.weights) + sys.getsizeof(self.entries))
+        return {"version": self.version, "entries": len(self.texts), "keys": len(self.keys),
+                "cached_prefixes": len(self._cache), "memory_bytes": size}
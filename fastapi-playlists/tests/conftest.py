@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# app.py inicializa Sentry y monta IMG_DIR al importarse; esto corre antes de importar los tests
+os.environ["SENTRY_DSN"] = ""  # .env (cargado por Core_M_cajita) trae el DSN real
+os.environ.setdefault("IMG_DIR", tempfile.mkdtemp())
+
+
+@pytest.fixture
+def override_auth():
+    """require_auth de app.py y de Core_M_cajita devuelve un usuario de prueba (sin Auth0)."""
+    import app as rest
+    import Core_M_cajita
+
+    apps = ((rest.app, rest.require_auth), (Core_M_cajita.app, Core_M_cajita.require_auth))
+    for app, dependency in apps:
+        app.dependency_overrides[dependency] = lambda: {"sub": "test"}
+    yield
+    for app, _ in apps:
+        app.dependency_overrides.clear()
@@ -0,0 +1,68 @@
+"""Conexión MySQL falsa para probar endpoints sin base de datos.
+
+`responses` es una lista de (fragmento_sql, filas): la primera entrada cuyo fragmento
+aparece en la sentencia ejecutada define lo que devuelve fetchall()/fetchone().
+`filas` puede ser una función (sql, params) -> filas para respuestas que dependen del estado.
+"""
+
+
+class FakeCursor:
+    def __init__(self, conn, dictionary=False):
+        self.conn = conn
+        self.dictionary = dictionary
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((" ".join(sql.split()), params))
+        self.rows = []
+        for fragment, rows in self.conn.responses:
+            if fragment in sql:
+                self.rows = list(rows(sql, params) if callable(rows) else rows)
+                break
+        self.rowcount = len(self.rows) if self.rows else 1
+
+    def executemany(self, sql, seq):
+        for params in seq:
+            self.execute(sql, params)
+
+    def fetchall(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def fetchmany(self, size=1):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchone(self):
+        return self.rows.pop(0) if self.rows else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, responses=None):
+        self.responses = responses or []
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def cursor(self, dictionary=False, **kwargs):
+        return FakeCursor(self, dictionary)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def start_transaction(self, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+    def statements(self, prefix):
+        return [sql for sql, _ in self.executed if sql.lower().startswith(prefix.lower())]
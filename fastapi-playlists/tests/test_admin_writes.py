@@ -0,0 +1,86 @@
+import pytest
+from fastapi.testclient import TestClient
+from mysql.connector import Error
+
+import Core_M_cajita
+from Core_M_cajita import app
+from fakedb import FakeConnection
+
+client = TestClient(app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def test_uiplaylist_saves_categories_in_one_commit(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/uiplaylist', json={"id": "pl1", "segid": 2, "img": None, "title": "T",
+                                         "categories": [1, 2, 2, 3]})
+    assert r.status_code == 200
+    assert r.json()["created"] is True and r.json()["playlist"]["categories"] == [1, 2, 3]
+    assert len(conn.statements("insert into lacajita_playlist_categories")) == 3
+    assert conn.commits == 1
+
+
+def test_uiplaylist_update_syncs_category_diff(monkeypatch):
+    conn = FakeConnection([
+        ("insert into lacajita_playlists", [None, None]),  # rowcount 2: fila existente actualizada
+        ("select id_category from lacajita_playlist_categories", [(1,), (4,)]),
+    ])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/uiplaylist', json={"id": "pl1", "segid": 2, "img": None, "title": "T",
+                                         "categories": [1, 3]})
+    body = r.json()
+    assert body["created"] is False
+    assert (body["categories_added"], body["categories_removed"]) == (1, 1)
+    assert [p for sql, p in conn.executed if sql.startswith("delete")] == [["pl1", 4]]
+    assert [p for sql, p in conn.executed if sql.startswith("insert into lacajita_playlist_categories")] == [("pl1", 3)]
+    # catalog.py relee por updated_at: el cambio de categorías también lo mueve
+    assert [p for sql, p in conn.executed if sql.startswith("update lacajita_playlists set updated_at")] == [("pl1",)]
+    assert not conn.statements("select 1") and conn.commits == 1
+
+
+def test_iuseasonvideos_applies_only_the_diff(monkeypatch):
+    conn = FakeConnection([("select video_id, active from lacajita_videos", [("a", 1), ("b", 1), ("x", 1)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/iuseasonvideos', json={"season_id": 7, "videoarr": ["b", "c", "a", "c"]})
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["inserted"], body["deleted"], body["unchanged"]) == (1, 1, 2)
+    assert [p for sql, p in conn.executed if sql.startswith("insert into lacajita_videos")] == [(7, "c")]
+    assert [p for sql, p in conn.executed if sql.startswith("insert into lacajita_changes")] == [
+        ["video", "7:x", "D"], ["video", "7:c", "I"]]
+    assert [p for sql, p in conn.executed if sql.startswith("delete")] == [[7, "x"]]
+    assert conn.commits == 1
+
+
+def test_iuseasonvideos_reactivates_a_resubmitted_inactive_video(monkeypatch):
+    conn = FakeConnection([("select video_id, active from lacajita_videos", [("a", 1), ("b", 0)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/iuseasonvideos', json={"season_id": 7, "videoarr": ["a", "b"]})
+    body = r.json()
+    assert (body["inserted"], body["deleted"], body["reactivated"], body["unchanged"]) == (0, 0, 1, 1)
+    assert [p for sql, p in conn.executed if sql.startswith("update lacajita_videos set active=1")] == [[7, "b"]]
+    assert [p for sql, p in conn.executed if sql.startswith("insert into lacajita_changes")] == [["video", "7:b", "U"]]
+    assert conn.commits == 1
+
+def test_iuseasonvideos_noop_is_one_select(monkeypatch):
+    conn = FakeConnection([("select video_id, active from lacajita_videos", [("a", 1), ("b", 1)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/iuseasonvideos', json={"season_id": 7, "videoarr": ["b", "a"]})
+    assert r.json()["unchanged"] == 2
+    assert len(conn.executed) == 1 and conn.commits == 0
+
+
+def test_usegments_rolls_back_on_error(monkeypatch):
+    class Failing(FakeConnection):
+        def commit(self):
+            raise Error("deadlock")
+
+    conn = Failing([("select id, rank_key, order_ from lacajita_segments", [(1, "A", 1), (2, "K", 2)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/usegments', json={"arrorder": [{"id": 1, "order_": 2}, {"id": 2, "order_": 1}]})
+    assert r.status_code == 500
+    assert len(conn.statements("update lacajita_segments")) == 1  # un solo UPDATE con CASE
+    assert conn.rollbacks == 1
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import mysql.connector
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def test_create_playlist_returns_row_without_reread(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    r = client.post('/playlists', json={"id": "pl1", "segment_id": 2, "title": "T"})
+    assert r.status_code == 201
+    body = r.json()
+    assert body["id"] == "pl1" and body["active"] == 1 and body["created_at"] == body["updated_at"]
+    assert [sql.split()[0] for sql, _ in conn.executed] == ["INSERT", "insert"]
+    assert conn.executed[1][1] == ["playlist", "pl1", "I"]  # registro de cambios (changelog.py)
+
+
+def test_create_duplicate_playlist_is_409(monkeypatch):
+    class Dup(FakeConnection):
+        def cursor(self, **kwargs):
+            cur = super().cursor(**kwargs)
+
+            def execute(sql, params=None):
+                raise mysql.connector.IntegrityError(msg="Duplicate entry", errno=1062)
+            cur.execute = execute
+            return cur
+
+    conn = Dup()
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    assert client.post('/playlists', json={"id": "pl1", "title": "T"}).status_code == 409
+    assert conn.rollbacks == 1
+
+
+def _warm_catalog(monkeypatch, conn, created_at):
+    """CATALOG con la instantánea ya cargada (pl1 con `created_at`)."""
+    conn.responses[:0] = [
+        ("select (select count(*)", [{"n": 1, "max": created_at}]),
+        ("from lacajita_playlists p", [{"id": "pl1", "title": "Viejo", "created_at": created_at}]),
+    ]
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    rest.CATALOG.refresh()
+    conn.executed.clear()
+
+
+def test_update_playlist_is_one_statement(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    _warm_catalog(monkeypatch, conn, datetime(2023, 5, 1))
+    r = client.put('/playlists/pl1', json={"id": "pl1", "title": "Nuevo", "active": 1})
+    assert r.status_code == 200 and r.json()["title"] == "Nuevo"
+    assert len(conn.executed) == 2 and conn.commits == 1
+    assert conn.executed[1][1] == ["playlist", "pl1", "U"]  # registro de cambios (changelog.py)
+
+
+def test_update_missing_playlist_is_404(monkeypatch):
+    conn = FakeConnection()
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(conn, "cursor", _zero_rowcount_cursor(conn))
+    assert client.put('/playlists/nope', json={"id": "nope", "title": "T"}).status_code == 404
+    assert conn.commits == 0 and conn.rollbacks == 1
+
+
+def test_update_playlist_returns_stored_created_at(monkeypatch):
+    stored = datetime(2023, 5, 1)
+    conn = FakeConnection([
+        ("select (select count(*)", [{"n": 1, "max": stored}]),
+        ("from lacajita_playlists p", [{"id": "pl1", "title": "Viejo", "created_at": stored}]),
+    ])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    rest.CATALOG.refresh()
+    r = client.put('/playlists/pl1', json={"id": "pl1", "title": "Nuevo", "created_at": "2030-01-01T00:00:00"})
+    assert r.json()["created_at"] == "2023-05-01T00:00:00"
+    assert rest.CATALOG.snapshot().playlists["pl1"]["created_at"] == stored
+
+
+def test_update_playlist_reads_created_at_on_a_cold_catalog(monkeypatch):
+    stored = datetime(2023, 5, 1)
+    conn = FakeConnection([("SELECT created_at FROM lacajita_playlists", [(stored,)])])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn))  # sin instantánea todavía
+    r = client.put('/playlists/pl1', json={"id": "pl1", "title": "Nuevo"})
+    assert r.json()["created_at"] == "2023-05-01T00:00:00"
+    assert conn.executed[-1] == ("SELECT created_at FROM lacajita_playlists WHERE id = %s", ("pl1",))
+
+
+def _zero_rowcount_cursor(conn):
+    original = FakeConnection.cursor
+
+    def cursor(**kwargs):
+        cur = original(conn, **kwargs)
+        execute = cur.execute
+
+        def zero(sql, params=None):
+            execute(sql, params)
+            cur.rowcount = 0
+        cur.execute = zero
+        return cur
+    return cursor
@@ -0,0 +1,94 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def _db(monkeypatch, responses=None, lastrowid=None):
+    conn = FakeConnection(responses)
+    if lastrowid is not None:
+        cursor = conn.cursor
+
+        def with_lastrowid(**kwargs):
+            cur = cursor(**kwargs)
+            cur.lastrowid = lastrowid
+            return cur
+        conn.cursor = with_lastrowid
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    return conn
+
+
+def test_create_videos_batch_skips_existing_pairs(monkeypatch):
+    conn = _db(monkeypatch, [("select season_id, video_id from lacajita_videos", [(1, "a")])])
+    r = client.post('/batch/videos', json={"items": [
+        {"season_id": 1, "video_id": "a"}, {"season_id": 1, "video_id": "b"},
+        {"season_id": 2, "video_id": "a"}, {"season_id": 1, "video_id": "b"}]})
+    assert r.status_code == 200
+    body = r.json()
+    assert [x["status"] for x in body["results"]] == ["exists", "created", "created", "exists"]
+    inserts = conn.statements("insert into lacajita_videos")
+    assert len(inserts) == 1 and inserts[0].count("(%s,%s,%s,%s)") == 2
+    assert conn.commits == 1
+
+
+def test_create_segments_batch_assigns_ids_and_rank_keys(monkeypatch):
+    conn = _db(monkeypatch, [("select max(rank_key)", [("V",)])], lastrowid=40)
+    r = client.post('/batch/segments', json={"items": [{"name": "A"}, {"name": "B", "order": 3}]})
+    items = [x["item"] for x in r.json()["results"]]
+    assert [i["id"] for i in items] == [40, 41]
+    assert "V" < items[0]["rank_key"] < items[1]["rank_key"]
+    assert items[1]["order_"] == 3 and items[0]["active"] == 1
+
+
+def test_invalid_batch_writes_nothing(monkeypatch):
+    conn = _db(monkeypatch)
+    r = client.post('/batch/home-carousel', json={"items": [{"imgsrc": "x.jpg"}, {"link": "solo-link"}]})
+    assert r.status_code == 422
+    assert r.json()["detail"]["errors"] == [{"index": 1, "error": "Debe indicar imgsrc o video"}]
+    assert conn.executed == []
+
+
+def test_patch_batch_is_one_case_update(monkeypatch):
+    conn = _db(monkeypatch, [("select id from lacajita_season", [(1,), (2,)])])
+    r = client.patch('/batch/seasons', json={"items": [
+        {"id": 1, "title": "T1"}, {"id": 2, "active": 0}, {"id": 3, "title": "X"}]})
+    assert [x["status"] for x in r.json()["results"]] == ["updated", "updated", "not_found"]
+    (sql, params), = [(s, p) for s, p in conn.executed if s.startswith("update")]
+    assert "title = case when id=%s then %s else title end" in sql
+    assert "active = case when id=%s then %s else active end" in sql
+    assert params == [1, "T1", 2, 0, 1, 2]
+
+
+def test_patch_batch_order_moves_rows(monkeypatch):
+    conn = _db(monkeypatch, [("select id from lacajita_segments", [(1,), (2,), (3,)]),
+                             ("select id, rank_key, order_ from lacajita_segments",
+                              [(1, "A", 1), (2, "K", 2), (3, "V", 3)])])
+    r = client.patch('/batch/segments', json={"items": [{"id": 3, "order": 1}, {"id": 1, "order": 3},
+                                                        {"id": 2, "name": "Sin mover"}]})
+    assert [x["status"] for x in r.json()["results"]] == ["updated"] * 3
+    # una sola escritura de claves, solo para las filas movidas: 3 < K < 1
+    (sql, params), = [(s, p) for s, p in conn.executed if s.startswith("update lacajita_segments set rank_key")]
+    keys = dict(zip(params[0:4:2], params[1:4:2]))
+    assert sorted(keys) == [1, 3] and keys[3] < "K" < keys[1]
+    assert conn.commits == 1
+
+
+def test_delete_batch_reports_missing(monkeypatch):
+    conn = _db(monkeypatch, [("select season_id, video_id from lacajita_videos", [(1, "a")])])
+    r = client.request("DELETE", '/batch/videos', json={"items": [
+        {"season_id": 1, "video_id": "a"}, {"season_id": 1, "video_id": "zz"}]})
+    assert r.json()["deleted"] == 1 and r.json()["not_found"] == 1
+    assert conn.statements("delete from lacajita_videos") == [
+        "delete from lacajita_videos where (season_id, video_id) in ((%s,%s))"]
+
+
+def test_batch_timestamps_share_one_clock():
+    clocks = {spec.defaults[col] for spec in rest.BATCH_SPECS.values()
+              for col in ("date", "date_time") if col in spec.defaults}
+    assert clocks == {rest._utcnow}
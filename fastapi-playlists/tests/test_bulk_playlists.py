@@ -0,0 +1,42 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import Core_M_cajita
+from Core_M_cajita import app
+from fakedb import FakeConnection
+
+client = TestClient(app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def _post(monkeypatch, conn, playlists):
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    return client.post('/bulk/playlists', json={"playlists": playlists})
+
+
+def test_bulk_upsert_single_transaction(monkeypatch):
+    conn = FakeConnection([("select id from lacajita_playlists", [("a",)])])
+    r = _post(monkeypatch, conn, [
+        {"id": "a", "segid": 1, "title": "A", "categories": [1, 2]},
+        {"id": "b", "segid": 1, "title": "B"},
+        {"id": "c", "segid": 0, "title": "C"},
+    ])
+    assert r.status_code == 200
+    body = r.json()
+    assert {x["id"]: x["status"] for x in body["results"]} == {"a": "updated", "b": "inserted", "c": "invalid"}
+    assert (body["inserted"], body["updated"], body["invalid"]) == (1, 1, 1)
+    assert conn.commits == 1
+    upserts = conn.statements("insert into lacajita_playlists")
+    assert len(upserts) == 1 and "on duplicate key update" in upserts[0]
+    # Solo "a" envía categorías: un DELETE y un INSERT multi-row
+    assert len(conn.statements("delete from lacajita_playlist_categories")) == 1
+    assert len(conn.statements("insert into lacajita_playlist_categories")) == 1
+
+
+def test_bulk_all_invalid_does_not_touch_db(monkeypatch):
+    conn = FakeConnection()
+    r = _post(monkeypatch, conn, [{"id": "x", "segid": 0, "title": ""}])
+    assert r.json()["invalid"] == 1
+    assert conn.executed == []
@@ -0,0 +1,82 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import Core_M_cajita
+from Core_M_cajita import app
+from fakedb import FakeConnection
+
+client = TestClient(app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def _seasons_db():
+    """Temporada 10 de 'pl1' existente; la de 'pl2' aparece tras el INSERT."""
+    conn = None
+    existing = [(10, "pl1", "T1", 1)]
+
+    def seasons(sql, params):
+        if conn.statements("insert into lacajita_season"):
+            return existing + [(11, "pl2", "T1", 1)]
+        return existing
+
+    conn = FakeConnection([
+        ("select id from lacajita_playlists", [("pl1",), ("pl2",)]),
+        ("from lacajita_season", seasons),
+        ("from lacajita_videos", [(10, "a", 1), (10, "b", 1), (10, "c", 0)]),
+    ])
+    return conn
+
+
+def test_diff_sync_touches_only_changed_videos(monkeypatch):
+    conn = _seasons_db()
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/bulk/seasons', json={"seasons": [
+        {"playlist_id": "pl1", "title": "T1", "videos": ["a", "c", "d"]},   # b fuera, c vuelve, d nueva
+        {"playlist_id": "pl2", "title": "T1", "videos": ["x", "y"]},
+        {"playlist_id": "nope", "title": "T1", "videos": ["z"]},
+    ]})
+    assert r.status_code == 200
+    body = r.json()
+    by_pl = {x["playlist_id"]: x for x in body["results"]}
+    assert by_pl["pl1"]["status"] == "updated"
+    assert (by_pl["pl1"]["added"], by_pl["pl1"]["reactivated"], by_pl["pl1"]["deactivated"]) == (1, 1, 1)
+    assert by_pl["pl2"]["status"] == "created" and by_pl["pl2"]["season_id"] == 11
+    assert by_pl["nope"]["status"] == "invalid"
+    assert (body["added"], body["reactivated"], body["deactivated"]) == (3, 1, 1)
+    assert conn.commits == 1
+    # Un solo INSERT multi-row de videos y un UPDATE por cada sentido
+    inserts = conn.statements("insert into lacajita_videos")
+    assert len(inserts) == 1
+    assert len(conn.statements("update lacajita_videos set active=1")) == 1
+    assert len(conn.statements("update lacajita_videos set active=0")) == 1
+    assert not conn.statements("delete")
+
+
+def test_unchanged_season_only_reads(monkeypatch):
+    conn = FakeConnection([
+        ("select id from lacajita_playlists", [("pl1",)]),
+        ("from lacajita_season", [(10, "pl1", "T1", 1)]),
+        ("from lacajita_videos", [(10, "a", 1), (10, "b", 1)]),
+    ])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/bulk/seasons', json={"seasons": [{"playlist_id": "pl1", "title": "T1", "videos": ["a", "b"]}]})
+    assert r.json()["results"][0]["status"] == "unchanged"
+    assert all(sql.startswith("select") for sql, _ in conn.executed)
+
+
+def test_empty_list_deactivates_all_and_creates_nothing(monkeypatch):
+    conn = _seasons_db()
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/bulk/seasons', json={"seasons": [
+        {"playlist_id": "pl1", "title": "T1", "videos": []},
+        {"playlist_id": "pl2", "title": "T1", "videos": []},  # no existe: no se crea una temporada vacía
+    ]})
+    body = r.json()
+    by_pl = {x["playlist_id"]: x for x in body["results"]}
+    assert by_pl["pl1"]["status"] == "updated" and by_pl["pl1"]["deactivated"] == 2
+    assert by_pl["pl2"]["status"] == "unchanged"
+    assert [p for sql, p in conn.executed if sql.startswith("update lacajita_videos set active=0")] == [
+        [10, "a", 10, "b"]]
+    assert not conn.statements("insert into lacajita_season") and not conn.statements("insert into lacajita_videos")
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog_stream
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+D = datetime(2024, 1, 1)
+
+
+def _conn(n_playlists=3):
+    return FakeConnection([
+        ("from lacajita_segments", [{"id": 1, "name": "Cine"}]),
+        ("from lacajita_playlists p", [{"id": f"p{i}", "subscription_cost": Decimal("1.50"),
+                                        "updated_at": D, "categories": b"3,4" if i == 0 else None}
+                                       for i in range(n_playlists)]),
+        ("from lacajita_season s", [{"id": 10, "playlist_id": "p0", "date": D}]),
+        ("from lacajita_videos v", [{"season_id": 10, "video_id": "v1"}]),
+    ])
+
+
+def _parse(chunks):
+    return [json.loads(l) for l in b"".join(chunks).decode().splitlines()]
+
+
+def test_records_in_batches_with_end_marker():
+    conn = _conn(5)
+    chunks = list(catalog_stream.records(conn, batch_rows=2))
+    lines = _parse(chunks)
+    assert [l["type"] for l in lines] == ["segment"] + ["playlist"] * 5 + ["season", "video", "end"]
+    assert len(chunks) == 1 + 3 + 1 + 1 + 1  # las playlists llegan en lotes de 2
+    assert lines[1]["categories"] == [3, 4] and lines[2]["categories"] == []
+    assert lines[1]["subscription_cost"] == 1.5 and lines[1]["updated_at"] == "2024-01-01T00:00:00"
+    assert lines[-1]["counts"] == {"segment": 1, "playlist": 5, "season": 1, "video": 1}
+
+
+def test_since_filters_playlists_and_children():
+    conn = FakeConnection([])
+    list(catalog_stream.records(conn, since=D))
+    filtered = [(sql, params) for sql, params in conn.executed if "lacajita_playlists p" in sql]
+    assert len(filtered) == 3
+    assert all("where p.updated_at >= %s" in sql and params == (D,) for sql, params in filtered)
+
+
+def test_error_mid_stream_has_no_end():
+    conn = _conn()
+
+    def boom(sql, params):
+        raise RuntimeError("conexión perdida")
+    conn.responses.insert(0, ("from lacajita_season s", boom))
+    lines = _parse(catalog_stream.records(conn))
+    assert lines[-1]["type"] == "error" and "end" not in [l["type"] for l in lines]
+
+
+def test_client_disconnect_closes_connection_without_error_line():
+    class Unread(FakeConnection):
+        closed = False
+
+        def cursor(self, **kwargs):
+            cur = super().cursor(**kwargs)
+
+            def close():  # como mysql.connector con filas sin leer en un cursor sin búfer
+                if cur.rows:
+                    raise RuntimeError("Unread result found")
+            cur.close = close
+            return cur
+
+        def close(self):
+            self.closed = True
+
+    conn = Unread(_conn(5).responses)
+    gen = catalog_stream.records(conn, batch_rows=2)
+    assert _parse([next(gen), next(gen)])[-1]["type"] == "playlist"
+    gen.close()  # desconexión a mitad de las playlists
+    assert conn.closed
+
+
+def test_stream_endpoint(override_auth, monkeypatch):
+    monkeypatch.setattr(rest, "get_connection", lambda: _conn())
+    r = client.get("/catalog/stream", params={"since": "2024-01-01T00:00:00"})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(l) for l in r.text.splitlines()]
+    assert lines[-1] == {"type": "end", "counts": {"segment": 1, "playlist": 3, "season": 1, "video": 1},
+                         "since": "2024-01-01T00:00:00"}
@@ -0,0 +1,102 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import changelog
+import wire
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+D = datetime(2024, 1, 1)
+
+
+def _log(*entries):
+    return [{"seq": n, "entity": e, "entity_id": i, "op": op} for n, (e, i, op) in enumerate(entries, start=1)]
+
+
+def test_compact_keeps_net_operation_per_entity():
+    rows = _log(("playlist", "a", "I"), ("playlist", "a", "U"),   # alta + cambio = alta
+                ("season", "1", "I"), ("season", "1", "D"),       # alta + baja = nada
+                ("video", "1:x", "D"), ("video", "1:x", "I"),     # baja + alta = cambio
+                ("segment", "2", "U"), ("segment", "2", "D"),
+                ("playlist", "b", "U"))
+    assert [(c["entity"], c["id"], c["op"], c["seq"]) for c in changelog.compact(rows)] == [
+        ("playlist", "a", "I", 2), ("video", "1:x", "U", 6), ("segment", "2", "D", 8), ("playlist", "b", "U", 9)]
+
+
+def test_resumable_window():
+    assert changelog.is_resumable(0, 0, 0)
+    assert changelog.is_resumable(9, 10, 20) and changelog.is_resumable(20, 10, 20)
+    assert not changelog.is_resumable(8, 10, 20)   # lo posterior a 8 ya se borró
+    assert not changelog.is_resumable(21, 10, 20)  # seq de otra base de datos
+
+
+
+def _log_conn(log):
+    return FakeConnection([
+        ("where changed_at <", lambda sql, p: [(r["seq"],) for r in log if r["age"] >= p[0]][-1:]),
+        ("from lacajita_changes where seq >", lambda sql, p: [r for r in log if r["seq"] > p[0]][:p[1]]),
+    ])
+
+
+def test_read_stops_at_a_seq_that_is_not_committed_yet():
+    log = [dict(r, age=age) for r, age in zip(_log(("playlist", "a", "U"), ("playlist", "b", "U")), (90, 5))]
+    log.append({"seq": 4, "entity": "season", "entity_id": "3", "op": "I", "age": 1})  # seq 3 sigue abierto
+    cur = _log_conn(log).cursor()
+    rows, more = changelog.read(cur, 0)
+    assert [r["seq"] for r in rows] == [1, 2] and not more and "age" not in rows[0]
+    assert changelog.changes_since(cur, 2)["seq"] == 2  # el cliente no avanza más allá del hueco
+    assert changelog.watermark(cur) == 2
+
+    log[-1]["age"] = changelog.GAP_SECONDS  # hueco viejo: un rollback, se salta
+    assert [r["seq"] for r in changelog.read(cur, 2)[0]] == [4]
+    assert changelog.watermark(cur) == 4
+
+@pytest.fixture
+def app_db(monkeypatch, override_auth):
+    wire.CACHE.clear()
+    log = _log(("playlist", "a", "U"), ("video", "1:v1", "I"), ("playlist", "gone", "I"), ("season", "3", "D"))
+    conn = FakeConnection([
+        ("select min(seq)", lambda sql, p: [{"first": log[0]["seq"], "last": log[-1]["seq"]}]),
+        ("from lacajita_changes where seq >", lambda sql, p: [r for r in log if r["seq"] > p[0]][:p[1]]),
+        ("from lacajita_playlists p where p.id in", [{"id": "a", "title": "A", "categories": b"1,2"}]),
+        ("from lacajita_videos where", [{"season_id": 1, "video_id": "v1", "date": D, "active": 1}]),
+        ("select (select count(*)", [{"n": 1, "max": D}]),
+        ("from lacajita_playlists p", [{"id": "a", "segment_id": 1, "title": "A", "active": 1, "updated_at": D}]),
+        ("from lacajita_segments", [{"id": 1, "name": "Cine", "livetv": 0, "active": 1}]),
+    ])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    return log
+
+
+def test_changes_since_returns_current_rows(app_db):
+    body = client.get("/catalog/changes", params={"since": 0}).json()
+    assert (body["full"], body["seq"], body["more"]) == (False, 4, False)
+    assert [(c["entity"], c["id"], c["op"]) for c in body["changes"]] == [
+        ("playlist", "a", "U"), ("video", "1:v1", "I"), ("playlist", "gone", "D"), ("season", "3", "D")]
+    assert body["changes"][0]["data"]["categories"] == [1, 2]
+    assert body["changes"][1]["data"]["date"] == "2024-01-01T00:00:00"
+
+    page = client.get("/catalog/changes", params={"since": 1, "limit": 2}).json()
+    assert [c["id"] for c in page["changes"]] == ["1:v1", "gone"] and page["seq"] == 3 and page["more"]
+    assert client.get("/catalog/changes", params={"since": 4}).json()["changes"] == []
+
+
+def test_unknown_since_falls_back_to_full_catalog(app_db):
+    body = client.get("/catalog/changes", params={"since": 99}).json()
+    assert body["full"] is True and body["seq"] == 4
+    assert body["catalog"]["segments"][0]["playlist"][0]["id"] == "a"
+
+
+def test_batch_writes_record_each_element(monkeypatch, override_auth):
+    conn = FakeConnection([("select season_id, video_id from lacajita_videos", [(1, "v1")])])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    r = client.request("DELETE", "/batch/videos", json={"items": [{"season_id": 1, "video_id": "v1"},
+                                                                  {"season_id": 1, "video_id": "v2"}]})
+    assert r.status_code == 200
+    assert [p for sql, p in conn.executed if sql.startswith("insert into lacajita_changes")] == [["video", "1:v1", "D"]]
+    assert conn.commits == 1
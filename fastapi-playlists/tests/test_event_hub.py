@@ -0,0 +1,143 @@
+import asyncio
+import json
+
+import event_hub
+from fakedb import FakeConnection
+
+
+def _log(*entries, start=1, age=0):
+    return [{"seq": n, "entity": e, "entity_id": i, "op": op, "age": age}
+            for n, (e, i, op) in enumerate(entries, start=start)]
+
+
+def _hub(log, **kwargs):
+    conn = FakeConnection([
+        ("select min(seq)", lambda sql, p: [{"first": log[0]["seq"] if log else None,
+                                             "last": log[-1]["seq"] if log else None}]),
+        ("from lacajita_changes where seq >", lambda sql, p: [r for r in log if r["seq"] > p[0]][:p[1]]),
+    ])
+    kwargs.setdefault("poll_seconds", 3600)
+    kwargs.setdefault("heartbeat_seconds", 3600)
+    return event_hub.Hub(lambda: conn, **kwargs)
+
+
+def _data(frame):
+    return json.loads(frame.split(b"data: ", 1)[1])
+
+
+def test_events_are_serialized_once_for_all_subscribers():
+    log = _log(("playlist", "a", "U"))
+
+    async def run():
+        hub = _hub(log)
+        a, b = hub.stream(), hub.stream()
+        for s in (a, b):
+            assert (await anext(s)).startswith(b"retry:")
+            assert await anext(s) == b'id: 1\nevent: ready\ndata: {"seq":1}\n\n'
+        log.extend(_log(("season", "3", "I"), ("season", "3", "U"), start=2))
+        await hub.poll_catalog()
+        fa, fb = await anext(a), await anext(b)
+        assert fa is fb and fa.startswith(b"id: 3\nevent: catalog\n")
+        assert _data(fa)["changes"] == [{"entity": "season", "id": "3", "op": "I"}]
+        await a.aclose(); await b.aclose()
+        assert not hub.subscribers
+
+    asyncio.run(run())
+
+
+def _resume(log, last_event_id, prepare=None):
+    async def run():
+        hub = _hub(log)
+        first = hub.stream()
+        await anext(first); await anext(first)
+        if prepare:
+            await prepare(hub)
+        s = hub.stream(last_event_id)
+        await anext(s)
+        out = await anext(s)
+        await s.aclose(); await first.aclose()
+        return hub, out
+
+    return asyncio.run(run())
+
+
+def test_reconnect_replays_from_the_change_log():
+    log = _log(("playlist", "a", "U"), ("season", "3", "I"), ("playlist", "a", "D"))
+    _, frame = _resume(log, "1")
+    assert frame.startswith(b"id: 3\nevent: catalog\n")
+    assert _data(frame)["changes"] == [{"entity": "season", "id": "3", "op": "I"},
+                                       {"entity": "playlist", "id": "a", "op": "D"}]
+
+
+def test_reconnect_uses_the_backlog_or_resets():
+    log = _log(("playlist", "a", "U"))
+
+    async def one_more(hub):
+        log.extend(_log(("video", "1:x", "I"), start=2))
+        await hub.poll_catalog()
+
+    hub, frame = _resume(log, "1", one_more)
+    assert frame is hub.backlog[-1][2]  # mismos bytes que recibieron las conexiones abiertas
+
+    pruned = _log(("playlist", "a", "U"), start=5)
+    _, frame = _resume(pruned, "2")
+    assert frame == b'id: 5\nevent: reset\ndata: {"seq":5}\n\n'
+
+
+def test_reset_reaches_open_streams_after_the_log_restarts():
+    log = _log(("playlist", "a", "U"), ("playlist", "b", "U"), ("season", "3", "I"))
+
+    async def run():
+        hub = _hub(log, heartbeat_seconds=0.05)  # un reset perdido sale como heartbeat
+        s = hub.stream()
+        await anext(s)
+        assert _data(await anext(s)) == {"seq": 3}
+        log[:] = _log(("playlist", "c", "I"))  # tabla recreada: el seq vuelve a empezar
+        await hub.poll_catalog()
+        assert await anext(s) == b'id: 1\nevent: reset\ndata: {"seq":1}\n\n'
+        log.extend(_log(("playlist", "c", "U"), start=2))
+        await hub.poll_catalog()
+        assert (await anext(s)).startswith(b"id: 2\nevent: catalog\n")
+        await s.aclose()
+
+    asyncio.run(run())
+
+
+def test_late_commit_is_pushed_not_skipped():
+    log = _log(("playlist", "a", "U"))
+    log += _log(("season", "3", "I"), start=3)  # seq 2 aún en una transacción abierta
+
+    async def run():
+        hub = _hub(log)
+        s = hub.stream()
+        await anext(s)
+        assert _data(await anext(s)) == {"seq": 1}
+        log.insert(1, _log(("video", "1:x", "I"), start=2)[0])  # commit tardío de seq 2
+        await hub.poll_catalog()
+        frame = await anext(s)
+        assert frame.startswith(b"id: 3\nevent: catalog\n")
+        assert [c["id"] for c in _data(frame)["changes"]] == ["1:x", "3"]
+        await s.aclose()
+
+    asyncio.run(run())
+
+
+def test_dashboard_and_heartbeat():
+    calls = []
+
+    def dashboard():
+        calls.append(1)
+        return {"system_summary": {"playlists": 3}}
+
+    async def run():
+        hub = _hub([], dashboard=dashboard, heartbeat_seconds=0.01)
+        s = hub.stream()
+        frames = [await anext(s) for _ in range(4)]
+        assert frames[1] == b'id: 0\nevent: ready\ndata: {"seq":0}\n\n'
+        assert b'event: dashboard\ndata: {"system_summary":{"playlists":3}}\n\n' in frames
+        assert event_hub.HEARTBEAT in frames
+        await hub.poll_dashboard()  # sin cambios: no se vuelve a emitir
+        assert [await anext(s) for _ in range(2)] == [event_hub.HEARTBEAT] * 2 and len(calls) == 2
+        await s.aclose()
+
+    asyncio.run(run())
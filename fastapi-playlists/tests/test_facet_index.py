@@ -0,0 +1,127 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import facet_index
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+
+
+def _p(pid, segment, categories, subscription=0, active=1, category=None):
+    return {"id": pid, "segment_id": segment, "categories": categories, "subscription": subscription,
+            "active": active, "category": category, "title": pid, "updated_at": datetime(2024, 1, 1)}
+
+
+PLAYLISTS = [
+    _p("a", 1, [10, 11], category="Cine"),
+    _p("b", 1, [11], subscription=1, category="Cine"),
+    _p("c", 2, [10], category="Docs"),
+    _p("d", 2, [], active=0),
+]
+
+
+def _index():
+    index = facet_index.FacetIndex()
+    for p in PLAYLISTS:
+        index.upsert(p)
+    return index
+
+
+def test_and_or_not_expressions():
+    index = _index()
+    ids = lambda expr: index.members(index.evaluate(expr))
+    assert ids({"category": [10, 11]}) == ["a", "b", "c"]
+    assert ids({"segment": 1, "category": 10}) == ["a"]
+    assert ids({"or": [{"segment": 2}, {"subscription": 1}]}) == ["b", "c", "d"]
+    assert ids({"and": [{"active": 1}, {"not": {"category": 11}}]}) == ["c"]
+    with pytest.raises(ValueError):
+        index.evaluate({"color": "red"})
+    with pytest.raises(ValueError):
+        index.evaluate({"or": {"segment": 1}})
+
+
+def test_counts_are_disjunctive():
+    counts = _index().counts({"segment": ["1"], "active": ["1"]})
+    assert counts["segment"] == {"1": 2, "2": 1}  # ignora su propio filtro
+    assert counts["category"] == {"10": 1, "11": 2}
+    assert counts["subscription"] == {"0": 1, "1": 1}
+
+
+def test_upsert_and_remove_reuse_ordinals():
+    index = _index()
+    index.upsert({**PLAYLISTS[0], "categories": [12]})
+    assert index.members(index.any_of("category", [10])) == ["c"]
+    index.remove("a")
+    assert "a" not in index.members(index.all) and len(index) == 3
+    index.upsert(_p("e", 3, [12]))
+    assert index.ordinal["e"] == 0
+    assert index.members(index.any_of("category", [12])) == ["e"]
+
+
+@pytest.fixture
+def app_catalog(monkeypatch, override_auth):
+    links = [{"id_playlist": p["id"], "id_category": c} for p in PLAYLISTS for c in p["categories"]]
+    conn = FakeConnection([
+        ("select (select count(*)", [{"n": 4, "max": datetime(2024, 1, 1), "l": 4, "c": 2, "s": 2, "se": 0}]),
+        ("from lacajita_playlists p", lambda sql, params: [{k: v for k, v in p.items() if k != "categories"}
+                                                          for p in PLAYLISTS]),
+        ("select id_playlist, id_category", links),
+        ("SELECT COUNT(*) as count", [{"count": 0}]),
+    ])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    cat = catalog.Catalog(lambda: conn, refresh_seconds=3600)
+    cat.register("facets", facet_index.FacetIndex.from_snapshot)
+    monkeypatch.setattr(rest, "CATALOG", cat)
+    return conn
+
+
+def test_facets_endpoint_counts_in_one_call(app_catalog):
+    r = client.get("/playlists/facets", params={"category": "10,11", "active": "1"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["total"] == 3
+    assert body["facets"]["segment"] == {"1": 2, "2": 1}
+    assert body["facets"]["active"] == {"1": 3}
+
+
+def test_filter_endpoint(app_catalog):
+    r = client.post("/playlists/filter", json={"where": {"and": [{"segment": [1, 2]}, {"not": {"active": 0}}]},
+                                               "limit": 2, "counts": True})
+    body = r.json()
+    assert body["total"] == 3 and [p["id"] for p in body["items"]] == ["a", "b"]
+    assert body["facets"]["legacy_category"] == {"Cine": 2, "Docs": 1}
+    assert client.post("/playlists/filter", json={"where": {"nope": 1}}).status_code == 422
+
+
+def test_filter_reads_rows_from_the_index_snapshot(app_catalog):
+    snapshot, index = rest.CATALOG.indexed("facets")
+    assert index.version == snapshot.version
+    del snapshot.playlists["a"]  # baja que el índice aún no vio
+    body = client.post("/playlists/filter", json={"where": {"active": 1}}).json()
+    assert body["total"] == 3 and [p["id"] for p in body["items"]] == ["b", "c"]
+
+
+def test_empty_legacy_category_is_counted():
+    index = _index()
+    index.upsert(_p("e", 2, [], category=""))
+    # como el GROUP BY category anterior de /stats/overview: "" es un valor, NULL no
+    assert index.counts({}, facets=["legacy_category"]) == {"legacy_category": {"Cine": 2, "Docs": 1, "": 1}}
+
+
+def test_version_follows_in_place_updates(app_catalog):
+    _, index = rest.CATALOG.indexed("facets")
+    before = index.version
+    rest.CATALOG.playlist_saved({"id": "a", "active": 0})
+    assert rest.CATALOG.index("facets") is index and index.version == rest.CATALOG.version > before
+
+
+def test_stats_overview_uses_facet_counts(app_catalog):
+    stats = client.get("/stats/overview").json()
+    assert stats["active_playlists"] == 3
+    assert stats["playlists_by_category"] == [{"category": "Cine", "count": 2}, {"category": "Docs", "count": 1}]
+    assert (stats["subscription_required"], stats["free_content"]) == (1, 2)
+    assert not [sql for sql, _ in app_catalog.executed if "GROUP BY" in sql]
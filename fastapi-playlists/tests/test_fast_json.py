@@ -0,0 +1,37 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from fastapi import Response
+from fastapi.testclient import TestClient
+
+import app as rest
+import fast_json
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+
+
+def test_dumps_matches_iso_and_decimal_conventions(monkeypatch):
+    row = {"date": datetime(2024, 1, 2, 3, 4, 5), "day": date(2024, 1, 2), "cost": Decimal("4.50"),
+           "title": "Acción", 1: {"raw": bytearray(b"x")}}
+    expected = {"date": "2024-01-02T03:04:05", "day": "2024-01-02", "cost": 4.5, "title": "Acción",
+                "1": {"raw": "x"}}
+    assert json.loads(fast_json.dumps(row)) == expected
+    monkeypatch.setattr(fast_json, "orjson", None)
+    assert json.loads(fast_json.dumps(row)) == expected
+
+
+def test_respond_keeps_endpoint_headers():
+    response = Response()
+    response.headers["X-Next-Cursor"] = "abc"
+    out = fast_json.respond([1], response)
+    assert out.headers["x-next-cursor"] == "abc" and out.body == b"[1]"
+
+
+def test_videos_endpoint_uses_fast_path(monkeypatch, override_auth):
+    conn = FakeConnection([("FROM lacajita_videos", [
+        {"season_id": 1, "video_id": "v1", "date": datetime(2024, 1, 1), "active": 1}])])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    r = client.get("/videos")
+    assert r.json() == [{"season_id": 1, "video_id": "v1", "date": "2024-01-01T00:00:00", "active": 1}]
@@ -0,0 +1,40 @@
+import image_index
+
+
+def test_blurhash_solid_color():
+    pixels = [(255, 0, 0)] * (8 * 6)
+    bh, color = image_index.blurhash_encode(pixels, 8, 6)
+    # 1 (size) + 1 (max) + 4 (DC) + 2 por cada componente AC (4*3-1)
+    assert len(bh) == 6 + 2 * 11
+    assert color == "#ff0000"
+
+
+def test_blurhash_matches_reference_encoder():
+    w, h = 12, 9
+    pixels = [((x * 37) % 256, (y * 59) % 256, ((x + y) * 23) % 256) for y in range(h) for x in range(w)]
+    bh, _ = image_index.blurhash_encode(pixels, w, h)
+    assert bh == "LOE4AWX-273PziaXSFR?dxe%fXe^"
+
+
+def test_placeholder_for_prefers_playlist_cover():
+    index = {"pl1.jpeg": {"blurhash": "A"}, "other.jpg": {"blurhash": "B"}}
+    assert image_index.placeholder_for(index, "pl1", "https://cdn/x/other.jpg")["blurhash"] == "A"
+    assert image_index.placeholder_for(index, "pl2", "https://cdn/x/other.jpg?v=2")["blurhash"] == "B"
+    assert image_index.placeholder_for(index, "pl2", None) is None
+    assert image_index.placeholder_for({}, "pl1") is None
+
+
+def test_update_entry_concurrent_writers_keep_every_entry(tmp_path):
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (8, 8), (200, 10, 10)).save(buf, "PNG")
+    content = buf.getvalue()
+    names = [f"pl{i}.png" for i in range(8)]
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda n: image_index.update_entry(str(tmp_path), n, content), names))
+    assert set(image_index.load_index(str(tmp_path))) == set(names)
+    assert (tmp_path / "index.json.lock").exists()
@@ -0,0 +1,146 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import jw_api_ingest
+from jw_state import IngestState, RunJournal
+
+
+class _Resp:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+        self.text = ""
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class _FakeJW:
+    """Management API listing (page/page_length/total) + Delivery API media with links.next."""
+
+    def __init__(self, total, media_per_playlist=3, fail_pages=()):
+        self.fail_pages = set(fail_pages)
+        self.playlists = [{"id": f"pl{i:03d}", "metadata": {"title": f"Playlist {i}"}} for i in range(total)]
+        self.media_per_playlist = media_per_playlist
+        self.pages_requested = []
+
+    def request(self, method, url, params=None, **kwargs):
+        if "/sites/" in url:
+            page, length = params["page"], params["page_length"]
+            self.pages_requested.append(page)
+            if page in self.fail_pages:
+                return _Resp(403)
+            chunk = self.playlists[(page - 1) * length:page * length]
+            return _Resp(200, {"playlists": chunk, "total": len(self.playlists)}, {"ETag": f'"p{page}"'})
+        pid = url.split("/playlists/")[1].split("?")[0]
+        offset = 1 if params else int(url.split("page_offset=")[1])
+        data = {"playlist": [{"mediaid": f"{pid}-m{offset}", "image": f"https://img/{pid}-{offset}.jpg"}]
+                if self.media_per_playlist else [], "links": {}}
+        if offset < self.media_per_playlist:
+            data["links"]["next"] = f"https://cdn.jwplayer.com/v2/playlists/{pid}?page_offset={offset + 1}"
+        return _Resp(200, data)
+
+
+class _FakeBackend:
+    def __init__(self):
+        self.batches = []
+        self.seasons = []
+
+    def request(self, method, url, json=None, **kwargs):
+        if url.endswith("/bulk/seasons"):
+            self.seasons += json["seasons"]
+            return _Resp(200, {"results": [{"playlist_id": s["playlist_id"], "title": s["title"], "status": "created"}
+                                           for s in json["seasons"]]})
+        self.batches.append(json["playlists"])
+        return _Resp(200, {"results": [{"id": p["id"], "status": "inserted"} for p in json["playlists"]]})
+
+
+def test_fetches_every_page_and_media_and_streams_batches():
+    jw, backend = _FakeJW(total=25), _FakeBackend()
+    stats = jw_api_ingest.CatalogIngest(jw, jw, backend, "site1234", "http://api", concurrency=3, rate=0,
+                                        page_length=10, batch_size=8, segid=1, dry_run=False).run()
+    assert sorted(jw.pages_requested) == [1, 2, 3]
+    sent = [p for batch in backend.batches for p in batch]
+    assert sorted(p["id"] for p in sent) == [f"pl{i:03d}" for i in range(25)]
+    assert all(len(batch) <= 8 for batch in backend.batches)  # batch_size, aunque la página traiga 10
+    # Playlists without an image take the first media poster
+    assert all(p["img"].endswith("-1.jpg") for p in sent)
+    assert stats.get("media") == 25 * 3
+    assert stats.get("upserted") == 25
+    # Each playlist's media become one season with all its videos
+    assert len(backend.seasons) == 25 and stats.get("seasons_synced") == 25
+    assert backend.seasons[0]["videos"] == [f"{backend.seasons[0]['playlist_id']}-m{i}" for i in (1, 2, 3)]
+
+
+def test_season_payloads_group_by_season_number():
+    media = [{"mediaid": "a", "seasonNumber": "2"}, {"mediaid": "b"}, {"mediaid": "c", "seasonNumber": "2"}, {}]
+    out = jw_api_ingest.season_payloads("pl1", media)
+    assert out == [{"playlist_id": "pl1", "title": "Temporada 2", "videos": ["a", "c"]},
+                   {"playlist_id": "pl1", "title": "Temporada 1", "videos": ["b"]}]
+
+
+def test_season_payloads_empty_seasons_deactivate():
+    # Temporada ya sincronizada sin media ahora: lista vacía (el backend desactiva sus videos)
+    out = jw_api_ingest.season_payloads("pl1", [{"mediaid": "b"}], known_titles=["Temporada 2", "Temporada 1"])
+    assert out == [{"playlist_id": "pl1", "title": "Temporada 1", "videos": ["b"]},
+                   {"playlist_id": "pl1", "title": "Temporada 2", "videos": []}]
+    assert jw_api_ingest.season_payloads("pl1", []) == [{"playlist_id": "pl1", "title": "Temporada 1", "videos": []}]
+    # media sin ids: no son fiables, no se envía nada que desactive
+    assert jw_api_ingest.season_payloads("pl1", [{}]) == []
+
+
+def test_playlist_left_without_media_deactivates_its_season(tmp_path):
+    state = IngestState(str(tmp_path / "state.sqlite"))
+    jw, backend = _FakeJW(total=1, media_per_playlist=2), _FakeBackend()
+
+    def run():
+        jw_api_ingest.CatalogIngest(jw, jw, backend, "site1234", "http://api", concurrency=1, rate=0,
+                                    page_length=10, batch_size=8, segid=1, state=state, dry_run=False).run()
+    run()
+    jw.media_per_playlist = 0
+    backend.seasons.clear()
+    run()
+    assert backend.seasons == [{"playlist_id": "pl000", "title": "Temporada 1", "videos": []}]
+    state.close()
+
+def test_bounded_map_limits_in_flight_and_reports_errors():
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fn(x):
+        if x == 3:
+            raise ValueError("boom")
+        return x * 2
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        out = dict(jw_api_ingest.bounded_map(pool, fn, range(6), window=2))
+    assert isinstance(out.pop(3), ValueError)
+    assert out == {0: 0, 1: 2, 2: 4, 4: 8, 5: 10}
+
+
+def test_resume_skips_pages_already_applied(tmp_path):
+    state = IngestState(str(tmp_path / "state.sqlite"))
+    jw, backend = _FakeJW(total=30, fail_pages={3}), _FakeBackend()
+    journal = RunJournal(state, "jw_api_ingest")
+    stats = jw_api_ingest.CatalogIngest(jw, jw, backend, "site1234", "http://api", rate=0, page_length=10,
+                                        batch_size=10, segid=1, state=state, dry_run=False,
+                                        journal=journal).run()
+    assert stats.get("page_failures") == 1
+    journal.finish("incomplete")
+
+    jw2, backend2 = _FakeJW(total=30), _FakeBackend()
+    resumed = RunJournal(state, "jw_api_ingest", resume=True)
+    stats = jw_api_ingest.CatalogIngest(jw2, jw2, backend2, "site1234", "http://api", rate=0, page_length=10,
+                                         batch_size=10, segid=1, state=state, dry_run=False,
+                                         journal=resumed).run()
+    assert resumed.resumed and stats.get("pages_resumed") == 2
+    # Page 1 is re-read for the total, but only page 3 is applied
+    assert sorted(jw2.pages_requested) == [1, 3]
+    assert sorted(p["id"] for b in backend2.batches for p in b) == [f"pl{i:03d}" for i in range(20, 30)]
+    state.close()
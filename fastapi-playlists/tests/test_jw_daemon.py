@@ -0,0 +1,118 @@
+import json
+import os
+import sys
+import threading
+
+import requests
+from requests.adapters import BaseAdapter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import jw_daemon
+from jw_daemon import Scheduler, CHANGED, UNCHANGED, FAILED
+from jw_http import BackendAuth, RunStats
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_intervals_adapt_per_source_with_jitter(tmp_path):
+    clock = _Clock()
+    results = {"busy": CHANGED, "static": UNCHANGED, "broken": FAILED}
+    sched = Scheduler({k: (lambda k=k: results[k]) for k in results}, min_interval=100, max_interval=1000,
+                      jitter=0.1, status_path=str(tmp_path / "status.json"), clock=clock)
+    for s in sched.sources.values():
+        s.interval = 400
+    for _ in range(3):
+        for key in results:
+            sched._run_job(key)
+    assert sched.sources["busy"].interval == 100          # 400 -> 200 -> 100 -> 100 (mínimo)
+    assert sched.sources["static"].interval == 1000       # 400 -> 600 -> 900 -> 1000 (máximo)
+    broken = sched.sources["broken"]
+    assert broken.interval == 400 and broken.failures == 3
+    # Tercer fallo seguido: 400 * 0.25 * 4 = 400 s, ±10% de jitter
+    assert 360 <= broken.next_run - clock.now <= 440
+    static = sched.sources["static"]
+    assert 900 <= static.next_run - clock.now <= 1100
+
+    status = json.loads((tmp_path / "status.json").read_text())
+    assert status["sources"]["busy"]["last_result"] == "changed"
+    assert status["sources"]["static"]["runs"] == 3
+    # Un reinicio recupera los intervalos aprendidos
+    again = Scheduler({"static": lambda: UNCHANGED}, min_interval=100, max_interval=1000,
+                      status_path=str(tmp_path / "status.json"), clock=clock)
+    assert again.sources["static"].interval == 1000
+
+
+def test_due_returns_only_sources_whose_time_came(tmp_path):
+    clock = _Clock()
+    sched = Scheduler({"a": lambda: UNCHANGED, "b": lambda: UNCHANGED}, min_interval=100,
+                      status_path=None, clock=clock)
+    clock.now += jw_daemon.STARTUP_SPREAD + 1
+    assert sorted(sched.due()) == ["a", "b"]
+    sched._run_job("a")
+    assert sched.due() == []
+
+
+def test_stats_logged_and_reset_at_the_end_of_each_cycle(tmp_path):
+    stats = RunStats()
+    summaries = []
+
+    def job():
+        stats.incr("items", 2)
+        return CHANGED
+
+    def end_of_cycle():
+        summaries.append(stats.log_and_reset("Resumen ciclo"))
+        sched.stop()
+
+    sched = Scheduler({"a": job, "b": job}, min_interval=100, status_path=None, on_cycle=end_of_cycle)
+    for s in sched.sources.values():
+        s.next_run = 0
+    sched.heap = [(0, k) for k in sched.sources]
+    thread = threading.Thread(target=sched.run_forever, kwargs={"poll": 0.01})
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert [s["items"] for s in summaries] == [4]
+    assert stats.get("items") == 0
+
+class _Backend(BaseAdapter):
+    """Backend que solo acepta el token 'Bearer new' y registra las cabeceras recibidas."""
+
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def send(self, request, **kwargs):
+        self.seen.append((request.url, request.headers.get("Authorization")))
+        resp = requests.Response()
+        resp.status_code = 200 if request.headers.get("Authorization") in (None, "Bearer new") else 401
+        if "api.local" not in request.url:
+            resp.status_code = 200
+        resp._content = b"{}"
+        resp.request = request
+        resp.connection = self
+        return resp
+
+    def close(self):
+        pass
+
+
+def test_backend_auth_scoped_to_api_and_refreshed_on_401():
+    adapter = _Backend()
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.auth = BackendAuth("http://api.local/api", "Bearer old", refresh=lambda: "Bearer new")
+    assert session.get("http://api.local/api/bulk/playlists").status_code == 200
+    assert session.get("http://other.site/page").status_code == 200
+    assert adapter.seen == [
+        ("http://api.local/api/bulk/playlists", "Bearer old"),
+        ("http://api.local/api/bulk/playlists", "Bearer new"),
+        ("http://other.site/page", None),
+    ]
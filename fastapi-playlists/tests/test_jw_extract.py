@@ -0,0 +1,38 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from jw_extract import extract_jwplayer_config, scan_chunks
+
+PAGE = (
+    "<html>" + "<p>{relleno}</p>" * 50 +
+    '<script>jwplayer("player").setup({"playlist": [{"title": "Fin })] \\" cita", "file": "a.mp4", // coment }\n'
+    ' "image": "p.jpg"}], /* } ] */ "width": 640});</script>'
+    '<script>var x = {playlist: [1]};</script></html>'
+)
+EXPECTED = {"playlist": [{"title": 'Fin })] " cita', "file": "a.mp4", "image": "p.jpg"}], "width": 640}
+
+
+def test_balanced_object_with_strings_escapes_and_comments():
+    assert extract_jwplayer_config(PAGE) == EXPECTED
+
+
+def test_chunked_input_gives_same_result_for_any_split():
+    body = PAGE.encode("utf-8")
+    for size in (1, 2, 5, 64, 4096):
+        cfg, _ = scan_chunks(body[i:i + size] for i in range(0, len(body), size))
+        assert cfg == EXPECTED, size
+
+
+def test_stops_reading_once_setup_is_found():
+    body = (PAGE + "x" * 1_000_000).encode("utf-8")
+    cfg, read = scan_chunks(body[i:i + 4096] for i in range(0, len(body), 4096))
+    assert cfg == EXPECTED
+    assert read < 10_000
+
+
+def test_playlist_array_fallback_and_invalid_setup():
+    html = "jwplayer('x').setup({file: cfg.url}, cb); var o = {playlist: [{'title': 'a',}]};"
+    assert extract_jwplayer_config(html) == {"playlist": [{"title": "a"}]}
+    assert extract_jwplayer_config("<html>sin reproductor</html>") is None
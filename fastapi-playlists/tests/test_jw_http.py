@@ -0,0 +1,58 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+import jw_http
+
+
+class _Resp:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class _FakeSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return _Resp(self.statuses.pop(0), {"Retry-After": "0"})
+
+
+def test_retry_on_429_and_5xx_then_success():
+    s = _FakeSession([429, 503, 200])
+    r = jw_http.request_with_retry(s, "GET", "http://h/x", retries=4)
+    assert r.status_code == 200
+    assert s.calls == 3
+
+
+def test_retry_gives_up_and_returns_last_response():
+    s = _FakeSession([500, 500, 500])
+    r = jw_http.request_with_retry(s, "GET", "http://h/x", retries=2)
+    assert r.status_code == 500
+    assert s.calls == 3
+
+
+def test_no_retry_on_client_error():
+    s = _FakeSession([404, 200])
+    assert jw_http.request_with_retry(s, "GET", "http://h/x").status_code == 404
+    assert s.calls == 1
+
+
+def test_token_bucket_burst_is_immediate():
+    bucket = jw_http.TokenBucket(rate=1000, burst=5)
+    for _ in range(5):
+        bucket.acquire()
+    assert bucket.tokens < 1
+
+
+def test_run_stats_summary():
+    stats = jw_http.RunStats()
+    stats.incr("pages", 2)
+    stats.incr("items", 10)
+    s = stats.summary()
+    assert s["pages"] == 2 and s["items"] == 10
+    assert s["items_per_sec"] > 0
@@ -0,0 +1,62 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from jw_state import IngestState, RunJournal, content_hash, stable_id
+
+
+def test_stable_id_is_deterministic():
+    assert stable_id("Mi serie", "a.mp4") == stable_id("Mi serie", "a.mp4")
+    assert stable_id("Mi serie", "a.mp4") != stable_id("Mi serie", "b.mp4")
+    assert stable_id("x").startswith("jw-") and len(stable_id("x")) == 19
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_state_roundtrip(tmp_path):
+    st = IngestState(str(tmp_path / "state.sqlite"))
+    assert st.conditional_headers("http://h/p") == {}
+    st.save_validators("http://h/p", '"abc"', "Mon, 01 Jan 2024 00:00:00 GMT")
+    assert st.conditional_headers("http://h/p") == {
+        "If-None-Match": '"abc"',
+        "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT",
+    }
+    assert not st.is_unchanged("id1", "h1")
+    st.mark_items([("id1", "h1")])
+    assert st.is_unchanged("id1", "h1")
+    assert not st.is_unchanged("id1", "h2")
+    st.close()
+
+
+def test_run_journal_resume(tmp_path):
+    st = IngestState(str(tmp_path / "state.sqlite"))
+    run = RunJournal(st, "jw_ingest")
+    run.step_done("source", "http://h/a", {"fetch": 0.1})
+    # Sin --resume se abre una ejecución nueva y la anterior queda abandonada
+    fresh = RunJournal(st, "jw_ingest")
+    assert fresh.run_id != run.run_id and fresh.completed("source") == set()
+    fresh.step_done("source", "http://h/b")
+    fresh.finish("incomplete")
+    resumed = RunJournal(st, "jw_ingest", resume=True)
+    assert resumed.resumed and resumed.run_id == fresh.run_id
+    assert resumed.completed("source") == {"http://h/b"}
+    resumed.finish()
+    assert not RunJournal(st, "jw_ingest", resume=True).resumed
+    st.close()
+
+
+def test_run_journal_resumes_only_with_same_params(tmp_path):
+    st = IngestState(str(tmp_path / "state.sqlite"))
+    run = RunJournal(st, "jw_api_ingest", params={"site_id": "A", "page_length": 50})
+    run.step_done("page", "1")
+    # Otro sitio u otro tamaño de página: las páginas hechas no valen, se empieza de nuevo
+    other = RunJournal(st, "jw_api_ingest", resume=True, params={"site_id": "A", "page_length": 100})
+    assert not other.resumed and other.completed("page") == set()
+    other.finish("incomplete")
+    same = RunJournal(st, "jw_api_ingest", resume=True, params={"page_length": 100, "site_id": "A"})
+    assert same.resumed and same.run_id == other.run_id
+    st.close()
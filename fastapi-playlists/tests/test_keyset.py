@@ -0,0 +1,156 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import Core_M_cajita
+import app as rest
+import keyset
+from fakedb import FakeConnection
+
+rest_client = TestClient(rest.app)
+core_client = TestClient(Core_M_cajita.app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def test_cursor_roundtrip_and_invalid():
+    values = [datetime(2024, 5, 1, 10, 30), 7, "abc"]
+    assert keyset.decode_cursor(keyset.encode_cursor(values), 3) == values
+    for bad in ("no-es-base64!", keyset.encode_cursor([1]), "bnVsbA"):
+        with pytest.raises(ValueError):
+            keyset.decode_cursor(bad, 3)
+
+
+@pytest.mark.parametrize("desc", [True, False])
+def test_pages_cover_every_row_once(desc):
+    # SQLite ordena los NULL como MySQL (primero en ASC, al final en DESC)
+    db = sqlite3.connect(":memory:")
+    db.row_factory = sqlite3.Row
+    db.execute("create table v (date text, season_id int, video_id text)")
+    rows = [("2024-01-0%d" % (i % 3 + 1) if i % 4 else None, i % 2, "v%02d" % i) for i in range(20)]
+    db.executemany("insert into v values (?,?,?)", rows)
+    ks = keyset.Keyset(("date", "season_id", "video_id"), desc=desc, nullable_first=True)
+    base = f"select * from v order by {ks.order_by()}"
+    expected = [tuple(r) for r in db.execute(base)]
+
+    seen, cursor = [], None
+    while True:
+        where, params = ks.after(cursor) if cursor else ("1=1", [])
+        sql = f"select * from v where {where} order by {ks.order_by()} limit ?".replace("%s", "?")
+        page, cursor = ks.page([dict(r) for r in db.execute(sql, params + [4])], 3)
+        seen += [tuple(r.values()) for r in page]
+        if not cursor:
+            break
+    assert seen == expected
+
+
+def test_non_nullable_key_adds_range_bound():
+    sql, params = keyset.Keyset(("title", "id")).after(keyset.encode_cursor(["b", 10]))
+    assert sql == "title >= %s AND (title > %s OR (title = %s AND id > %s))" and params == ["b", "b", "b", 10]
+
+
+def test_videos_page_sets_next_cursor_header(monkeypatch):
+    rows = [{"season_id": 1, "video_id": f"v{i}", "date": datetime(2024, 1, 1), "active": 1} for i in range(3)]
+    conn = FakeConnection([("FROM lacajita_videos", rows)])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    r = rest_client.get("/videos", params={"limit": 2, "active": 1})
+    assert r.status_code == 200 and [v["video_id"] for v in r.json()] == ["v0", "v1"]
+    sql, params = conn.executed[-1]
+    assert sql.endswith("LIMIT %s") and params == [1, 3]
+    assert keyset.decode_cursor(r.headers[keyset.NEXT_CURSOR_HEADER], 3) == [datetime(2024, 1, 1), 1, "v1"]
+
+    r = rest_client.get("/videos", params={"limit": 2, "cursor": r.headers[keyset.NEXT_CURSOR_HEADER]})
+    sql, params = conn.executed[-1]
+    assert "date = %s AND season_id = %s AND video_id < %s" in sql and params[-1] == 3
+
+
+def test_videos_without_limit_returns_everything(monkeypatch):
+    conn = FakeConnection([("FROM lacajita_videos", [])])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    r = rest_client.get("/videos")
+    assert r.status_code == 200 and keyset.NEXT_CURSOR_HEADER not in r.headers
+    assert "LIMIT" not in conn.executed[-1][0]
+
+
+def test_bad_cursor_is_400(monkeypatch):
+    monkeypatch.setattr(rest, "get_connection", FakeConnection)
+    assert rest_client.get("/seasons", params={"cursor": "xx"}).status_code == 400
+    monkeypatch.setattr(Core_M_cajita, "getConnection", FakeConnection)
+    assert core_client.get("/categories", params={"cursor": "xx"}).status_code == 400
+
+
+def test_manplaylists_page_loads_only_its_relations(monkeypatch):
+    conn = FakeConnection([
+        ("from lacajita_playlists pl", [{"id": "a", "img": None}, {"id": "b", "img": None}, {"id": "c", "img": None}]),
+        ("from lacajita_categories cat", [{"id": 1, "name": "X", "id_playlist": "b"}]),
+        ("from lacajita_season", [{"id": 9, "playlist_id": "a"}]),
+    ])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = core_client.get("/manplaylists", params={"limit": 2})
+    body = r.json()
+    assert [p["id"] for p in body] == ["a", "b"]
+    assert body[0]["seasons"] == [{"id": 9, "playlist_id": "a"}]
+    assert body[1]["categories"] == [{"name": "X", "id": 1}]
+    assert [p for sql, p in conn.executed[1:]] == [["a", "b"], ["a", "b"]]
+    assert keyset.decode_cursor(r.headers[keyset.NEXT_CURSOR_HEADER], 1) == ["b"]
+
+
+def _fake_auth0(monkeypatch, users):
+    """/api/v2/users en memoria: filtra por `q` (exacto o rango estricto sobre created_at),
+    ordena solo por created_at (los empates en cualquier orden) y pagina con page/per_page."""
+    calls = []
+
+    def fake_request(url, headers, params):
+        calls.append(params)
+        q = params.get("q", "")
+        rows = list(users)
+        if q.startswith('created_at:"'):
+            rows = [u for u in rows if u["created_at"] == q.split('"')[1]]
+        elif q.startswith('created_at:{"'):
+            rows = [u for u in rows if u["created_at"] > q.split('"')[1]]
+        rows.sort(key=lambda u: u["created_at"])
+        start = params["page"] * params["per_page"]
+        return rows[start:start + params["per_page"]]
+    monkeypatch.setattr(Core_M_cajita, "get_management_token", lambda: "t")
+    monkeypatch.setattr(Core_M_cajita, "_auth0_users_request", fake_request)
+    return calls
+
+
+def _all_pages(limit):
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        body = core_client.get("/auth0/users", params=params).json()
+        ids += [u["user_id"] for u in body["users"]]
+        cursor = body["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def test_auth0_users_cursor_skips_ties_already_served(monkeypatch):
+    calls = _fake_auth0(monkeypatch, [{"user_id": u, "created_at": t} for u, t in
+                                      [("auth0|b", "2024-01-01T00:00:00.000Z"), ("auth0|a", "2024-01-01T00:00:00.000Z"),
+                                       ("auth0|c", "2024-01-02T00:00:00.000Z")]])
+
+    first = core_client.get("/auth0/users", params={"limit": 1}).json()
+    assert [u["user_id"] for u in first["users"]] == ["auth0|a"]
+    calls.clear()
+    second = core_client.get("/auth0/users", params={"limit": 1, "cursor": first["next_cursor"]}).json()
+    assert [u["user_id"] for u in second["users"]] == ["auth0|b"]
+    assert [c["q"] for c in calls] == ['created_at:"2024-01-01T00:00:00.000Z"',
+                                       'created_at:{"2024-01-01T00:00:00.000Z" TO *]']
+    assert _all_pages(1) == ["auth0|a", "auth0|b", "auth0|c"]
+
+
+def test_auth0_users_cursor_survives_more_ties_than_per_page(monkeypatch):
+    monkeypatch.setattr(Core_M_cajita, "AUTH0_MAX_PER_PAGE", 3)
+    # 7 usuarios creados en el mismo instante (importación masiva), más que per_page
+    users = [{"user_id": f"auth0|{i}", "created_at": "2024-01-01T00:00:00.000Z"} for i in range(7, 0, -1)]
+    users += [{"user_id": "auth0|z", "created_at": "2024-01-02T00:00:00.000Z"}]
+    _fake_auth0(monkeypatch, users)
+    expected = [f"auth0|{i}" for i in range(1, 8)] + ["auth0|z"]
+    assert _all_pages(2) == expected
+    assert _all_pages(5) == expected
@@ -0,0 +1,130 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import Core_M_cajita
+import app as rest
+import ordering
+from Core_M_cajita import app
+from fakedb import FakeConnection
+
+client = TestClient(app)
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def test_key_between_keeps_order_under_random_inserts():
+    rnd = random.Random(7)
+    keys = ordering.spread_keys(3)
+    assert keys == sorted(keys)
+    for _ in range(500):
+        i = rnd.randint(0, len(keys))
+        a = keys[i - 1] if i else None
+        b = keys[i] if i < len(keys) else None
+        k = ordering.key_between(a, b)
+        assert (a or "") < k and (b is None or k < b) and not k.endswith("0")
+        keys.insert(i, k)
+    assert keys == sorted(keys) and len(set(keys)) == len(keys)
+    with pytest.raises(ValueError):
+        ordering.key_between("b", "a")
+
+
+def test_move_rewrites_a_single_row(monkeypatch):
+    conn = FakeConnection([("select id, rank_key from lacajita_segments", [(2, "K"), (3, "V")])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/order/segments/move', json={"id": 9, "after_id": 2})
+    assert r.status_code == 200
+    key = r.json()["rank_key"]
+    assert "K" < key < "V"
+    assert conn.statements("update lacajita_segments") == ["update lacajita_segments set rank_key=%s where id=%s"]
+    assert len(conn.executed) == 3 and conn.commits == 1
+    assert conn.executed[-1][1] == ["segment", "9", "U"]  # registro de cambios (changelog.py)
+
+
+def test_move_unknown_neighbour_is_404(monkeypatch):
+    conn = FakeConnection([("select id from lacajita_home_carousel", [(1,), (2,)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/order/homecarousel/move', json={"id": 1, "before_id": 42})
+    assert r.status_code == 404
+    assert conn.rollbacks == 1
+    assert client.post('/order/playlists/move', json={"id": 1}).status_code == 404
+
+
+def test_usegments_applies_permutation_in_one_case_update(monkeypatch):
+    conn = FakeConnection([("select id, rank_key, order_ from lacajita_segments",
+                            [(5, "A", 1), (6, "K", 2), (7, "V", 3)])])
+    monkeypatch.setattr(Core_M_cajita, "getConnection", lambda: conn)
+    r = client.post('/usegments', json={"arrorder": [{"id": 5, "order_": 2}, {"id": 6, "order_": 1},
+                                                     {"id": 7, "order_": 3}]})
+    assert r.status_code == 200
+    _, (sql, params), (log_sql, log_params) = conn.executed
+    assert log_sql.startswith("insert into lacajita_changes") and log_params[1::3] == ["6", "5", "7"]
+    assert sql.startswith("update lacajita_segments set rank_key = case id")
+    keys = dict(zip(params[0:6:2], params[1:6:2]))
+    assert keys[6] < keys[5] < keys[7]
+    assert conn.commits == 1
+
+
+def test_partial_permutation_keeps_unlisted_rows_in_place():
+    conn = FakeConnection([("select id, rank_key, order_ from lacajita_segments",
+                            [(1, "A", 1), (2, "F", 2), (3, "K", 3), (4, "P", 4), (5, "V", 5)])])
+    assert ordering.apply_permutation(conn.cursor(), "lacajita_segments", [4, 2]) == [4, 2]
+    # 2 y 4 intercambian sus lugares; 1, 3 y 5 conservan clave y order_
+    (sql, params), = [(s, p) for s, p in conn.executed if s.startswith("update")]
+    keys = dict(zip(params[0:4:2], params[1:4:2]))
+    assert sorted(keys) == [2, 4] and "A" < keys[4] < "K" < keys[2] < "V"
+    assert "order_" not in sql
+
+
+def _segments_db():
+    """lacajita_segments en memoria: responde las consultas de app.py y de ordering.py."""
+    table = {i: {"id": i, "name": f"S{i}", "livetv": 0, "order_": i, "active": 1, "rank_key": k}
+             for i, k in ((1, "A"), (2, "K"), (3, "V"))}
+
+    def ordered():
+        return sorted(table.values(),
+                      key=lambda r: (r["rank_key"] is None, r["rank_key"] or "", r["order_"], r["id"]))
+
+    def update(sql, p):
+        table[p[-1]].update(zip(("name", "livetv", "order_", "active"), p[:-1]))
+        return []
+
+    def set_keys(sql, p):
+        n = len(p) // (5 if "order_ = case" in sql else 3)
+        for item_id, key in zip(p[0:2 * n:2], p[1:2 * n:2]):
+            table[item_id]["rank_key"] = key
+        return []
+
+    def select(sql, p):
+        rows = [r for r in ordered() if not p or r["id"] == p[0]]
+        return [{"id": r["id"], "name": r["name"], "livetv": r["livetv"], "order": r["order_"],
+                 "active": r["active"]} for r in rows]
+
+    return FakeConnection([
+        ("SELECT order_ FROM lacajita_segments", lambda sql, p: [(table[p[0]]["order_"],)] if p[0] in table else []),
+        ("UPDATE lacajita_segments", update),
+        ("select id, rank_key, order_ from lacajita_segments",
+         lambda sql, p: [(r["id"], r["rank_key"], r["order_"]) for r in ordered()]),
+        ("update lacajita_segments set rank_key = case id", set_keys),
+        ("FROM lacajita_segments", select),
+    ])
+
+
+def test_put_segment_order_moves_it_in_the_listing(monkeypatch):
+    conn = _segments_db()
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    rest_client = TestClient(rest.app)
+    r = rest_client.put('/segments/3', json={"name": "S3", "livetv": 0, "order": 0, "active": 1})
+    assert r.status_code == 200 and r.json()["order"] == 0
+    assert [s["id"] for s in rest_client.get('/segments').json()] == [3, 1, 2]
+
+    # order es un valor, no una posición: con order 1 empata con el 1 y va detrás (ORDER BY order_, id)
+    rest_client.put('/segments/3', json={"name": "S3", "livetv": 0, "order": 1, "active": 1})
+    assert [s["id"] for s in rest_client.get('/segments').json()] == [1, 3, 2]
+
+    # el mismo order (p. ej. reenviar lo leído) no mueve la fila
+    rest_client.put('/segments/2', json={"name": "Otro", "livetv": 0, "order": 2, "active": 1})
+    assert [s["id"] for s in rest_client.get('/segments').json()] == [1, 3, 2]
+    assert rest_client.put('/segments/9', json={"name": "X", "order": 1}).status_code == 404
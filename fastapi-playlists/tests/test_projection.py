@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import projection
+import wire
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+D = datetime(2024, 1, 1)
+
+PLAYLISTS = [
+    {"id": "a", "segment_id": 1, "title": "A", "description": "x" * 500, "active": 1, "updated_at": D,
+     "created_at": D, "img": "a.jpg", "subscription_cost": None},
+    {"id": "b", "segment_id": 1, "title": "B", "description": "", "active": 1, "updated_at": None,
+     "created_at": D, "img": None, "subscription_cost": None},
+    {"id": "c", "segment_id": 1, "title": "C", "description": "", "active": 0, "updated_at": D,
+     "created_at": D, "img": None, "subscription_cost": None},
+]
+SEGMENTS = [{"id": 1, "name": "Cine", "livetv": 0, "order_": 1, "active": 1},
+            {"id": 2, "name": "En vivo", "livetv": 1, "order_": 2, "active": 1}]
+SEASONS = [{"id": 10, "playlist_id": "a", "title": "T1", "description": "", "date": D, "active": 1},
+           {"id": 11, "playlist_id": "a", "title": "T0", "description": "", "date": D, "active": 0}]
+VIDEOS = [{"season_id": 10, "video_id": "v1", "date": D, "active": 1},
+          {"season_id": 10, "video_id": "v2", "date": D, "active": 0}]
+
+
+def test_compiled_projection_keeps_only_requested_fields():
+    project = projection.compile_projection(("id", "updated_at"))
+    assert project({"id": "a", "title": "x", "updated_at": D}) == {"id": "a", "updated_at": "2024-01-01T00:00:00"}
+    assert projection.compile_projection(("id", "updated_at")) is project
+
+
+def test_from_query_validation():
+    assert projection.Projection.from_query({"active": "1"}) is None
+    proj = projection.Projection.from_query({"fields": "id,title", "include": "seasons.videos"})
+    assert proj.fields["playlist"] == ("id", "title") and proj.include == {"seasons", "seasons.videos"}
+    assert "video" not in proj.fields
+    for bad in ({"fields": "id,password"}, {"fields[user]": "id"}, {"include": "owner"}):
+        with pytest.raises(ValueError):
+            projection.Projection.from_query(bad)
+
+
+@pytest.fixture
+def app_catalog(monkeypatch, override_auth):
+    wire.CACHE.clear()
+    conn = FakeConnection([
+        ("select (select count(*)", [{"n": 3, "max": D, "l": 0, "c": 0, "s": 2, "se": 2, "v": 2}]),
+        ("from lacajita_playlists p", PLAYLISTS),
+        ("from lacajita_segments", SEGMENTS),
+        ("from lacajita_season", SEASONS),
+        ("from lacajita_videos", VIDEOS),
+        ("lacajita_home_carousel", [{"id": 1, "link": "l", "imgsrc": None, "video": None, "active": 1}]),
+    ])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(rest, "_livetv_channels", lambda: [{"id": 7, "name": "Canal 7"}])
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    return conn
+
+
+def test_catalog_tree_with_sparse_fields(app_catalog):
+    r = client.get("/playlists", params={"fields": "id,title", "fields[segment]": "id,name"})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["segments"][0] == {"id": 1, "name": "Cine", "playlist": [{"id": "b", "title": "B"},
+                                                                         {"id": "a", "title": "A"}]}
+    assert body["segments"][1]["livetvlist"] == [{"id": 7, "name": "Canal 7"}]
+    assert body["homecarousel"][0]["imgsrc"] == ""
+    assert client.get("/playlists", params={"fields": "nope"}).status_code == 400
+
+
+def test_single_playlist_include_expansion(app_catalog):
+    r = client.get("/playlists/a", params={"fields": "id", "include": "seasons.videos",
+                                           "fields[season]": "id,title"})
+    assert r.json() == {"id": "a", "seasons": [{"id": 10, "title": "T1", "videos": ["v1"]}]}
+    r = client.get("/playlists/a", params={"fields": "id", "include": "seasons.videos", "fields[season]": "id",
+                                           "fields[video]": "video_id"})
+    assert r.json()["seasons"][0]["videos"] == [{"video_id": "v1"}]
+    assert client.get("/playlists/zz", params={"fields": "id"}).status_code == 404
+
+
+def test_by_segment_reads_snapshot(app_catalog):
+    full = client.get("/playlists/by-segment/1", params={"include_videos": True}).json()
+    assert [p["id"] for p in full] == ["a", "b"]
+    assert full[0]["seasons"][0]["videos"] == ["v1"] and full[0]["updated_at"] == "2024-01-01T00:00:00"
+    sparse = client.get("/playlists/by-segment/1", params={"fields": "id", "include_seasons": False}).json()
+    assert sparse == [{"id": "a"}, {"id": "b"}]
+    assert client.get("/playlists/by-segment/9").status_code == 404
+    assert not [sql for sql, _ in app_catalog.executed if "WHERE segment_id" in sql]
@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import search_index
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+
+
+def _playlist(pid, title, description="", category=None, **extra):
+    return {"id": pid, "segment_id": 1, "title": title, "description": description, "category": category,
+            "subscription": 0, "subscription_cost": None, "active": 1, "img": None,
+            "created_at": datetime(2024, 1, 1), "updated_at": datetime(2024, 1, 1), "segment_name": "Series",
+            **extra}
+
+
+PLAYLISTS = [
+    _playlist("p1", "Acción sin límites", "Persecuciones y explosiones", "Cine"),
+    _playlist("p2", "Documentales de naturaleza", "Una serie sobre la acción del clima", "Docs"),
+    _playlist("p3", "Cocina fácil", "Recetas rápidas", "Cocina", subscription=1),
+    _playlist("p4", "Aventura y acción", "Inactiva", "Cine", active=0),
+]
+
+
+def _catalog_db(playlists, signature=None):
+    signature = signature or {"n": len(playlists), "max": datetime(2024, 1, 1), "links": 1, "cats": 1,
+                              "segs": 1, "seasons": 0}
+    return FakeConnection([
+        ("select (select count(*)", lambda sql, params: [dict(signature)]),
+        ("from lacajita_playlists p", lambda sql, params: [dict(p) for p in playlists]),
+        ("select id_playlist, id_category", [{"id_playlist": "p2", "id_category": 7}]),
+        ("select id, name from lacajita_categories", [{"id": 7, "name": "Ciencia"}]),
+        ("from lacajita_segments", [{"id": 1, "name": "Series"}]),
+    ])
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+@pytest.fixture
+def fresh_catalog(monkeypatch):
+    def install(conn):
+        monkeypatch.setattr(rest, "get_connection", lambda: conn)
+        cat = catalog.Catalog(lambda: conn, refresh_seconds=0)
+        cat.register("search", search_index.SearchIndex.from_snapshot)
+        monkeypatch.setattr(rest, "CATALOG", cat)
+        return cat
+    return install
+
+
+def test_fold_and_stem_match_spanish_variants():
+    assert search_index.terms("ACCIÓN") == search_index.terms("accion")
+    assert search_index.terms("Documentales") == search_index.terms("documental")
+    assert search_index.terms("películas") == search_index.terms("Película")
+    assert search_index.terms("año") != search_index.terms("ano")
+    assert search_index.terms("la serie de la semana") == [search_index.stem("serie"), search_index.stem("semana")]
+
+
+def test_title_match_ranks_above_description_match():
+    index = search_index.SearchIndex()
+    for p in PLAYLISTS[:2]:
+        index.upsert(p)
+    assert [p["id"] for _, p in index.search("accion")] == ["p1", "p2"]
+
+
+def test_upsert_and_remove_update_postings():
+    index = search_index.SearchIndex()
+    index.upsert(PLAYLISTS[0])
+    index.upsert({**PLAYLISTS[0], "title": "Comedia"})
+    assert not index.search("accion") and index.search("comedias")
+    index.remove("p1")
+    assert len(index) == 0 and not index.postings and index.total_len == 0
+
+
+def test_search_endpoint_is_accent_insensitive_and_filtered(fresh_catalog):
+    fresh_catalog(_catalog_db(PLAYLISTS))
+    r = client.get("/playlists/search", params={"q": "accion"})
+    assert r.status_code == 200
+    assert [p["id"] for p in r.json()] == ["p1", "p2"]  # p4 inactiva
+    assert r.json()[0]["created_at"] == "2024-01-01T00:00:00"
+    r = client.get("/playlists/search", params={"q": "acción", "category": "Docs"})
+    assert [p["id"] for p in r.json()] == ["p2"]
+    r = client.get("/playlists/search", params={"q": "ciencia"})  # categoría enlazada
+    assert [p["id"] for p in r.json()] == ["p2"]
+    r = client.get("/playlists/search", params={"q": "recetas", "subscription": 0})
+    assert r.json() == []
+
+
+def test_search_route_is_not_shadowed_by_item_route():
+    paths = [getattr(r, "path", None) for r in rest.app.routes]
+    assert paths.index("/playlists/search") < paths.index("/playlists/{item_id}")
+
+
+def test_catalog_applies_new_playlists_incrementally(fresh_catalog):
+    playlists = list(PLAYLISTS)
+    signature = {"n": 4, "max": datetime(2024, 1, 1), "links": 1, "cats": 1, "segs": 1, "seasons": 0}
+    conn = _catalog_db(playlists, signature)
+    cat = fresh_catalog(conn)
+    index = cat.index("search")
+
+    playlists.append(_playlist("p5", "Acción en la montaña", updated_at=datetime(2024, 2, 1)))
+    signature.update(n=5, max=datetime(2024, 2, 1))
+    conn.executed.clear()
+    assert cat.index("search") is index  # mismo índice, actualizado en sitio
+    assert "p5" in index.docs
+    assert any("where p.updated_at >= %s" in sql for sql, _ in conn.executed)
+    assert not conn.statements("select * from lacajita_segments")
+
+
+def test_playlist_crud_updates_index_in_process(fresh_catalog):
+    cat = fresh_catalog(_catalog_db(PLAYLISTS))
+    cat.refresh_seconds = 3600
+    cat.index("search")
+    client.put("/playlists/p3", json={"id": "p3", "segment_id": 1, "title": "Cocina vegana", "active": 1})
+    assert [p["id"] for p in client.get("/playlists/search", params={"q": "veganas"}).json()] == ["p3"]
+    client.delete("/playlists/p3")
+    assert client.get("/playlists/search", params={"q": "veganas"}).json() == []
@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import keyset
+import segment_rows
+import wire
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+D = datetime(2024, 1, 1)
+
+SEGMENTS = [{"id": 2, "name": "Series", "livetv": 0, "order_": 1, "active": 1},
+            {"id": 1, "name": "Cine", "livetv": 0, "order_": 2, "active": 1},
+            {"id": 3, "name": "Oculto", "livetv": 0, "order_": 3, "active": 0},
+            {"id": 4, "name": "En vivo", "livetv": 1, "order_": 4, "active": 1}]
+PLAYLISTS = ([{"id": f"c{i}", "segment_id": 1, "title": f"Cine {i}", "active": 1, "updated_at": D + timedelta(days=i)}
+              for i in range(5)]
+             + [{"id": "c-old", "segment_id": 1, "title": "Sin fecha", "active": 1, "updated_at": None},
+                {"id": "c-off", "segment_id": 1, "title": "Inactiva", "active": 0, "updated_at": D},
+                {"id": "s0", "segment_id": 2, "title": "Serie", "active": 1, "updated_at": D}])
+
+
+def _snapshot():
+    snap = catalog.Snapshot({p["id"]: p for p in PLAYLISTS}, {}, {s["id"]: s for s in SEGMENTS}, [])
+    snap.version = 7
+    return snap
+
+
+def test_rows_follow_segment_order_and_skip_inactive():
+    rows = segment_rows.SegmentRows.from_snapshot(_snapshot())
+    assert [s["id"] for s in rows.segments] == [2, 1, 4]
+    assert [p["id"] for p in rows.rows[1]] == ["c4", "c3", "c2", "c1", "c0", "c-old"]
+    with pytest.raises(KeyError):
+        rows.page(3, 10)
+
+
+def test_cursor_walks_the_whole_row():
+    rows = segment_rows.SegmentRows.from_snapshot(_snapshot())
+    seen, cursor = [], None
+    while True:
+        items, cursor = rows.page(1, 4, cursor)
+        seen += [p["id"] for p in items]
+        if cursor is None:
+            break
+    assert seen == ["c4", "c3", "c2", "c1", "c0", "c-old"]
+    with pytest.raises(ValueError):
+        rows.page(1, 4, keyset.encode_cursor([5, "x"]))
+
+
+@pytest.fixture
+def app_catalog(monkeypatch, override_auth):
+    wire.CACHE.clear()
+    conn = FakeConnection([
+        ("select (select count(*)", [{"n": len(PLAYLISTS), "max": D}]),
+        ("from lacajita_playlists p", PLAYLISTS),
+        ("from lacajita_segments", SEGMENTS),
+    ])
+    monkeypatch.setattr(rest, "_livetv_channels", lambda: [{"id": 9}])
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    rest.CATALOG.register("rows", segment_rows.SegmentRows.from_snapshot)
+    return conn
+
+
+def test_home_and_segment_pages(app_catalog):
+    home = client.get("/home", params={"per_segment": 2}).json()
+    series, cine, live = home["segments"]
+    assert series == {"id": 2, "name": "Series", "livetv": 0, "order_": 1, "next_cursor": None,
+                      "playlists": [{"id": "s0", "segment_id": 2, "title": "Serie", "img": None, "subscription": None,
+                                     "updated_at": "2024-01-01T00:00:00", "placeholder": None}]}
+    assert [p["id"] for p in cine["playlists"]] == ["c4", "c3"] and live["livetvlist"] == [{"id": 9}]
+
+    page = client.get("/home/segments/1", params={"cursor": cine["next_cursor"], "limit": 10,
+                                                  "fields": "id"}).json()
+    assert page["playlists"] == [{"id": i} for i in ("c2", "c1", "c0", "c-old")] and page["next_cursor"] is None
+    assert client.get("/home/segments/3").status_code == 404
+    assert client.get("/home/segments/1", params={"cursor": "nope"}).status_code == 400
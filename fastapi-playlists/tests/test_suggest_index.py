@@ -0,0 +1,75 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import suggest_index
+from fakedb import FakeConnection
+
+client = TestClient(rest.app)
+NOW = datetime(2024, 6, 1)
+
+
+def _snapshot():
+    playlists = {
+        "p1": {"id": "p1", "title": "Acción en la montaña", "active": 1, "updated_at": NOW, "categories": [1]},
+        "p2": {"id": "p2", "title": "Acuarelas", "active": 1, "updated_at": NOW - timedelta(days=365), "categories": [1]},
+        "p3": {"id": "p3", "title": "Acertijos", "active": 0, "updated_at": NOW, "categories": []},
+    }
+    seasons = [{"id": 10, "playlist_id": "p1", "title": "Temporada montañera", "date": NOW, "active": 1},
+               {"id": 11, "playlist_id": "p3", "title": "Acertijos 1", "date": NOW, "active": 1}]
+    snap = catalog.Snapshot(playlists, {1: "Acuáticos", 2: "Animación"}, {}, seasons)
+    snap.version = 3
+    return snap
+
+
+def test_prefix_matches_any_word_start_without_accents():
+    index = suggest_index.SuggestIndex.from_snapshot(_snapshot(), now=NOW)
+    assert [s["id"] for s in index.suggest("MONTA")] == ["p1", 10]
+    assert [s["text"] for s in index.suggest("acu", kind="category")] == ["Acuáticos"]
+    assert index.suggest("la") == []  # palabra vacía: no es inicio de clave
+    assert index.suggest("  ") == []
+
+
+def test_ranking_prefers_recent_and_skips_inactive():
+    index = suggest_index.SuggestIndex.from_snapshot(_snapshot(), now=NOW)
+    results = index.suggest("ac", k=10)
+    assert [s["id"] for s in results] == ["p1", 1, "p2"]  # p3 y su temporada están inactivas
+    assert index.suggest("ac", k=1) == results[:1]
+    assert index.stats()["cached_prefixes"] == 1
+
+
+def test_stats_report_size_and_version():
+    stats = suggest_index.SuggestIndex.from_snapshot(_snapshot(), now=NOW).stats()
+    assert stats["version"] == 3 and stats["entries"] == 5
+    assert stats["keys"] > stats["entries"] and stats["memory_bytes"] > 0
+
+
+pytestmark = pytest.mark.usefixtures("override_auth")
+
+
+def test_suggest_endpoint_rebuilds_on_catalog_change(monkeypatch):
+    titles = ["Cocina fácil"]
+    signature = {"n": 1, "max": NOW, "links": 0, "cats": 0, "segs": 0, "seasons": 0}
+    conn = FakeConnection([
+        ("select (select count(*)", lambda sql, params: [dict(signature)]),
+        ("from lacajita_playlists p", lambda sql, params: [
+            {"id": f"p{i}", "title": t, "active": 1, "updated_at": NOW, "segment_id": None}
+            for i, t in enumerate(titles)]),
+    ])
+    cat = catalog.Catalog(lambda: conn, refresh_seconds=0)
+    cat.register("suggest", suggest_index.SuggestIndex.from_snapshot)
+    monkeypatch.setattr(rest, "CATALOG", cat)
+
+    r = client.get("/playlists/suggest", params={"prefix": "coc"})
+    assert r.status_code == 200 and [s["text"] for s in r.json()["suggestions"]] == ["Cocina fácil"]
+    version = r.json()["version"]
+
+    titles.append("Cocteles")
+    signature.update(n=2, max=NOW + timedelta(seconds=1))
+    body = client.get("/playlists/suggest", params={"prefix": "coc"}).json()
+    assert body["version"] > version and len(body["suggestions"]) == 2
+    assert client.get("/playlists/suggest", params={"prefix": "c", "type": "video"}).status_code == 422
+    assert client.get("/playlists/suggest/stats").json()["entries"] == 2
@@ -0,0 +1,75 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app as rest
+import catalog
+import wire
+from fakedb import FakeConnection
+
+msgpack = pytest.importorskip("msgpack")
+cbor2 = pytest.importorskip("cbor2")
+
+client = TestClient(rest.app)
+D = datetime(2024, 1, 1)
+MP = {"Accept": "application/msgpack"}
+
+
+def test_negotiate_by_quality_and_aliases():
+    assert wire.negotiate(None) is None
+    assert wire.negotiate("application/json") is None
+    assert wire.negotiate("application/x-msgpack") == wire.MSGPACK
+    assert wire.negotiate("application/json;q=0.5, application/cbor") == wire.CBOR
+    assert wire.negotiate("application/msgpack;q=0.2, */*") is None
+    assert wire.negotiate("text/html, application/cbor;q=0.1") == wire.CBOR
+
+
+def test_binary_formats_carry_same_values_as_json():
+    row = {"date": D, "cost": Decimal("2.50"), "ids": [1, 2], "title": "Acción"}
+    expected = json.loads(wire.encode(row, None))
+    assert msgpack.unpackb(wire.encode(row, wire.MSGPACK)) == expected
+    assert cbor2.loads(wire.encode(row, wire.CBOR)) == expected
+
+
+@pytest.fixture
+def app_db(monkeypatch, override_auth):
+    wire.CACHE.clear()
+    conn = FakeConnection([
+        ("select (select count(*)", [{"n": 1, "max": D}]),
+        ("from lacajita_playlists p", [{"id": "a", "segment_id": 1, "title": "A", "active": 1, "updated_at": D}]),
+        ("from lacajita_segments", [{"id": 1, "name": "Cine", "livetv": 0, "active": 1}]),
+        ("FROM lacajita_videos", [{"season_id": 1, "video_id": "v1", "date": D, "active": 1}]),
+    ])
+    monkeypatch.setattr(rest, "get_connection", lambda: conn)
+    monkeypatch.setattr(rest, "CATALOG", catalog.Catalog(lambda: conn, refresh_seconds=3600))
+    return conn
+
+
+def test_list_endpoint_answers_in_negotiated_format(app_db):
+    r = client.get("/videos", headers=MP)
+    assert r.headers["content-type"] == wire.MSGPACK and "Accept" in r.headers["vary"]
+    assert msgpack.unpackb(r.content) == client.get("/videos").json()
+
+
+def test_catalog_body_is_encoded_once_per_version(app_db):
+    first = client.get("/playlists/by-segment/1", headers={"Accept": "application/cbor"})
+    assert cbor2.loads(first.content)[0]["id"] == "a"
+    second = client.get("/playlists/by-segment/1", headers={"Accept": "application/cbor"})
+    assert second.content == first.content and wire.CACHE.hits == 1
+    rest.CATALOG.playlist_saved({"id": "a", "title": "A2"})
+    third = client.get("/playlists/by-segment/1", headers={"Accept": "application/cbor"})
+    assert cbor2.loads(third.content)[0]["title"] == "A2"
+
+
+def test_msgpack_request_bodies(app_db):
+    body = msgpack.packb({"items": []})
+    r = client.post("/batch/videos", content=body, headers={"Content-Type": "application/msgpack", **MP})
+    assert r.status_code == 200 and msgpack.unpackb(r.content) == {"results": []}
+    r = client.post("/batch/videos", content=msgpack.packb({"items": [{"video_id": "x"}]}),
+                    headers={"Content-Type": "application/msgpack"})
+    assert r.status_code == 422  # el cuerpo decodificado pasa por la validación normal
+    r = client.post("/batch/videos", content=b"\xc1", headers={"Content-Type": "application/msgpack"})
+    assert r.status_code == 400
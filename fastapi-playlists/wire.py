@@ -0,0 +1,212 @@
+# wire.py
+# Negociación de formato: JSON, MessagePack o CBOR en respuestas y cuerpos de petición
+"""
+Los clientes de TV (hardware modesto) pueden pedir el catálogo en un formato binario, que
+ocupa menos y se decodifica más rápido que JSON (ver scripts/bench_wire_formats.py):
+
+    Accept: application/msgpack        (también application/x-msgpack)
+    Accept: application/cbor
+
+y enviar cuerpos con `Content-Type: application/msgpack` o `application/cbor` a cualquier
+endpoint (lotes /batch/*, /bulk/*, analítica...): `NegotiatedRoute` los decodifica antes de
+que FastAPI valide el modelo, así que los endpoints no cambian.
+
+Las respuestas negociadas salen de `respond()` (mismo contrato que fast_json.respond): el
+formato lo decide el `Accept` de la petición en curso y, si no es binario o la librería no
+está instalada, se responde JSON. Las fechas viajan como texto ISO y los DECIMAL como número
+en los tres formatos, así el cliente ve los mismos valores.
+
+`respond_cached()` guarda los cuerpos ya codificados por (clave, formato); la clave incluye
+la versión del catálogo, de modo que mientras no cambie no se vuelve a proyectar ni codificar.
+
+msgpack y cbor2 son opcionales (requirements.txt).
+"""
+import contextvars
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+import fast_json
+
+try:
+    import msgpack
+except ImportError:  # msgpack opcional
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # cbor2 opcional
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+_ALIASES = {"application/x-msgpack": MSGPACK, MSGPACK: MSGPACK, CBOR: CBOR}
+
+CACHE_ENTRIES = 64
+
+_accepted: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("wire_accepted", default=None)
+
+
+def available() -> set:
+    out = set()
+    if msgpack is not None:
+        out.add(MSGPACK)
+    if cbor2 is not None:
+        out.add(CBOR)
+    return out
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Formato binario preferido en la cabecera Accept (por q y luego por orden), o None para JSON."""
+    if not accept:
+        return None
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media, _, params = part.strip().partition(";")
+        media = media.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if media in ("application/json", "*/*", "application/*"):
+            media = JSON
+        else:
+            media = _ALIASES.get(media)
+            if media not in available():
+                continue
+        if q > best_q:
+            best, best_q = media, q
+    return None if best == JSON else best
+
+
+def _media_of(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return _ALIASES.get(content_type.split(";", 1)[0].strip().lower())
+
+
+def _cbor_iso(encoder, value) -> None:
+    encoder.encode(value.isoformat())
+
+
+def _cbor_float(encoder, value) -> None:
+    encoder.encode(float(value))
+
+
+_CBOR_ENCODERS = {datetime: _cbor_iso, date: _cbor_iso, Decimal: _cbor_float}
+
+
+def encode(content: Any, media: Optional[str]) -> bytes:
+    if media == MSGPACK:
+        return msgpack.packb(content, default=fast_json.encode_default, use_bin_type=True)
+    if media == CBOR:
+        return cbor2.dumps(content, encoders=_CBOR_ENCODERS, default=lambda enc, v: enc.encode(fast_json.encode_default(v)))
+    return fast_json.dumps(content)
+
+
+def decode(body: bytes, media: str) -> Any:
+    if media == MSGPACK:
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    return cbor2.loads(body)
+
+
+def accepted() -> Optional[str]:
+    """Formato binario negociado para la petición en curso (None = JSON)."""
+    return _accepted.get()
+
+
+def _response(body: bytes, media: Optional[str], response: Optional[Response], status_code: int) -> Response:
+    headers = {}
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    headers["Vary"] = "Accept"
+    return Response(body, status_code=status_code, headers=headers, media_type=media or JSON)
+
+
+def respond(content: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+    """Como fast_json.respond, pero en el formato negociado con Accept."""
+    media = accepted()
+    return _response(encode(content, media), media, response, status_code)
+
+
+class EncodedCache:
+    """Cuerpos codificados por (clave, formato); LRU de `maxsize` entradas."""
+
+    def __init__(self, maxsize: int = CACHE_ENTRIES):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = build()
+        with self._lock:
+            self._items[key] = body
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+
+
+CACHE = EncodedCache()
+
+
+def respond_cached(key: Hashable, build: Callable[[], Any], response: Optional[Response] = None,
+                   cache: Optional[EncodedCache] = None) -> Response:
+    """`respond(build())`, reutilizando el cuerpo ya codificado para (key, formato).
+    `key` debe cambiar cuando cambia el contenido (p. ej. incluir la versión del catálogo)."""
+    media = accepted()
+    body = (cache or CACHE).get((key, media), lambda: encode(build(), media))
+    return _response(body, media, response, 200)
+
+
+class NegotiatedRoute(APIRoute):
+    """Ruta que acepta cuerpos MessagePack/CBOR y anota el formato pedido en Accept."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            media = _media_of(request.headers.get("content-type"))
+            if media is not None:
+                if media not in available():
+                    raise HTTPException(status_code=415, detail=f"{media} no está disponible en el servidor")
+                body = await request.body()
+                try:
+                    data = decode(body, media)
+                except Exception:
+                    raise HTTPException(status_code=400, detail=f"Cuerpo {media} inválido")
+                scope = dict(request.scope)
+                scope["headers"] = [(k, v) for k, v in scope["headers"] if k != b"content-type"]
+                scope["headers"].append((b"content-type", JSON.encode()))
+                request = Request(scope, request.receive)
+                request._body = body
+                request._json = data
+            token = _accepted.set(negotiate(request.headers.get("accept")))
+            try:
+                return await handler(request)
+            finally:
+                _accepted.reset(token)
+
+        return route_handler